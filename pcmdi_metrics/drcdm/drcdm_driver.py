@@ -66,6 +66,13 @@ if __name__ == "__main__":
         shp_path, coords, region_name, col, "land"
     )
 
+    # Lat/lon box of the region, to read only the data in it
+    region_bounds = None
+    if use_region_mask:
+        region_bounds = region_utilities.get_region_bounds(
+            region_name, coords=coords, shp_path=shp_path, column=col
+        )
+
     # Verifying output directory
     metrics_output_path = utilities.verify_output_path(metrics_output_path, case_id)
 
@@ -183,6 +190,8 @@ if __name__ == "__main__":
                 sftlf = xcdat.open_dataset(sftlf_filename, decode_times=False)
                 if use_region_mask:
                     print("\nCreating region mask for land/sea mask.")
+                    # Same region box as the data
+                    sftlf = region_utilities.select_region_bounds(sftlf, region_bounds)
                     sftlf = region_utilities.mask_region(
                         sftlf, region_name, coords=coords, shp_path=shp_path, column=col
                     )
@@ -237,7 +246,10 @@ if __name__ == "__main__":
                         print("  ", t)
 
                 # Load and prep data
-                ds = utilities.load_dataset(test_data_full_path)
+                # Only the years and the region box are read from the files
+                ds = utilities.load_dataset(
+                    test_data_full_path, start_year, end_year, bounds=region_bounds
+                )
 
                 if not sftlf_exists and generate_sftlf:
                     print("Generating land sea mask.")
@@ -277,10 +289,7 @@ if __name__ == "__main__":
                         ds, region_name, coords=coords, shp_path=shp_path, column=col
                     )
 
-                # Get time slice if year parameters exist
-                if start_year is not None:
-                    ds = utilities.slice_dataset(ds, start_year, end_year)
-                else:
+                if start_year is None:
                     # Get labels for start/end years from dataset
                     yrs = [str(int(ds.time.dt.year[0])), str(int(ds.time.dt.year[-1]))]
 
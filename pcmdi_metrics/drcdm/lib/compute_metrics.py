@@ -1,5 +1,3 @@
-import datetime
-
 import cftime
 import matplotlib.pyplot as plt
 import numpy as np
@@ -9,6 +7,7 @@ import xclim
 
 from pcmdi_metrics.io.xcdat_dataset_io import get_latitude_key, get_longitude_key
 from pcmdi_metrics.stats import compute_statistics_dataset as pmp_stats
+from pcmdi_metrics.utils import block_statistic, get_block_labels
 
 bgclr = [0.45, 0.45, 0.45]
 
@@ -51,8 +50,6 @@ class SeasonalAverager:
         self.dec_mode = dec_mode
         self.drop_incomplete_djf = drop_incomplete_djf
         self.annual_strict = annual_strict
-        self.del1d = datetime.timedelta(days=1)
-        self.del0d = datetime.timedelta(days=0)
         self.pentad = None
         self.sftlf = sftlf["sftlf"]
 
@@ -76,108 +73,34 @@ class SeasonalAverager:
         ds.time.encoding["units"] = self.TSD.time_units
         return ds
 
+    def _data_array(self, pentad):
+        # Daily data or 5-day mean
+        if pentad:
+            if self.pentad is None:
+                self.calc_5day_mean()
+            return self.pentad
+        return self.TSD.return_data_array()
+
     def annual_stats(self, stat, pentad=False):
         # Acquire annual statistics
         # Arguments:
-        #     stat: Can be "max", "min"
+        #     stat: Can be "max", "min", "mean", "median", "q<percentile>",
+        #           "ge<threshold>", "le<threshold>"
         #     pentad: True to run on 5-day mean
         # Returns:
-        #     ds_ann: Dataset containing annual max or min grid
+        #     ds_ann: Dataset containing annual statistic grid
 
-        if pentad:
-            if self.pentad is None:
-                self.calc_5day_mean()
-            ds = self.pentad
-        else:
-            ds = self.TSD.return_data_array()
-        cal = self.TSD.calendar
-
-        if self.annual_strict and pentad:
-            # This setting is for means using 5 day rolling average values, where
-            # we do not want to include any data from the prior year
-            year_range = self.TSD.year_range
-            hr = int(ds.time[0].dt.hour)  # get hour to help with selecting nearest time
-
-            # Only use data from that year - start on Jan 5 avg
-            date_range = [
-                xr.cftime_range(
-                    start=cftime.datetime(year, 1, 5, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year + 1, 1, 1, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                )
-                for year in year_range
-            ]
-            date_range = [item for sublist in date_range for item in sublist]
-            if stat == "max":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
-                )
-            elif stat == "mean":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .mean(dim="time")
-                )
-            elif stat == "median":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .median(dim="time")
-                )
-            elif stat.startswith("q"):
-                num = float(stat.replace("q", "").replace("p", ".")) / 100.0
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .quantile(num, dim="time", skipna=True)
-                )
-            elif stat.startswith("ge"):
-                num = int(stat.replace("ge", ""))
-                ds_ann = (
-                    ds.where(ds >= num)
-                    .sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .count(dim="time")
-                    / ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .count(dim="time")
-                    * 100
-                )
-            elif stat.startswith("le"):
-                num = int(stat.replace("le", ""))
-                ds_ann = (
-                    ds.where(ds <= num)
-                    .groupby("time.year")
-                    .sel(time=date_range, method="nearest")
-                    .count(dim="time")
-                    / ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .count(dim="time")
-                    * 100
-                )
+        ds = self._data_array(pentad)
+        labels, years = self.block_labels("ANN", pentad)
 
+        if stat in ["max", "min", "mean", "median"]:
+            ds_ann = block_statistic(ds, labels, years, stat)
         else:
-            # Group by date
-            if stat == "max":
-                ds_ann = ds.groupby("time.year").max(dim="time")
-            elif stat == "min":
-                ds_ann = ds.groupby("time.year").min(dim="time")
-            elif stat == "mean":
-                ds_ann = ds.groupby("time.year").mean(dim="time")
-            elif stat == "median":
-                ds_ann = ds.groupby("time.year").median(dim="time")
-            elif stat.startswith("q"):
+            if (labels < 0).any():
+                # Only use the time steps in the annual blocks, e.g. from Jan 5
+                # for strict 5-day means
+                ds = ds.isel(time=np.flatnonzero(labels >= 0))
+            if stat.startswith("q"):
                 num = float(stat.replace("q", "").replace("p", ".")) / 100.0
                 ds_ann = ds.groupby("time.year").quantile(num, dim="time", skipna=True)
             elif stat.startswith("ge"):
@@ -195,188 +118,39 @@ class SeasonalAverager:
                     * 100
                 )
 
-        # Need to fix time axis if groupby operation happened
-        if "year" in ds_ann.coords:
-            ds_ann = self.fix_time_coord(ds_ann)
-        return self.masked_ds(ds_ann)
+        return self.masked_ds(self.fix_time_coord(ds_ann))
 
     def seasonal_stats(self, season, stat, pentad=False):
         # Acquire statistics for a given season
         # Arguments:
         #     season: Can be "DJF","MAM","JJA","SON"
-        #     stat: Can be "max", "min"
+        #     stat: Can be "max", "min", "mean", "median"
         #     pentad: True to run on 5-day mean
         # Returns:
-        #     ds_stat: Dataset containing seasonal max or min grid
+        #     ds_stat: Dataset containing seasonal statistic grid
 
-        year_range = self.TSD.year_range
+        ds = self._data_array(pentad)
+        labels, years = self.block_labels(season, pentad)
+        ds_stat = block_statistic(ds, labels, years, stat)
+        return self.masked_ds(self.fix_time_coord(ds_stat))
 
-        if pentad:
-            if self.pentad is None:
-                self.calc_5day_mean()
-            ds = self.pentad
-        else:
-            ds = self.TSD.return_data_array()
-        cal = self.TSD.calendar
-
-        hr = int(ds.time[0].dt.hour)  # help with selecting nearest time
-
-        if season == "DJF" and self.dec_mode == "DJF":
-            # Resample DJF to count prior DJF in current year
-            if stat == "max":
-                ds_stat = ds.resample(time="QS-DEC").max(dim="time")
-            elif stat == "min":
-                ds_stat = ds.resample(time="QS-DEC").min(dim="time")
-            elif stat == "mean":
-                ds_stat = ds.resample(time="QS-DEC").mean(dim="time")
-            elif stat == "median":
-                ds_stat = ds.resample(time="QS-DEC").median(dim="time")
-
-            ds_stat = ds_stat.isel(time=ds_stat.time.dt.month.isin([12]))
-
-            # Deal with inconsistencies between QS-DEC calendar and block exremes calendar
-            if self.drop_incomplete_djf:
-                ds_stat = ds_stat.sel(
-                    {"time": slice(str(year_range[0]), str(year_range[-1] - 1))}
-                )
-                ds_stat["time"] = [
-                    cftime.datetime(y, 1, 1, calendar=cal)
-                    for y in np.arange(year_range[0] + 1, year_range[-1] + 1)
-                ]
-            else:
-                ds_stat = ds_stat.sel(
-                    {"time": slice(str(year_range[0] - 1), str(year_range[-1] - 1))}
-                )
-                ds_stat["time"] = [
-                    cftime.datetime(y, 1, 1, calendar=cal)
-                    for y in np.arange(year_range[0], year_range[-1] + 1)
-                ]
-
-        elif season == "DJF" and self.dec_mode == "JFD":
-            # Make date lists that capture JF and D in all years, then merge and sort
-            if self.annual_strict and pentad:
-                # Only use data from that year - start on Jan 5 avg
-                date_range_1 = [
-                    xr.cftime_range(
-                        start=cftime.datetime(year, 1, 5, hour=hr, calendar=cal)
-                        - self.del0d,
-                        end=cftime.datetime(year, 3, 1, hour=hr, calendar=cal)
-                        - self.del1d,
-                        freq="D",
-                        calendar=cal,
-                    )
-                    for year in year_range
-                ]
-            else:
-                date_range_1 = [
-                    xr.cftime_range(
-                        start=cftime.datetime(year, 1, 1, hour=hr, calendar=cal)
-                        - self.del0d,
-                        end=cftime.datetime(year, 3, 1, hour=hr, calendar=cal)
-                        - self.del1d,
-                        freq="D",
-                        calendar=cal,
-                    )
-                    for year in year_range
-                ]
-            date_range_1 = [item for sublist in date_range_1 for item in sublist]
-            date_range_2 = [
-                xr.cftime_range(
-                    start=cftime.datetime(year, 12, 1, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year + 1, 1, 1, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                )
-                for year in year_range
-            ]
-            date_range_2 = [item for sublist in date_range_2 for item in sublist]
-            date_range = sorted(date_range_1 + date_range_2)
-
-            if stat == "max":
-                ds_stat = (
-                    ds.sel(
-                        time=date_range, method="nearest"
-                    )  # could also do ds.sel(time = slice(*(begin_cftime, end_cftime)))
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
-                )
-            elif stat == "mean":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .mean(dim="time")
-                )
-            elif stat == "median":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .median(dim="time")
-                )
-
-        else:  # Other 3 seasons
-            dates = {  # Month/day tuples
-                "MAM": [(3, 1), (6, 1)],
-                "JJA": [(6, 1), (9, 1)],
-                "SON": [(9, 1), (12, 1)],
-            }
-
-            mo_st = dates[season][0][0]
-            day_st = dates[season][0][1]
-            mo_en = dates[season][1][0]
-            day_en = dates[season][1][1]
-
-            cal = self.TSD.calendar
-
-            date_range = [
-                xr.cftime_range(
-                    start=cftime.datetime(year, mo_st, day_st, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year, mo_en, day_en, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                )
-                for year in year_range
-            ]
-            date_range = [item for sublist in date_range for item in sublist]
-
-            if stat == "max":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
-                )
-            elif stat == "mean":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .mean(dim="time")
-                )
-            elif stat == "median":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .median(dim="time")
-                )
-
-        # Need to fix time axis if groupby operation happened
-        if "year" in ds_stat.coords:
-            ds_stat = self.fix_time_coord(ds_stat)
-        return self.masked_ds(ds_stat)
+    def block_labels(self, block, pentad=False):
+        # Map each time step to the year block it belongs to
+        # Arguments:
+        #     block: Can be "ANN", "DJF", "MAM", "JJA", "SON"
+        #     pentad: True for the blocks of the 5-day mean
+        # Returns:
+        #     labels: Index in years of the block of each time step (-1 if unused)
+        #     years: Years of the blocks
+
+        return get_block_labels(
+            self.TSD.ds.time,
+            block,
+            dec_mode=self.dec_mode,
+            drop_incomplete_djf=self.drop_incomplete_djf,
+            annual_strict=self.annual_strict,
+            pentad=pentad,
+        )
 
 
 def update_nc_attrs(ds, dec_mode, drop_incomplete_djf, annual_strict):
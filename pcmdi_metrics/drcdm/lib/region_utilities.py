@@ -6,6 +6,8 @@ import geopandas as gpd
 import numpy as np
 import regionmask
 
+from pcmdi_metrics.io import get_latitude_key, get_longitude_key
+
 
 def check_region_params(shp_path, coords, region_name, col, default):
     use_region_mask = False
@@ -110,3 +112,58 @@ def mask_region(data, name, coords=None, shp_path=None, column=None):
         sys.exit()
 
     return masked_data
+
+
+def get_region_bounds(name, coords=None, shp_path=None, column=None):
+    # Return the lat/lon box (lat_min, lat_max, lon_min, lon_max)
+    # of the region from coordinate list or shapefile, so that
+    # only the data in it need to be read before masking.
+
+    # Option 1: Region is defined by coord pairs
+    if coords is not None:
+        lon, lat = np.array(coords, dtype=float).T
+        lon_min, lat_min, lon_max, lat_max = lon.min(), lat.min(), lon.max(), lat.max()
+
+    # Option 2: region is defined by shapefile
+    elif shp_path is not None:
+        try:
+            regions_file = gpd.read_file(shp_path)
+            region = regions_file[regions_file[column] == name]
+            lon_min, lat_min, lon_max, lat_max = region.total_bounds
+        except Exception as e:
+            print("Error in getting region bounds from shapefile:")
+            print("  ", e)
+            sys.exit()
+
+    else:
+        print(
+            "Error in region bounds: Region coordinates or shapefile must be provided."
+        )
+        sys.exit()
+
+    return (float(lat_min), float(lat_max), float(lon_min), float(lon_max))
+
+
+def select_region_bounds(data, bounds):
+    # Return the data within the lat/lon box 'bounds' (see get_region_bounds).
+    # Longitudes are compared modulo 360, so the box and the data can use
+    # either the -180-180 or the 0-360 convention.
+    # Data on curvilinear grids (2-D latitude/longitude) are returned as they
+    # are, and only the region mask selects the region.
+    # Data should be lazily loaded, so that only the selection is read.
+    lat_min, lat_max, lon_min, lon_max = bounds
+
+    lat = data[get_latitude_key(data)]
+    lon = data[get_longitude_key(data)]
+    if lat.ndim != 1 or lon.ndim != 1:
+        return data
+
+    in_lat = (lat.values >= lat_min) & (lat.values <= lat_max)
+    if lon_max - lon_min >= 360:
+        in_lon = np.ones(len(lon), dtype=bool)
+    else:
+        in_lon = (lon.values - lon_min) % 360 <= lon_max - lon_min
+
+    return data.isel(
+        {lat.dims[0]: np.flatnonzero(in_lat), lon.dims[0]: np.flatnonzero(in_lon)}
+    )
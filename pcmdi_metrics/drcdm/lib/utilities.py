@@ -6,14 +6,19 @@ import sys
 import cftime
 import xcdat
 
+from pcmdi_metrics.drcdm.lib.region_utilities import select_region_bounds
 from pcmdi_metrics.io import xcdat_openxml
 from pcmdi_metrics.io.base import Base
 
 
-def load_dataset(filepath):
+def load_dataset(filepath, start_year=None, end_year=None, bounds=None):
     # Load an xarray dataset from the given filepath.
     # If list of netcdf files, opens mfdataset.
     # If list of xmls, open last file in list.
+    # If start_year and end_year are given, selects those years,
+    # and if bounds are given, selects the lat/lon box of the region
+    # (see region_utilities.get_region_bounds). Both are selected before
+    # the data are read, so only those parts of the files are loaded.
     def fix_calendar(ds):
         cal = ds.time.calendar
         # Add any calendar fixes here
@@ -39,6 +44,10 @@ def load_dataset(filepath):
                 filepath[0], chunks={"time": -1}, decode_times=False
             )
             ds = fix_calendar(ds)
+    if start_year is not None:
+        ds = slice_dataset(ds, start_year, end_year)
+    if bounds is not None:
+        ds = select_region_bounds(ds, bounds)
     return ds
 
 
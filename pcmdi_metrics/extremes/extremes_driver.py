@@ -51,6 +51,8 @@ regrid = parameter.regrid
 cov_file = parameter.covariate_path
 cov_name = parameter.covariate
 return_period = parameter.return_period
+num_workers = parameter.num_workers
+rv_warm_start = parameter.rv_warm_start
 # Block extrema related settings
 annual_strict = parameter.annual_strict
 exclude_leap = parameter.exclude_leap
@@ -67,6 +69,13 @@ use_region_mask, region_name, coords = region_utilities.check_region_params(
     shp_path, coords, region_name, col, "land"
 )
 
+# Lat/lon box of the region, to read only the data in it
+region_bounds = None
+if use_region_mask:
+    region_bounds = region_utilities.get_region_bounds(
+        region_name, coords=coords, shp_path=shp_path, column=col
+    )
+
 # Verifying output directory
 metrics_output_path = utilities.verify_output_path(metrics_output_path, case_id)
 
@@ -187,6 +196,8 @@ for model in model_loop_list:
                 sftlf["sftlf"] = sftlf["sftlf"] * 100.0
             if use_region_mask:
                 print("\nCreating sftlf region mask.")
+                # Same region box as the data
+                sftlf = region_utilities.select_region_bounds(sftlf, region_bounds)
                 sftlf = region_utilities.mask_region(
                     sftlf, region_name, coords=coords, shp_path=shp_path, column=col
                 )
@@ -233,7 +244,10 @@ for model in model_loop_list:
                     print("  ", t)
 
             # Load and prep data
-            ds = utilities.load_dataset(test_data_full_path)
+            # Only the years and the region box are read from the files
+            ds = utilities.load_dataset(
+                test_data_full_path, start_year, end_year, bounds=region_bounds
+            )
 
             if not sftlf_exists and generate_sftlf:
                 print("Generating land sea mask.")
@@ -253,10 +267,7 @@ for model in model_loop_list:
                     ds, region_name, coords=coords, shp_path=shp_path, column=col
                 )
 
-            # Get time slice if year parameters exist
-            if start_year is not None:
-                ds = utilities.slice_dataset(ds, start_year, end_year)
-            else:
+            if start_year is None:
                 # Get labels for start/end years from dataset
                 yrs = [str(int(ds.time.dt.year[0])), str(int(ds.time.dt.year[-1]))]
 
@@ -538,12 +549,28 @@ for model in model_loop_list:
             # Use all realizations
             print(model)
             meta = return_value.compute_rv_for_model(
-                filelist, cov_file, cov_name, nc_dir, return_period, meta, maxes=maxes
+                filelist,
+                cov_file,
+                cov_name,
+                nc_dir,
+                return_period,
+                meta,
+                maxes=maxes,
+                num_workers=num_workers,
+                warm_start=rv_warm_start,
             )
         elif len(filelist) == 1:
             # Return value from single realization
             meta = return_value.compute_rv_from_file(
-                filelist, cov_file, cov_name, nc_dir, return_period, meta, maxes=maxes
+                filelist,
+                cov_file,
+                cov_name,
+                nc_dir,
+                return_period,
+                meta,
+                maxes=maxes,
+                num_workers=num_workers,
+                warm_start=rv_warm_start,
             )
 
 rv_metrics_dict = compute_metrics.init_metrics_dict(
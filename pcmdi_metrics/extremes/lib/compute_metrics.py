@@ -1,6 +1,4 @@
 #!/usr/bin/env python
-import datetime
-
 import cftime
 import numpy as np
 import xarray as xr
@@ -14,6 +12,7 @@ from pcmdi_metrics.stats import meanabs_xy as compute_meanabs_xy
 from pcmdi_metrics.stats import rms_xy as compute_rms_xy
 from pcmdi_metrics.stats import rmsc_xy as compute_rmsc_xy
 from pcmdi_metrics.stats import std_xy as compute_std_xy
+from pcmdi_metrics.utils import block_statistic, get_block_labels, reduce_blocks
 
 
 class TimeSeriesData:
@@ -54,8 +53,6 @@ class SeasonalAverager:
         self.dec_mode = dec_mode
         self.drop_incomplete_djf = drop_incomplete_djf
         self.annual_strict = annual_strict
-        self.del1d = datetime.timedelta(days=1)
-        self.del0d = datetime.timedelta(days=0)
         self.pentad = None
         self.sftlf = sftlf["sftlf"]
 
@@ -78,217 +75,121 @@ class SeasonalAverager:
         ds.time.encoding["units"] = self.TSD.time_units
         return ds
 
+    def _data_array(self, pentad):
+        # Daily data or 5-day mean
+        if pentad:
+            if self.pentad is None:
+                self.calc_5day_mean()
+            return self.pentad
+        return self.TSD.return_data_array()
+
     def annual_stats(self, stat, pentad=False):
         # Acquire annual statistics
         # Arguments:
-        #     stat: Can be "max", "min"
+        #     stat: Can be "max", "min", "mean", "median"
         #     pentad: True to run on 5-day mean
         # Returns:
-        #     ds_ann: Dataset containing annual max or min grid
-
-        if pentad:
-            if self.pentad is None:
-                self.calc_5day_mean()
-            ds = self.pentad
-        else:
-            ds = self.TSD.return_data_array()
-        cal = self.TSD.calendar
-
-        if self.annual_strict and pentad:
-            # This setting is for means using 5 day rolling average values, where
-            # we do not want to include any data from the prior year
-            year_range = self.TSD.year_range
-            hr = int(ds.time[0].dt.hour)  # get hour to help with selecting nearest time
-
-            # Only use data from that year - start on Jan 5 avg
-            date_range = [
-                xr.date_range(
-                    start=cftime.datetime(year, 1, 5, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year + 1, 1, 1, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                    use_cftime=True,
-                )
-                for year in year_range
-            ]
-            date_range = [item for sublist in date_range for item in sublist]
-            if stat == "max":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_ann = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
-                )
-        else:
-            # Group by date
-            if stat == "max":
-                ds_ann = ds.groupby("time.year").max(dim="time")
-            elif stat == "min":
-                ds_ann = ds.groupby("time.year").min(dim="time")
+        #     ds_ann: Dataset containing annual statistic grid
 
-        # Need to fix time axis if groupby operation happened
-        if "year" in ds_ann.coords:
-            ds_ann = self.fix_time_coord(ds_ann)
-        return self.masked_ds(ds_ann)
+        ds = self._data_array(pentad)
+        labels, years = self.block_labels("ANN", pentad)
+        ds_ann = block_statistic(ds, labels, years, stat)
+        return self.masked_ds(self.fix_time_coord(ds_ann))
 
     def seasonal_stats(self, season, stat, pentad=False):
         # Acquire statistics for a given season
         # Arguments:
         #     season: Can be "DJF","MAM","JJA","SON"
-        #     stat: Can be "max", "min"
+        #     stat: Can be "max", "min", "mean", "median"
         #     pentad: True to run on 5-day mean
         # Returns:
-        #     ds_stat: Dataset containing seasonal max or min grid
+        #     ds_stat: Dataset containing seasonal statistic grid
 
-        year_range = self.TSD.year_range
+        ds = self._data_array(pentad)
+        labels, years = self.block_labels(season, pentad)
+        ds_stat = block_statistic(ds, labels, years, stat)
+        return self.masked_ds(self.fix_time_coord(ds_stat))
 
-        if pentad:
-            if self.pentad is None:
-                self.calc_5day_mean()
-            ds = self.pentad
-        else:
-            ds = self.TSD.return_data_array()
-        cal = self.TSD.calendar
-
-        hr = int(ds.time[0].dt.hour)  # help with selecting nearest time
-
-        if season == "DJF" and self.dec_mode == "DJF":
-            # Resample DJF to count prior DJF in current year
-            if stat == "max":
-                ds_stat = ds.resample(time="QS-DEC").max(dim="time")
-            elif stat == "min":
-                ds_stat = ds.resample(time="QS-DEC").min(dim="time")
-
-            ds_stat = ds_stat.isel(time=ds_stat.time.dt.month.isin([12]))
+    def block_labels(self, block, pentad=False):
+        # Map each time step to the year block it belongs to, with the same
+        # blocks as annual_stats ("ANN") and seasonal_stats.
+        # Arguments:
+        #     block: Can be "ANN", "DJF", "MAM", "JJA", "SON"
+        #     pentad: True for the blocks of the 5-day mean
+        # Returns:
+        #     labels: Index in years of the block of each time step (-1 if unused)
+        #     years: Years of the blocks
+
+        return get_block_labels(
+            self.TSD.ds.time,
+            block,
+            dec_mode=self.dec_mode,
+            drop_incomplete_djf=self.drop_incomplete_djf,
+            annual_strict=self.annual_strict,
+            pentad=pentad,
+        )
 
-            # Deal with inconsistencies between QS-DEC calendar and block exremes calendar
-            if self.drop_incomplete_djf:
-                ds_stat = ds_stat.sel(
-                    {"time": slice(str(year_range[0]), str(year_range[-1] - 1))}
-                )
-                ds_stat["time"] = [
-                    cftime.datetime(y, 1, 1, calendar=cal)
-                    for y in np.arange(year_range[0] + 1, year_range[-1] + 1)
-                ]
-            else:
-                ds_stat = ds_stat.sel(
-                    {"time": slice(str(year_range[0] - 1), str(year_range[-1] - 1))}
+    def block_extremes(self, stats, chunk_size=3650):
+        # Compute several block statistics in one pass over the time series,
+        # reading chunk_size time steps at a time.
+        # Arguments:
+        #     stats: List of (stat, pentad) tuples, where stat can be "max" or
+        #            "min" and pentad is True to run on 5-day mean
+        #     chunk_size: Number of time steps per chunk
+        # Returns:
+        #     block_stats: Dict of {(stat, pentad): {block: DataArray}}, the
+        #                  same as annual_stats and seasonal_stats for blocks
+        #                  "ANN", "DJF", "MAM", "JJA", "SON"
+
+        ds = self.TSD.return_data_array().transpose("time", ...)
+        blocks = ["ANN", "DJF", "MAM", "JJA", "SON"]
+        dtype = np.result_type(ds.dtype, np.float32)
+
+        labels = {}
+        results = {}
+        for stat, pentad in stats:
+            for block in blocks:
+                if (block, pentad) not in labels:
+                    labels[block, pentad] = self.block_labels(block, pentad)
+                nyears = len(labels[block, pentad][1])
+                results[stat, pentad, block] = np.full(
+                    (nyears,) + ds.shape[1:], np.nan, dtype=dtype
                 )
-                ds_stat["time"] = [
-                    cftime.datetime(y, 1, 1, calendar=cal)
-                    for y in np.arange(year_range[0], year_range[-1] + 1)
-                ]
-
-        elif season == "DJF" and self.dec_mode == "JFD":
-            # Make date lists that capture JF and D in all years, then merge and sort
-            if self.annual_strict and pentad:
-                # Only use data from that year - start on Jan 5 avg
-                date_range_1 = [
-                    xr.date_range(
-                        start=cftime.datetime(year, 1, 5, hour=hr, calendar=cal)
-                        - self.del0d,
-                        end=cftime.datetime(year, 3, 1, hour=hr, calendar=cal)
-                        - self.del1d,
-                        freq="D",
-                        calendar=cal,
-                        use_cftime=True,
-                    )
-                    for year in year_range
-                ]
-            else:
-                date_range_1 = [
-                    xr.date_range(
-                        start=cftime.datetime(year, 1, 1, hour=hr, calendar=cal)
-                        - self.del0d,
-                        end=cftime.datetime(year, 3, 1, hour=hr, calendar=cal)
-                        - self.del1d,
-                        freq="D",
-                        calendar=cal,
-                        use_cftime=True,
+
+        # Last 4 days of the previous chunk for the 5-day mean
+        previous = np.full((4,) + ds.shape[1:], np.nan, dtype=dtype)
+        for start in range(0, len(ds.time), chunk_size):
+            chunk = np.asarray(ds.isel(time=slice(start, start + chunk_size)).values)
+            data = {False: chunk}
+            if any(pentad for _, pentad in stats):
+                window = np.concatenate([previous, chunk.astype(dtype)])
+                data[True] = sum(window[i : i + len(chunk)] for i in range(5)) / 5
+                previous = window[-4:]
+            for stat, pentad in stats:
+                for block in blocks:
+                    reduce_blocks(
+                        data[pentad],
+                        labels[block, pentad][0][start : start + len(chunk)],
+                        len(labels[block, pentad][1]),
+                        stat,
+                        out=results[stat, pentad, block],
                     )
-                    for year in year_range
-                ]
-            date_range_1 = [item for sublist in date_range_1 for item in sublist]
-            date_range_2 = [
-                xr.date_range(
-                    start=cftime.datetime(year, 12, 1, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year + 1, 1, 1, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                    use_cftime=True,
-                )
-                for year in year_range
-            ]
-            date_range_2 = [item for sublist in date_range_2 for item in sublist]
-            date_range = sorted(date_range_1 + date_range_2)
-
-            if stat == "max":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
-                )
 
-        else:  # Other 3 seasons
-            dates = {  # Month/day tuples
-                "MAM": [(3, 1), (6, 1)],
-                "JJA": [(6, 1), (9, 1)],
-                "SON": [(9, 1), (12, 1)],
-            }
-
-            mo_st = dates[season][0][0]
-            day_st = dates[season][0][1]
-            mo_en = dates[season][1][0]
-            day_en = dates[season][1][1]
-
-            cal = self.TSD.calendar
-
-            date_range = [
-                xr.date_range(
-                    start=cftime.datetime(year, mo_st, day_st, hour=hr, calendar=cal)
-                    - self.del0d,
-                    end=cftime.datetime(year, mo_en, day_en, hour=hr, calendar=cal)
-                    - self.del1d,
-                    freq="D",
-                    calendar=cal,
-                    use_cftime=True,
-                )
-                for year in year_range
-            ]
-            date_range = [item for sublist in date_range for item in sublist]
-
-            if stat == "max":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .max(dim="time")
-                )
-            elif stat == "min":
-                ds_stat = (
-                    ds.sel(time=date_range, method="nearest")
-                    .groupby("time.year")
-                    .min(dim="time")
+        coords = ds.isel(time=0, drop=True).coords
+        block_stats = {}
+        for stat, pentad in stats:
+            block_stats[stat, pentad] = {}
+            for block in blocks:
+                ds_stat = xr.DataArray(
+                    results[stat, pentad, block],
+                    dims=("year",) + ds.dims[1:],
+                    coords={**coords, "year": labels[block, pentad][1]},
+                    attrs=ds.attrs,
+                    name=ds.name,
                 )
-
-        # Need to fix time axis if groupby operation happened
-        if "year" in ds_stat.coords:
-            ds_stat = self.fix_time_coord(ds_stat)
-        return self.masked_ds(ds_stat)
+                ds_stat = self.fix_time_coord(ds_stat)
+                block_stats[stat, pentad][block] = self.masked_ds(ds_stat)
+        return block_stats
 
 
 def update_nc_attrs(ds, dec_mode, drop_incomplete_djf, annual_strict):
@@ -370,14 +271,14 @@ def temperature_indices(
         annual_strict=annual_strict,
     )
 
+    # All annual and seasonal extrema from one pass over the data
+    block_stats = S.block_extremes([("max", False), ("min", False)])
+
     Tmax = xr.Dataset()
     Tmin = xr.Dataset()
-    Tmax["ANN"] = S.annual_stats("max")
-    Tmin["ANN"] = S.annual_stats("min")
-
-    for season in ["DJF", "MAM", "JJA", "SON"]:
-        Tmax[season] = S.seasonal_stats(season, "max")
-        Tmin[season] = S.seasonal_stats(season, "min")
+    for season in ["ANN", "DJF", "MAM", "JJA", "SON"]:
+        Tmax[season] = block_stats["max", False][season]
+        Tmin[season] = block_stats["min", False][season]
 
     Tmax = update_nc_attrs(Tmax, dec_mode, drop_incomplete_djf, annual_strict)
     Tmin = update_nc_attrs(Tmin, dec_mode, drop_incomplete_djf, annual_strict)
@@ -405,37 +306,20 @@ def precipitation_indices(
         annual_strict=annual_strict,
     )
 
-    # Rx1day
-    P1day = xr.Dataset()
-    P1day["ANN"] = S.annual_stats("max", pentad=False)
-    # Can end up with very small negative values that should be 0
-    # Possibly related to this issue? https://github.com/pydata/bottleneck/issues/332
-    # (from https://github.com/pydata/xarray/issues/3855)
-    P1day["ANN"] = (
-        P1day["ANN"].where(P1day["ANN"] > 0, 0).where(~np.isnan(P1day["ANN"]), np.nan)
-    )
-    for season in ["DJF", "MAM", "JJA", "SON"]:
-        P1day[season] = S.seasonal_stats(season, "max", pentad=False)
-        P1day[season] = (
-            P1day[season]
-            .where(P1day[season] > 0, 0)
-            .where(~np.isnan(P1day[season]), np.nan)
-        )
-    P1day = update_nc_attrs(P1day, dec_mode, drop_incomplete_djf, annual_strict)
+    # Rx1day and Rx5day from one pass over the data
+    block_stats = S.block_extremes([("max", False), ("max", True)])
 
-    # Rx5day
+    P1day = xr.Dataset()
     P5day = xr.Dataset()
-    P5day["ANN"] = S.annual_stats("max", pentad=True)
-    P5day["ANN"] = (
-        P5day["ANN"].where(P5day["ANN"] > 0, 0).where(~np.isnan(P5day["ANN"]), np.nan)
-    )
-    for season in ["DJF", "MAM", "JJA", "SON"]:
-        P5day[season] = S.seasonal_stats(season, "max", pentad=True)
-        P5day[season] = (
-            P5day[season]
-            .where(P5day[season] > 0, 0)
-            .where(~np.isnan(P5day[season]), np.nan)
-        )
+    for season in ["ANN", "DJF", "MAM", "JJA", "SON"]:
+        # Can end up with very small negative values that should be 0
+        # Possibly related to this issue? https://github.com/pydata/bottleneck/issues/332
+        # (from https://github.com/pydata/xarray/issues/3855)
+        Rx1day = block_stats["max", False][season]
+        P1day[season] = Rx1day.where(Rx1day > 0, 0).where(~np.isnan(Rx1day), np.nan)
+        Rx5day = block_stats["max", True][season]
+        P5day[season] = Rx5day.where(Rx5day > 0, 0).where(~np.isnan(Rx5day), np.nan)
+    P1day = update_nc_attrs(P1day, dec_mode, drop_incomplete_djf, annual_strict)
     P5day = update_nc_attrs(P5day, dec_mode, drop_incomplete_djf, annual_strict)
 
     return P1day, P5day
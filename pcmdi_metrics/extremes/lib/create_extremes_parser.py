@@ -287,5 +287,21 @@ def create_extremes_parser():
         default=20,
         help="Return period, in years, for obtaining return values.",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        dest="num_workers",
+        default=1,
+        help="Number of processes for the return value GEV fits (default: 1)",
+        required=False,
+    )
+    parser.add_argument(
+        "--rv_warm_start",
+        action="store_true",
+        help="Start the GEV fit of each grid cell from the parameters fitted for a "
+        "neighboring cell instead of the default first guess. Results can differ "
+        "from the default fits.",
+        required=False,
+    )
 
     return parser
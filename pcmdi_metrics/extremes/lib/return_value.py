@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import xarray as xr
@@ -12,7 +13,15 @@ from pcmdi_metrics.extremes.lib import utilities
 
 
 def compute_rv_from_file(
-    filelist, cov_filepath, cov_name, outdir, return_period, meta, maxes=True
+    filelist,
+    cov_filepath,
+    cov_name,
+    outdir,
+    return_period,
+    meta,
+    maxes=True,
+    num_workers=1,
+    warm_start=False,
 ):
     # Go through all files and get return value and standard error by file.
     # Write results to netcdf file.
@@ -28,7 +37,15 @@ def compute_rv_from_file(
     for ncfile in filelist:
         ds = xc.open_dataset(ncfile)
         print(ncfile)
-        rv, se = get_dataset_rv(ds, cov_filepath, cov_name, return_period, maxes)
+        rv, se = get_dataset_rv(
+            ds,
+            cov_filepath,
+            cov_name,
+            return_period,
+            maxes,
+            num_workers=num_workers,
+            warm_start=warm_start,
+        )
         if rv is None:
             print("Error in calculating return value for", ncfile)
             print("Skipping file.")
@@ -57,7 +74,15 @@ def compute_rv_from_file(
 
 
 def compute_rv_for_model(
-    filelist, cov_filepath, cov_varname, ncdir, return_period, meta, maxes=True
+    filelist,
+    cov_filepath,
+    cov_varname,
+    ncdir,
+    return_period,
+    meta,
+    maxes=True,
+    num_workers=1,
+    warm_start=False,
 ):
     # Similar to compute_rv_from_dataset, but to work on multiple realizations
     # from the same model
@@ -67,6 +92,8 @@ def compute_rv_for_model(
     #   cov_varname: string
     #   return_period: int
     #   maxes: bool
+    #   num_workers: int, number of processes for the GEV fits
+    #   warm_start: bool, see fit_rv_cells
 
     nreal = len(filelist)
 
@@ -158,21 +185,21 @@ def compute_rv_for_model(
             rv_array = np.ones((lat * lon)) * np.nan
         se_array = rv_array.copy()
         # Here's where we're doing the return value calculation
-        for j in range(0, lat * lon):
-            if np.sum(arr[:, j]) == 0:
-                continue
-            elif np.isnan(np.sum(arr[:, j])):
-                continue
-            rv, se = calc_rv_py(
-                arr[:, j].squeeze(), cov, return_period, nreplicates=nreal, maxes=maxes
-            )
-            if rv is not None:
-                if nonstationary:
-                    rv_array[i1:, j] = np.squeeze(rv * scale_factor)
-                    se_array[i1:, j] = np.squeeze(se * scale_factor)
-                else:
-                    rv_array[j] = rv * scale_factor
-                    se_array[j] = se * scale_factor
+        rv, se = fit_rv_cells(
+            arr,
+            cov,
+            return_period,
+            nreplicates=nreal,
+            maxes=maxes,
+            num_workers=num_workers,
+            warm_start=warm_start,
+        )
+        if nonstationary:
+            rv_array[i1:, :] = rv * scale_factor
+            se_array[i1:, :] = se * scale_factor
+        else:
+            rv_array = rv * scale_factor
+            se_array = se * scale_factor
 
         # reshape array to match desired dimensions and add to Dataset
         # Also reorder dimensions for nonstationary case
@@ -225,7 +252,15 @@ def compute_rv_for_model(
     return meta
 
 
-def get_dataset_rv(ds, cov_filepath, cov_varname, return_period=20, maxes=True):
+def get_dataset_rv(
+    ds,
+    cov_filepath,
+    cov_varname,
+    return_period=20,
+    maxes=True,
+    num_workers=1,
+    warm_start=False,
+):
     # Get the return value for a single model & realization
     # Set cov_filepath and cov_varname to None for stationary GEV.
     # Arguments:
@@ -234,6 +269,8 @@ def get_dataset_rv(ds, cov_filepath, cov_varname, return_period=20, maxes=True):
     #   cov_varname: string
     #   return_period: int
     #   maxes: bool
+    #   num_workers: int, number of processes for the GEV fits
+    #   warm_start: bool, see fit_rv_cells
 
     dec_mode = str(ds.attrs["december_mode"])
     drop_incomplete_djf = ds.attrs["drop_incomplete_djf"]
@@ -313,22 +350,21 @@ def get_dataset_rv(ds, cov_filepath, cov_varname, return_period=20, maxes=True):
         else:
             cov_slice = None
 
-        for j in range(0, dim2):
-            b = data[i1:, j]
-            if np.sum(b) == 0:
-                continue
-            elif np.isnan(np.sum(b)):
-                continue
-            rv_tmp, se_tmp = calc_rv_py(
-                data[i1:, j].squeeze(), cov_slice, return_period, 1, maxes
-            )
-            if rv_tmp is not None:
-                if nonstationary:
-                    rv_array[i1:, j] = rv_tmp * scale_factor
-                    se_array[i1:, j] = se_tmp * scale_factor
-                else:
-                    rv_array[j] = rv_tmp * scale_factor
-                    se_array[j] = se_tmp * scale_factor
+        rv_tmp, se_tmp = fit_rv_cells(
+            data[i1:],
+            cov_slice,
+            return_period,
+            1,
+            maxes,
+            num_workers=num_workers,
+            warm_start=warm_start,
+        )
+        if nonstationary:
+            rv_array[i1:, :] = rv_tmp * scale_factor
+            se_array[i1:, :] = se_tmp * scale_factor
+        else:
+            rv_array = rv_tmp * scale_factor
+            se_array = se_tmp * scale_factor
 
         if nonstationary:
             rv_array = np.reshape(rv_array, (time, lat, lon))
@@ -492,6 +528,443 @@ def calc_rv_py(x, covariate, return_period, nreplicates=1, maxes=True):
     return return_value.squeeze(), se.squeeze()
 
 
+def fit_rv_cells(
+    arr,
+    covariate,
+    return_period,
+    nreplicates=1,
+    maxes=True,
+    num_workers=1,
+    block_size=256,
+    warm_start=False,
+):
+    # Return value and standard error for every column (cell) of arr, with
+    # the same results as calling calc_rv_py on each column.
+    # Columns that are all zero or contain nan are skipped (left as nan).
+    # The cells are split in blocks that are fitted in parallel over
+    # num_workers processes, and each block is fitted with calc_rv_batch.
+    # Arguments:
+    #   arr: numpy array (time, cells)
+    #   covariate: numpy array or None
+    #   return_period: int
+    #   nreplicates: int
+    #   maxes: bool
+    #   num_workers: int, number of processes
+    #   block_size: int, number of cells fitted together
+    #   warm_start: bool, start the fits from the parameters of neighboring cells
+    # Returns:
+    #   rv_array, se_array: numpy arrays (cells,), or (time, cells) if nonstationary
+
+    ncells = arr.shape[1]
+    if covariate is None:
+        rv_array = np.ones((ncells)) * np.nan
+    else:
+        rv_array = np.ones((len(covariate), ncells)) * np.nan
+    se_array = rv_array.copy()
+
+    column_sum = np.sum(arr, axis=0)
+    cells = np.where((column_sum != 0) & ~np.isnan(column_sum))[0]
+    blocks = [cells[i : i + block_size] for i in range(0, len(cells), block_size)]
+    args = [
+        (
+            np.ascontiguousarray(arr[:, block].T),
+            covariate,
+            return_period,
+            nreplicates,
+            maxes,
+            warm_start,
+        )
+        for block in blocks
+    ]
+
+    if num_workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_fit_rv_block, args))
+    else:
+        results = [_fit_rv_block(a) for a in args]
+
+    for block, (rv, se) in zip(blocks, results):
+        if covariate is None:
+            rv_array[block] = rv
+            se_array[block] = se
+        else:
+            rv_array[:, block] = rv.T
+            se_array[:, block] = se.T
+
+    return rv_array, se_array
+
+
+def _fit_rv_block(args):
+    x, covariate, return_period, nreplicates, maxes, warm_start = args
+    if not warm_start or len(x) < 2:
+        rv, se, _ = calc_rv_batch(x, covariate, return_period, nreplicates, maxes)
+        return rv, se
+
+    # Fit every few cells from a stationary GEV first guess (as calc_rv_py),
+    # then start the other cells from the parameters of the previous of those
+    stride = 4
+    anchors = np.arange(0, len(x), stride)
+    others = np.setdiff1d(np.arange(len(x)), anchors)
+    rv_a, se_a, params_a = calc_rv_batch(
+        x[anchors], covariate, return_period, nreplicates, maxes
+    )
+    init = params_a[others // stride]
+    rv_o, se_o, _ = calc_rv_batch(
+        x[others], covariate, return_period, nreplicates, maxes, init_params=init
+    )
+
+    rv = np.empty((len(x),) + rv_a.shape[1:])
+    se = np.empty_like(rv)
+    rv[anchors], se[anchors] = rv_a, se_a
+    rv[others], se[others] = rv_o, se_o
+    return rv, se
+
+
+def calc_rv_batch(
+    x, covariate, return_period, nreplicates=1, maxes=True, init_params=None
+):
+    # Vectorized version of calc_rv_py for a batch of cells: the GEV
+    # negative log likelihood is minimized for all cells at once with the
+    # same Nelder-Mead steps as scipy.optimize.minimize, and the Hessian for
+    # the standard error is computed by central differences.
+    # Arguments:
+    #   x: numpy array (cells, samples)
+    #   covariate: numpy array or None
+    #   return_period: int
+    #   nreplicates: int
+    #   maxes: bool
+    #   init_params: numpy array (cells, parameters), optional first guess
+    #       instead of the stationary GEV fit of each cell
+    # Returns:
+    #   return_value, standard_error: numpy arrays (cells,), or (cells, time)
+    #       if nonstationary
+    #   params: numpy array (cells, parameters), fitted parameters
+
+    x = np.asarray(x, dtype=float)
+    if not maxes:
+        x = -1 * x
+
+    nonstationary = covariate is not None
+    if nonstationary:
+        covariate = np.asarray(covariate)
+        covariate_tiled = np.tile(covariate, nreplicates)
+    else:
+        covariate_tiled = None
+
+    def ll(params, rows):
+        return _gev_nll_batch(params, x[rows], covariate_tiled)
+
+    # Use the stationary gev to make initial parameter guess
+    if init_params is None:
+        shape, loc, scale = _gev_fit_batch(x).T
+        if nonstationary:
+            x0 = np.stack([loc, np.zeros(len(x)), scale, shape], axis=1)
+        else:
+            x0 = np.stack([loc, scale, shape], axis=1)
+    else:
+        x0 = np.array(init_params, dtype=float)
+
+    # Get GEV parameters
+    params, success = _nelder_mead_batch(ll, x0, tol=1e-7)
+
+    if nonstationary:
+        scale = params[:, 2]
+        shape = params[:, 3]
+        location = params[:, 0:1] + params[:, 1:2] * covariate
+    else:
+        location = params[:, 0:1]
+        scale = params[:, 1]
+        shape = params[:, 2]
+
+    # Calculate return value
+    with np.errstate(all="ignore"):
+        return_value = genextreme.isf(
+            1 / return_period, shape[:, None], location, scale[:, None]
+        )
+    return_value = np.where(success[:, None], return_value, np.nan)
+    if not maxes:
+        return_value = -1 * return_value
+
+    # Calculate standard error
+    vcov = _inverse_hessian_batch(ll, params)
+    y = -np.log(1 - 1 / return_period)
+    with np.errstate(all="ignore"):
+        dsh = (-1 / shape) * (1 - y ** (-shape))
+        dsc = scale * (shape**-2) * (1 - y**-shape) - (
+            scale / shape * (y**-shape) * np.log(y)
+        )
+        if nonstationary:
+            ones = np.ones((len(x), len(covariate)))
+            grad = np.stack(
+                [ones, ones * covariate, ones * dsh[:, None], ones * dsc[:, None]],
+                axis=1,
+            )
+        else:
+            grad = np.stack([np.ones(len(x)), dsh, dsc], axis=1)[:, :, None]
+        se = np.sqrt(np.einsum("ckt,ckl,clt->ct", grad, vcov, grad))
+    # calc_rv_py can not compute the standard error for a Gumbel fit
+    se[shape == 0] = np.nan
+
+    if not nonstationary:
+        return_value = return_value[:, 0]
+        se = se[:, 0]
+
+    return return_value, se, params
+
+
+def _gev_fit_batch(x):
+    # Stationary GEV fit of each row of x (cells, samples), with the same
+    # first guess, penalized negative log likelihood and optimizer as
+    # scipy.stats.genextreme.fit. Returns (cells, 3): shape, loc, scale.
+
+    # First guess: shape from the sign of the skewness, and loc and scale
+    # from the method of moments, moved so that the support holds the data
+    mu = x.mean(axis=1, keepdims=True)
+    skew = ((x - mu) ** 3).mean(axis=1) / np.power(((x - mu) ** 2).mean(axis=1), 1.5)
+    shape = np.where(skew < 0, 0.5, -0.5)
+    mu_gev, mu2_gev = genextreme.stats(shape, moments="mv")
+    with np.errstate(all="ignore"):
+        scale = np.sqrt(x.var(axis=1) / mu2_gev)
+        loc = mu[:, 0] - scale * mu_gev
+    loc = np.where(np.isfinite(loc), loc, 0)
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1)
+
+    data_a = x.min(axis=1)
+    data_b = x.max(axis=1)
+    margin = (data_b - data_a) * 0.1
+    bound = loc + scale / shape  # upper bound if shape > 0, lower bound if < 0
+    compatible = np.where(shape > 0, data_b < bound, bound < data_a)
+    loc = np.where(
+        compatible,
+        loc,
+        np.where(shape > 0, data_b - 1 / shape + margin, data_a - 1 / shape - margin),
+    )
+    scale = np.where(compatible, scale, 1)
+
+    def nnlf(theta, rows):
+        return _gev_penalized_nnlf_batch(theta, x[rows])
+
+    theta, _ = _nelder_mead_batch(nnlf, np.stack([shape, loc, scale], axis=1), tol=1e-4)
+    return theta
+
+
+def _gev_penalized_nnlf_batch(theta, x):
+    # Penalized negative log likelihood of scipy.stats.genextreme for each
+    # row of theta (cells, 3): shape, loc, scale, and x (cells, samples)
+    c = theta[:, 0:1]
+    loc = theta[:, 1:2]
+    scale = theta[:, 2:3]
+    with np.errstate(all="ignore"):
+        z = (x - loc) / scale
+        # support of the distribution
+        tiny = np.finfo(float).tiny
+        upper = np.where(c > 0, 1.0 / np.maximum(c, tiny), np.inf)
+        lower = np.where(c < 0, 1.0 / np.minimum(c, -tiny), -np.inf)
+        inside = (lower <= z) & (z <= upper)
+        # log of the density
+        cz = np.where(c != 0, c * z, 0.0)
+        logex2 = np.log1p(-cz)
+        logpex2 = np.where(c != 0, np.log1p(-c * z) / c, -z)
+        logpdf = np.where(
+            (cz == 1) | (cz == -np.inf), -np.inf, -np.exp(logpex2) + logpex2 - logex2
+        )
+        logpdf = np.where((c == 1) & (z == 1), 0.0, logpdf)
+        valid = inside & np.isfinite(logpdf)
+        n_bad = x.shape[1] - np.count_nonzero(valid, axis=1)
+        result = (
+            -np.sum(np.where(valid, logpdf, 0), axis=1)
+            + n_bad * np.log(np.finfo(float).max) * 100
+            + x.shape[1] * np.log(scale[:, 0])
+        )
+    return np.where(np.isfinite(c[:, 0]) & (scale[:, 0] > 0), result, np.inf)
+
+
+def _gev_nll_batch(params, x, covariate_tiled=None):
+    # Negative log likelihood of the GEV (same as in calc_rv_py) for each
+    # row of params (cells, parameters) and x (cells, samples)
+    n = x.shape[1]
+    if covariate_tiled is not None:
+        location = params[:, 0:1] + params[:, 1:2] * covariate_tiled
+        scale = params[:, 2:3]
+        shape = params[:, 3:4]
+    else:
+        location = params[:, 0:1]
+        scale = params[:, 1:2]
+        shape = params[:, 2:3]
+
+    gumbel = np.abs(shape) <= 1e-8  # np.allclose(shape, 0)
+    with np.errstate(all="ignore"):
+        y_gumbel = (x - location) / scale
+        result_gumbel = np.sum(n * np.log(scale) + y_gumbel + np.exp(-y_gumbel), axis=1)
+        # This value must be > 0, Coles 2001
+        y = 1 + shape * (x - location) / scale
+        outside = np.any(y <= 0, axis=1)
+        y = np.where(y <= 0, 1, y)
+        result = np.sum(
+            np.log(scale) + y ** (-1 / shape) + np.log(y) * (1 / shape + 1), axis=1
+        )
+    result = np.where(outside, 1e10, result)
+    return np.where(gumbel[:, 0], result_gumbel, result)
+
+
+def _nelder_mead_batch(func, x0, tol=1e-7):
+    # Nelder-Mead minimization of independent problems, one per row of x0,
+    # with the same steps as scipy.optimize.minimize(method="nelder-mead")
+    # and xatol = fatol = tol.
+    # func(params, rows) returns the function values (len(rows),) for the
+    # parameters (len(rows), N) of the problems of index rows.
+    # Returns the minima (cells, N) and a success flag for each problem.
+    rho, chi, psi, sigma = 1, 2, 0.5, 0.5
+    ncells, N = x0.shape
+    maxiter = maxfun = N * 200
+    all_rows = np.arange(ncells)
+
+    sim = np.repeat(x0[:, None, :], N + 1, axis=1)
+    for k in range(N):
+        sim[:, k + 1, k] = np.where(x0[:, k] != 0, (1 + 0.05) * x0[:, k], 0.00025)
+    fsim = np.stack([func(sim[:, k], all_rows) for k in range(N + 1)], axis=1)
+    sim, fsim = _sort_simplex(sim, fsim)
+
+    fcalls = np.full(ncells, N + 1)
+    iterations = np.ones(ncells, dtype=int)
+    active = np.ones(ncells, dtype=bool)
+
+    while True:
+        active &= (fcalls < maxfun) & (iterations < maxiter)
+        rows = np.where(active)[0]
+        s, fs = sim[rows], fsim[rows]
+        converged = (np.max(np.abs(s[:, 1:] - s[:, :1]), axis=(1, 2)) <= tol) & (
+            np.max(np.abs(fs[:, :1] - fs[:, 1:]), axis=1) <= tol
+        )
+        active[rows[converged]] = False
+        rows = rows[~converged]
+        if len(rows) == 0:
+            break
+
+        s, fs, calls = sim[rows], fsim[rows], fcalls[rows] + 1
+        xbar = np.add.reduce(s[:, :-1], 1) / N
+        worst = s[:, -1]
+        xr = (1 + rho) * xbar - rho * worst
+        fxr = func(xr, rows)
+
+        expand = fxr < fs[:, 0]
+        accept = ~expand & (fxr < fs[:, -2])
+        outside = ~expand & ~accept & (fxr < fs[:, -1])
+        inside = ~expand & ~accept & ~outside
+        xnew = np.where(
+            expand[:, None],
+            (1 + rho * chi) * xbar - rho * chi * worst,
+            np.where(
+                outside[:, None],
+                (1 + psi * rho) * xbar - psi * rho * worst,
+                (1 - psi) * xbar + psi * worst,
+            ),
+        )
+        # Iterations stop without update when a call would exceed maxfun
+        stopped = ~accept & (calls >= maxfun)
+        second = ~accept & ~stopped
+        fxnew = np.full(len(rows), np.nan)
+        fxnew[second] = func(xnew[second], rows[second])
+        calls += second
+
+        take_r = accept | (expand & ~stopped & ~(fxnew < fxr))
+        take_new = ~stopped & (
+            (expand & (fxnew < fxr))
+            | (outside & (fxnew <= fxr))
+            | (inside & (fxnew < fs[:, -1]))
+        )
+        s[:, -1] = np.where(take_r[:, None], xr, s[:, -1])
+        fs[:, -1] = np.where(take_r, fxr, fs[:, -1])
+        s[:, -1] = np.where(take_new[:, None], xnew, s[:, -1])
+        fs[:, -1] = np.where(take_new, fxnew, fs[:, -1])
+
+        # Shrink towards the best vertex
+        shrink = (outside | inside) & ~stopped & ~take_new
+        for j in range(1, N + 1):
+            i = np.where(shrink & ~stopped)[0]
+            s[i, j] = s[i, 0] + sigma * (s[i, j] - s[i, 0])
+            stopped[i[calls[i] >= maxfun]] = True
+            i = i[calls[i] < maxfun]
+            fs[i, j] = func(s[i, j], rows[i])
+            calls[i] += 1
+
+        iterations[rows] += ~stopped
+        active[rows[stopped]] = False
+        fcalls[rows] = calls
+        sim[rows], fsim[rows] = _sort_simplex(s, fs)
+
+    success = (fcalls < maxfun) & (iterations < maxiter)
+    return sim[:, 0], success
+
+
+def _sort_simplex(sim, fsim):
+    # Sort the vertices of each simplex so that the first has the lowest value
+    ind = np.argsort(fsim, axis=1)
+    return np.take_along_axis(sim, ind[:, :, None], 1), np.take_along_axis(fsim, ind, 1)
+
+
+def _inverse_hessian_batch(func, params):
+    # Inverse of the Hessian of func(params, rows) at params (cells, N), by
+    # central differences. Cells whose differences reach outside of the GEV
+    # support use numdifftools as calc_rv_py, except if params itself is
+    # outside (flat penalty, singular Hessian). As in calc_rv_py, cells with
+    # negative variances are tried again with the complex step method of
+    # numdifftools, and set to nan if the variances are still negative.
+    ncells, N = params.shape
+    rows = np.arange(ncells)
+    h = np.finfo(float).eps ** 0.25 * np.maximum(np.abs(params), 1)
+    step = np.eye(N)[None, :, :] * h[:, :, None]  # step[:, i] along parameter i
+
+    f0 = func(params, rows)
+    evaluations = [f0]
+    hess = np.empty((ncells, N, N))
+    for i in range(N):
+        fp = func(params + step[:, i], rows)
+        fm = func(params - step[:, i], rows)
+        hess[:, i, i] = (fp - 2 * f0 + fm) / h[:, i] ** 2
+        evaluations += [fp, fm]
+        for j in range(i):
+            fpp = func(params + step[:, i] + step[:, j], rows)
+            fpm = func(params + step[:, i] - step[:, j], rows)
+            fmp = func(params - step[:, i] + step[:, j], rows)
+            fmm = func(params - step[:, i] - step[:, j], rows)
+            hess[:, i, j] = hess[:, j, i] = (fpp - fpm - fmp + fmm) / (
+                4 * h[:, i] * h[:, j]
+            )
+            evaluations += [fpp, fpm, fmp, fmm]
+    evaluations = np.stack(evaluations)
+    smooth = np.isfinite(evaluations).all(axis=0) & (evaluations < 1e10).all(axis=0)
+
+    def cell_hessian(c, method):
+        hs = Hessian(
+            lambda p: func(p[None, :], rows[c : c + 1])[0],
+            step=None,
+            method=method,
+            order=None,
+        )
+        return hs(params[c])
+
+    vcov = np.full((ncells, N, N), np.nan)
+    for c in rows[f0 < 1e10]:
+        try:
+            if not smooth[c]:
+                hess[c] = cell_hessian(c, "central")
+            vcov[c] = np.linalg.inv(hess[c])
+        except (np.linalg.LinAlgError, ValueError):
+            continue
+
+    negative = (np.diagonal(vcov, axis1=1, axis2=2) < 0).any(axis=1)
+    for c in rows[negative]:
+        # Try again with a different method
+        try:
+            vcov[c] = np.linalg.inv(cell_hessian(c, "complex"))
+        except (np.linalg.LinAlgError, ValueError, TypeError):
+            vcov[c] = np.nan
+    negative = (np.diagonal(vcov, axis1=1, axis2=2) < 0).any(axis=1)
+    vcov[negative] = np.nan
+    return vcov
+
+
 def calc_rv_interpolated(tseries, return_period, average=False):
     # A function to get a stationary return period
     # interpolated from the block maximum data
@@ -6,15 +6,20 @@ import sys
 import cftime
 import xcdat
 
+from pcmdi_metrics.extremes.lib.region_utilities import select_region_bounds
 from pcmdi_metrics.io import xcdat_openxml
 from pcmdi_metrics.io.base import Base
 from pcmdi_metrics.utils import create_land_sea_mask
 
 
-def load_dataset(filepath):
+def load_dataset(filepath, start_year=None, end_year=None, bounds=None):
     # Load an xarray dataset from the given filepath.
     # If list of netcdf files, opens mfdataset.
     # If list of xmls, open last file in list.
+    # If start_year and end_year are given, selects those years,
+    # and if bounds are given, selects the lat/lon box of the region
+    # (see region_utilities.get_region_bounds). Both are selected before
+    # the data are read, so only those parts of the files are loaded.
     if filepath[-1].endswith(".xml"):
         # Final item of sorted list would have most recent version date
         ds = xcdat_openxml.xcdat_openxml(filepath[-1])
@@ -22,6 +27,10 @@ def load_dataset(filepath):
         ds = xcdat.open_mfdataset(filepath, chunks=None)
     else:
         ds = xcdat.open_dataset(filepath[0])
+    if start_year is not None:
+        ds = slice_dataset(ds, start_year, end_year)
+    if bounds is not None:
+        ds = select_region_bounds(ds, bounds)
     return ds
 
 
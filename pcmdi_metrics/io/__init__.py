@@ -24,5 +24,6 @@ from .xcdat_dataset_io import (  # noqa  # isort:skip
     get_time_key,
     select_subset,
 )
-from .regions import load_regions_specs, region_subset  # noqa
+from .regions import create_region_masks, load_regions_specs, region_subset  # noqa
+from .regrid_cache import RegridCache  # noqa
 from .region_from_file import region_from_file
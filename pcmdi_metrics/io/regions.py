@@ -1,5 +1,6 @@
 from typing import Union
 
+import numpy as np
 import xarray as xr
 import xcdat as xc
 
@@ -8,6 +9,7 @@ from pcmdi_metrics.io import (
     get_latitude,
     get_latitude_key,
     get_longitude,
+    get_longitude_key,
     select_subset,
 )
 
@@ -343,6 +345,109 @@ def region_subset(
         return ds
 
 
+def create_region_masks(
+    ds: Union[xr.Dataset, xr.DataArray],
+    regions: list,
+    regions_specs: dict = None,
+    landfrac: xr.DataArray = None,
+    land_criteria: float = 0.8,
+    ocean_criteria: float = 0.2,
+) -> xr.DataArray:
+    """
+    Create a stacked mask of regions on the grid of a dataset.
+
+    Each layer of the mask selects the grid cells that :func:`region_subset` and
+    land/ocean masking with ``apply_landmask`` would keep for a region, so all
+    regions can be reduced together instead of subsetting the data region by region.
+
+    Parameters
+    ----------
+    ds : Union[xr.Dataset, xr.DataArray]
+        Dataset or data array that provides the latitude-longitude grid.
+    regions : list
+        Names of the regions, keys of `regions_specs`. Regions named with a "land"
+        or "ocean" component (e.g., "land_NHEX") are also masked by `landfrac`.
+    regions_specs : dict, optional
+        A dictionary containing specifications for different regions. If None,
+        defaults are loaded, by default None.
+    landfrac : xr.DataArray, optional
+        Land fraction on the same grid, as fraction (0-1) or percentage (0-100).
+        Required for land or ocean regions, by default None.
+    land_criteria : float, optional
+        Threshold for considering a grid cell as land, by default 0.8.
+    ocean_criteria : float, optional
+        Threshold for considering a grid cell as ocean, by default 0.2.
+
+    Returns
+    -------
+    xr.DataArray
+        Mask of dimensions (region, lat, lon), 1 inside and 0 outside each region.
+
+    Raises
+    ------
+    ValueError
+        If a land or ocean region is requested without `landfrac`.
+
+    See Also
+    --------
+    region_subset : Subset a dataset to a single region.
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.io import create_region_masks
+    >>> masks = create_region_masks(ds, ["global", "NHEX", "land_TROPICS"], landfrac=sftlf)
+    """
+    if regions_specs is None:
+        regions_specs = load_regions_specs()
+
+    lat_key = get_latitude_key(ds)
+    lon_key = get_longitude_key(ds)
+    lat = ds[lat_key].values
+    lon = ds[lon_key].values
+
+    if landfrac is not None:
+        landfrac = landfrac.transpose(lat_key, lon_key).values
+        if landfrac.dtype.kind == "f" and np.nanmax(landfrac) > 1:
+            landfrac = landfrac / 100.0
+
+    masks = np.ones((len(regions), len(lat), len(lon)))
+
+    for r, region in enumerate(regions):
+        keywords = region.split("_")
+        if any(keyword in keywords for keyword in ["land", "ocean"]):
+            if landfrac is None:
+                raise ValueError(f"landfrac is required for region {region}")
+            if "land" in keywords:
+                masks[r] *= landfrac >= land_criteria
+            else:
+                masks[r] *= landfrac <= ocean_criteria
+
+        if region.lower() in ["global", "land", "ocean"]:
+            continue
+
+        domain = regions_specs[region].get("domain", {})
+
+        if "latitude" in domain:
+            lat0, lat1 = domain["latitude"]
+            in_lat = (lat >= min(lat0, lat1)) & (lat <= max(lat0, lat1))
+            masks[r] *= in_lat[:, np.newaxis]
+
+        if "longitude" in domain:
+            lon0, lon1 = domain["longitude"]
+            lon_region = lon
+            # same longitude range swap as in region_subset
+            if min(lon0, lon1) < 0 and min(lon.min(), lon.max()) >= 0:
+                lon_region = ((lon + 180) % 360) - 180
+            in_lon = (lon_region >= lon0) & (lon_region <= lon1)
+            masks[r] *= in_lon[np.newaxis, :]
+
+    return xr.DataArray(
+        masks,
+        dims=["region", lat_key, lon_key],
+        coords={"region": regions, lat_key: ds[lat_key], lon_key: ds[lon_key]},
+    )
+
+
 def _reverse_lat(ds: xr.Dataset) -> xr.Dataset:
     lat_key = get_latitude_key(ds)
     ds_reversed = _reverse_coord(ds, lat_key)
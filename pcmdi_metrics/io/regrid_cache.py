@@ -0,0 +1,246 @@
+import glob
+import hashlib
+import json
+import os
+from typing import Optional, Union
+
+import numpy as np
+import xarray as xr
+import xmltodict
+
+from pcmdi_metrics.io.write_atomic import write_atomic
+from pcmdi_metrics.io.xcdat_dataset_io import get_grid
+from pcmdi_metrics.io.xcdat_openxml import xcdat_open
+
+# Bump when the layout of cached files changes to invalidate old entries
+CACHE_VERSION = 2
+
+
+def file_fingerprint(data_path: Union[str, list], hash_content: bool = False) -> str:
+    """
+    Fingerprint the input file(s) of a dataset.
+
+    Parameters
+    ----------
+    data_path : Union[str, list]
+        Path of the file(s) as given to :func:`xcdat_open`: a netCDF file, a list of
+        files, a wildcard pattern, or an xml file generated by cdscan.
+    hash_content : bool, optional
+        If True, hash the file content (MD5). Otherwise use the absolute path,
+        modification time and size of each file, by default False.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest identifying the input files and their state.
+    """
+    if isinstance(data_path, list):
+        files = sorted(data_path)
+    elif "*" in data_path:
+        files = sorted(glob.glob(data_path))
+    else:
+        files = [data_path]
+        if data_path.split(".")[-1].lower() == "xml":
+            # also follow the netCDF files that the xml file points to
+            with open(data_path, encoding="utf-8") as fd:
+                doc = xmltodict.parse(fd.read())
+            files += sorted(
+                glob.glob(os.path.join(doc["dataset"]["@directory"], "*.nc"))
+            )
+
+    md5 = hashlib.md5()
+    for f in files:
+        f = os.path.abspath(f)
+        md5.update(f.encode())
+        if hash_content:
+            with open(f, "rb") as fd:
+                for block in iter(lambda: fd.read(2**20), b""):
+                    md5.update(block)
+        else:
+            st = os.stat(f)
+            md5.update(f"{st.st_mtime_ns}:{st.st_size}".encode())
+    return md5.hexdigest()
+
+
+def grid_fingerprint(grid: Union[xr.Dataset, xr.DataArray]) -> str:
+    """
+    Fingerprint a latitude-longitude grid from its coordinates and bounds.
+
+    Parameters
+    ----------
+    grid : Union[xr.Dataset, xr.DataArray]
+        Dataset or data array with latitude, longitude and their bounds.
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the grid.
+    """
+    grid = get_grid(grid)
+    md5 = hashlib.md5()
+    for key in sorted(grid.variables):
+        md5.update(key.encode())
+        md5.update(np.ascontiguousarray(grid[key].values, dtype=np.float64).tobytes())
+    return md5.hexdigest()
+
+
+class RegridCache:
+    """
+    Persistent on-disk cache of regridded datasets.
+
+    Entries are netCDF files named by a key built from the fingerprint of the
+    input files, the target grid and the loading options (see :meth:`make_key`),
+    each with a JSON file of the options used to open it again (e.g.,
+    `decode_times`). When the cache grows beyond `max_size_gb`, the least recently used entries
+    are removed.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory where cached datasets are stored. Created if it does not exist.
+    max_size_gb : float, optional
+        Maximum total size of the cache in GB, by default None (unbounded).
+    hash_content : bool, optional
+        If True, identify input files by the MD5 of their content instead of
+        their modification time and size, by default False.
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.io import RegridCache
+    >>> from pcmdi_metrics.mean_climate.lib import load_and_regrid
+    >>> cache = RegridCache("regrid_cache", max_size_gb=20)
+    >>> ds = load_and_regrid("ts_clim.nc", "ts", t_grid=t_grid, cache=cache)
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size_gb: Optional[float] = None,
+        hash_content: bool = False,
+    ):
+        self.cache_dir = cache_dir
+        self.max_size_gb = max_size_gb
+        self.hash_content = hash_content
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, data_path: Union[str, list], t_grid: xr.Dataset, **options):
+        """
+        Build the cache key of a regridded dataset.
+
+        Parameters
+        ----------
+        data_path : Union[str, list]
+            Path of the input file(s).
+        t_grid : xr.Dataset
+            Target grid.
+        **options
+            Any other option that changes the regridded result (e.g., varname,
+            level, regrid_tool).
+
+        Returns
+        -------
+        str
+            Cache key.
+        """
+        key = {
+            "version": CACHE_VERSION,
+            "files": file_fingerprint(data_path, hash_content=self.hash_content),
+            "grid": grid_fingerprint(t_grid),
+            "options": {k: str(v) for k, v in sorted(options.items())},
+        }
+        return hashlib.md5(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.nc")
+
+    def _open_kwargs_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[xr.Dataset]:
+        """
+        Load a cached dataset.
+
+        Parameters
+        ----------
+        key : str
+            Cache key from :meth:`make_key`.
+
+        Returns
+        -------
+        Optional[xr.Dataset]
+            The cached dataset loaded in memory, or None if not cached.
+        """
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(self._open_kwargs_path(key)) as f:
+                open_kwargs = json.load(f)
+            ds = xcdat_open(path, **open_kwargs)
+            ds.load()
+            ds.close()
+        except Exception as e:
+            print(f"[WARNING]: failed to read regrid cache entry {path}: {e}")
+            return None
+        # mark as recently used
+        os.utime(path)
+        return ds
+
+    def put(self, key: str, ds: xr.Dataset, open_kwargs: Optional[dict] = None):
+        """
+        Store a dataset in the cache and evict old entries if needed.
+
+        Parameters
+        ----------
+        key : str
+            Cache key from :meth:`make_key`.
+        ds : xr.Dataset
+            Dataset to store.
+        open_kwargs : Optional[dict], optional
+            Keyword arguments of :func:`xcdat_open` used to load the entry in
+            :meth:`get` (e.g., ``{"decode_times": False}``), by default None.
+        """
+        path = self._path(key)
+        # the options file goes first since get() looks for the netCDF file
+        if write_atomic(
+            self._open_kwargs_path(key),
+            lambda tmp: _dump_json(open_kwargs or {}, tmp),
+            "regrid cache entry",
+        ) and write_atomic(path, ds.to_netcdf, "regrid cache entry"):
+            self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in `max_size_gb`."""
+        if self.max_size_gb is None:
+            return
+
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*.nc")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        max_size = self.max_size_gb * 1024**3
+        for _, size, path in sorted(entries):
+            if total <= max_size:
+                break
+            for f in [path, path[: -len(".nc")] + ".json"]:
+                try:
+                    os.remove(f)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        for pattern in ["*.nc", "*.json"]:
+            for path in glob.glob(os.path.join(self.cache_dir, pattern)):
+                os.remove(path)
+
+
+def _dump_json(obj, path):
+    with open(path, "w") as f:
+        json.dump(obj, f)
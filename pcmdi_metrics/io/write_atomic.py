@@ -0,0 +1,43 @@
+import os
+import tempfile
+from typing import Callable
+
+
+def write_atomic(path: str, write: Callable[[str], None], description: str) -> bool:
+    """
+    Write a file through a temporary file that is renamed once complete.
+
+    Concurrent readers see either no file or the complete file, never a partially
+    written one. On failure, a warning is printed and the temporary file removed.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file to write. Its directory is created if it does not exist.
+    write : Callable[[str], None]
+        Function writing the content to the path it is given (e.g., ``ds.to_netcdf``).
+    description : str
+        Description of the file used in the warning (e.g., "regrid cache entry").
+
+    Returns
+    -------
+    bool
+        True if the file was written, False otherwise.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, suffix=os.path.splitext(path)[1] + ".tmp"
+        )
+        os.close(fd)
+        write(tmp_path)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[WARNING]: failed to write {description} {path}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
@@ -1,5 +1,16 @@
 from .calculate_climatology import calculate_climatology  # noqa
 from .compute_metrics import compute_metrics  # noqa
+from .compute_metrics_fused import (  # noqa
+    compute_metrics_fused,
+    compute_metrics_regions,
+)
+from .compute_run_metrics import (  # noqa
+    compute_run_metrics,
+    compute_run_metrics_in_worker,
+    create_reference_regions,
+    init_worker,
+    model_result_dict,
+)
 from .compute_statistics import (  # noqa
     annual_mean,
     bias_xy,
@@ -1,12 +1,19 @@
 import datetime
 import os
 
+import cftime
 import dask
+import numpy as np
+import xarray as xr
 
-from pcmdi_metrics.io import xcdat_open
+from pcmdi_metrics.io import get_time_key, xcdat_open
+from pcmdi_metrics.stats import get_time_weights
 
 from .plot_clim_maps import plot_climatology
 
+# season index (DJF, MAM, JJA, SON) of each calendar month
+_SEASON_OF_MONTH = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
 
 def calculate_climatology(
     var,
@@ -20,6 +27,8 @@ def calculate_climatology(
     periodinname=None,
     climlist=None,
     plot=True,
+    streaming=False,
+    chunk_size=12,
 ):
     if ver is None:
         ver = datetime.datetime.now().strftime("v%Y%m%d")
@@ -87,22 +96,26 @@ def calculate_climatology(
     print("end_mo_str is ", end_mo_str)
 
     # Calculate climatology
-    dask.config.set(**{"array.slicing.split_large_chunks": True})
-    d_clim = d.temporal.climatology(
-        var,
-        freq="season",
-        weighted=True,
-        season_config={"dec_mode": "DJF", "drop_incomplete_djf": True},
-    )
-    d_ac = d.temporal.climatology(var, freq="month", weighted=True)
+    if streaming:
+        d_clim_dict = streamed_climatology(d, var, chunk_size=chunk_size)
+        d_ac = d_clim_dict["AC"]
+    else:
+        dask.config.set(**{"array.slicing.split_large_chunks": True})
+        d_clim = d.temporal.climatology(
+            var,
+            freq="season",
+            weighted=True,
+            season_config={"dec_mode": "DJF", "drop_incomplete_djf": True},
+        )
+        d_ac = d.temporal.climatology(var, freq="month", weighted=True)
 
-    d_clim_dict = dict()
+        d_clim_dict = dict()
 
-    d_clim_dict["DJF"] = d_clim.isel(time=0)
-    d_clim_dict["MAM"] = d_clim.isel(time=1)
-    d_clim_dict["JJA"] = d_clim.isel(time=2)
-    d_clim_dict["SON"] = d_clim.isel(time=3)
-    d_clim_dict["AC"] = d_ac
+        d_clim_dict["DJF"] = d_clim.isel(time=0)
+        d_clim_dict["MAM"] = d_clim.isel(time=1)
+        d_clim_dict["JJA"] = d_clim.isel(time=2)
+        d_clim_dict["SON"] = d_clim.isel(time=3)
+        d_clim_dict["AC"] = d_ac
 
     if climlist is None:
         clims = ["AC", "DJF", "MAM", "JJA", "SON"]
@@ -167,6 +180,98 @@ def calculate_climatology(
                 print("output figure:", output_fig_path)
 
 
+def streamed_climatology(d, var, chunk_size=12):
+    """Annual cycle and seasonal climatologies from one pass over time chunks
+
+    Args:
+        d (xr.Dataset): dataset with time bounds, opened lazily so that only one chunk is loaded at a time
+        var (str): variable name
+        chunk_size (int): number of time steps read at once. Default is 12
+
+    Returns:
+        dict: climatology datasets with keys "AC", "DJF", "MAM", "JJA" and "SON", equivalent to
+        ``temporal.climatology`` weighted by the time bounds, with incomplete DJF seasons at the
+        start and end of the time series dropped. Missing values are excluded from the averages.
+    """
+    time_key = get_time_key(d)
+    da = d[var].transpose(time_key, ...)
+    years = d[time_key].dt.year.values
+    months = d[time_key].dt.month.values
+    weights = get_time_weights(d)
+
+    # drop the incomplete DJF season at the start (Jan, Feb) and end (Dec) of the record
+    in_season = ~(
+        ((years == years[0]) & (months <= 2)) | ((years == years[-1]) & (months == 12))
+    )
+
+    # weighted sums and sums of weights, accumulated chunk by chunk
+    shape = da.shape[1:]
+    month_sum = np.zeros((12,) + shape)
+    month_wts = np.zeros((12,) + shape)
+    season_sum = np.zeros((4,) + shape)
+    season_wts = np.zeros((4,) + shape)
+
+    for start in range(0, da.shape[0], chunk_size):
+        tslice = slice(start, start + chunk_size)
+        block = np.asarray(da.isel({time_key: tslice}).values, dtype=np.float64)
+        valid = np.isfinite(block)
+        w = np.where(valid, weights[tslice].reshape((-1,) + (1,) * len(shape)), 0.0)
+        wx = np.where(valid, block, 0.0) * w
+
+        for m in np.unique(months[tslice]):
+            sel = months[tslice] == m
+            month_sum[m - 1] += wx[sel].sum(axis=0)
+            month_wts[m - 1] += w[sel].sum(axis=0)
+            sel &= in_season[tslice]
+            season_sum[_SEASON_OF_MONTH[m - 1]] += wx[sel].sum(axis=0)
+            season_wts[_SEASON_OF_MONTH[m - 1]] += w[sel].sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ac = np.where(month_wts > 0, month_sum / month_wts, np.nan)
+        clim = np.where(season_wts > 0, season_sum / season_wts, np.nan)
+
+    # same layout as temporal.climatology: time points in year 1, at the first month of each period
+    calendar = d[time_key].dt.calendar
+    base = d.drop_dims(time_key)
+    time_attrs = {k: v for k, v in d[time_key].attrs.items() if k != "bounds"}
+    attrs = dict(
+        da.attrs, operation="temporal_avg", mode="climatology", weighted="True"
+    )
+
+    d_clim_dict = dict()
+    d_clim_dict["AC"] = _climatology_dataset(
+        base,
+        var,
+        ac,
+        [cftime.datetime(1, m, 1, calendar=calendar) for m in range(1, 13)],
+        da.dims,
+        time_attrs,
+        dict(attrs, freq="month"),
+    )
+    d_season = _climatology_dataset(
+        base,
+        var,
+        clim,
+        [cftime.datetime(1, m, 1, calendar=calendar) for m in [1, 4, 7, 10]],
+        da.dims,
+        time_attrs,
+        dict(attrs, freq="season", dec_mode="DJF", drop_incomplete_djf="True"),
+    )
+    for i, season in enumerate(["DJF", "MAM", "JJA", "SON"]):
+        d_clim_dict[season] = d_season.isel({time_key: i})
+
+    return d_clim_dict
+
+
+def _climatology_dataset(base, var, data, times, dims, time_attrs, attrs):
+    time_key = dims[0]
+    coords = {time_key: xr.DataArray(times, dims=[time_key], attrs=time_attrs)}
+    coords.update({k: base[k] for k in dims[1:] if k in base.coords})
+    ds = base.copy()
+    ds[var] = xr.DataArray(data, dims=dims, coords=coords, attrs=attrs)
+    return ds
+
+
 def is_4d_variable(ds, data_var):
     da = ds[data_var]
     print("data_var, da.shape:", data_var, da.shape)
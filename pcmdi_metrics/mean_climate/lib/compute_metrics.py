@@ -6,6 +6,8 @@ import xarray as xr
 
 from pcmdi_metrics import stats
 
+from .compute_metrics_fused import compute_metrics_fused
+
 
 def compute_metrics(
     var: str,
@@ -13,6 +15,7 @@ def compute_metrics(
     do: Optional[xr.Dataset] = None,
     debug: bool = False,
     time_dim_sync: bool = False,
+    fused: bool = True,
 ) -> Dict[str, Any]:
     """
     Compute various climate metrics for a given variable.
@@ -33,6 +36,9 @@ def compute_metrics(
         If True, print additional debug information.
     time_dim_sync : bool, default False
         If True, synchronize the time dimension between model and observational datasets.
+    fused : bool, default True
+        If True, compute all metrics in a single pass with :func:`compute_metrics_fused`.
+        If False, call the individual `pcmdi_metrics.stats` functions for each metric.
 
     Returns
     -------
@@ -66,6 +72,11 @@ def compute_metrics(
         metrics_defs["zonal_mean"] = stats.zonal_mean(None, None)
         return metrics_defs
 
+    if fused:
+        return compute_metrics_fused(
+            var, dm, do, debug=debug, time_dim_sync=time_dim_sync
+        )
+
     # Copy the dataset to avoid the original being changed
     dm = dm.copy(deep=True)
     do = do.copy(deep=True)
@@ -0,0 +1,548 @@
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.io import get_latitude_key, get_longitude_key, get_time_key
+from pcmdi_metrics.stats import get_time_weights
+from pcmdi_metrics.utils import get_spatial_weights
+
+MONTHS = [
+    "jan",
+    "feb",
+    "mar",
+    "apr",
+    "may",
+    "jun",
+    "jul",
+    "aug",
+    "sep",
+    "oct",
+    "nov",
+    "dec",
+]
+
+SEASONS = ["djf", "mam", "jja", "son"]
+
+# Month indices and day weights used by `stats.seasonal_mean`
+_SEASON_MONTHS = {
+    "djf": [11, 0, 1],
+    "mam": [2, 3, 4],
+    "jja": [5, 6, 7],
+    "son": [8, 9, 10],
+}
+_MONTH_WEIGHTS = np.array([31, 31, 28.25, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+# Order of the time slices stacked by `stack_time_slices`: annual, 4 seasons, 12 months
+SLICES = ["ann"] + SEASONS + MONTHS
+_MONTH_SLICES = slice(1 + len(SEASONS), None)
+
+# Per-cell terms accumulated for every time slice.  Terms prefixed with "m"/"o"
+# are restricted to cells where the model/obs value is valid, the rest to cells
+# where both are valid.
+_MOMENTS = [
+    "w_m",
+    "m",
+    "mm",
+    "w_o",
+    "o",
+    "oo",
+    "w_v",
+    "vm",
+    "vo",
+    "vmm",
+    "voo",
+    "vmo",
+    "d",
+    "dd",
+    "absd",
+]
+
+_BLOCK_SIZE = 2**15
+
+
+def compute_metrics_fused(
+    var: str,
+    dm: xr.Dataset,
+    do: xr.Dataset,
+    debug: bool = False,
+    time_dim_sync: bool = False,
+) -> Dict[str, Any]:
+    """
+    Compute the mean climate metrics for a variable with the fused engine.
+
+    Spatial and temporal weights are built once, and the weighted moments of the
+    model and observation fields are formed for the annual, seasonal and monthly
+    time slices in a single vectorized pass.  Every statistic reported by
+    :func:`compute_metrics` is then derived from those moments.
+
+    Parameters
+    ----------
+    var : str
+        The variable name to compute metrics for.
+    dm : xr.Dataset
+        The model dataset, a 12-month annual cycle climatology.
+    do : xr.Dataset
+        The observational dataset on the same grid as `dm`.
+    debug : bool, default False
+        If True, print additional debug information.
+    time_dim_sync : bool, default False
+        If True, use the model time bounds for the observation as well.
+
+    Returns
+    -------
+    Dict[str, Any]
+        A dictionary containing the computed metrics, structured as the output of
+        :func:`compute_metrics`.
+
+    Notes
+    -----
+    Input datasets are not modified or copied.
+    """
+    var = re.split(r"[_-]", var)[0]
+    m, o, wy, wx, tw_m, tw_o = _to_arrays(var, dm, do, time_dim_sync)
+
+    if debug:
+        print("compute_metrics_fused, m.shape, o.shape:", m.shape, o.shape)
+
+    stats = fused_statistics(m, o, wy, wx, tw_m, tw_o)
+
+    return metrics_to_dict(stats)
+
+
+def compute_metrics_regions(
+    var: str,
+    dm: xr.Dataset,
+    do: xr.Dataset,
+    region_masks: xr.DataArray,
+    debug: bool = False,
+    time_dim_sync: bool = False,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compute the mean climate metrics for several regions at once.
+
+    All regions are reduced together with the fused engine using a stacked
+    (region, lat, lon) mask, so the datasets are neither copied nor subset for
+    each region.
+
+    Parameters
+    ----------
+    var : str
+        The variable name to compute metrics for.
+    dm : xr.Dataset
+        The model dataset, a 12-month annual cycle climatology.
+    do : xr.Dataset
+        The observational dataset on the same grid as `dm`.
+    region_masks : xr.DataArray
+        Region masks on the grid of `dm`, as created by
+        :func:`pcmdi_metrics.io.create_region_masks`.
+    debug : bool, default False
+        If True, print additional debug information.
+    time_dim_sync : bool, default False
+        If True, use the model time bounds for the observation as well.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        Metrics dictionary (see :func:`compute_metrics`) for each region.
+    """
+    var = re.split(r"[_-]", var)[0]
+    m, o, wy, wx, tw_m, tw_o = _to_arrays(var, dm, do, time_dim_sync)
+
+    masks = region_masks.transpose(
+        "region", get_latitude_key(dm), get_longitude_key(dm)
+    ).values
+
+    if debug:
+        print("compute_metrics_regions, regions:", region_masks.region.values)
+
+    stats = fused_statistics(m, o, wy, wx, tw_m, tw_o, masks=masks)
+
+    metrics_dictionary = OrderedDict()
+    for r, region in enumerate(region_masks.region.values):
+        metrics_dictionary[str(region)] = metrics_to_dict(stats, region=r)
+
+    return metrics_dictionary
+
+
+def _to_arrays(var: str, dm: xr.Dataset, do: xr.Dataset, time_dim_sync: bool):
+    """Extract (time, lat, lon) data, axis weights and time weights from datasets."""
+    dm = dm.bounds.add_missing_bounds()
+    do = do.bounds.add_missing_bounds()
+
+    time_key = get_time_key(dm)
+    lat_key = get_latitude_key(dm)
+    lon_key = get_longitude_key(dm)
+
+    m = dm[var].transpose(time_key, lat_key, lon_key).values.astype(np.float64)
+    o = do[var].transpose(time_key, lat_key, lon_key).values.astype(np.float64)
+    wy = get_spatial_weights(dm, axis=["Y"]).values.astype(np.float64)
+    wx = get_spatial_weights(dm, axis=["X"]).values.astype(np.float64)
+
+    tw_m = get_time_weights(dm)
+    tw_o = tw_m if time_dim_sync else get_time_weights(do)
+
+    return m, o, wy, wx, tw_m, tw_o
+
+
+def stack_time_slices(field: np.ndarray, time_weights: np.ndarray) -> np.ndarray:
+    """
+    Stack the annual, seasonal and monthly fields of a 12-month climatology.
+
+    Parameters
+    ----------
+    field : np.ndarray
+        Annual cycle climatology with time as the first axis (12, ...).
+    time_weights : np.ndarray
+        Weights for the annual mean, typically from :func:`get_time_weights`.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (17, ...) ordered as `SLICES`.
+
+    Notes
+    -----
+    The annual mean skips missing months as ``temporal.average`` does, while a
+    seasonal mean is missing if any of its months is, as in ``stats.seasonal_mean``.
+    """
+    if field.shape[0] != 12:
+        raise ValueError(
+            f"Expected 12 months of annual cycle climatology, got {field.shape[0]}"
+        )
+
+    tw = time_weights.reshape((-1,) + (1,) * (field.ndim - 1))
+    valid = np.isfinite(field)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annual = (np.where(valid, field, 0) * tw).sum(axis=0) / (valid * tw).sum(axis=0)
+
+    seasons = []
+    for season in SEASONS:
+        indx = _SEASON_MONTHS[season]
+        mo_wts = _MONTH_WEIGHTS[indx]
+        seasons.append(
+            (
+                field[indx[0]] * mo_wts[0]
+                + field[indx[1]] * mo_wts[1]
+                + field[indx[2]] * mo_wts[2]
+            )
+            / mo_wts.sum()
+        )
+
+    return np.concatenate([annual[np.newaxis], np.stack(seasons), field], axis=0)
+
+
+def accumulate_moments(
+    m: np.ndarray,
+    o: np.ndarray,
+    weights: np.ndarray,
+    shift: Optional[np.ndarray] = None,
+    block_size: int = _BLOCK_SIZE,
+) -> Dict[str, np.ndarray]:
+    """
+    Accumulate weighted moments of model and observation slices in one pass.
+
+    Parameters
+    ----------
+    m : np.ndarray
+        Model slices of shape (S, N), with N the flattened spatial cells.
+    o : np.ndarray
+        Observation slices of shape (S, N).
+    weights : np.ndarray
+        Spatial weights of shape (R, N), one row per set of weights (e.g., region).
+    shift : np.ndarray, optional
+        Per-slice constant of shape (S,) removed from `m` and `o` before forming
+        the moments to limit round-off, by default None (no shift).
+    block_size : int, optional
+        Number of cells processed at once, bounding the temporary memory.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Weighted sums of shape (R, S) keyed by the names in `_MOMENTS`.
+    """
+    n_slices, n_cells = m.shape
+    if shift is None:
+        shift = np.zeros(n_slices)
+    shift = shift[:, np.newaxis]
+
+    sums = np.zeros((weights.shape[0], len(_MOMENTS), n_slices))
+
+    for start in range(0, n_cells, block_size):
+        cells = slice(start, start + block_size)
+        mb = m[:, cells] - shift
+        ob = o[:, cells] - shift
+        valid_m = np.isfinite(mb)
+        valid_o = np.isfinite(ob)
+        valid = valid_m & valid_o
+        mb = np.where(valid_m, mb, 0.0)
+        ob = np.where(valid_o, ob, 0.0)
+        vm = np.where(valid, mb, 0.0)
+        vo = np.where(valid, ob, 0.0)
+        d = vm - vo
+
+        terms = np.stack(
+            [
+                valid_m,
+                mb,
+                mb * mb,
+                valid_o,
+                ob,
+                ob * ob,
+                valid,
+                vm,
+                vo,
+                vm * vm,
+                vo * vo,
+                vm * vo,
+                d,
+                d * d,
+                np.abs(d),
+            ]
+        ).astype(np.float64)
+
+        sums += np.tensordot(weights[:, cells], terms, axes=([1], [2]))
+
+    return {name: sums[:, k, :] for k, name in enumerate(_MOMENTS)}
+
+
+def statistics_from_moments(
+    moments: Dict[str, np.ndarray], shift: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Derive spatial statistics from the moments of :func:`accumulate_moments`.
+
+    Parameters
+    ----------
+    moments : Dict[str, np.ndarray]
+        Weighted sums of shape (R, S).
+    shift : np.ndarray, optional
+        The shift given to :func:`accumulate_moments`, by default None.
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Statistics of shape (R, S): "mean_m", "mean_o", "std_m", "std_o", "bias",
+        "mae", "rms", "rmsc" and "cor".
+
+    Notes
+    -----
+    As in `pcmdi_metrics.stats`, mean and standard deviation of each field use its
+    own valid cells, while the comparison statistics use cells where both are valid.
+    """
+    if shift is None:
+        shift = 0.0
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_m = moments["m"] / moments["w_m"]
+        mean_o = moments["o"] / moments["w_o"]
+        var_m = moments["mm"] / moments["w_m"] - mean_m**2
+        var_o = moments["oo"] / moments["w_o"] - mean_o**2
+
+        w_v = moments["w_v"]
+        mean_vm = moments["vm"] / w_v
+        mean_vo = moments["vo"] / w_v
+        bias = moments["d"] / w_v
+        ms = moments["dd"] / w_v
+        cov = moments["vmo"] / w_v - mean_vm * mean_vo
+        var_vm = moments["vmm"] / w_v - mean_vm**2
+        var_vo = moments["voo"] / w_v - mean_vo**2
+
+        return {
+            "mean_m": mean_m + shift,
+            "mean_o": mean_o + shift,
+            "std_m": np.sqrt(np.maximum(var_m, 0)),
+            "std_o": np.sqrt(np.maximum(var_o, 0)),
+            "bias": bias,
+            "mae": moments["absd"] / w_v,
+            "rms": np.sqrt(ms),
+            "rmsc": np.sqrt(np.maximum(ms - bias**2, 0)),
+            "cor": cov / np.sqrt(var_vm * var_vo),
+        }
+
+
+def _nan_weighted_mean(values: np.ndarray, weights: np.ndarray, axis=-1):
+    """Weighted mean along an axis skipping missing values, as xarray ``weighted``."""
+    valid = np.isfinite(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (np.where(valid, values, 0) * weights).sum(axis=axis) / (
+            valid * weights
+        ).sum(axis=axis)
+
+
+def fused_statistics(
+    m: np.ndarray,
+    o: np.ndarray,
+    wy: np.ndarray,
+    wx: np.ndarray,
+    tw_m: np.ndarray,
+    tw_o: np.ndarray,
+    masks: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute all mean climate statistics from model and observation arrays.
+
+    Parameters
+    ----------
+    m : np.ndarray
+        Model annual cycle of shape (12, lat, lon).
+    o : np.ndarray
+        Observation annual cycle of shape (12, lat, lon).
+    wy : np.ndarray
+        Latitude weights of shape (lat,).
+    wx : np.ndarray
+        Longitude weights of shape (lon,).
+    tw_m : np.ndarray
+        Time weights of the model annual cycle, shape (12,).
+    tw_o : np.ndarray
+        Time weights of the observation annual cycle, shape (12,).
+    masks : np.ndarray, optional
+        Region masks of shape (R, lat, lon), 1 inside and 0 outside each region,
+        by default None (a single global region).
+
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        Slice statistics of shape (R, 17) (see :func:`statistics_from_moments`),
+        and annual-cycle and zonal-mean statistics of shape (R,).
+    """
+    n_lat, n_lon = m.shape[1:]
+    if masks is None:
+        masks = np.ones((1, n_lat, n_lon))
+
+    weights = masks * np.outer(wy, wx)[np.newaxis]
+    flat_weights = weights.reshape(len(masks), -1)
+
+    m_slices = stack_time_slices(m, tw_m)
+    o_slices = stack_time_slices(o, tw_o)
+
+    # Shift every slice by its obs mean so moments are formed on anomalies
+    with np.errstate(invalid="ignore"):
+        shift = np.nan_to_num(
+            np.array([np.nanmean(s) if np.isfinite(s).any() else 0 for s in o_slices])
+        )
+
+    moments = accumulate_moments(
+        m_slices.reshape(len(SLICES), -1),
+        o_slices.reshape(len(SLICES), -1),
+        flat_weights,
+        shift=shift,
+    )
+    stats = statistics_from_moments(moments, shift=shift)
+
+    # Space-time statistics from the monthly slices
+    months = _MONTH_SLICES
+    stats["rms_xyt"] = _nan_weighted_mean(
+        np.sqrt(moments["dd"][:, months] / moments["w_v"][:, months]), tw_m
+    )
+    stats["std_xyt"] = _std_xyt(moments, "m", shift[months], tw_m)
+    stats["std-obs_xyt"] = _std_xyt(moments, "o", shift[months], tw_o)
+
+    # Zonal mean statistics from the annual mean
+    stats.update(_zonal_statistics(m_slices[0], o_slices[0], masks, wy, wx))
+
+    return stats
+
+
+def _std_xyt(moments, key, shift, time_weights):
+    """Space-time standard deviation from the monthly slice moments."""
+    months = _MONTH_SLICES
+    w = moments[f"w_{key}"][:, months]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_1 = moments[key][:, months] / w
+        mean_2 = moments[key + key][:, months] / w
+    # Space-time mean, then the space-time mean of squared departures from it
+    offset = _nan_weighted_mean(mean_1 + shift, time_weights)[:, np.newaxis] - shift
+    variance = _nan_weighted_mean(
+        mean_2 - 2 * offset * mean_1 + offset**2, time_weights
+    )
+    return np.sqrt(np.maximum(variance, 0))
+
+
+def _zonal_statistics(m_ann, o_ann, masks, wy, wx):
+    """Zonal mean RMS, and RMS and STD of deviations from the zonal mean."""
+    # Zonal means of each field within each region, shape (R, lat); latitudes
+    # outside a region have no valid cell and drop out of the latitude average
+    zm_m = _nan_weighted_mean(m_ann[np.newaxis], masks * wx)
+    zm_o = _nan_weighted_mean(o_ann[np.newaxis], masks * wx)
+    rms_y = np.sqrt(_nan_weighted_mean((zm_m - zm_o) ** 2, wy))
+
+    weights = masks * np.outer(wy, wx)
+    dev_m = np.where(weights > 0, m_ann - zm_m[..., np.newaxis], np.nan)
+    dev_o = np.where(weights > 0, o_ann - zm_o[..., np.newaxis], np.nan)
+    n_regions = weights.shape[0]
+    flat_weights = weights.reshape(n_regions, -1)
+    dev_m = dev_m.reshape(n_regions, -1)
+    dev_o = dev_o.reshape(n_regions, -1)
+
+    rms_devzm = np.sqrt(_nan_weighted_mean((dev_m - dev_o) ** 2, flat_weights))
+
+    def _std(dev):
+        mean = _nan_weighted_mean(dev, flat_weights)[:, np.newaxis]
+        return np.sqrt(_nan_weighted_mean((dev - mean) ** 2, flat_weights))
+
+    return {
+        "rms_y": rms_y,
+        "rms_devzm": rms_devzm,
+        "std_xy_devzm": _std(dev_m),
+        "std-obs_xy_devzm": _std(dev_o),
+    }
+
+
+def metrics_to_dict(stats: Dict[str, np.ndarray], region: int = 0) -> Dict[str, Any]:
+    """
+    Format statistics from :func:`fused_statistics` as a metrics dictionary.
+
+    Parameters
+    ----------
+    stats : Dict[str, np.ndarray]
+        Statistics from :func:`fused_statistics`.
+    region : int, optional
+        Index of the region to format, by default 0.
+
+    Returns
+    -------
+    Dict[str, Any]
+        Metrics dictionary as returned by :func:`compute_metrics`.
+    """
+    float_format = "{:.5e}"
+
+    slice_stats = {
+        "mean-obs_xy": "mean_o",
+        "mean_xy": "mean_m",
+        "std-obs_xy": "std_o",
+        "std_xy": "std_m",
+        "rms_xy": "rms",
+        "rmsc_xy": "rmsc",
+        "cor_xy": "cor",
+        "bias_xy": "bias",
+        "mae_xy": "mae",
+    }
+    annual_stats = {
+        "std-obs_xyt": "std-obs_xyt",
+        "std_xyt": "std_xyt",
+        "std-obs_xy_devzm": "std-obs_xy_devzm",
+        "std_xy_devzm": "std_xy_devzm",
+        "rms_xyt": "rms_xyt",
+        "rms_y": "rms_y",
+        "rms_devzm": "rms_devzm",
+    }
+
+    metrics_dictionary = OrderedDict()
+    for stat in sorted(list(slice_stats) + list(annual_stats)):
+        metrics_dictionary[stat] = OrderedDict()
+
+    for stat, key in annual_stats.items():
+        metrics_dictionary[stat]["ann"] = float_format.format(stats[key][region])
+
+    for stat, key in slice_stats.items():
+        values = stats[key][region]
+        for n, slice_name in enumerate(SLICES[: 1 + len(SEASONS)]):
+            metrics_dictionary[stat][slice_name] = float_format.format(values[n])
+        metrics_dictionary[stat]["CalendarMonths"] = [
+            float_format.format(v) for v in values[_MONTH_SLICES]
+        ]
+
+    return metrics_dictionary
@@ -0,0 +1,357 @@
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import xarray as xr
+
+from pcmdi_metrics.io import region_subset
+from pcmdi_metrics.utils import apply_landmask, tree
+
+from .compute_metrics import compute_metrics
+from .compute_metrics_fused import compute_metrics_regions
+from .data_qc import data_qc
+from .load_and_regrid import load_and_regrid
+from .mean_climate_metrics_to_json import mean_climate_metrics_to_json
+from .plot_clim_maps import plot_climatology_diff
+
+# State shared by all runs computed in a worker process, see init_worker
+_worker_state: Dict[str, Any] = dict()
+
+
+def _keep_over(region: str) -> Optional[str]:
+    # land/ocean regions are computed on masked data
+    if "land" in region.split("_"):
+        return "land"
+    if "ocean" in region.split("_"):
+        return "ocean"
+    return None
+
+
+def create_reference_regions(
+    ds_ref: xr.Dataset,
+    varname: str,
+    regions: List[str],
+    regions_specs: dict,
+    landfrac: xr.DataArray,
+) -> "OrderedDict[str, xr.Dataset]":
+    """
+    Mask and subset the reference dataset for each region.
+
+    Parameters
+    ----------
+    ds_ref : xr.Dataset
+        The reference dataset on the target grid.
+    varname : str
+        The variable name.
+    regions : list of str
+        Regions to compute metrics for. Regions with "land" or "ocean" in their
+        name are masked with `landfrac` before being subset.
+    regions_specs : dict
+        Region specifications, see :func:`pcmdi_metrics.io.load_regions_specs`.
+    landfrac : xr.DataArray
+        Land fraction on the target grid.
+
+    Returns
+    -------
+    OrderedDict
+        Reference dataset of each region.
+    """
+    masked_data = dict()
+    ds_ref_dict = OrderedDict()
+    for region in regions:
+        keep_over = _keep_over(region)
+        if keep_over is None:
+            ds_ref_tmp = ds_ref
+        elif keep_over in masked_data:
+            ds_ref_tmp = masked_data[keep_over]
+        else:
+            # only the data variable is replaced
+            ds_ref_tmp = ds_ref.copy()
+            ds_ref_tmp[varname] = apply_landmask(
+                ds_ref[varname], landfrac=landfrac, keep_over=keep_over
+            )
+            masked_data[keep_over] = ds_ref_tmp
+
+        if region.lower() in ["global", "land", "ocean"]:
+            ds_ref_dict[region] = ds_ref_tmp
+        else:
+            ds_ref_dict[region] = region_subset(
+                ds_ref_tmp, region=region, regions_specs=regions_specs
+            )
+    return ds_ref_dict
+
+
+def compute_run_metrics(
+    model: str,
+    run: str,
+    test_data_full_path: str,
+    state: Dict[str, Any],
+    result_dict: dict,
+) -> Optional[Tuple[str, dict]]:
+    """
+    Compute the metrics of a model run against a reference.
+
+    Parameters
+    ----------
+    model : str
+        The model name.
+    run : str
+        The realization.
+    test_data_full_path : str
+        Path of the annual cycle climatology of the run.
+    state : dict
+        Settings and data shared by all runs of a variable and reference:
+        "var", "varname", "varname_testdata", "level", "ref", "ref_dataset_name",
+        "t_grid" (target grid with "sftlf"), "ds_ref", "ds_ref_dict" (from
+        :func:`create_reference_regions`), "regions", "regions_specs",
+        "region_batched", "region_masks", "time_dim_sync", "regrid_tool",
+        "regrid_cache", "reuse_regrid_weights", "save_test_clims",
+        "diagnostics_output_path", "graphics_output_path", "metrics_output_path",
+        "target_grid", "case_id", "cmec" and "debug".
+    result_dict : dict
+        Results of the variable, updated with the results of the run and written
+        to the individual JSON file of the run.
+
+    Returns
+    -------
+    tuple or None
+        ``(units, run_results)``, or None if the computation failed.
+    """
+    var = state["var"]
+    varname = state["varname"]
+    level = state["level"]
+    ref = state["ref"]
+    t_grid = state["t_grid"]
+    ds_ref = state["ds_ref"]
+    ds_ref_dict = state["ds_ref_dict"]
+    region_batched = state["region_batched"]
+    regrid_tool = state["regrid_tool"]
+    case_id = state["case_id"]
+    debug = state["debug"]
+
+    print("-----------------------")
+    print("model, run:", model, run)
+    print("test_data (model in this case) full_path:", test_data_full_path)
+    try:
+        ds_test_dict = OrderedDict()
+
+        # load data and regrid
+        ds_test = load_and_regrid(
+            data_path=test_data_full_path,
+            varname=varname,
+            varname_in_file=state["varname_testdata"],
+            level=level,
+            t_grid=t_grid,
+            decode_times=True,
+            regrid_tool=regrid_tool,
+            debug=debug,
+            cache=state["regrid_cache"],
+            reuse_weights=state["reuse_regrid_weights"],
+        )
+        print("load and regrid done")
+        result_dict["RESULTS"][model]["units"] = ds_test[varname].units
+        result_dict["RESULTS"][model][ref][run]["InputClimatologyFileName"] = (
+            test_data_full_path.split("/")[-1]
+        )
+
+        ds_test = data_qc(f"{model}_{run}", ds_test, ds_ref, var, varname)
+
+        if region_batched:
+            # compute metrics for all regions at once
+            print("compute metrics start (all regions)")
+            metrics_regions = compute_metrics_regions(
+                varname,
+                ds_test,
+                ds_ref,
+                state["region_masks"],
+                debug=debug,
+                time_dim_sync=state["time_dim_sync"],
+            )
+
+        # land/ocean masked data of this variable, reused across regions
+        masked_data = dict()
+
+        # -----------
+        # region loop
+        # -----------
+        for region in state["regions"]:
+            print("region:", region)
+
+            # land/sea mask -- conduct masking only for variable data array, not entire data
+            keep_over = _keep_over(region)
+            if keep_over is None:
+                ds_test_tmp = ds_test
+            elif keep_over in masked_data:
+                ds_test_tmp = masked_data[keep_over]
+            else:
+                # only the data variable is replaced
+                ds_test_tmp = ds_test.copy()
+                ds_test_tmp[varname] = apply_landmask(
+                    ds_test[varname],
+                    landfrac=t_grid["sftlf"],
+                    keep_over=keep_over,
+                )
+                masked_data[keep_over] = ds_test_tmp
+                print("mask done")
+
+            # spatial subset
+            if region.lower() in ["global", "land", "ocean"]:
+                ds_test_dict[region] = ds_test_tmp
+            else:
+                ds_test_dict[region] = region_subset(
+                    ds_test_tmp,
+                    region=region,
+                    regions_specs=state["regions_specs"],
+                )
+                print("spatial subset done")
+
+            # Save to netcdf file
+            if state["save_test_clims"]:
+                test_clims_dir = os.path.join(
+                    state["diagnostics_output_path"],
+                    var,
+                    "interpolated_model_clims",
+                )
+                os.makedirs(test_clims_dir, exist_ok=True)
+                test_clims_file = os.path.join(
+                    test_clims_dir,
+                    "_".join(
+                        [
+                            var,
+                            model,
+                            run,
+                            "interpolated",
+                            regrid_tool,
+                            region,
+                            "AC",
+                            case_id + ".nc",
+                        ]
+                    ),
+                )
+                ds_test_dict[region].to_netcdf(test_clims_file)
+
+            if debug:
+                print("ds_test_tmp:", ds_test_dict[region])
+                ds_test_dict[region].to_netcdf(
+                    "_".join(
+                        [
+                            var,
+                            "model",
+                            model,
+                            run,
+                            region,
+                            case_id + ".nc",
+                        ]
+                    )
+                )
+
+            # plot map
+            test_clims_plot_dir = os.path.join(state["graphics_output_path"], var)
+            os.makedirs(test_clims_plot_dir, exist_ok=True)
+            for season in ["AC", "DJF", "MAM", "JJA", "SON"]:
+                output_filename = "_".join(
+                    [
+                        var,
+                        model,
+                        run,
+                        "interpolated",
+                        regrid_tool,
+                        region,
+                        season,
+                        case_id + ".png",
+                    ]
+                )
+                plot_climatology_diff(
+                    ds_test_dict[region],
+                    varname,
+                    ds_ref_dict[region],
+                    varname,
+                    level=level,
+                    season=season,
+                    output_dir=test_clims_plot_dir,
+                    output_filename=output_filename,
+                    dataname_test=f"{model}_{run}",
+                    dataname_ref=state["ref_dataset_name"],
+                    fig_title=f"Climatology ({season}, {region}): {varname}",
+                )
+                print("plot map done")
+
+            # compute metrics
+            if region_batched:
+                result_dict["RESULTS"][model][ref][run][region] = metrics_regions[
+                    region
+                ]
+            else:
+                print("compute metrics start")
+                result_dict["RESULTS"][model][ref][run][region] = compute_metrics(
+                    varname,
+                    ds_test_dict[region],
+                    ds_ref_dict[region],
+                    debug=debug,
+                    time_dim_sync=state["time_dim_sync"],
+                )
+
+            # write individual JSON
+            # --- single simulation, obs (need to accumulate later) / single variable
+            json_filename_tmp = "_".join(
+                [
+                    var,
+                    model,
+                    run,
+                    state["target_grid"],
+                    regrid_tool,
+                    "metrics",
+                    ref,
+                    case_id,
+                ]
+            )
+            mean_climate_metrics_to_json(
+                os.path.join(state["metrics_output_path"], var),
+                json_filename_tmp,
+                result_dict,
+                model=model,
+                run=run,
+                cmec_flag=state["cmec"],
+                debug=debug,
+            )
+        return (
+            result_dict["RESULTS"][model]["units"],
+            result_dict["RESULTS"][model][ref][run],
+        )
+    except Exception as e:
+        if debug:
+            raise
+        print("error occured for ", model, run)
+        print(e)
+        return None
+
+
+def init_worker(state: Dict[str, Any]):
+    """Keep the state of :func:`compute_run_metrics` in a worker process."""
+    _worker_state.clear()
+    _worker_state.update(state)
+
+
+def compute_run_metrics_in_worker(
+    model: str, run: str, test_data_full_path: str, result_dict: dict
+) -> Optional[Tuple[str, dict]]:
+    """
+    Compute the metrics of a model run in a worker process.
+
+    The state is sent once to each worker by :func:`init_worker`, so that the
+    reference is not sent again for every run. `result_dict` only needs the
+    results of the model (see :func:`model_result_dict`).
+    """
+    return compute_run_metrics(
+        model, run, test_data_full_path, _worker_state, result_dict
+    )
+
+
+def model_result_dict(result_dict: dict, model: str) -> dict:
+    """Copy of the variable results restricted to one model."""
+    model_dict = tree()
+    for key, value in result_dict.items():
+        if key != "RESULTS":
+            model_dict[key] = value
+    model_dict["RESULTS"][model] = result_dict["RESULTS"][model]
+    return model_dict
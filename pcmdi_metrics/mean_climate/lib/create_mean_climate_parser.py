@@ -108,6 +108,36 @@ def create_mean_climate_parser():
         required=False,
     )
 
+    parser.add_argument(
+        "--regrid_cache_dir",
+        dest="regrid_cache_dir",
+        help="Directory of the on-disk cache of regridded climatologies."
+        + " Default is None (no caching)",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--regrid_cache_max_size",
+        type=float,
+        dest="regrid_cache_max_size",
+        help="Maximum size of the regridded climatology cache in GB."
+        + " Least recently used entries are removed beyond it. Default is None (unbounded)",
+        default=None,
+        required=False,
+    )
+
+    parser.add_argument(
+        "--reuse_regrid_weights",
+        # If input is 'True' or 'true', return True. Otherwise False.
+        type=lambda x: x.lower() == "true",
+        dest="reuse_regrid_weights",
+        help="True to compute the regridding weights once per source grid and reuse them"
+        + " for all datasets on that grid, otherwise False",
+        default=False,
+        required=False,
+    )
+
     parser.add_argument(
         "--regrid_method",
         dest="regrid_method",
@@ -219,6 +249,17 @@ def create_mean_climate_parser():
         required=False,
     )
 
+    parser.add_argument(
+        "--region_batched",
+        # If input is 'True' or 'true', return True. Otherwise False.
+        type=lambda x: x.lower() == "true",
+        dest="region_batched",
+        help="True to compute metrics of all regions at once using stacked region masks,"
+        + " otherwise False",
+        default=False,
+        required=False,
+    )
+
     parser.add_argument(
         "--test_clims_interpolated_output",
         dest="test_clims_interpolated_output",
@@ -272,4 +313,14 @@ def create_mean_climate_parser():
         required=False,
     )
 
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        dest="num_workers",
+        default=1,
+        help="Number of worker processes computing metrics of model runs in parallel."
+        + " The reference data is loaded once and sent once to each worker. Default is 1",
+        required=False,
+    )
+
     return parser
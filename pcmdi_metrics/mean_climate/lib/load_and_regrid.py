@@ -9,6 +9,7 @@ from pcmdi_metrics.io import (
     get_longitude_key,
     xcdat_open,
 )
+from pcmdi_metrics.utils import get_regridder
 
 
 def load_and_regrid(
@@ -19,8 +20,11 @@ def load_and_regrid(
     t_grid=None,
     decode_times=True,
     regrid_tool="regrid2",
+    regrid_method="bilinear",
     calendar_qc=False,
     debug=False,
+    cache=None,
+    reuse_weights=False,
 ):
     """Load data and regrid to target grid
 
@@ -32,8 +36,11 @@ def load_and_regrid(
         t_grid (xarray.core.dataset.Dataset): target grid to regrid
         decode_times (bool): Default is True. decode_times=False will be removed once obs4MIP written using xcdat
         regrid_tool (str): Name of the regridding tool. See https://xcdat.readthedocs.io/en/stable/generated/xarray.Dataset.regridder.horizontal.html for more info
+        regrid_method (str): Regrid method of the xesmf regridder. Default is "bilinear".
         calendar_qc (bool): Turn on QC for calendar. Default is False.
         debug (bool): Default is False. If True, print more info to help debugging process
+        cache (pcmdi_metrics.io.RegridCache): Optional on-disk cache of regridded datasets. Default is None (no caching)
+        reuse_weights (bool): Reuse the regridding weights of earlier calls on the same source and target grids. Default is False.
     """
     if debug:
         print("load_and_regrid start")
@@ -41,6 +48,23 @@ def load_and_regrid(
     if varname_in_file is None:
         varname_in_file = varname
 
+    if cache is not None:
+        cache_key = cache.make_key(
+            data_path,
+            t_grid,
+            varname=varname,
+            varname_in_file=varname_in_file,
+            level=level,
+            decode_times=decode_times,
+            regrid_tool=regrid_tool,
+            regrid_method=regrid_method,
+            calendar_qc=calendar_qc,
+        )
+        ds_cached = cache.get(cache_key)
+        if ds_cached is not None:
+            print("load_and_regrid: regridded data loaded from cache")
+            return ds_cached
+
     # load data
     ds = xcdat_open(
         data_path, data_var=varname_in_file, decode_times=decode_times
@@ -129,13 +153,16 @@ def load_and_regrid(
         print("(before regrid) Dimension coordiates of ds:", ds.dims)
 
     # regrid
-    if regrid_tool == "regrid2":
+    if reuse_weights:
+        ds_regridded = get_regridder(
+            ds, t_grid, regrid_tool=regrid_tool, regrid_method=regrid_method
+        ).regrid(ds, varname_in_file)
+    elif regrid_tool == "regrid2":
         ds_regridded = ds.regridder.horizontal(
             varname_in_file, t_grid, tool=regrid_tool
         )
     elif regrid_tool in ["esmf", "xesmf"]:
         regrid_tool = "xesmf"
-        regrid_method = "bilinear"
         ds_regridded = ds.regridder.horizontal(
             varname_in_file, t_grid, tool=regrid_tool, method=regrid_method
         )
@@ -165,6 +192,9 @@ def load_and_regrid(
             ds_regridded = ds_regridded.bounds.add_missing_bounds(["T"])
             print("[WARNING]: bounds.add_missing_bounds conducted for T axis")
 
+    if cache is not None:
+        cache.put(cache_key, ds_regridded, open_kwargs={"decode_times": decode_times})
+
     if debug:
         print("ds_regridded:", ds_regridded)
     return ds_regridded
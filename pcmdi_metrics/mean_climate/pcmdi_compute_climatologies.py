@@ -45,6 +45,25 @@ P.add_argument(
 
 P.add_argument("--version", dest="version", default=None, required=False)
 
+P.add_argument(
+    "--streaming",
+    # If input is 'True' or 'true', return True. Otherwise False.
+    type=lambda x: x.lower() == "true",
+    dest="streaming",
+    default=False,
+    help="True to compute climatologies in one pass over time chunks to bound memory use",
+    required=False,
+)
+
+P.add_argument(
+    "--chunk_size",
+    type=int,
+    dest="chunk_size",
+    default=12,
+    help="Number of time steps read at once in streaming mode (default=12)",
+    required=False,
+)
+
 args = P.get_parameter()
 
 infile_template = args.infile
@@ -57,6 +76,8 @@ end = args.end
 periodinname = args.periodinname
 climlist = args.climlist
 ver = args.version
+streaming = args.streaming
+chunk_size = args.chunk_size
 
 if ver is None:
     ver = datetime.datetime.now().strftime("v%Y%m%d")
@@ -99,4 +120,6 @@ for var in varlist:
         ver,
         periodinname,
         climlist,
+        streaming=streaming,
+        chunk_size=chunk_size,
     )
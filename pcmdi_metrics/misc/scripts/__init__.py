@@ -1 +1,2 @@
+from .job_scheduler import JobScheduler  # noqa
 from .parallel_submitter import parallel_submitter  # noqa
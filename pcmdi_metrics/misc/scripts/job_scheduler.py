@@ -0,0 +1,289 @@
+import glob
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+
+
+class JobScheduler:
+    """
+    Run a dependency graph of command-line tasks on a bounded pool of processes
+
+    Import (after installing PMP):
+    >> from pcmdi_metrics.misc.scripts import JobScheduler
+
+    Tasks whose dependencies are all completed are launched in order of priority:
+    the estimated cost of the task plus the largest cost of the tasks that depend
+    on it (critical path), so long chains and big jobs start first and do not
+    end up as tail jobs. The cost of a task is given or estimated from the size of
+    its input files. The scheduler polls its own processes only (other child
+    processes of the caller are left alone), retries failed tasks, and records the
+    status of each task in a state file so that an interrupted run resumes without
+    re-running completed tasks.
+
+    Inputs:
+
+    - num_workers: integer number that limits how many processes run at one time
+       default: 20% of all CPUs of the current computer
+    - log_dir: string for directory path for log files, default = './logs'
+    - state_file: string for path of the JSON state file, default = None (no resume)
+    - max_retries: integer number of times a failed task is re-submitted, default = 0
+    - poll_interval: seconds between checks of the running processes, default = 0.5
+
+    Example:
+
+    >> scheduler = JobScheduler(num_workers=4, state_file="state.json", max_retries=1)
+    >> scheduler.add_task("clim_ts", "pcmdi_compute_climatologies.py -p clim_ts.py",
+    ..                    inputs=["/data/ts/*.nc"])
+    >> scheduler.add_task("mean_clim_ts", "mean_climate_driver.py -p param.py --vars ts",
+    ..                    depends_on=["clim_ts"])
+    >> scheduler.add_task("merge", "python merge_json.py", depends_on=["mean_clim_ts"])
+    >> status = scheduler.run()
+    """
+
+    def __init__(
+        self,
+        num_workers=None,
+        log_dir="./logs",
+        state_file=None,
+        max_retries=0,
+        poll_interval=0.5,
+    ):
+        if num_workers is None:
+            num_workers = int(
+                os.cpu_count() * 0.2
+            )  # default: use 20% of all available CPUs
+        self.num_workers = max(num_workers, 1)
+        self.log_dir = log_dir
+        self.state_file = state_file
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.tasks = dict()
+
+    def add_task(
+        self, name, cmd, depends_on=None, inputs=None, cost=None, log_file=None
+    ):
+        """
+        Add a task
+
+        Inputs:
+
+        - name: string, unique name of the task
+        - cmd: command line, either a string (split as in a shell) or a list
+        - depends_on: list of task names that must complete before this task starts
+        - inputs: list of input file paths or wildcard patterns, used to estimate the cost
+        - cost: estimated cost of the task. Default: total size of the input files in bytes
+        - log_file: path prefix of the stdout/stderr log files, default: log_dir/log_<name>
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task {name} is already defined")
+
+        if isinstance(cmd, str):
+            cmd = shlex.split(cmd)
+
+        if cost is None:
+            cost = estimate_cost(inputs)
+
+        if log_file is None:
+            log_file = os.path.join(self.log_dir, "log_" + name)
+
+        self.tasks[name] = {
+            "cmd": list(cmd),
+            "depends_on": list(depends_on or []),
+            "cost": cost,
+            "log_file": log_file,
+        }
+
+    def priorities(self):
+        """Cost of each task plus the largest priority of the tasks depending on it"""
+        dependents = {name: [] for name in self.tasks}
+        for name, task in self.tasks.items():
+            for dep in task["depends_on"]:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task {name} depends on undefined task {dep}")
+                dependents[dep].append(name)
+
+        priority = dict()
+        for name in reversed(self._topological_order(dependents)):
+            priority[name] = self.tasks[name]["cost"] + max(
+                [priority[d] for d in dependents[name]], default=0
+            )
+        return priority
+
+    def _topological_order(self, dependents):
+        remaining = {name: len(task["depends_on"]) for name, task in self.tasks.items()}
+        ready = [name for name, n in remaining.items() if n == 0]
+        order = []
+        while ready:
+            name = ready.pop()
+            order.append(name)
+            for d in dependents[name]:
+                remaining[d] -= 1
+                if remaining[d] == 0:
+                    ready.append(d)
+        if len(order) != len(self.tasks):
+            cycle = sorted(set(self.tasks) - set(order))
+            raise ValueError(f"Task dependencies contain a cycle: {cycle}")
+        return order
+
+    def run(self):
+        """
+        Run all tasks and wait for their completion
+
+        Output:
+        - dict of task name to status: "done", "failed", or "skipped" (a dependency failed)
+        """
+        priority = self.priorities()
+        state = self._load_state()
+        status = dict()
+        attempts = dict()
+        for name in self.tasks:
+            if state.get(name, {}).get("status") == "done":
+                status[name] = "done"
+                print("Already completed, skipped:", name)
+            else:
+                status[name] = "pending"
+            attempts[name] = 0
+
+        os.makedirs(self.log_dir, exist_ok=True)
+        print("Number of employed CPUs for subprocesses:", self.num_workers)
+        print("Scheduled process start: %s" % time.ctime())
+
+        running = dict()  # pid -> (name, Popen)
+        while True:
+            self._skip_failed_dependents(status)
+
+            ready = [
+                name
+                for name in self.tasks
+                if status[name] == "pending"
+                and all(status[d] == "done" for d in self.tasks[name]["depends_on"])
+            ]
+            ready.sort(key=lambda name: priority[name], reverse=True)
+
+            for name in ready[: self.num_workers - len(running)]:
+                p = self._submit(name, attempts[name])
+                attempts[name] += 1
+                status[name] = "running"
+                running[p.pid] = (name, p)
+
+            if not running:
+                break
+
+            # wait until one of the running tasks exits
+            pid = self._wait(running)
+            name, p = running.pop(pid)
+
+            if p.returncode == 0:
+                status[name] = "done"
+                print("Completed: %s (%s)" % (name, time.ctime()))
+            elif attempts[name] <= self.max_retries:
+                status[name] = "pending"
+                print(
+                    "Failed (exit code %d), retrying: %s (%s)"
+                    % (p.returncode, name, time.ctime())
+                )
+            else:
+                status[name] = "failed"
+                print(
+                    "Failed (exit code %d): %s (%s)"
+                    % (p.returncode, name, time.ctime())
+                )
+            self._save_state(status, attempts)
+
+        self._save_state(status, attempts)
+        print("Scheduled processes are completed: %s" % time.ctime())
+        return status
+
+    def _submit(self, name, attempt):
+        task = self.tasks[name]
+        print("Launching %s: %s" % (name, " ".join(task["cmd"])))
+        log_dir = os.path.dirname(task["log_file"])
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        # append on retries to keep the log of earlier attempts
+        mode = "ab" if attempt > 0 else "wb"
+        with (
+            open(task["log_file"] + "_stdout.txt", mode) as out,
+            open(task["log_file"] + "_stderr.txt", mode) as err,
+        ):
+            return subprocess.Popen(task["cmd"], stdout=out, stderr=err)
+
+    def _wait(self, running):
+        processes = [p for _, p in running.values()]
+        while True:
+            index = find_done(processes)
+            if index is not None:
+                return processes[index].pid
+            time.sleep(self.poll_interval)
+
+    def _skip_failed_dependents(self, status):
+        changed = True
+        while changed:
+            changed = False
+            for name, task in self.tasks.items():
+                if status[name] == "pending" and any(
+                    status[d] in ["failed", "skipped"] for d in task["depends_on"]
+                ):
+                    status[name] = "skipped"
+                    print("Skipped (dependency failed):", name)
+                    changed = True
+
+    def _load_state(self):
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return dict()
+        with open(self.state_file) as f:
+            return json.load(f)
+
+    def _save_state(self, status, attempts):
+        if self.state_file is None:
+            return
+        state = {
+            name: {"status": status[name], "attempts": attempts[name]}
+            for name in self.tasks
+        }
+        state_dir = os.path.dirname(os.path.abspath(self.state_file))
+        fd, tmp_path = tempfile.mkstemp(dir=state_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp_path, self.state_file)
+
+
+def find_done(processes):
+    """Index of the first process (subprocess.Popen) that has exited, or None"""
+    for i, p in enumerate(processes):
+        if p.poll() is not None:
+            return i
+    return None
+
+
+def estimate_cost(inputs):
+    """Total size in bytes of the input files (paths or wildcard patterns)"""
+    if inputs is None:
+        return 0
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    cost = 0
+    for pattern in inputs:
+        for path in glob.glob(pattern):
+            if os.path.isfile(path):
+                cost += os.path.getsize(path)
+    return cost
+
+
+def main():
+    scheduler = JobScheduler(num_workers=2)
+    for r in range(1, 10):
+        scheduler.add_task("expr_" + str(r), "expr 1 + " + str(r))
+    scheduler.add_task(
+        "echo_done",
+        "echo done",
+        depends_on=["expr_" + str(r) for r in range(1, 10)],
+    )
+    print(scheduler.run())
+
+
+if __name__ == "__main__":
+    main()
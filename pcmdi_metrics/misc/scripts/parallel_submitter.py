@@ -1,7 +1,8 @@
 import os
-import subprocess
 import time
 
+from .job_scheduler import JobScheduler, find_done
+
 
 def parallel_submitter(
     cmd_list, log_dir="./logs", logfilename_list=None, num_workers=None
@@ -53,19 +54,15 @@ def parallel_submitter(
         os.environ["UVCDAT_ANONYMOUS_LOG"] = "no"
     # ------------------------------------------------------
 
-    os.makedirs(log_dir, exist_ok=True)
-
     if num_workers is None:
         num_workers = int(
             os.cpu_count() * 0.2
         )  # default: use 20% of all available CPUs
 
-    print("Number of employed CPUs for subprocesses:", num_workers)
-    print("Parallel process start: %s" % time.ctime())
+    # processes are launched by the job scheduler
+    scheduler = JobScheduler(num_workers=num_workers, log_dir=log_dir)
 
-    processes = list()
-
-    for index, (process, log_file) in enumerate(zip(cmd_list, logfilename_list)):
+    for index, process in enumerate(cmd_list):
         print(index, ":", process)
 
         # LOG FILE
@@ -74,35 +71,19 @@ def parallel_submitter(
         else:
             log_file = os.path.join(log_dir, logfilename_list[index])
 
-        # SUBMIT PROCESS
-        with (
-            open(log_file + "_stdout.txt", "wb") as out,
-            open(log_file + "_stderr.txt", "wb") as err,
-        ):
-            p = subprocess.Popen(process.split(" "), stdout=out, stderr=err)
-            processes.append(p)
-
-        # WAIT FOR NEXT SUBMIT
-        if len(processes) == num_workers:
-            wait = True
-            while wait:
-                done, num = check_for_done(processes)
-                if done:
-                    processes.pop(num)
-                    wait = False
-                    if index != len(cmd_list) - 1:
-                        print("Launching next process in cmd_list: %s" % time.ctime())
-                else:
-                    time.sleep(2)  # set this so the CPU does not go crazy
+        scheduler.add_task(str(index), process.split(" "), log_file=log_file)
+
+    scheduler.run()
 
     # DONE
     print("Parallel process submission for all tasks are completed: %s" % time.ctime())
 
 
 def check_for_done(processes):
-    for i, p in enumerate(processes):
-        if p.poll() is not None:
-            return True, i  # subprocess finished
+    """Kept for compatibility, see job_scheduler.find_done"""
+    i = find_done(processes)
+    if i is not None:
+        return True, i  # subprocess finished
     return False, False  # suprocess not finished
 
 
@@ -1,12 +1,15 @@
 from .argparse_functions import AddParserArgument  # noqa
 from .lib_precip_distribution import (  # noqa
     CalcBinStructure,
+    CalcDistCounts,
     CalcMetricsDomain,
     CalcMetricsDomain3Clust,
     CalcMetricsDomainAR6,
     CalcP10P90,
     CalcPscore,
     CalcRainMetrics,
+    CalcRainMetricsMap,
+    DistsFromCounts,
     MakeDists,
     MedDomain,
     MedDomain3Clust,
@@ -16,4 +19,5 @@ from .lib_precip_distribution import (  # noqa
     oneyear,
     precip_distribution_cum,
     precip_distribution_frq_amt,
+    regrid_by_year,
 )
@@ -74,6 +74,30 @@ def AddParserArgument(P):
         action="store_false",
         help="Do not save CMEC format metrics JSON",
     )
+    P.add_argument(
+        "--num_workers",
+        type=int,
+        dest="num_workers",
+        default=1,
+        help="Number of processes for the distributions at grid points (default: 1)",
+    )
+    P.add_argument(
+        "--reuse_regrid_weights",
+        # If input is 'True' or 'true', return True. Otherwise False.
+        type=lambda x: x.lower() == "true",
+        dest="reuse_regrid_weights",
+        default=True,
+        help="True to compute the regridding weights for the first year and reuse them"
+        + " for the other years, otherwise False (default: True)",
+    )
+    P.add_argument(
+        "--regrid_scratch_file",
+        type=str,
+        dest="regrid_scratch_file",
+        default=None,
+        help="Path of a .npy scratch file holding the regridded data as a memory-mapped"
+        + " array, instead of memory (default: None)",
+    )
     P.set_defaults(cmec=False)
 
     return P
@@ -1,6 +1,7 @@
 import copy
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import cftime  # noqa: F401
 import numpy as np
@@ -26,7 +27,18 @@ from pcmdi_metrics.utils import create_land_sea_mask, create_target_grid, regrid
 
 # ==================================================================================
 def precip_distribution_frq_amt(
-    dat, ds_rg, data_var, syr, eyr, res, outdir, ref, refdir, cmec, debug=False
+    dat,
+    ds_rg,
+    data_var,
+    syr,
+    eyr,
+    res,
+    outdir,
+    ref,
+    refdir,
+    cmec,
+    debug=False,
+    num_workers=1,
 ):
     """
     - The metric algorithm is based on Dr. Pendergrass's work (https://github.com/apendergrass/rain-metrics-python)
@@ -57,6 +69,8 @@ def precip_distribution_frq_amt(
         flag for CMEC output
     debug : bool, optional
         if True, debug mode is enabled (default is False)
+    num_workers : int, optional
+        number of processes for the distributions at grid points (default is 1)
     """
 
     # Month separation
@@ -91,7 +105,9 @@ def precip_distribution_frq_amt(
 
         # Calculate distributions at each grid point
         print("start MakeDists")
-        ppdfmap, pamtmap, bins, ppdfmap_tn = MakeDists(pdata1, binl)
+        ppdfmap, pamtmap, bins, ppdfmap_tn = MakeDists(
+            pdata1, binl, num_workers=num_workers
+        )
 
         if debug:
             print("ppdfmap type:", type(ppdfmap))
@@ -107,18 +123,8 @@ def precip_distribution_frq_amt(
 
         # Calculate metrics from the distribution at each grid point
         print("start CalcRainMetrics for each grid point")
-        for i in range(drg.shape[2]):
-            for j in range(drg.shape[1]):
-                rainpeak, rainwidth, plotpeak, plotwidth = CalcRainMetrics(
-                    ppdfmap[:, j, i], bincrates
-                )
-                pdfpeakmap[im, j, i] = rainpeak
-                pdfwidthmap[im, j, i] = rainwidth
-                rainpeak, rainwidth, plotpeak, plotwidth = CalcRainMetrics(
-                    pamtmap[:, j, i], bincrates
-                )
-                amtpeakmap[im, j, i] = rainpeak
-                amtwidthmap[im, j, i] = rainwidth
+        pdfpeakmap[im], pdfwidthmap[im] = CalcRainMetricsMap(ppdfmap, bincrates)
+        amtpeakmap[im], amtwidthmap[im] = CalcRainMetricsMap(pamtmap, bincrates)
         print("completed CalcRainMetrics for each grid point")
 
         # Make Spatial pattern of distributions with separated months
@@ -421,7 +427,7 @@ def precip_distribution_cum(
 
 
 # ==================================================================================
-def Regrid_xr(ds, data_var, resdeg):
+def Regrid_xr(ds, data_var, resdeg, reuse_weights=False):
     """
     Regridding horizontal resolution using xarray
 
@@ -429,6 +435,7 @@ def Regrid_xr(ds, data_var, resdeg):
     - ds: xarray Dataset or DataArray
     - data_var: name of the variable to regrid
     - resdeg: list of target horizontal resolution [degree] for lon and lat (e.g., [4, 4])
+    - reuse_weights: reuse the regridding weights of earlier calls on the same grid (default: False)
 
     Output
     - ds_regrid: xarray Dataset with target horizontal resolution
@@ -452,7 +459,7 @@ def Regrid_xr(ds, data_var, resdeg):
         target_grid_resolution=f"{dlat}x{dlon}",
         grid_type="uniform",
     )
-    ds_regrid = regrid(ds, data_var, tgrid)
+    ds_regrid = regrid(ds, data_var, tgrid, reuse_weights=reuse_weights)
 
     print(
         f"Completed regridding (via Regrid_xr) from {ds[data_var].shape} to {ds_regrid[data_var].shape}"
@@ -460,6 +467,95 @@ def Regrid_xr(ds, data_var, resdeg):
     return ds_regrid
 
 
+def regrid_by_year(
+    ds, data_var, syr, eyr, ldy, fac, resdeg, reuse_weights=True, scratch_file=None
+):
+    """Correct, scale and regrid precipitation one year at a time.
+
+    The regridded data of each year are written into an array of the whole period,
+    allocated once, so the regridded data are copied only once and the input data are
+    read one year at a time.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        Input dataset, e.g., opened lazily with `xcdat_open`.
+    data_var : str
+        Name of the precipitation variable.
+    syr : int
+        Start year.
+    eyr : int
+        End year.
+    ldy : int
+        Last day of December in the calendar of the data (30 or 31).
+    fac : float
+        Factor converting the precipitation to mm/day.
+    resdeg : list
+        Target horizontal resolution [degree] for lon and lat (e.g., [4, 4]).
+    reuse_weights : bool, optional
+        Compute the regridding weights for the first year and reuse them for the
+        other years (see :func:`pcmdi_metrics.utils.get_regridder`) (default is True).
+    scratch_file : str, optional
+        Path of a .npy file used as a memory-mapped array for the regridded data,
+        instead of an array in memory (default is None).
+
+    Returns
+    -------
+    xr.Dataset
+        Regridded dataset from the start of `syr` to the end of `eyr`.
+    """
+
+    def year_slice(syr, eyr):
+        return slice(
+            str(syr) + "-01-01 00:00:00", str(eyr) + "-12-" + str(ldy) + " 23:59:59"
+        )
+
+    time = ds["time"].sel(time=year_slice(syr, eyr))
+
+    data = None
+    it = 0
+    for iyr in range(syr, eyr + 1):
+        dy = ds.sel(time=year_slice(iyr, iyr))
+        do = dy[data_var]
+        # Correct negative precip to 0 (ERA-interim from CREATE-IP and ERA-5 from obs4MIP have negative precip values between -1 and 0)
+        do = xr.where((do < 0) & (do > -1), 0, do)
+        do = do * float(fac)
+
+        # Replace the variable of this year only, the input dataset is unchanged
+        dy = dy.assign({data_var: dy[data_var].copy(data=do.values)})
+
+        # Regridding
+        rgtmp = Regrid_xr(dy, data_var, resdeg, reuse_weights=reuse_weights)
+        drg = rgtmp[data_var].transpose("time", ...)
+
+        if data is None:
+            # Allocate the regridded data of the whole period
+            shape = (len(time),) + drg.shape[1:]
+            if scratch_file is None:
+                data = np.empty(shape, dtype=drg.dtype)
+            else:
+                data = np.lib.format.open_memmap(
+                    scratch_file, mode="w+", dtype=drg.dtype, shape=shape
+                )
+            ds_rg = rgtmp.drop_dims("time")
+            dims = drg.dims
+            coords = {d: drg[d] for d in dims[1:] if d in drg.coords}
+
+        data[it : it + drg.shape[0]] = drg.values
+        it += drg.shape[0]
+        print(iyr, data[:it].shape)
+
+    ds_rg[data_var] = xr.DataArray(
+        data, dims=dims, coords={"time": time, **coords}, attrs=drg.attrs
+    )
+    # Bounds of the time axis
+    for key in ds.data_vars:
+        if key != data_var and "time" in ds[key].dims:
+            ds_rg[key] = ds[key].sel(time=time["time"])
+
+    return ds_rg
+
+
 # ==================================================================================
 def get_daily_calendar_month(d, months):
     """
@@ -600,7 +696,7 @@ def CalcBinStructure(pdata1):
 
 
 # ==================================================================================
-def MakeDists(pdata, binl):
+def MakeDists(pdata, binl, num_workers=1, block_size=4096):
     """Calculate precipitation distributions from data.
 
     Parameters
@@ -609,6 +705,10 @@ def MakeDists(pdata, binl):
         Precipitation data with dimensions (time, lat, lon).
     binl : xr.DataArray
         Left edges of the bins for the precipitation distribution.
+    num_workers : int, optional
+        Number of processes over which blocks of grid cells are distributed (default is 1).
+    block_size : int, optional
+        Number of grid cells per block (default is 4096).
 
     Returns
     -------
@@ -623,37 +723,123 @@ def MakeDists(pdata, binl):
     """
     # This is called from within makeraindist.
     # Caclulate distributions
-    nlat = pdata.shape[1]
-    nlon = pdata.shape[2]
-    nd = pdata.shape[0]
+    n, pamt = CalcDistCounts(pdata, binl, num_workers, block_size)
+    return DistsFromCounts(
+        n, pamt, pdata.shape[0], binl, get_latitude(pdata), get_longitude(pdata)
+    )
+
+
+def CalcDistCounts(pdata, binl, num_workers=1, block_size=4096):
+    """Count precipitation days and sum precipitation amounts in each bin at each grid point.
+
+    All grid points are binned with a single digitize, and the counts and amounts are
+    accumulated with bincount on flattened (grid point, bin) indices. Counts and amounts
+    of consecutive periods can be added up before :func:`DistsFromCounts`.
+
+    Parameters
+    ----------
+    pdata : xr.DataArray or np.ndarray
+        Precipitation data with dimensions (time, lat, lon).
+    binl : xr.DataArray
+        Left edges of the bins for the precipitation distribution.
+    num_workers : int, optional
+        Number of processes over which blocks of grid cells are distributed (default is 1).
+    block_size : int, optional
+        Number of grid cells per block (default is 4096).
+
+    Returns
+    -------
+    np.ndarray
+        Number of days in each bin (np.histogram), with dimensions (bin, lat, lon).
+    np.ndarray
+        Precipitation amount in each bin, with dimensions (bin, lat, lon).
+    """
     bins = np.append(0, binl)
-    n = np.empty((len(binl), nlat, nlon))
-    binno = np.empty(pdata.shape)
-    for ilon in range(nlon):
-        for ilat in range(nlat):
-            # this is the histogram - we'll get frequency from this
-            thisn, thisbin = np.histogram(pdata[:, ilat, ilon], bins)
-            # n[:, ilat, ilon] = thisn
-            thmiss = 0.7  # threshold for missing grid
-            if np.sum(thisn) >= nd * thmiss:
-                n[:, ilat, ilon] = thisn
-            else:
-                n[:, ilat, ilon] = np.nan
+    data = np.asarray(pdata)
+    shape = data.shape[1:]
+    data = data.reshape(data.shape[0], -1)
+    ncell = data.shape[1]
+
+    blocks = [slice(i, min(i + block_size, ncell)) for i in range(0, ncell, block_size)]
+    args = [(np.ascontiguousarray(data[:, block]), bins) for block in blocks]
+    if num_workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_dist_counts_block, args))
+    else:
+        results = [_dist_counts_block(a) for a in args]
+
+    n = np.empty((len(binl), ncell))
+    pamt = np.empty((len(binl), ncell))
+    for block, (n_block, pamt_block) in zip(blocks, results):
+        n[:, block] = n_block
+        pamt[:, block] = pamt_block
+
+    return n.reshape((len(binl),) + shape), pamt.reshape((len(binl),) + shape)
+
+
+def _dist_counts_block(args):
+    # Counts and amounts of the bins for a block of grid cells (time, cell)
+    data, bins = args
+    nbin = len(bins) - 1
+    ncell = data.shape[1]
+
+    # these are the bin locations. we'll use these for the amount dist
+    binno = np.digitize(data, bins)
+    # index of each cell, for flattened (cell, bin) indices
+    cell = np.broadcast_to(np.arange(ncell) * nbin, data.shape)
+
+    # this is the histogram - we'll get frequency from this
+    # (np.histogram bins, with the last bin including its right edge)
+    ihist = binno - 1
+    ihist[data == bins[-1]] = nbin - 1
+    valid = (ihist >= 0) & (ihist < nbin)
+    n = np.bincount(cell[valid] + ihist[valid], minlength=ncell * nbin)
+
+    # add up all the precip in each bin - this will be the rain amount distribution.
+    # as in the original algorithm, amount bin i holds the precip with binno == i
+    valid = binno < nbin
+    pamt = np.bincount(
+        cell[valid] + binno[valid], weights=data[valid], minlength=ncell * nbin
+    )
+
+    return n.reshape(ncell, nbin).T, pamt.reshape(ncell, nbin).T
+
+
+def DistsFromCounts(n, pamt, nd, binl, lat, lon):
+    """Calculate precipitation distributions from the counts of :func:`CalcDistCounts`.
+
+    Parameters
+    ----------
+    n : np.ndarray
+        Number of days in each bin, with dimensions (bin, lat, lon).
+    pamt : np.ndarray
+        Precipitation amount in each bin, with dimensions (bin, lat, lon).
+    nd : int
+        Number of days of the data.
+    binl : xr.DataArray
+        Left edges of the bins for the precipitation distribution.
+    lat : xr.DataArray
+        Latitude of the data.
+    lon : xr.DataArray
+        Longitude of the data.
+
+    Returns
+    -------
+    tuple
+        Same as :func:`MakeDists`.
+    """
+    bins = np.append(0, binl)
+    n = np.array(n, dtype=float)
+    thmiss = 0.7  # threshold for missing grid
+    n[:, np.sum(n, axis=0) < nd * thmiss] = np.nan
 
-            # these are the bin locations. we'll use these for the amount dist
-            binno[:, ilat, ilon] = np.digitize(pdata[:, ilat, ilon], bins)
     # Calculate the number of days with non-missing data, for normalization
     ndmat = np.tile(np.expand_dims(np.nansum(n, axis=0), axis=0), (len(bins) - 1, 1, 1))
 
     thisppdfmap = n / ndmat
     thisppdfmap_tn = thisppdfmap * ndmat
 
-    # Iterate back over the bins and add up all the precip - this will be the rain amount distribution.
-    # This step is probably the limiting factor and might be able to be made more efficient - I had a clever trick in matlab, but it doesn't work in python
-    testpamtmap = np.empty(thisppdfmap.shape)
-    for ibin in range(len(bins) - 1):
-        testpamtmap[ibin, :, :] = (pdata * (ibin == binno)).sum(axis=0)
-    thispamtmap = testpamtmap / ndmat
+    thispamtmap = pamt / ndmat
 
     # Change Inf to Nan
     thisppdfmap[np.isinf(thisppdfmap)] = np.nan
@@ -663,10 +849,6 @@ def MakeDists(pdata, binl):
     # Assume binl is a list or 1D array of bin centers
     bin_coord = xr.DataArray(binl, dims="bin", name="bin")
 
-    # Extract latitude and longitude from pdata
-    lat = get_latitude(pdata)
-    lon = get_longitude(pdata)
-
     # Create coordinate-aware DataArrays
     thisppdfmap = xr.DataArray(
         thisppdfmap,
@@ -690,7 +872,7 @@ def MakeDists(pdata, binl):
     )
 
     # Create the bin boundaries as a separate 1D DataArray
-    binbound = xr.DataArray(thisbin, dims="binbound", name="binbound")
+    binbound = xr.DataArray(bins, dims="binbound", name="binbound")
 
     # return thisppdfmap, thispamtmap, thisbin, thisppdfmap_tn
     return thisppdfmap, thispamtmap, binbound, thisppdfmap_tn
@@ -768,6 +950,153 @@ def CalcRainMetrics(pdistin, bincrates):
         return np.nan, np.nan, (np.nan, pmax), (np.nan, np.nan, np.nan)
 
 
+def CalcRainMetricsMap(pdistmap, bincrates):
+    """Calculate the rain peak and width of the distributions at all grid points.
+
+    Array version of :func:`CalcRainMetrics`, with the same steps applied to all
+    grid points at once. The sums and interpolations are done in the same order as
+    in :func:`CalcRainMetrics`, so the results are identical. Grid points where the
+    distribution does not cross the 10% line as expected are calculated with
+    :func:`CalcRainMetrics`.
+
+    Parameters
+    ----------
+    pdistmap : xr.DataArray or np.ndarray
+        Rain frequency or amount distributions, with dimensions (bin, lat, lon).
+    bincrates : np.ndarray
+        Rain rates of the bins, from :func:`CalcBinStructure`.
+
+    Returns
+    -------
+    np.ndarray
+        Rain peak, with dimensions (lat, lon).
+    np.ndarray
+        Rain width, with dimensions (lat, lon).
+    """
+    pdist = np.array(pdistmap)
+    shape = pdist.shape[1:]
+    pdist = pdist.reshape(pdist.shape[0], -1)
+    nb = pdist.shape[0]
+    tile = np.array(0.1)
+
+    # msahn, Days with precip<0.1mm/day are considered dry (Pendergrass and Deser 2017)
+    thidx = np.argwhere(bincrates > 0.1)
+    thidx = int(thidx[0][0])
+    pdist[:thidx] = 0
+
+    pmax = pdist.max(axis=0)
+    rainpeak = np.full(pdist.shape[1], np.nan)
+    rainwidth = np.full(pdist.shape[1], np.nan)
+    cells = np.flatnonzero(pmax > 0)
+    pdist = pdist[:, cells]
+    pmax = pmax[cells]
+
+    # first bin of the maximum
+    rainpeak[cells] = bincrates[np.argmax(pdist == pmax, axis=0)]
+
+    # fraction of the distribution above lines at different heights.
+    # cumsum adds up the bins in order, as the builtin sum of CalcRainMetrics
+    theps = np.linspace(0.1, 0.99, 99)[:, np.newaxis] * pmax
+    thefrac = np.empty(theps.shape)
+    ptot = np.cumsum(pdist, axis=0)[-1]
+    for i in range(len(theps)):
+        overp = (pdist - theps[i]) * (pdist > theps[i])
+        thefrac[i] = np.cumsum(overp, axis=0)[-1] / ptot
+    ptilerain = _interp_monotonic(-tile, -thefrac, theps)
+
+    diffraintile = pdist - ptilerain
+    ind = np.arange(nb)[:, np.newaxis]
+    above = diffraintile > 0
+    below = diffraintile < 0
+    afterfirst = np.argmax(above, axis=0)
+    beforelast = nb - 1 - np.argmax(above[::-1], axis=0)
+    # last bin below the line before afterfirst
+    lastbelow = np.maximum.accumulate(np.where(below, ind, -1), axis=0)
+    beforefirst = np.take_along_axis(
+        lastbelow, np.maximum(afterfirst - 1, 0)[np.newaxis], axis=0
+    )[0]
+    # first bin below the line after beforelast, except the last bin
+    nextbelow = np.minimum.accumulate(np.where(below, ind, nb)[::-1], axis=0)[::-1]
+    afterlast = np.take_along_axis(nextbelow, beforelast[np.newaxis], axis=0)[0]
+    noiend = afterlast >= nb - 1
+
+    # number of non-increasing steps of the distribution before each bin
+    nondec = np.zeros(diffraintile.shape, dtype=int)
+    nondec[1:] = np.cumsum(~(np.diff(diffraintile, axis=0) > 0), axis=0)
+    noninc = np.zeros(diffraintile.shape, dtype=int)
+    noninc[1:] = np.cumsum(~(np.diff(-diffraintile, axis=0) > 0), axis=0)
+
+    def _at(a, i):
+        return np.take_along_axis(a, np.clip(i, 0, nb - 1)[np.newaxis], axis=0)[0]
+
+    # note: r1 and r2 are bin indices, not rain rates.
+    r1 = np.where(
+        _at(nondec, afterfirst) - _at(nondec, beforefirst) == 0,
+        _interp_crossing(
+            _at(diffraintile, afterfirst - 1),
+            _at(diffraintile, afterfirst),
+            afterfirst - 1,
+        ),
+        np.add(beforefirst, afterfirst) / 2,
+    )
+    r2 = np.where(
+        _at(noninc, afterlast) - _at(noninc, beforelast) == 0,
+        _interp_crossing(
+            -_at(diffraintile, afterlast - 1),
+            -_at(diffraintile, afterlast),
+            afterlast - 1,
+        ),
+        np.add(beforelast, afterlast) / 2,
+    )
+    # Bin width - needed to normalize the rain amount distribution
+    db = (bincrates[2] - bincrates[1]) / bincrates[1]
+    rainwidth[cells] = np.where(noiend, 0, (r2 - r1) * db + 1)
+
+    # grid points where the fractions do not decrease with height or with no bin
+    # below the line before the peak
+    other = np.any(np.diff(thefrac, axis=0) > 0, axis=0)
+    other |= (afterfirst < 1) | (beforefirst < 0)
+    for c in np.flatnonzero(other):
+        rainpeak[cells[c]], rainwidth[cells[c]] = CalcRainMetrics(
+            pdist[:, c], bincrates
+        )[:2]
+
+    return rainpeak.reshape(shape), rainwidth.reshape(shape)
+
+
+def _interp_monotonic(x, xp, fp):
+    # np.interp(x, xp[:, k], fp[:, k]) for each column k of xp sorted in
+    # increasing order, with the same branches and arithmetic as np.interp
+    n = xp.shape[0]
+    j = np.sum(xp <= x, axis=0) - 1
+    jlo = np.clip(j, 0, n - 2)[np.newaxis]
+    xlo = np.take_along_axis(xp, jlo, axis=0)[0]
+    xhi = np.take_along_axis(xp, jlo + 1, axis=0)[0]
+    flo = np.take_along_axis(fp, jlo, axis=0)[0]
+    fhi = np.take_along_axis(fp, jlo + 1, axis=0)[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (fhi - flo) / (xhi - xlo)
+        result = slope * (x - xlo) + flo
+        retry = slope * (x - xhi) + fhi
+    result = np.where(np.isnan(result), retry, result)
+    result = np.where(np.isnan(result) & (flo == fhi), flo, result)
+    result = np.where(xlo == x, flo, result)
+    result = np.where(j < 0, fp[0], result)
+    return np.where(j >= n - 1, fp[-1], result)
+
+
+def _interp_crossing(ylo, yhi, ilo):
+    # np.interp(0, y, range(...)) between the bins ilo and ilo + 1 of y,
+    # where y crosses 0 (ylo <= 0 < yhi)
+    ilo = ilo.astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = ((ilo + 1) - ilo) / (yhi - ylo)
+        result = slope * (0 - ylo) + ilo
+        retry = slope * (0 - yhi) + (ilo + 1)
+    result = np.where(np.isnan(result), retry, result)
+    return np.where(ylo == 0, ilo, result)
+
+
 # ==================================================================================
 def CalcMetricsDomain(pdf, amt, months, bincrates, dat, ref, ref_dir):
     """
@@ -1875,30 +2204,28 @@ def oneyear(thisyear, missingthresh, debug=False):
     ptotnp = np.array(ptot)
     ptotnp[np.where(ptotnp == 0)] = np.nan
     pfrac = cum_sum / np.tile(ptotnp[np.newaxis, :, :], [nd, 1, 1])
-    ndhy = np.full((dims[1], dims[2]), np.nan)
-    prdays = np.full((dims[1], dims[2]), np.nan)
-    prdays_gt_1mm = np.full((dims[1], dims[2]), np.nan)
     x = np.linspace(0, nd, num=nd + 1, endpoint=True)
-    z = np.array([0.0])
-    for ij in range(dims[1]):
-        for ik in range(dims[2]):
-            p = pfrac[:, ij, ik]
-            y = np.concatenate([z, p])
-            ndh = np.interp(0.5, y, x)
-            ndhy[ij, ik] = ndh
-            if np.isnan(ptotnp[ij, ik]):
-                prdays[ij, ik] = np.nan
-                prdays_gt_1mm[ij, ik] = np.nan
-            else:
-                # For the case, pfrac does not reach 1 (maybe due to regridding)
-                # prdays[ij, ik] = np.where(y >= 1)[0][0]
-                prdays[ij, ik] = np.nanargmax(y)
-                if np.diff(cum_sum[:, ij, ik])[-1] >= 1:
-                    prdays_gt_1mm[ij, ik] = prdays[ij, ik]
-                else:
-                    prdays_gt_1mm[ij, ik] = np.where(
-                        np.diff(np.concatenate([z, cum_sum[:, ij, ik]])) < 1
-                    )[0][0]
+    y = np.concatenate([np.zeros((1, dims[1], dims[2])), pfrac])
+    valid = ~np.isnan(ptotnp)
+
+    # Number of days for half of precipitation, np.interp(0.5, y, x) at each grid point.
+    # The cumulated fractions are increasing, unless there is negative precipitation.
+    increasing = np.all(np.diff(y, axis=0) >= 0, axis=0)
+    ndhy = _interp_monotonic(
+        0.5,
+        y.reshape(nd + 1, -1),
+        np.broadcast_to(x[:, np.newaxis], (nd + 1, y[0].size)),
+    ).reshape(dims[1:])
+    ndhy[~increasing] = np.nan
+    for ij, ik in zip(*np.nonzero(valid & ~increasing)):
+        ndhy[ij, ik] = np.interp(0.5, y[:, ij, ik], x)
+
+    # For the case, pfrac does not reach 1 (maybe due to regridding)
+    # prdays[ij, ik] = np.where(y >= 1)[0][0]
+    prdays = np.where(valid, np.argmax(np.where(valid, y, 0), axis=0), np.nan)
+    dcum = np.diff(np.concatenate([np.zeros((1, dims[1], dims[2])), cum_sum]), axis=0)
+    prdays_gt_1mm = np.where(dcum[-1] >= 1, prdays, np.argmax(dcum < 1, axis=0))
+    prdays_gt_1mm[~valid] = np.nan
 
     # prdyfrac = prdays/ndwonan
     prdyfrac = prdays_gt_1mm / ndwonan
@@ -1,17 +1,14 @@
 #!/usr/bin/env python
 
-import copy
 import glob
 import os
 
-import xarray as xr
-
 from pcmdi_metrics.io import StringConstructor, get_calendar, xcdat_open
 from pcmdi_metrics.precip_distribution.lib import (
     AddParserArgument,
-    Regrid_xr,
     precip_distribution_cum,
     precip_distribution_frq_amt,
+    regrid_by_year,
 )
 from pcmdi_metrics.utils.pmp_parser import PMPParser
 
@@ -28,6 +25,9 @@ ref = param.ref
 prd = param.prd
 fac = param.fac
 res = param.res
+num_workers = param.num_workers
+reuse_regrid_weights = param.reuse_regrid_weights
+regrid_scratch_file = param.regrid_scratch_file
 print(modpath)
 print(mod)
 print(prd)
@@ -80,32 +80,24 @@ else:
 
 syr = prd[0]
 eyr = prd[1]
-for iyr in range(syr, eyr + 1):
-    ds = ds_raw.sel(
-        time=slice(
-            str(iyr) + "-01-01 00:00:00", str(iyr) + "-12-" + str(ldy) + " 23:59:59"
-        )
-    )
-    do = ds[var]
-    # Correct negative precip to 0 (ERA-interim from CREATE-IP and ERA-5 from obs4MIP have negative precip values between -1 and 0)
-    do = xr.where((do < 0) & (do > -1), 0, do)
-    do = do * float(fac)
-
-    # Update the DataArray in the Dataset
-    ds[var].values = do.values
-
-    # Regridding with xcdat
-    rgtmp = Regrid_xr(ds, var, res)
-
-    if iyr == syr:
-        ds_rg = copy.deepcopy(rgtmp)
-    else:
-        ds_rg = xr.concat([ds_rg, rgtmp], dim="time")
-
-    print(iyr, ds_rg[var].shape)
+# Correct and regrid one year at a time into the array of the whole period
+ds_rg = regrid_by_year(
+    ds_raw,
+    var,
+    syr,
+    eyr,
+    ldy,
+    fac,
+    res,
+    reuse_weights=reuse_regrid_weights,
+    scratch_file=regrid_scratch_file,
+)
+print(ds_rg[var].shape)
 
 # Calculate metrics from precipitation frequency and amount distributions
-precip_distribution_frq_amt(dat, ds_rg, var, syr, eyr, res, outdir, ref, refdir, cmec)
+precip_distribution_frq_amt(
+    dat, ds_rg, var, syr, eyr, res, outdir, ref, refdir, cmec, num_workers=num_workers
+)
 
 # Calculate metrics from precipitation cumulative distributions
 precip_distribution_cum(dat, ds_rg, var, cal, syr, eyr, res, outdir, cmec)
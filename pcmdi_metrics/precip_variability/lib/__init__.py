@@ -6,8 +6,11 @@ from .lib_variability_across_timescales import (  # noqa
     RedNoiseSignificanceLevel,
     RegridHoriz,
     CropLatLon,
+    interpolate_missing,
     lag1_autocorrelation,
+    lag1_autocorrelation_batch,
     prdday_to_frqidx,
     precip_variability_across_timescale,
     rednoise,
+    rednoise_batch,
 )
@@ -104,6 +104,22 @@ def AddParserArgument(P):
         help="Attribute containing feature in vectorized region.",
         default=None,
     )
+    P.add_argument(
+        "--chunk_size",
+        type=int,
+        dest="chunk_size",
+        default=None,
+        help="Number of grid points of the power spectra computed at once"
+        + " (default: None, all grid points)",
+    )
+    P.add_argument(
+        "--anom_scratch_file",
+        type=str,
+        dest="anom_scratch_file",
+        default=None,
+        help="Path of a .npy scratch file holding the anomaly as a memory-mapped"
+        + " array, instead of memory (default: None)",
+    )
     P.set_defaults(cmec=False)
 
     return P
@@ -35,6 +35,8 @@ def precip_variability_across_timescale(
     fshp,
     feature,
     attr,
+    chunk_size=None,
+    anom_scratch_file=None,
 ):
     """
     Regridding -> Anomaly -> Power spectra -> Domain&Frequency average -> Write
@@ -94,10 +96,10 @@ def precip_variability_across_timescale(
     f.close()
 
     # Anomaly
-    clim, anom = ClimAnom(drg, ntd, syr, eyr, cal)
+    clim, anom = ClimAnom(drg, ntd, syr, eyr, cal, anom_scratch_file)
 
     # Power spectum of total
-    freqs, ps, rn, sig95 = Powerspectrum(drg, nperseg, noverlap)
+    freqs, ps, rn, sig95 = Powerspectrum(drg, nperseg, noverlap, chunk_size)
     # Domain & Frequency average
     if fshp and regions_specs is None:
         # Set up the regions_specs to cover the whole earth; areas outside
@@ -123,7 +125,7 @@ def precip_variability_across_timescale(
     )
 
     # Power spectum of anomaly
-    freqs, ps, rn, sig95 = Powerspectrum(anom, nperseg, noverlap)
+    freqs, ps, rn, sig95 = Powerspectrum(anom, nperseg, noverlap, chunk_size)
     # Domain & Frequency average
     psdmfm_unforced = Avg_PS_DomFrq(ps, freqs, ntd, dat, mip, "unforced", regions_specs)
     # Write data (nc file)
@@ -246,7 +248,7 @@ def CropLatLon(d, regions_specs):
 
 
 # ==================================================================================
-def ClimAnom(d, ntd, syr, eyr, cal):
+def ClimAnom(d, ntd, syr, eyr, cal, scratch_file=None):
     """
     Calculate climatoloty and anomaly with data higher frequency than daily
     Input
@@ -255,84 +257,59 @@ def ClimAnom(d, ntd, syr, eyr, cal):
     - syr: analysis start year
     - eyr: analysis end year
     - cal: calendar
+    - scratch_file: path of a .npy file used as a memory-mapped array for the anomaly,
+      instead of an array in memory (default: None)
     Output
     - clim: climatology (climatological diurnal and annual cycles)
     - anom: anomaly departure from the climatological diurnal and annual cycles
     """
 
     # Year segment
-    nyr = eyr - syr + 1
     if "gregorian" in cal or "standard" in cal:
         ndy = 366
-        ldy = 31
-        dseg = np.zeros((nyr, ndy, ntd, d.shape[1], d.shape[2]), dtype=float)
-        for iyr, year in enumerate(range(syr, eyr + 1)):
-            yrtmp = d.sel(
-                time=slice(
-                    str(year) + "-01-01 00:00:00",
-                    str(year) + "-12-" + str(ldy) + " 23:59:59",
-                )
-            )
-
-            expanded = yrtmp.expand_dims("ndy")
-            yrtmpseg = np.reshape(
-                expanded,
-                (int(yrtmp.shape[0] / ntd), ntd, yrtmp.shape[1], yrtmp.shape[2]),
-            )
-
-            if yrtmpseg.shape[0] == 365:
-                dseg[iyr, 0:59] = yrtmpseg[0:59]
-                dseg[iyr, 60:366] = yrtmpseg[59:365]
-                dseg[iyr, 59] = np.nan
-            else:
-                dseg[iyr] = yrtmpseg
-    else:
-        if "360" in cal:
-            ndy = 360
-            ldy = 30
-        else:  # 365-canlendar
-            ndy = 365
-            ldy = 31
-        dseg = np.zeros((nyr, ndy, ntd, d.shape[1], d.shape[2]), dtype=float)
-        for iyr, year in enumerate(range(syr, eyr + 1)):
-            yrtmp = d.sel(
-                time=slice(
-                    str(year) + "-01-01 00:00:00",
-                    str(year) + "-12-" + str(ldy) + " 23:59:59",
-                )
-            )
-
-            expanded = yrtmp.expand_dims("ndy")
-            yrtmpseg = np.reshape(
-                expanded,
-                (int(yrtmp.shape[0] / ntd), ntd, yrtmp.shape[1], yrtmp.shape[2]),
-            )
-            dseg[iyr] = yrtmpseg
-
-    # Climatology
-    clim = np.nanmean(dseg, axis=0)
+    elif "360" in cal:
+        ndy = 360
+    else:  # 365-canlendar
+        ndy = 365
+
+    # Day of year x time of day index of each time step, from its position in its year
+    year = d[d.dims[0]].dt.year.values
+    years, ystart, ylen = np.unique(year, return_index=True, return_counts=True)
+    if years[0] != syr or years[-1] != eyr or len(years) != eyr - syr + 1:
+        sys.exit("ERROR: data of years " + str(syr) + "-" + str(eyr) + " are needed!")
+    iyr = np.searchsorted(years, year)
+    idx = np.arange(len(year)) - ystart[iyr]
+    if ndy == 366:
+        # Feb 29 is missing in years with 365 days
+        noleap = (ylen == 365 * ntd)[iyr]
+        idx[noleap & (idx >= 59 * ntd)] += ntd
+
+    # Time blocks no longer than a year hold each index at most once
+    nblk = int(ylen.min())
+    dnp = d.data
+    ncell = int(np.prod(d.shape[1:]))
+
+    # Climatology, with running sums of the years
+    csum = np.zeros((ndy * ntd, ncell), dtype=float)
+    cnum = np.zeros((ndy * ntd, ncell), dtype=int)
+    for it in range(0, d.shape[0], nblk):
+        blk = np.asarray(dnp[it : it + nblk], dtype=float).reshape(-1, ncell)
+        valid = ~np.isnan(blk)
+        csum[idx[it : it + nblk]] += np.where(valid, blk, 0)
+        cnum[idx[it : it + nblk]] += valid
+    with np.errstate(divide="ignore", invalid="ignore"):
+        clim = csum / cnum
 
     # Anomaly
-    anom = np.array([])
-    if "gregorian" in cal or "standard" in cal:
-        for iyr, year in enumerate(range(syr, eyr + 1)):
-            yrtmp = d.sel(
-                time=slice(
-                    str(year) + "-01-01 00:00:00",
-                    str(year) + "-12-" + str(ldy) + " 23:59:59",
-                )
-            )
-
-            if yrtmp.shape[0] == 365 * ntd:
-                anom = np.append(
-                    anom,
-                    (np.delete(dseg[iyr], 59, axis=0) - np.delete(clim, 59, axis=0)),
-                )
-            else:
-                anom = np.append(anom, (dseg[iyr] - clim))
+    if scratch_file is None:
+        anom = np.empty((d.shape[0], ncell), dtype=float)
     else:
-        for iyr, year in enumerate(range(syr, eyr + 1)):
-            anom = np.append(anom, (dseg[iyr] - clim))
+        anom = np.lib.format.open_memmap(
+            scratch_file, mode="w+", dtype=float, shape=(d.shape[0], ncell)
+        )
+    for it in range(0, d.shape[0], nblk):
+        blk = np.asarray(dnp[it : it + nblk], dtype=float).reshape(-1, ncell)
+        anom[it : it + nblk] = blk - clim[idx[it : it + nblk]]
 
     # Reahape and Dimension information
     clim = np.reshape(clim, (ndy * ntd, d.shape[1], d.shape[2]))
@@ -351,13 +328,14 @@ def ClimAnom(d, ntd, syr, eyr, cal):
 
 
 # ==================================================================================
-def Powerspectrum(d, nperseg, noverlap):
+def Powerspectrum(d, nperseg, noverlap, chunk_size=None):
     """
     Power spectrum (scipy.signal.welch)
     Input
     - d: xCDAT variable
     - nperseg: Length of each segment
     - noverlap: Length of overlap between segments
+    - chunk_size: Number of grid points processed at once (default: None, all grid points)
     Output
     - freqs: Sample frequencies
     - psd: Power spectra
@@ -365,32 +343,43 @@ def Powerspectrum(d, nperseg, noverlap):
     - sig95: 95% rednoise confidence level
     """
 
-    # Fill missing date using interpolation
-    dnp = np.array(d)
-    dfm = np.zeros((d.shape[0], d.shape[1], d.shape[2]), dtype=float)
-    for iy in range(d.shape[1]):
-        for ix in range(d.shape[2]):
-            yp = pd.Series(dnp[:, iy, ix])
-            ypfm = yp.interpolate(method="linear")
-            dfm[:, iy, ix] = np.array(ypfm)
-
-    # Calculate power spectrum
-    freqs, psd = signal.welch(
-        dfm, scaling="spectrum", nperseg=nperseg, noverlap=noverlap, axis=0
-    )
+    dnp = np.asarray(d)
+    ntime = dnp.shape[0]
+    dnp = dnp.reshape(ntime, -1)
+    ncell = dnp.shape[1]
+    if chunk_size is None:
+        chunk_size = max(ncell, 1)
 
     # Signigicance test of power spectra (from J. Lee's MOV code)
     nps = max(
-        np.floor(((dfm.shape[0] - nperseg) / (nperseg - noverlap)) + 1), 1
+        np.floor(((ntime - nperseg) / (nperseg - noverlap)) + 1), 1
     )  # Number of power spectra
-    rn = np.zeros((psd.shape[0], psd.shape[1], psd.shape[2]), np.float64)
-    sig95 = np.zeros((psd.shape[0], psd.shape[1], psd.shape[2]), np.float64)
-    for iy in range(psd.shape[1]):
-        for ix in range(psd.shape[2]):
-            r1 = np.array(lag1_autocorrelation(dfm[:, iy, ix]))
-            rn[:, iy, ix] = rednoise(psd[:, iy, ix], len(freqs), r1)
-            nu = 2 * nps
-            sig95[:, iy, ix] = RedNoiseSignificanceLevel(nu, rn[:, iy, ix])
+    nu = 2 * nps
+
+    for ic in range(0, ncell, chunk_size):
+        cells = slice(ic, min(ic + chunk_size, ncell))
+
+        # Fill missing date using interpolation
+        dfm = interpolate_missing(dnp[:, cells])
+
+        # Calculate power spectrum
+        freqs, psdc = signal.welch(
+            dfm, scaling="spectrum", nperseg=nperseg, noverlap=noverlap, axis=0
+        )
+        if ic == 0:
+            psd = np.zeros((len(freqs), ncell), psdc.dtype)
+            rn = np.zeros((len(freqs), ncell), np.float64)
+            sig95 = np.zeros((len(freqs), ncell), np.float64)
+        psd[:, cells] = psdc
+
+        r1 = lag1_autocorrelation_batch(dfm)
+        rn[:, cells] = rednoise_batch(psdc, len(freqs), r1)
+        sig95[:, cells] = RedNoiseSignificanceLevel(nu, rn[:, cells])
+
+    shape = (len(freqs),) + d.shape[1:]
+    psd = psd.reshape(shape)
+    rn = rn.reshape(shape)
+    sig95 = sig95.reshape(shape)
 
     # Decorate arrays with dimensions
     # axisfrq = np.arange(len(freqs))
@@ -406,6 +395,45 @@ def Powerspectrum(d, nperseg, noverlap):
     return freqs, psd, rn, sig95
 
 
+# ==================================================================================
+def interpolate_missing(x):
+    """
+    Linear interpolation of missing values along the first axis, as
+    pd.Series.interpolate(method="linear") applied to each grid point:
+    missing values after the last valid value get the last valid value, and
+    missing values before the first valid value stay missing.
+    Input
+    - x: array with time as the first axis
+    Output
+    - xfm: array with interpolated missing values
+    """
+    x = np.asarray(x)
+    xfm = np.array(x, dtype=float)
+    valid = ~np.isnan(xfm)
+    if valid.all():
+        return xfm
+
+    ntime = xfm.shape[0]
+    ind = np.arange(ntime).reshape((-1,) + (1,) * (xfm.ndim - 1))
+    # Previous and following valid time steps of each time step
+    iprev = np.maximum.accumulate(np.where(valid, ind, -1), axis=0)
+    inext = np.minimum.accumulate(np.where(valid, ind, ntime)[::-1], axis=0)[::-1]
+
+    fill = ~valid & (iprev >= 0)
+    inside = fill & (inext < ntime)
+    after = fill & ~inside
+    iprev = np.where(fill, iprev, 0)
+    inext = np.where(inside, inext, iprev + 1)
+    xprev = np.take_along_axis(xfm, iprev, axis=0)
+    xnext = np.take_along_axis(xfm, np.minimum(inext, ntime - 1), axis=0)
+    # same arithmetic as np.interp used by pandas, in the precision of the input
+    slope = (xnext - xprev) / (inext - iprev)
+    xint = slope * (ind - iprev) + xprev
+    xfm[inside] = xint[inside].astype(x.dtype)
+    xfm[after] = xprev[after]
+    return xfm
+
+
 # ==================================================================================
 def lag1_autocorrelation(x):
     lag = 1
@@ -413,6 +441,28 @@ def lag1_autocorrelation(x):
     return result
 
 
+# ==================================================================================
+def lag1_autocorrelation_batch(x):
+    """
+    Lag-1 autocorrelation of each grid point, as lag1_autocorrelation
+    Input
+    - x: array with dimensions (time, grid point)
+    Output
+    - r1: lag-1 autocorrelation of each grid point
+    """
+    lag = 1
+    x0 = x[:-lag] - np.mean(x[:-lag], axis=0)
+    x1 = x[lag:] - np.mean(x[lag:], axis=0)
+    # as np.corrcoef, from the covariance matrix
+    nm1 = x0.shape[0] - 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c01 = np.sum(x0 * x1, axis=0) / nm1
+        c00 = np.sum(x0 * x0, axis=0) / nm1
+        c11 = np.sum(x1 * x1, axis=0) / nm1
+        result = c01 / np.sqrt(c00) / np.sqrt(c11)
+    return np.clip(result, -1, 1)
+
+
 # ==================================================================================
 def rednoise(VAR, NUMHAR, R1):
     """
@@ -439,6 +489,29 @@ def rednoise(VAR, NUMHAR, R1):
     return RN
 
 
+# ==================================================================================
+def rednoise_batch(VAR, NUMHAR, R1):
+    """
+    Red noise spectra of all grid points, as rednoise
+    Input
+    - VAR    : array of spectral estimates, with dimensions (frequency, grid point)
+    - NUMHAR : number of harmonics
+    - R1     : lag correlation coefficient of each grid point
+    Output
+    - RN     : array of null rednoise estimates, with dimensions (frequency, grid point)
+    """
+    # cumsum adds the spectral estimates in the same order as sum in rednoise
+    WHITENOISE = np.cumsum(VAR, axis=0)[-1] / float(NUMHAR)
+    # CALCULATE "NULL" RED NOISE
+    R1X2 = 2.0 * R1
+    R12 = R1 * R1
+    TOP = 1.0 - R12
+    BOT = 1.0 + R12
+    COS = np.array([math.cos(math.pi * K / NUMHAR) for K in range(NUMHAR)])
+    RN = WHITENOISE * (TOP / (BOT - R1X2 * COS[:, np.newaxis]))
+    return RN
+
+
 # ==================================================================================
 def RedNoiseSignificanceLevel(nu, rn, p=0.050):
     """
@@ -26,6 +26,8 @@ regions_specs = param.regions_specs
 fshp = param.region_file
 feature = param.feature
 attr = param.attr
+chunk_size = param.chunk_size
+anom_scratch_file = param.anom_scratch_file
 print(modpath)
 print(mod)
 print(prd)
@@ -79,4 +81,6 @@ precip_variability_across_timescale(
     fshp,
     feature,
     attr,
+    chunk_size=chunk_size,
+    anom_scratch_file=anom_scratch_file,
 )
@@ -1,7 +1,9 @@
 import argparse
+import hashlib
 import json
 import os
 import warnings
+from collections import OrderedDict
 
 import matplotlib.lines as mlines
 import matplotlib.patches as mpatches
@@ -11,8 +13,9 @@ import pandas as pd
 import pyproj
 import xcdat as xc
 from matplotlib.colors import BoundaryNorm, ListedColormap
-from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
 
+from pcmdi_metrics.io.write_atomic import write_atomic
 from pcmdi_metrics.io.xcdat_dataset_io import get_calendar
 
 warnings.filterwarnings("ignore", message="invalid value encountered in divide")
@@ -46,6 +49,7 @@ def calc_iiee_annual_cycle(
     identifier=None,
     save_dir="output",
     debug=False,
+    cache_dir=None,
 ):
     """
     Compute the monthly climatological annual cycle of Integrated Ice-Edge Error
@@ -53,7 +57,9 @@ def calc_iiee_annual_cycle(
 
     The function subsets the input datasets to the requested time range, computes
     monthly climatologies, evaluates IIEE for each month, and optionally saves
-    monthly comparison plots plus a seasonal-cycle summary plot.
+    monthly comparison plots plus a seasonal-cycle summary plot. The grids are
+    projected and the model climatology is interpolated onto the observational
+    grid once for all months.
 
     Parameters
     ----------
@@ -81,6 +87,9 @@ def calc_iiee_annual_cycle(
         Default is ``"output"``.
     debug : bool, optional
         If ``True``, print additional diagnostic information. Default is ``False``.
+    cache_dir : str or None, optional
+        Directory of an on-disk cache of the model-to-observation nearest-neighbor
+        indices, reused by later runs on the same grids. Default is ``None``.
 
     Returns
     -------
@@ -148,6 +157,24 @@ def calc_iiee_annual_cycle(
 
     monthly_diagnostics = {}
 
+    # Interpolate all months of the model climatology onto the observational grid
+    projection = get_polar_equal_area_projection()
+    obs_x, obs_y = project_grid(
+        obs_monthly_clim, grid_label="obs", projection=projection
+    )
+    model_x, model_y = project_grid(
+        model_monthly_clim, grid_label="model", projection=projection
+    )
+    model_sic_on_obs_grid = interpolate_model_to_obs_grid(
+        model_sic=model_monthly_clim[model_data_var],
+        model_x=model_x,
+        model_y=model_y,
+        obs_x=obs_x,
+        obs_y=obs_y,
+        obs_status_flag=obs_monthly_clim["status_flag"],
+        cache_dir=cache_dir,
+    )
+
     # Calculate metrics per month
     for month_index in range(N_MONTHS):
         month = month_index + 1
@@ -158,6 +185,7 @@ def calc_iiee_annual_cycle(
             obs_data_var=obs_data_var,
             model_data_var=model_data_var,
             debug=debug,
+            model_sic_on_obs_grid=model_sic_on_obs_grid[month_index],
         )
 
         result["metrics"][month] = metrics
@@ -212,6 +240,8 @@ def calc_iiee(
     obs_data_var="ice_conc",
     model_data_var="siconc",
     debug=False,
+    model_sic_on_obs_grid=None,
+    cache_dir=None,
 ):
     """
     Calculate Integrated Ice-Edge Error (IIEE) for a single monthly field.
@@ -229,6 +259,12 @@ def calc_iiee(
         Name of the model sea ice concentration variable.
     debug : bool, optional
         If ``True``, print scalar diagnostic values.
+    model_sic_on_obs_grid : np.ndarray or None, optional
+        Model sea ice concentration already interpolated onto the observational
+        grid (see :func:`interpolate_model_to_obs_grid`). If ``None``, it is
+        interpolated here.
+    cache_dir : str or None, optional
+        Directory of an on-disk cache of nearest-neighbor indices.
 
     Returns
     -------
@@ -238,34 +274,36 @@ def calc_iiee(
     # Quick quality control
     validate_monthly_inputs(obs_data, model_data, obs_data_var, model_data_var)
 
-    # CONVERTING coordinates onto OSI SAF grid in meters centered at the North Pole
-    # Define the Lambert Azimuthal Equal-Area (laea) projection centered at the North Pole
-    # This coordinate is used in OSI SAF data
-    projection = get_polar_equal_area_projection()
-
-    # Conversion of satellite coordinates from degrees to meters centered at the North Pole
-    obs_x, obs_y = project_grid(obs_data, grid_label="obs", projection=projection)
-
-    # Conversion of model latitude and longitude to meters centered at the North Pole
-    model_x, model_y = project_grid(
-        model_data, grid_label="model", projection=projection
-    )
-
     obs_sic = obs_data[obs_data_var]
     obs_status_flag = obs_data["status_flag"]
     model_sic = model_data[model_data_var]
 
     check_sic_units(obs_sic, model_sic)
 
-    # INTERPOLATING model data onto observational data grid (i.e., laea projection)
-    model_sic_on_obs_grid = interpolate_model_to_obs_grid(
-        model_sic=model_sic,
-        model_x=model_x,
-        model_y=model_y,
-        obs_x=obs_x,
-        obs_y=obs_y,
-        obs_status_flag=obs_status_flag,
-    )
+    if model_sic_on_obs_grid is None:
+        # CONVERTING coordinates onto OSI SAF grid in meters centered at the North Pole
+        # Define the Lambert Azimuthal Equal-Area (laea) projection centered at the North Pole
+        # This coordinate is used in OSI SAF data
+        projection = get_polar_equal_area_projection()
+
+        # Conversion of satellite coordinates from degrees to meters centered at the North Pole
+        obs_x, obs_y = project_grid(obs_data, grid_label="obs", projection=projection)
+
+        # Conversion of model latitude and longitude to meters centered at the North Pole
+        model_x, model_y = project_grid(
+            model_data, grid_label="model", projection=projection
+        )
+
+        # INTERPOLATING model data onto observational data grid (i.e., laea projection)
+        model_sic_on_obs_grid = interpolate_model_to_obs_grid(
+            model_sic=model_sic,
+            model_x=model_x,
+            model_y=model_y,
+            obs_x=obs_x,
+            obs_y=obs_y,
+            obs_status_flag=obs_status_flag,
+            cache_dir=cache_dir,
+        )
 
     # IIEE CALCULATION
     metrics, diagnostics = compute_iiee_metrics_and_diagnostics(
@@ -439,43 +477,155 @@ def interpolate_model_to_obs_grid(
     obs_x,
     obs_y,
     obs_status_flag,
+    cache_dir=None,
 ):
     """
     Interpolate model sea ice concentration onto the observational grid.
 
+    The nearest model ocean point of each observational point is looked up once
+    per model grid, observational grid and model ocean mask (see
+    :func:`get_nearest_model_index`), and all fields sharing them are
+    interpolated with a single gather.
+
     Parameters
     ----------
     model_sic : xarray.DataArray
-        Model sea ice concentration field.
+        Model sea ice concentration field, optionally with leading dimensions
+        (e.g., time) before the grid dimensions.
     model_x, model_y : np.ndarray
         Projected model grid coordinates.
     obs_x, obs_y : np.ndarray
         Projected observational grid coordinates.
     obs_status_flag : xarray.DataArray
         Observational status flag used to mask land points.
+    cache_dir : str or None, optional
+        Directory of an on-disk cache of nearest-neighbor indices. Default is
+        ``None`` (in-memory cache only).
 
     Returns
     -------
     np.ndarray
-        Model sea ice concentration on the observational grid.
+        Model sea ice concentration on the observational grid, with the
+        leading dimensions of ``model_sic``.
     """
-    model_points_xy = np.column_stack((model_x.ravel(), model_y.ravel()))
-    model_sic_1d = model_sic.values.ravel()
-    model_ocean_mask = ~np.isnan(model_sic_1d)
+    model_sic_values = np.asarray(model_sic.values)
+    leading_shape = model_sic_values.shape[: model_sic_values.ndim - model_x.ndim]
+    model_sic_2d = model_sic_values.reshape(-1, model_x.size)
+    model_ocean_masks = ~np.isnan(model_sic_2d)
 
-    obs_points_xy = np.column_stack((obs_x.ravel(), obs_y.ravel()))
     obs_status_flag_1d = obs_status_flag.values.ravel()
 
     # the model input data are interpolated onto the observational data grid
-    model_sic_interpolated_1d = griddata(
-        model_points_xy[model_ocean_mask],
-        model_sic_1d[model_ocean_mask],
-        obs_points_xy,
-        method="nearest",
-    )
+    model_sic_interpolated = np.full((len(model_sic_2d), obs_x.size), np.nan)
+    ocean_masks, mask_index = np.unique(model_ocean_masks, axis=0, return_inverse=True)
+    for k, model_ocean_mask in enumerate(ocean_masks):
+        fields = np.flatnonzero(mask_index.ravel() == k)
+        nearest_index = get_nearest_model_index(
+            model_x, model_y, obs_x, obs_y, model_ocean_mask, cache_dir=cache_dir
+        )
+        found = nearest_index >= 0
+        model_sic_interpolated[np.ix_(fields, found)] = model_sic_2d[
+            np.ix_(fields, nearest_index[found])
+        ]
+
+    model_sic_interpolated[:, obs_status_flag_1d == 1] = np.nan
+    return model_sic_interpolated.reshape(leading_shape + obs_x.shape)
+
 
-    model_sic_interpolated_1d[obs_status_flag_1d == 1] = np.nan
-    return model_sic_interpolated_1d.reshape(obs_x.shape)
+_NEAREST_INDEX_CACHE = OrderedDict()
+MAX_NEAREST_INDEX_CACHE = 8
+
+
+def get_nearest_model_index(
+    model_x, model_y, obs_x, obs_y, model_ocean_mask, cache_dir=None
+):
+    """
+    Index of the nearest model ocean point of each observational point.
+
+    This is the neighbor that ``scipy.interpolate.griddata(method="nearest")``
+    picks. Indices are kept in a process-wide cache (the last
+    ``MAX_NEAREST_INDEX_CACHE`` grids) and, if ``cache_dir`` is given, on disk,
+    both keyed by a hash of the grids and the ocean mask, so that all months
+    and realizations of a model on the same grid reuse them.
+
+    Parameters
+    ----------
+    model_x, model_y : np.ndarray
+        Projected model grid coordinates.
+    obs_x, obs_y : np.ndarray
+        Projected observational grid coordinates.
+    model_ocean_mask : np.ndarray
+        Boolean mask of the model ocean points, same size as ``model_x``.
+    cache_dir : str or None, optional
+        Directory of the on-disk cache. Default is ``None``.
+
+    Returns
+    -------
+    np.ndarray
+        Indices into the flattened model grid, one per observational point.
+        Observational points without neighbor (e.g., NaN coordinates) get -1.
+    """
+    model_ocean_mask = np.asarray(model_ocean_mask, dtype=bool).ravel()
+
+    md5 = hashlib.md5()
+    for values in (model_x, model_y, obs_x, obs_y):
+        md5.update(str(np.shape(values)).encode())
+        md5.update(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    md5.update(np.packbits(model_ocean_mask).tobytes())
+    key = md5.hexdigest()
+
+    if key in _NEAREST_INDEX_CACHE:
+        _NEAREST_INDEX_CACHE.move_to_end(key)
+        return _NEAREST_INDEX_CACHE[key]
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, f"iiee_nearest_index_{key}.npy")
+
+    if cache_file is not None and os.path.isfile(cache_file):
+        nearest_index = np.load(cache_file)
+    else:
+        nearest_index = _find_nearest_model_index(
+            model_x, model_y, obs_x, obs_y, model_ocean_mask
+        )
+        if cache_file is not None:
+            write_atomic(
+                cache_file,
+                lambda tmp: _save_npy(nearest_index, tmp),
+                "nearest-neighbor index cache",
+            )
+
+    nearest_index.flags.writeable = False
+    _NEAREST_INDEX_CACHE[key] = nearest_index
+    while len(_NEAREST_INDEX_CACHE) > MAX_NEAREST_INDEX_CACHE:
+        _NEAREST_INDEX_CACHE.popitem(last=False)
+    return nearest_index
+
+
+def clear_nearest_index_cache():
+    """Remove all nearest-neighbor indices from the process-wide cache."""
+    _NEAREST_INDEX_CACHE.clear()
+
+
+def _find_nearest_model_index(model_x, model_y, obs_x, obs_y, model_ocean_mask):
+    model_points_xy = np.column_stack((model_x.ravel(), model_y.ravel()))
+    obs_points_xy = np.column_stack((obs_x.ravel(), obs_y.ravel()))
+    ocean_index = np.flatnonzero(model_ocean_mask)
+
+    # same tree and query as griddata(method="nearest")
+    tree = cKDTree(model_points_xy[ocean_index])
+    distance, nearest = tree.query(obs_points_xy)
+
+    found = np.isfinite(distance)
+    nearest_index = np.full(len(obs_points_xy), -1, dtype=np.int64)
+    nearest_index[found] = ocean_index[nearest[found]]
+    return nearest_index
+
+
+def _save_npy(array, path):
+    # np.save appends .npy to file names without it, so write through a file object
+    with open(path, "wb") as f:
+        np.save(f, array)
 
 
 def compute_iiee_metrics_and_diagnostics(
@@ -1104,6 +1254,11 @@ def parse_args():
     parser.add_argument(
         "--debug", action="store_true", help="Print extra diagnostic output."
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory of a cache of model-to-observation nearest-neighbor indices.",
+    )
     return parser.parse_args()
 
 
@@ -1161,6 +1316,7 @@ def main():
         eyear=args.eyear,
         save_dir=args.save_dir,
         debug=args.debug,
+        cache_dir=args.cache_dir,
     )
 
     result["metadata"].update(
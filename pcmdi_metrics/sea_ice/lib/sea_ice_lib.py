@@ -243,18 +243,82 @@ def process_by_region(ds, ds_var, ds_area, pole):
     regions_list = ["arctic", "antarctic", "ca", "na", "np", "sa", "sp", "io"]
     clims = {}
     means = {}
+    # All regional extents are computed in one pass over the data
+    extents = get_region_extents(ds, ds_var, ds_area, pole, regions_list)
     for region in regions_list:
-        xvar = find_lon(ds)
-        yvar = find_lat(ds)
-        data = choose_region(region, ds, ds_var, xvar, yvar, pole)
-        total_extent, te_mean = get_total_extent(data, ds_area)
+        total_extent = extents.sel(region=region, drop=True)
+        te_mean = total_extent.mean("time", skipna=True).data.item()
         clim = get_clim(total_extent, ds_var, ds)
         clims[region] = clim
         means[region] = te_mean
-        del data
     return clims, means
 
 
+def get_region_labels(ds, ds_var, pole, regions_list):
+    # Label each grid cell by the set of regions it belongs to.
+    # Returns the labels over the spatial dimensions (coord_i, coord_j)
+    # and a (labels, regions) boolean array of the regions of each label.
+    xvar = find_lon(ds)
+    yvar = find_lat(ds)
+    coord_i, coord_j = get_xy_coords(ds, xvar)
+    grid = ds[[ds_var]]
+    if "time" in grid.dims:
+        grid = grid.isel({"time": 0})
+    grid[ds_var] = xr.ones_like(grid[ds_var])
+    code = 0
+    for bit, region in enumerate(regions_list):
+        in_region = choose_region(region, grid, ds_var, xvar, yvar, pole) > 0
+        code = code + in_region.astype(np.int64) * 2**bit
+    code = np.asarray(code.transpose(coord_i, coord_j))
+    codes, labels = np.unique(code, return_inverse=True)
+    region_of_label = (codes[:, None] >> np.arange(len(regions_list))) & 1 == 1
+    return labels.reshape(code.shape), region_of_label
+
+
+def get_region_extents(ds, ds_var, ds_area, pole, regions_list):
+    # Same extents as get_total_extent(choose_region(region, ...), ds_area)
+    # for every region, as a (time, region) DataArray. The weighted field is
+    # reduced by region label in a single pass, chunk by chunk for dask data.
+    data = ds[ds_var]
+    coord_i, coord_j = get_xy_coords(ds, find_lon(ds))
+    labels, region_of_label = get_region_labels(ds, ds_var, pole, regions_list)
+    weighted = data.where(data > 0.15) * ds_area
+    extents = xr.apply_ufunc(
+        _sum_by_label,
+        weighted,
+        input_core_dims=[[coord_i, coord_j]],
+        output_core_dims=[["region"]],
+        kwargs={"labels": labels, "region_of_label": region_of_label},
+        dask="parallelized",
+        output_dtypes=[np.float64],
+        dask_gufunc_kwargs={
+            "output_sizes": {"region": len(regions_list)},
+            "allow_rechunk": True,
+        },
+    )
+    extents = extents.assign_coords(region=regions_list)
+    if isinstance(extents.data, dask.array.core.Array):
+        extents = extents.compute()
+    return extents
+
+
+def _sum_by_label(values, labels, region_of_label):
+    # Sum values over their last two axes by label (skipping nan), then
+    # add up the labels of each region
+    values = values.reshape(values.shape[:-2] + (-1,))
+    flat = values.reshape(-1, values.shape[-1])
+    labels = labels.ravel()
+    n_labels = len(region_of_label)
+    nt = len(flat)
+    sums = np.bincount(
+        (np.arange(nt)[:, None] * n_labels + labels).ravel(),
+        weights=np.nan_to_num(flat).ravel(),
+        minlength=nt * n_labels,
+    ).reshape(nt, n_labels)
+    extents = sums @ region_of_label.astype(np.float64)
+    return extents.reshape(values.shape[:-1] + (region_of_label.shape[1],))
+
+
 def get_area(data, ds_area):
     xvar = find_lon(data)
     coord_i, coord_j = get_xy_coords(data, xvar)
@@ -1,3 +1,18 @@
+from .compute_statistics_array import (
+    bias_xy_array,
+    bias_xyt_array,
+    cor_xy_array,
+    get_time_weights,
+    mean_xy_array,
+    mean_xyt_array,
+    meanabs_xy_array,
+    meanabs_xyt_array,
+    rms_xy_array,
+    rms_xyt_array,
+    rmsc_xy_array,
+    std_xy_array,
+    std_xyt_array,
+)
 from .compute_statistics_dataArray import (
     calculate_spatial_correlation,
     calculate_temporal_correlation,
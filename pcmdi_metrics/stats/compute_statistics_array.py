@@ -0,0 +1,224 @@
+"""
+Array-mode statistics.
+
+These functions take plain NumPy arrays (or DataArrays, used through their values) and
+precomputed weights. They never modify their inputs and only allocate the temporaries
+of the reductions. Spatial statistics reduce over the trailing axes of the data that
+match the shape of the weights (e.g., (lat, lon)), and return a float for 2-D fields
+or an array over the leading axes otherwise. Missing values (NaN) are skipped, as in
+``xarray``'s weighted mean.
+
+The Dataset functions in :mod:`pcmdi_metrics.stats.compute_statistics_dataset` are
+wrappers around them.
+"""
+
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.io import get_time_bounds
+
+
+def mean_xy_array(d, weights):
+    """Weighted spatial mean, skipping missing values.
+
+    Args:
+        d (np.ndarray): Data, with the spatial axes last
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+    """
+    d = np.asarray(d)
+    weights = np.asarray(weights)
+    axes = tuple(range(d.ndim - weights.ndim, d.ndim))
+    valid = np.isfinite(d)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stat = (np.where(valid, d, 0.0) * weights).sum(axis=axes) / (
+            valid * weights
+        ).sum(axis=axes)
+    return _to_float(stat)
+
+
+def std_xy_array(d, weights):
+    """Weighted spatial standard deviation, skipping missing values.
+
+    Args:
+        d (np.ndarray): Data, with the spatial axes last
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+    """
+    d = np.asarray(d)
+    average = _expand(mean_xy_array(d, weights), np.ndim(weights))
+    return _to_float(np.sqrt(mean_xy_array((d - average) ** 2, weights)))
+
+
+def bias_xy_array(dm, do, weights):
+    """Weighted spatial mean of dm - do over cells where both are valid.
+
+    Args:
+        dm (np.ndarray): Model data, with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+    """
+    return mean_xy_array(np.subtract(dm, do), weights)
+
+
+def meanabs_xy_array(dm, do, weights):
+    """Weighted spatial mean absolute difference over cells where both are valid.
+
+    Args:
+        dm (np.ndarray): Model data, with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+    """
+    return mean_xy_array(np.abs(np.subtract(dm, do)), weights)
+
+
+def rms_xy_array(dm, do, weights, centered=False):
+    """Weighted spatial root-mean-square difference over cells where both are valid.
+
+    Args:
+        dm (np.ndarray): Model data, with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        centered (bool, optional): If True, remove the spatial mean of each field (over
+            its own valid cells) first. Defaults to False.
+    """
+    dif = np.subtract(dm, do)
+    if centered:
+        ndim = np.ndim(weights)
+        dif = dif - (
+            _expand(mean_xy_array(dm, weights), ndim)
+            - _expand(mean_xy_array(do, weights), ndim)
+        )
+    return _to_float(np.sqrt(mean_xy_array(dif**2, weights)))
+
+
+def rmsc_xy_array(dm, do, weights, normalize_by_own_stdv=False):
+    """Weighted spatial centered root-mean-square difference over cells where both are valid.
+
+    Args:
+        dm (np.ndarray): Model data, with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        normalize_by_own_stdv (bool, optional): If True, divide each field by its own
+            spatial standard deviation first. Defaults to False.
+    """
+    dm, do, weights = _jointly_valid(dm, do, weights)
+    if normalize_by_own_stdv:
+        ndim = weights.ndim
+        dm = dm / _expand(std_xy_array(dm, weights), ndim)
+        do = do / _expand(std_xy_array(do, weights), ndim)
+    return rms_xy_array(dm, do, weights, centered=True)
+
+
+def cor_xy_array(dm, do, weights):
+    """Weighted spatial pattern correlation over cells where both are valid.
+
+    Args:
+        dm (np.ndarray): Model data, with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+    """
+    dm, do, weights = _jointly_valid(dm, do, weights)
+    ndim = weights.ndim
+    dm_anom = dm - _expand(mean_xy_array(dm, weights), ndim)
+    do_anom = do - _expand(mean_xy_array(do, weights), ndim)
+    covariance = mean_xy_array(dm_anom * do_anom, weights)
+    return _to_float(
+        covariance / (std_xy_array(dm, weights) * std_xy_array(do, weights))
+    )
+
+
+def mean_xyt_array(d, weights, time_weights):
+    """Time mean of weighted spatial means, skipping missing values.
+
+    Args:
+        d (np.ndarray): Data of shape (time, ...), with the spatial axes last
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        time_weights (np.ndarray): Weight of each time step, e.g., from :func:`get_time_weights`
+    """
+    return mean_xy_array(mean_xy_array(d, weights), time_weights)
+
+
+def bias_xyt_array(dm, do, weights, time_weights):
+    """Space-time mean of dm - do.
+
+    Args:
+        dm (np.ndarray): Model data of shape (time, ...), with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        time_weights (np.ndarray): Weight of each time step
+    """
+    return mean_xyt_array(np.subtract(dm, do), weights, time_weights)
+
+
+def meanabs_xyt_array(dm, do, weights, time_weights):
+    """Space-time mean absolute difference.
+
+    Args:
+        dm (np.ndarray): Model data of shape (time, ...), with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        time_weights (np.ndarray): Weight of each time step
+    """
+    return mean_xyt_array(np.abs(np.subtract(dm, do)), weights, time_weights)
+
+
+def rms_xyt_array(dm, do, weights, time_weights):
+    """Time mean of the spatial root-mean-square differences.
+
+    Args:
+        dm (np.ndarray): Model data of shape (time, ...), with the spatial axes last
+        do (np.ndarray): Reference data, same shape as dm
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        time_weights (np.ndarray): Weight of each time step
+    """
+    rms_t = np.sqrt(mean_xy_array(np.subtract(dm, do) ** 2, weights))
+    return mean_xy_array(rms_t, time_weights)
+
+
+def std_xyt_array(d, weights, time_weights):
+    """Space-time standard deviation.
+
+    Args:
+        d (np.ndarray): Data of shape (time, ...), with the spatial axes last
+        weights (np.ndarray): Spatial weights, with the shape of the spatial axes
+        time_weights (np.ndarray): Weight of each time step
+    """
+    average = mean_xyt_array(d, weights, time_weights)
+    variance = mean_xyt_array((np.asarray(d) - average) ** 2, weights, time_weights)
+    return _to_float(np.sqrt(variance))
+
+
+def get_time_weights(ds: xr.Dataset) -> np.ndarray:
+    """
+    Get the time weights (length of each time interval) used by ``temporal.average``.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        Dataset with time bounds.
+
+    Returns
+    -------
+    np.ndarray
+        Length of each time step from its bounds, in nanoseconds.
+    """
+    time_bounds = get_time_bounds(ds)
+    lengths = np.asarray(time_bounds[:, 1].values - time_bounds[:, 0].values)
+    return lengths.astype("timedelta64[ns]").astype(np.float64)
+
+
+def _jointly_valid(dm, do, weights):
+    """Mask each field where the other is missing, and set those weights to zero."""
+    dm = np.asarray(dm)
+    do = np.asarray(do)
+    valid = np.isfinite(dm) & np.isfinite(do)
+    weights = np.where(valid, weights, 0.0)
+    return np.where(valid, dm, np.nan), np.where(valid, do, np.nan), weights
+
+
+def _expand(stat, ndim):
+    """Append `ndim` axes to a statistic so that it broadcasts against the data."""
+    return np.reshape(stat, np.shape(stat) + (1,) * ndim)
+
+
+def _to_float(stat):
+    return float(stat) if np.ndim(stat) == 0 else stat
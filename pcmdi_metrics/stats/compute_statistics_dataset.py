@@ -1,16 +1,33 @@
-import math
 from typing import Union
 
 import numpy as np
 import xarray as xr
 import xcdat as xc
 
+from pcmdi_metrics.io import get_time_key
+from pcmdi_metrics.utils import get_spatial_weights
+
+from .compute_statistics_array import (
+    bias_xy_array,
+    bias_xyt_array,
+    cor_xy_array,
+    get_time_weights,
+    mean_xy_array,
+    meanabs_xy_array,
+    meanabs_xyt_array,
+    rms_xy_array,
+    rms_xyt_array,
+    rmsc_xy_array,
+    std_xy_array,
+    std_xyt_array,
+)
+
 
 def da_to_ds(d: Union[xr.Dataset, xr.DataArray], var: str = "variable"):
     if isinstance(d, xr.Dataset):
-        return d.copy()
+        return d
     elif isinstance(d, xr.DataArray):
-        return d.to_dataset(name=var).bounds.add_missing_bounds().copy()
+        return d.to_dataset(name=var).bounds.add_missing_bounds()
     else:
         raise TypeError(
             "Input must be an instance of either xarrary.DataArray or xarrary.Dataset"
@@ -64,7 +81,7 @@ def seasonal_mean(d, season, var="variable"):
         + d.isel(time=indx[2])[var] * mo_wts[indx[2]]
     ) / season_num_days
 
-    ds_new = d.isel(time=0).copy(deep=True)
+    ds_new = d.isel(time=0).copy()
     ds_new[var] = d_season
 
     return ds_new
@@ -82,15 +99,8 @@ def bias_xy(dm, do, var="variable", weights=None):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    dif = dm[var] - do[var]
-    if weights is None:
-        weights = dm.spatial.get_weights(axis=["X", "Y"])
-    # stat = float(dif.weighted(weights).mean(("lon", "lat")))
-    stat = mean_xy(dif, weights=weights)
-    return float(stat)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return bias_xy_array(dm, do, weights)
 
 
 def bias_xyt(dm, do, var="variable"):
@@ -102,15 +112,8 @@ def bias_xyt(dm, do, var="variable"):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    ds = dm.copy(deep=True)
-    ds["dif"] = dm[var] - do[var]
-    stat = (
-        ds.spatial.average("dif", axis=["X", "Y"]).temporal.average("dif")["dif"].values
-    )
-    return float(stat)
+    dm, do, weights, time_weights = _to_arrays_xyt(dm, do, var)
+    return bias_xyt_array(dm, do, weights, time_weights)
 
 
 def cor_xy(dm, do, var="variable", weights=None):
@@ -122,32 +125,8 @@ def cor_xy(dm, do, var="variable", weights=None):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    valid = dm[var].notnull() & do[var].notnull()
-    dm[var] = dm[var].where(valid)
-    do[var] = do[var].where(valid)
-
-    if weights is None:
-        weights = dm.spatial.get_weights(axis=["X", "Y"])
-
-    weights = weights.where(valid).fillna(0)
-
-    dm_avg = dm.spatial.average(var, axis=["X", "Y"], weights=weights)[var].values
-    do_avg = do.spatial.average(var, axis=["X", "Y"], weights=weights)[var].values
-
-    covariance = (
-        ((dm[var] - dm_avg) * (do[var] - do_avg))
-        .weighted(weights)
-        .mean(dim=["lon", "lat"])
-        .values
-    )
-    std_dm = std_xy(dm, var)
-    std_do = std_xy(do, var)
-    stat = covariance / (std_dm * std_do)
-
-    return float(stat)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return cor_xy_array(dm, do, weights)
 
 
 def mean_xy(d, var="variable", weights=None):
@@ -159,15 +138,8 @@ def mean_xy(d, var="variable", weights=None):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    d = da_to_ds(d, var)
-
-    lat_key = xc.axis.get_dim_keys(d, axis="Y")
-    lon_key = xc.axis.get_dim_keys(d, axis="X")
-
-    if weights is None:
-        weights = d.spatial.get_weights(axis=["X", "Y"])
-    stat = d[var].weighted(weights).mean((lat_key, lon_key))
-    return float(stat)
+    d, weights = _to_array(d, var, weights)
+    return mean_xy_array(d, weights)
 
 
 def meanabs_xy(dm, do, var="variable", weights=None):
@@ -180,17 +152,8 @@ def meanabs_xy(dm, do, var="variable", weights=None):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    if weights is None:
-        weights = dm.spatial.get_weights(axis=["X", "Y"])
-
-    dif = abs(dm[var] - do[var])
-    stat = dif.weighted(weights).mean(("lon", "lat"))
-
-    del dif
-    return float(stat)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return meanabs_xy_array(dm, do, weights)
 
 
 def meanabs_xyt(dm, do, var="variable"):
@@ -203,19 +166,8 @@ def meanabs_xyt(dm, do, var="variable"):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    ds = dm.copy(deep=True)
-    ds["absdif"] = abs(dm[var] - do[var])
-    stat = (
-        ds.spatial.average("absdif", axis=["X", "Y"])
-        .temporal.average("absdif")["absdif"]
-        .values
-    )
-
-    del ds
-    return float(stat)
+    dm, do, weights, time_weights = _to_arrays_xyt(dm, do, var)
+    return meanabs_xyt_array(dm, do, weights, time_weights)
 
 
 def rms_0(dm, do, var="variable", weighted=True):
@@ -228,15 +180,12 @@ def rms_0(dm, do, var="variable", weighted=True):
         }
 
     dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    dif_square = (dm[var] - do[var]) ** 2
     if weighted:
-        weights = dm.spatial.get_weights(axis=["Y"])
-        stat = math.sqrt(dif_square.weighted(weights).mean(("lat")))
+        weights = get_spatial_weights(dm, axis=["Y"])
     else:
-        stat = math.sqrt(dif_square.mean(("lat")))
-    return float(stat)
+        weights = xr.ones_like(dm[xc.axis.get_dim_keys(dm, axis="Y")], dtype=float)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return rms_xy_array(dm, do, weights)
 
 
 def rms_xy(dm, do, var="variable", weights=None, centered=False):
@@ -257,30 +206,8 @@ def rms_xy(dm, do, var="variable", weights=None, centered=False):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    if isinstance(dm, xr.DataArray):
-        dm = da_to_ds(dm, var)
-
-    if isinstance(do, xr.DataArray):
-        do = da_to_ds(do, var)
-
-    if weights is None:
-        weights = dm.spatial.get_weights(axis=["X", "Y"])
-
-    dm_tmp = dm.copy()
-    do_tmp = do.copy()
-
-    if centered:
-        dm_tmp[var] = dm[var] - mean_xy(dm, var=var, weights=weights)
-        do_tmp[var] = do[var] - mean_xy(do, var=var, weights=weights)
-
-    dif_square = (dm_tmp[var] - do_tmp[var]) ** 2
-
-    stat = math.sqrt(mean_xy(dif_square, var=var, weights=weights))
-
-    del dm_tmp
-    del do_tmp
-
-    return float(stat)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return rms_xy_array(dm, do, weights, centered=centered)
 
 
 def rms_xyt(dm, do, var="variable"):
@@ -292,18 +219,8 @@ def rms_xyt(dm, do, var="variable"):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    dm = da_to_ds(dm, var)
-    do = da_to_ds(do, var)
-
-    ds = dm.copy(deep=True)
-    ds["diff_square"] = (dm[var] - do[var]) ** 2
-    ds["diff_square_sqrt"] = np.sqrt(
-        ds.spatial.average("diff_square", axis=["X", "Y"])["diff_square"]
-    )
-    stat = ds.temporal.average("diff_square_sqrt")["diff_square_sqrt"].values
-
-    del ds
-    return float(stat)
+    dm, do, weights, time_weights = _to_arrays_xyt(dm, do, var)
+    return rms_xyt_array(dm, do, weights, time_weights)
 
 
 def rmsc_xy(dm, do, var="variable", weights=None, NormalizeByOwnSTDV=False):
@@ -324,33 +241,8 @@ def rmsc_xy(dm, do, var="variable", weights=None, NormalizeByOwnSTDV=False):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    if isinstance(dm, xr.DataArray):
-        dm = da_to_ds(dm, var)
-
-    if isinstance(do, xr.DataArray):
-        do = da_to_ds(do, var)
-
-    valid = dm[var].notnull() & do[var].notnull()
-    dm[var] = dm[var].where(valid)
-    do[var] = do[var].where(valid)
-
-    if weights is None:
-        weights = dm.spatial.get_weights(axis=["X", "Y"])
-    weights = weights.where(valid).fillna(0)
-
-    dm_tmp = dm.copy()
-    do_tmp = do.copy()
-
-    if NormalizeByOwnSTDV:
-        dm_tmp[var] = dm[var] / std_xy(dm, var=var, weights=weights)
-        do_tmp[var] = do[var] / std_xy(do, var=var, weights=weights)
-
-    stat = rms_xy(dm_tmp, do_tmp, var=var, weights=weights, centered=True)
-
-    del dm_tmp
-    del do_tmp
-
-    return float(stat)
+    dm, do, weights = _to_arrays(dm, do, var, weights)
+    return rmsc_xy_array(dm, do, weights, normalize_by_own_stdv=NormalizeByOwnSTDV)
 
 
 def std_xy(ds, var="variable", weights=None):
@@ -362,19 +254,8 @@ def std_xy(ds, var="variable", weights=None):
             "Contact": "pcmdi-metrics@llnl.gov",
         }
 
-    ds = da_to_ds(ds, var)
-
-    if weights is None:
-        weights = ds.spatial.get_weights(axis=["X", "Y"])
-
-    lat_key = xc.axis.get_dim_keys(ds, axis="Y")
-    lon_key = xc.axis.get_dim_keys(ds, axis="X")
-
-    average = float(ds[var].weighted(weights).mean((lat_key, lon_key)))
-    anomaly = (ds[var] - average) ** 2
-    variance = float(anomaly.weighted(weights).mean((lat_key, lon_key)))
-    std = math.sqrt(variance)
-    return float(std)
+    ds, weights = _to_array(ds, var, weights)
+    return std_xy_array(ds, weights)
 
 
 def std_xyt(d, var="variable"):
@@ -385,15 +266,11 @@ def std_xyt(d, var="variable"):
             "Abstract": "Compute Space-Time Standard Deviation",
             "Contact": "pcmdi-metrics@llnl.gov",
         }
-    ds = d.copy(deep=True)
-    ds = da_to_ds(ds, var)
-    average = d.spatial.average(var, axis=["X", "Y"]).temporal.average(var)[var]
-    ds["anomaly"] = (d[var] - average) ** 2
-    variance = (
-        ds.spatial.average("anomaly").temporal.average("anomaly")["anomaly"].values
-    )
-    std = math.sqrt(variance)
-    return std
+
+    d = da_to_ds(d, var)
+    time_weights = get_time_weights(d)
+    d, weights = _to_array(d, var, None, time_key=get_time_key(d))
+    return std_xyt_array(d, weights, time_weights)
 
 
 def zonal_mean(dm, do, var="variable"):
@@ -412,3 +289,41 @@ def zonal_mean(dm, do, var="variable"):
     do_zm = do.spatial.average(var, axis=["X"])
 
     return dm_zm, do_zm  # DataSets
+
+
+def _to_array(d, var, weights, time_key=None):
+    """Values of the data and the weights, with the weight dimensions last.
+
+    The data are not copied unless they have to be transposed. Default weights are the
+    area weights of the grid of `d`.
+    """
+    if weights is None:
+        d = da_to_ds(d, var)
+        weights = get_spatial_weights(d)
+    return _values(d, var, weights.dims, time_key), np.asarray(weights.values)
+
+
+def _to_arrays(dm, do, var, weights, time_key=None):
+    """Values of two fields on the same grid and of the weights (default: grid of `dm`)"""
+    if weights is None:
+        dm = da_to_ds(dm, var)
+        weights = get_spatial_weights(dm)
+    return (
+        _values(dm, var, weights.dims, time_key),
+        _values(do, var, weights.dims, time_key),
+        np.asarray(weights.values),
+    )
+
+
+def _to_arrays_xyt(dm, do, var):
+    """Values of two time series of fields, the area weights, and the time weights"""
+    dm = da_to_ds(dm, var)
+    time_weights = get_time_weights(dm)
+    dm, do, weights = _to_arrays(dm, do, var, None, time_key=get_time_key(dm))
+    return dm, do, weights, time_weights
+
+
+def _values(d, var, dims, time_key=None):
+    da = d[var] if isinstance(d, xr.Dataset) else d
+    leading = [time_key] if time_key is not None else []
+    return da.transpose(*leading, ..., *dims).values
@@ -19,7 +19,9 @@ from .download import download_files_from_github
 from .grid import (
     calculate_area_weights,
     calculate_grid_area,
+    clear_grid_cache,
     create_target_grid,
+    get_spatial_weights,
     regrid,
 )
 from .land_sea_mask import apply_landmask, apply_oceanmask, create_land_sea_mask
@@ -31,7 +33,9 @@ from .qc import (
     last_day_of_month,
     repeating_months,
 )
+from .regridder_cache import clear_regridder_cache, get_regridder
 from .sort_human import sort_human
 from .string_constructor import StringConstructor, fill_template
+from .time_blocks import block_statistic, get_block_labels, reduce_blocks
 from .tree_dict import tree
 from .xr_to_cdms2 import cdms2_to_xarray, xarray_to_cdms2
@@ -1,3 +1,6 @@
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
 import xarray as xr
 import xcdat as xc
@@ -11,6 +14,11 @@ from pcmdi_metrics.io import (
     get_longitude_bounds_key,
     get_longitude_key,
 )
+from pcmdi_metrics.utils.regridder_cache import get_regridder
+
+# Process-wide cache of spatial weights and grid areas, most recently used last
+_GRID_CACHE = OrderedDict()
+MAX_GRID_CACHE = 64
 
 
 def create_target_grid(
@@ -132,7 +140,14 @@ def calculate_grid_area(ds: xr.Dataset) -> xr.DataArray:
     - ds_new (xarray.Dataset): New dataset with additional variables:
         - 'grid_area': Area of each grid cell in square meters.
         - 'area_weights': Area weights for each grid cell, normalized to sum to 1.
+
+    Notes:
+    - Areas are cached per grid (see `get_spatial_weights`), and the returned values are read-only.
     """
+    return _cached("grid_area", ["X", "Y"], ds, lambda: _calculate_grid_area(ds))
+
+
+def _calculate_grid_area(ds: xr.Dataset) -> xr.DataArray:
     lat_key = get_latitude_key(ds)
     lon_key = get_longitude_key(ds)
 
@@ -160,6 +175,85 @@ def calculate_grid_area(ds: xr.Dataset) -> xr.DataArray:
     return grid_area
 
 
+def get_spatial_weights(ds: xr.Dataset, axis: list = ["X", "Y"]) -> xr.DataArray:
+    """
+    Get the spatial weights of a dataset from a process-wide cache.
+
+    Same as ``ds.spatial.get_weights(axis=axis)``, computed once per grid: the cache is keyed
+    by a hash of the latitude and longitude coordinates and bounds, and holds up to
+    `MAX_GRID_CACHE` entries, dropping the least recently used ones.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        Dataset with latitude and longitude bounds.
+    axis : list, optional
+        Axes of the weights, by default ["X", "Y"].
+
+    Returns
+    -------
+    xr.DataArray
+        Spatial weights. The values are shared by all callers on the same grid and read-only;
+        copy them before modifying in place.
+
+    See Also
+    --------
+    clear_grid_cache : Remove all cached weights and areas.
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.utils import get_spatial_weights
+    >>> weights = get_spatial_weights(ds)
+    """
+    axis = list(axis)
+    return _cached(
+        "spatial_weights", axis, ds, lambda: ds.spatial.get_weights(axis=axis)
+    )
+
+
+def clear_grid_cache():
+    """Remove all spatial weights and grid areas from the process-wide cache."""
+    _GRID_CACHE.clear()
+
+
+def _cached(kind: str, axis: list, ds: xr.Dataset, compute) -> xr.DataArray:
+    key = (kind, _grid_hash(ds, axis))
+    if key in _GRID_CACHE:
+        _GRID_CACHE.move_to_end(key)
+        return _GRID_CACHE[key]
+
+    da = compute()
+    # own the values so that the cached array never aliases user data
+    da = da.copy(data=np.array(da.values))
+    da.values.flags.writeable = False
+
+    _GRID_CACHE[key] = da
+    while len(_GRID_CACHE) > MAX_GRID_CACHE:
+        _GRID_CACHE.popitem(last=False)
+    return da
+
+
+def _grid_hash(ds: xr.Dataset, axis: list) -> str:
+    """Hash of the coordinates and bounds (if any) of the given axes."""
+    md5 = hashlib.md5()
+    for ax in axis:
+        key = xc.get_dim_keys(ds, ax)
+        arrays = [ds[key]]
+        try:
+            # same lookup as xcdat, which also finds bounds without a "bounds" attribute
+            bounds = ds.bounds.get_bounds(ax)
+        except KeyError:
+            bounds = None
+        if isinstance(bounds, xr.Dataset):
+            arrays += [bounds[k] for k in sorted(bounds.data_vars)]
+        elif bounds is not None:
+            arrays.append(bounds)
+        for da in arrays:
+            md5.update(f"{ax}:{da.name}".encode())
+            md5.update(np.ascontiguousarray(da.values, dtype=np.float64).tobytes())
+    return md5.hexdigest()
+
+
 def calculate_area_weights(grid_area):
     # Calculate area weighting for each grid
     total_area = grid_area.sum()
@@ -174,6 +268,7 @@ def regrid(
     regrid_tool: str = "regrid2",
     regrid_method: str = "bilinear",
     fill_zero: bool = False,
+    reuse_weights: bool = False,
 ) -> xr.Dataset:
     """
     Regrid the dataset to a given grid.
@@ -192,6 +287,9 @@ def regrid(
         Regrid method option that is required for xesmf regridder. Default is "bilinear".
     fill_zero : bool, optional
         Fill NaN value with zero if exists. Default is False.
+    reuse_weights : bool, optional
+        Reuse the interpolation weights of earlier calls with the same source grid,
+        target grid, tool and method (see :func:`get_regridder`). Default is False.
 
     Returns
     -------
@@ -213,7 +311,11 @@ def regrid(
 
     target_grid = get_grid(target_grid)  # To remove time dimension if exist
     # regrid
-    if regrid_tool == "regrid2":
+    if reuse_weights:
+        ds_regridded = get_regridder(
+            ds, target_grid, regrid_tool=regrid_tool, regrid_method=regrid_method
+        ).regrid(ds, data_var)
+    elif regrid_tool == "regrid2":
         ds_regridded = ds.regridder.horizontal(data_var, target_grid, tool=regrid_tool)
     elif regrid_tool in ["esmf", "xesmf"]:
         regrid_tool = "xesmf"
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import sys
 import time
@@ -9,9 +10,19 @@ import numpy.ma as ma
 import regionmask
 import xarray as xr
 import xcdat as xc
+from numpy.lib.stride_tricks import sliding_window_view
 
 from pcmdi_metrics import resources
 from pcmdi_metrics.io import get_grid, get_latitude_key, get_longitude_key
+from pcmdi_metrics.io.write_atomic import write_atomic
+from pcmdi_metrics.utils.regridder_cache import get_regridder
+
+# 3x3 stencil of the eight neighbours of a cell (the centre is excluded)
+_NEIGHBOURS = np.ones((3, 3), dtype=bool)
+_NEIGHBOURS[1, 1] = False
+
+# Bump when the generation of the masks changes to invalidate cached masks
+_LAND_SEA_MASK_CACHE_VERSION = 1
 
 
 def create_land_sea_mask(
@@ -20,6 +31,9 @@ def create_land_sea_mask(
     lat_key: str = None,
     as_boolean: bool = False,
     method: str = "regionmask",
+    cache_dir: str = None,
+    source: xr.Dataset = None,
+    regrid_tool: str = "regrid2",
 ) -> xr.DataArray:
     """Generate a land-sea mask (1 for land, 0 for sea) for a given xarray Dataset or DataArray.
 
@@ -35,6 +49,16 @@ def create_land_sea_mask(
         Set mask value to True (land) or False (ocean), by default False, thus 1 (land) and 0 (ocean).
     method : str, optional
         Method to use for creating the mask, either `regionmask` or `pcmdi`, by default `regionmask`.
+    cache_dir : str, optional
+        Directory of an on-disk cache of generated masks, keyed by the grid coordinates and
+        bounds, the method and its inputs (source land fraction and regrid tool of the `pcmdi`
+        method, regionmask version of the `regionmask` method), so that a mask is generated only
+        once per grid. By default None (no caching).
+    source : xr.Dataset, optional
+        Land fraction (`sftlf`, 0 to 1) used by the `pcmdi` method, by default None (the
+        `navy_land.nc` file shipped with PMP).
+    regrid_tool : str, optional
+        Regrid tool used by the `pcmdi` method, by default "regrid2".
 
     Returns
     -------
@@ -52,48 +76,92 @@ def create_land_sea_mask(
     >>> mask = create_land_sea_mask(ds)  #  Generate land-sea mask (land: 1, sea: 0)
     >>> mask = create_land_sea_mask(ds, as_boolean=True)  # Generate land-sea mask (land: True, sea: False)
     >>> mask = create_land_sea_mask(ds, method="pcmdi")  # Use PCMDI method
+    >>> mask = create_land_sea_mask(ds, cache_dir="lsmask_cache")  # Reuse mask of earlier runs
     """
 
+    if lon_key is None:
+        lon_key = get_longitude_key(obj)
+    if lat_key is None:
+        lat_key = get_latitude_key(obj)
+
+    if cache_dir is not None:
+        cache_file = _land_sea_mask_cache_file(
+            cache_dir, obj, lon_key, lat_key, method, source, regrid_tool
+        )
+        if os.path.isfile(cache_file):
+            land_sea_mask = xr.open_dataarray(cache_file).load()
+            if as_boolean:
+                land_sea_mask = land_sea_mask.astype(bool)
+            return land_sea_mask
+
     # Create a land-sea mask
     if method.lower() == "regionmask":
         # Use regionmask
         land_mask = regionmask.defined_regions.natural_earth_v5_0_0.land_110
 
         # Get the longitude and latitude from the xarray dataset
-        if lon_key is None:
-            # lon_key = xc.axis.get_dim_keys(obj, axis="X")
-            lon_key = get_longitude_key(obj)
-        if lat_key is None:
-            # lat_key = xc.axis.get_dim_keys(obj, axis="Y")
-            lat_key = get_latitude_key(obj)
-
         lon = obj[lon_key]
         lat = obj[lat_key]
 
         # Mask the land-sea mask to match the dataset's coordinates
         land_sea_mask = land_mask.mask(lon, lat=lat)
 
-        if as_boolean:
-            # Convert the 0 (land) & nan (ocean) land-sea mask to a boolean mask
-            land_sea_mask = xr.where(land_sea_mask, False, True)
-        else:
-            # Convert the boolean land-sea mask to a 1/0 mask
-            land_sea_mask = xr.where(land_sea_mask, 0, 1)
+        # Convert the 0 (land) & nan (ocean) land-sea mask to a 1/0 mask
+        land_sea_mask = xr.where(land_sea_mask, 0, 1)
 
     elif method.lower() == "pcmdi":
         # Use the PCMDI method developed by Taylor and Doutriaux (2000)
-        land_sea_mask = generate_land_sea_mask__pcmdi(obj)
-
-        if as_boolean:
-            # Convert the 1/0 land-sea mask to a boolean mask
-            land_sea_mask = land_sea_mask.astype(bool)
+        land_sea_mask = generate_land_sea_mask__pcmdi(
+            obj, source=source, regridTool=regrid_tool
+        )
 
     else:
         raise ValueError("Unknown method '%s'. Please choose 'regionmask' or 'pcmdi'")
 
+    if cache_dir is not None:
+        write_atomic(cache_file, land_sea_mask.to_netcdf, "land-sea mask cache")
+
+    if as_boolean:
+        # Convert the 1/0 land-sea mask to a boolean mask
+        land_sea_mask = land_sea_mask.astype(bool)
+
     return land_sea_mask
 
 
+def _land_sea_mask_cache_file(
+    cache_dir: str,
+    obj: Union[xr.Dataset, xr.DataArray],
+    lon_key: str,
+    lat_key: str,
+    method: str,
+    source: xr.Dataset = None,
+    regrid_tool: str = "regrid2",
+) -> str:
+    """Path of the cached land-sea mask of a grid, named by a hash of every input of the mask."""
+    md5 = hashlib.md5(f"{_LAND_SEA_MASK_CACHE_VERSION}:{method.lower()}".encode())
+    arrays = [obj[lon_key], obj[lat_key]]
+    for key in (lon_key, lat_key):
+        bounds = obj[key].attrs.get("bounds")
+        if isinstance(obj, xr.Dataset) and bounds in obj:
+            arrays.append(obj[bounds])
+    if method.lower() == "regionmask":
+        md5.update(f"regionmask-{regionmask.__version__}-land_110".encode())
+    elif method.lower() == "pcmdi":
+        md5.update(regrid_tool.encode())
+        if source is None:
+            st = os.stat(_navy_land_path())
+            md5.update(f"navy_land:{st.st_mtime_ns}:{st.st_size}".encode())
+        else:
+            arrays += [
+                source[key]
+                for key in sorted(source.variables)
+                if np.issubdtype(source[key].dtype, np.number)
+            ]
+    for array in arrays:
+        md5.update(np.ascontiguousarray(array.values, dtype=np.float64).tobytes())
+    return os.path.join(cache_dir, f"land_sea_mask_{md5.hexdigest()}.nc")
+
+
 def find_max(da: xr.DataArray) -> float:
     """Find the maximum value in a given xarray DataArray.
 
@@ -369,14 +437,7 @@ def generate_land_sea_mask__pcmdi(
     """
 
     if source is None:
-        egg_pth = resources.resource_path()
-        source_path = os.path.join(egg_pth, "navy_land.nc")
-        if not os.path.isfile(source_path):
-            # pip install process places data files in different place, so checking here as well
-            source_path = os.path.join(
-                sys.prefix, "share/pcmdi_metrics", "navy_land.nc"
-            )
-        ds = xc.open_dataset(source_path, decode_times=False).load()
+        ds = xc.open_dataset(_navy_land_path(), decode_times=False).load()
     else:
         ds = source.copy()
         if not isinstance(ds, xr.Dataset):
@@ -434,9 +495,8 @@ def generate_land_sea_mask__pcmdi(
         ds_regrid[data_var + "_firstGuess"] = mask
 
     # Improve
-    UL, UC, UR, ML, MR, LL, LC, LR = _create_surrounds(
-        ds_regrid, data_var=data_var, debug=debug
-    )
+    # neighbours of each interior cell in the land fraction (fixed through iterations)
+    surrounds = _create_surrounds(ds_regrid, data_var=data_var, debug=debug)
 
     cont = True
     i = 0
@@ -445,14 +505,7 @@ def generate_land_sea_mask__pcmdi(
         mask_improved = _improve(
             mask,
             ds_regrid,
-            UL,
-            UC,
-            UR,
-            ML,
-            MR,
-            LL,
-            LC,
-            LR,
+            surrounds,
             data_var=data_var,
             threshold_1=threshold_1,
             threshold_2=threshold_2,
@@ -478,62 +531,51 @@ def generate_land_sea_mask__pcmdi(
     return mask
 
 
+def _navy_land_path():
+    """Path of the default land fraction of the PCMDI method."""
+    source_path = os.path.join(resources.resource_path(), "navy_land.nc")
+    if not os.path.isfile(source_path):
+        # pip install process places data files in different place, so checking here as well
+        source_path = os.path.join(sys.prefix, "share/pcmdi_metrics", "navy_land.nc")
+    return source_path
+
+
 def _create_surrounds(ds, data_var="sftlf", debug=False):
+    """3x3 neighbourhood of each interior cell, as a (lat, lon, 3, 3) view of the data.
+
+    The first and last latitudes are excluded; the first and last longitudes are excluded
+    too, unless the longitude axis wraps around, in which case it is padded periodically.
+    Select the eight neighbours with ``_NEIGHBOURS``.
+    """
     start_time = time.time()
-    data = ds[data_var].data
-    sh = list(data.shape)
-    L = ds["lon"]
-    bL = ds[ds.lon.attrs["bounds"]].data
+    data = np.asarray(ds[data_var].data)
 
-    L_isCircular = _isCircular(L)
-    L_modulo = 360
+    if _wraps_around(ds):
+        data = np.concatenate([data[:, -1:], data, data[:, :1]], axis=1)
 
-    if _isCircular(L) and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        sh[0] = sh[0] - 2
-    else:
-        sh[0] = sh[0] - 2
-        sh[1] = sh[1] - 2
-
-    UL = np.ones(sh)
-    UC = np.ones(sh)
-    UR = np.ones(sh)
-    ML = np.ones(sh)
-    MR = np.ones(sh)
-    LL = np.ones(sh)
-    LC = np.ones(sh)
-    LR = np.ones(sh)
-
-    if L_isCircular and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        UC[:, :] = data[2:]
-        LC[:, :] = data[:-2]
-        ML[:, 1:] = data[1:-1, :-1]
-        ML[:, 0] = data[1:-1, -1]
-        MR[:, :-1] = data[1:-1, 1:]
-        MR[:, -1] = data[1:-1, 0]
-        UL[:, 1:] = data[2:, :-1]
-        UL[:, 0] = data[2:, -1]
-        UR[:, :-1] = data[2:, 1:]
-        UR[:, -1] = data[2:, 0]
-        LL[:, 1:] = data[:-2, :-1]
-        LL[:, 0] = data[:-2, -1]
-        LR[:, :-1] = data[:-2, 1:]
-        LR[:, -1] = data[:-2, 0]
-    else:
-        UC[:, :] = data[2:, 1:-1]
-        LC[:, :] = data[:-2, 1:-1]
-        ML[:, :] = data[1:-1, :-2]
-        MR[:, :] = data[1:-1, 2:]
-        UL[:, :] = data[2:, :-2]
-        UR[:, :] = data[2:, 2:]
-        LL[:, :] = data[:-2, :-2]
-        LR[:, :] = data[:-2, 2:]
+    surrounds = sliding_window_view(data, (3, 3))
 
     end_time = time.time()
     if debug:
         elapsed_time = end_time - start_time
         print("Elapsed time (_create_surrounds):", elapsed_time, "seconds")
 
-    return UL, UC, UR, ML, MR, LL, LC, LR
+    return surrounds
+
+
+def _wraps_around(ds):
+    L = ds["lon"]
+    bL = ds[ds.lon.attrs["bounds"]].data
+    L_modulo = 360
+    return _isCircular(L) and bL[-1][1] - bL[0][0] % L_modulo == 0
+
+
+def _interior(ds, data):
+    """Cells that have eight neighbours in :func:`_create_surrounds`."""
+    if _wraps_around(ds):
+        return data[1:-1]  # elimnitates north and south poles
+    else:
+        return data[1:-1, 1:-1]  # elimnitates north and south poles
 
 
 def _isCircular(lons):
@@ -551,14 +593,7 @@ def _isCircular(lons):
 def _improve(
     mask,
     ds_regrid,
-    UL,
-    UC,
-    UR,
-    ML,
-    MR,
-    LL,
-    LC,
-    LR,
+    surrounds,
     data_var="sftlf",
     threshold_1=0.2,
     threshold_2=0.3,
@@ -570,72 +605,43 @@ def _improve(
     ds_mask_approx = _map2four(
         mask, ds_regrid, data_var=data_var, regridTool=regridTool, debug=debug
     )
-    diff = ds_regrid[data_var] - ds_mask_approx[data_var]
-
-    # Land point conversion
-    c1 = np.greater(diff, threshold_1)  # xr.DataArray
-    c2 = np.greater(ds_regrid[data_var], threshold_2)  # xr.DataArray
-    c = np.logical_and(c1, c2)
-    ds_regrid["c"] = c
-
-    # Now figures out local maxima
-    cUL, cUC, cUR, cML, cMR, cLL, cLC, cLR = _create_surrounds(ds_regrid, data_var="c")
-
-    L = ds_regrid["lon"]
-    bL = ds_regrid[ds_regrid.lon.attrs["bounds"]].data
+    frac = np.asarray(ds_regrid[data_var].data)
+    diff = frac - np.asarray(ds_mask_approx[data_var].data)
+    tmp = _interior(ds_regrid, frac)[..., np.newaxis, np.newaxis]
+
+    # Land point conversion: local maxima of land fraction among candidate cells
+    c = np.logical_and(np.greater(diff, threshold_1), np.greater(frac, threshold_2))
+    ds_regrid["c"] = (ds_regrid[data_var].dims, c)
+    c_surrounds = _create_surrounds(ds_regrid, data_var="c")
+    to_land = np.logical_and(
+        _interior(ds_regrid, c),
+        np.all(
+            np.greater(tmp, np.where(c_surrounds, surrounds, 0.0)),
+            axis=(-2, -1),
+            where=_NEIGHBOURS,
+        ),
+    )
 
-    L_modulo = 360
-    L_isCircular = _isCircular(L)
+    # Ocean point conversion: local minima of land fraction among candidate cells
+    c = np.logical_and(np.less(diff, -threshold_1), np.less(frac, 1.0 - threshold_2))
+    ds_regrid["c"] = (ds_regrid[data_var].dims, c)
+    c_surrounds = _create_surrounds(ds_regrid, data_var="c")
+    to_ocean = np.logical_and(
+        _interior(ds_regrid, c),
+        np.all(
+            np.less(tmp, np.where(c_surrounds, surrounds, 1.0)),
+            axis=(-2, -1),
+            where=_NEIGHBOURS,
+        ),
+    )
 
-    if L_isCircular and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        c = c[1:-1]  # elimnitates north and south poles
-        tmp = ds_regrid[data_var].data[1:-1]
-    else:
-        c = c[1:-1, 1:-1]  # elimnitates north and south poles
-        tmp = ds_regrid[data_var].data[1:-1, 1:-1]
-    m = np.logical_and(c, np.greater(tmp, np.where(cUL, UL, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cUC, UC, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cUR, UR, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cML, ML, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cMR, MR, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cLL, LL, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cLC, LC, 0.0)))
-    m = np.logical_and(m, np.greater(tmp, np.where(cLR, LR, 0.0)))
-    # Ok now update the mask by setting these points to land
+    # Ok now update the mask by setting these points to land, then ocean
     mask2 = mask * 1.0
-    if _isCircular(L) and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        mask2[1:-1] = xr.where(m, 1, mask[1:-1])
-    else:
-        mask2[1:-1, 1:-1] = xr.where(m, 1, mask[1:-1, 1:-1])
-
-    # ocean point conversion
-    c1 = np.less(diff, -threshold_1)
-    c2 = np.less(ds_regrid[data_var], 1.0 - threshold_2)
-    c = np.logical_and(c1, c2)
-    ds_regrid["c"] = c
-
-    cUL, cUC, cUR, cML, cMR, cLL, cLC, cLR = _create_surrounds(ds_regrid, data_var="c")
-
-    if L_isCircular and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        c = c[1:-1]  # elimnitates north and south poles
-        tmp = ds_regrid[data_var].data[1:-1]
-    else:
-        c = c[1:-1, 1:-1]  # elimnitates north and south poles
-        tmp = ds_regrid[data_var].data[1:-1, 1:-1]
-    # Now figures out local maxima
-    m = np.logical_and(c, np.less(tmp, np.where(cUL, UL, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cUC, UC, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cUR, UR, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cML, ML, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cMR, MR, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cLL, LL, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cLC, LC, 1.0)))
-    m = np.logical_and(m, np.less(tmp, np.where(cLR, LR, 1.0)))
-    # Ok now update the mask by setting these points to ocean
-    if L_isCircular and bL[-1][1] - bL[0][0] % L_modulo == 0:
-        mask2[1:-1] = xr.where(m, 0, mask2[1:-1])
-    else:
-        mask2[1:-1, 1:-1] = xr.where(m, 0, mask2[1:-1, 1:-1])
+    values = mask2.values
+    interior = _interior(ds_regrid, values)
+    interior[to_land] = 1
+    interior[to_ocean] = 0
+    mask2.values = values
 
     end_time = time.time()
     if debug:
@@ -680,10 +686,11 @@ def _map2four(mask, ds_regrid, data_var="sftlf", regridTool="regrid2", debug=Fal
 
     end_time_c = time.time()
 
-    doo = ds_tmp.regridder.horizontal(data_var, oo, tool=regridTool)
-    doe = ds_tmp.regridder.horizontal(data_var, oe, tool=regridTool)
-    deo = ds_tmp.regridder.horizontal(data_var, eo, tool=regridTool)
-    dee = ds_tmp.regridder.horizontal(data_var, ee, tool=regridTool)
+    # the regridding weights are computed in the first iteration and reused after
+    doo = get_regridder(ds_tmp, oo, regrid_tool=regridTool).regrid(ds_tmp, data_var)
+    doe = get_regridder(ds_tmp, oe, regrid_tool=regridTool).regrid(ds_tmp, data_var)
+    deo = get_regridder(ds_tmp, eo, regrid_tool=regridTool).regrid(ds_tmp, data_var)
+    dee = get_regridder(ds_tmp, ee, regrid_tool=regridTool).regrid(ds_tmp, data_var)
 
     end_time_r = time.time()
 
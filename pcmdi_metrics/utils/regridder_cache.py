@@ -0,0 +1,242 @@
+import abc
+from collections import OrderedDict
+
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.io import (
+    get_grid,
+    get_latitude_bounds,
+    get_latitude_key,
+    get_longitude_bounds,
+    get_longitude_key,
+)
+from pcmdi_metrics.io.regrid_cache import grid_fingerprint
+
+# Process-wide registry of regridders, most recently used last
+_REGRIDDERS = OrderedDict()
+MAX_REGRIDDERS = 32
+
+
+def get_regridder(
+    ds: xr.Dataset,
+    target_grid: xr.Dataset,
+    regrid_tool: str = "regrid2",
+    regrid_method: str = "bilinear",
+):
+    """
+    Get a regridder from the source grid of a dataset to a target grid.
+
+    Regridders are kept in a process-wide registry keyed by the source grid
+    fingerprint, the target grid fingerprint, the tool and the method, so the
+    interpolation weights are computed once and reused for every dataset on the
+    same source grid.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+        Dataset on the source grid, with latitude and longitude bounds.
+    target_grid : xr.Dataset
+        Grid to interpolate to.
+    regrid_tool : str, optional
+        Regrid option: "regrid2" or "xesmf" ("esmf"). Default is "regrid2".
+    regrid_method : str, optional
+        Regrid method for the xesmf regridder. Default is "bilinear".
+
+    Returns
+    -------
+    Regrid2Regridder or XESMFRegridder
+        Regridder with precomputed weights. Call ``regridder.regrid(ds, data_var)``
+        to regrid a data variable.
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.utils import get_regridder
+    >>> regridder = get_regridder(ds, target_grid, regrid_tool="xesmf")
+    >>> ds_regridded = regridder.regrid(ds, "ts")
+    """
+    if regrid_tool == "esmf":
+        regrid_tool = "xesmf"
+
+    key = (
+        grid_fingerprint(ds),
+        grid_fingerprint(target_grid),
+        regrid_tool,
+        regrid_method if regrid_tool == "xesmf" else None,
+    )
+
+    if key in _REGRIDDERS:
+        _REGRIDDERS.move_to_end(key)
+        return _REGRIDDERS[key]
+
+    if regrid_tool == "regrid2":
+        regridder = Regrid2Regridder(ds, target_grid)
+    elif regrid_tool == "xesmf":
+        regridder = XESMFRegridder(ds, target_grid, method=regrid_method)
+    else:
+        raise ValueError(
+            f"regrid_tool {regrid_tool} is undefined. Please use either 'regrid2' or 'xesmf'"
+        )
+
+    _REGRIDDERS[key] = regridder
+    while len(_REGRIDDERS) > MAX_REGRIDDERS:
+        _REGRIDDERS.popitem(last=False)
+
+    return regridder
+
+
+def clear_regridder_cache():
+    """Remove all regridders from the process-wide registry."""
+    _REGRIDDERS.clear()
+
+
+class _CachedRegridder(abc.ABC):
+    """Base class of regridders applying precomputed weights to datasets."""
+
+    def __init__(self, ds: xr.Dataset, target_grid: xr.Dataset):
+        self.src_lat_key = get_latitude_key(ds)
+        self.src_lon_key = get_longitude_key(ds)
+        self.target_grid = get_grid(target_grid)
+        self.lat_key = get_latitude_key(self.target_grid)
+        self.lon_key = get_longitude_key(self.target_grid)
+
+    @abc.abstractmethod
+    def _apply(self, data: np.ndarray) -> np.ndarray:
+        """Regrid a batch of fields of shape (n, lat, lon) on the source grid."""
+
+    def regrid(self, ds: xr.Dataset, data_var: str) -> xr.Dataset:
+        """
+        Regrid a data variable of a dataset.
+
+        Parameters
+        ----------
+        ds : xr.Dataset
+            Dataset on the source grid of the regridder.
+        data_var : str
+            Variable to regrid. Any other dimension (time, level, ...) is regridded
+            in one batch.
+
+        Returns
+        -------
+        xr.Dataset
+            Dataset with the regridded variable, the target grid coordinates and
+            bounds, and the bounds of the non-horizontal axes of `ds`.
+        """
+        da = ds[data_var]
+        other_dims = [
+            d for d in da.dims if d not in (self.src_lat_key, self.src_lon_key)
+        ]
+        da = da.transpose(*other_dims, self.src_lat_key, self.src_lon_key)
+
+        n_lat, n_lon = da.shape[-2:]
+        data = np.asarray(da.values, dtype=np.float64).reshape(-1, n_lat, n_lon)
+        regridded = self._apply(data).reshape(
+            da.shape[:-2]
+            + (
+                self.target_grid.sizes[self.lat_key],
+                self.target_grid.sizes[self.lon_key],
+            )
+        )
+
+        coords = {d: da[d] for d in other_dims if d in da.coords}
+        coords[self.lat_key] = self.target_grid[self.lat_key]
+        coords[self.lon_key] = self.target_grid[self.lon_key]
+        output_da = xr.DataArray(
+            regridded.astype(da.dtype, copy=False),
+            dims=other_dims + [self.lat_key, self.lon_key],
+            coords=coords,
+            attrs=da.attrs,
+        )
+
+        output_ds = xr.Dataset({data_var: output_da}, attrs=ds.attrs)
+        # bounds of the target grid and of the other axes of the input
+        for key in self.target_grid.data_vars:
+            output_ds[key] = self.target_grid[key]
+        for key in ds.data_vars:
+            if key == data_var or key in output_ds:
+                continue
+            if not set(ds[key].dims) & {self.src_lat_key, self.src_lon_key}:
+                output_ds[key] = ds[key]
+
+        return output_ds
+
+
+class Regrid2Regridder(_CachedRegridder):
+    """
+    Conservative area-weighted regridder on rectilinear grids, with the weights of
+    the regrid2 regridder of xcdat.
+
+    The latitude and longitude weights computed by ``xcdat.regridder.regrid2`` are
+    stored as two matrices, so a batch of fields is regridded with matrix products
+    instead of a loop over the destination cells. Missing values are excluded with a
+    validity mask: each destination cell is the weighted sum of the valid source
+    values divided by the weighted sum of the mask, and is nan when no valid source
+    cell overlaps it.
+    """
+
+    def __init__(self, ds: xr.Dataset, target_grid: xr.Dataset):
+        # private helpers of xcdat, imported here so that importing pcmdi_metrics
+        # does not depend on them
+        from xcdat.regridder.regrid2 import _map_latitude, _map_longitude
+
+        super().__init__(ds, target_grid)
+        src_lat_bnds = get_latitude_bounds(ds)
+        src_lon_bnds = get_longitude_bounds(ds)
+        self.lat_weights = _weight_matrix(
+            *_map_latitude(src_lat_bnds, get_latitude_bounds(self.target_grid)),
+            len(src_lat_bnds),
+        )
+        self.lon_weights = _weight_matrix(
+            *_map_longitude(src_lon_bnds, get_longitude_bounds(self.target_grid)),
+            len(src_lon_bnds),
+        )
+        # total weight of each destination cell
+        self.cell_weights = np.outer(
+            self.lat_weights.sum(axis=1), self.lon_weights.sum(axis=1)
+        )
+
+    def _apply(self, data: np.ndarray) -> np.ndarray:
+        valid = np.isfinite(data)
+        if valid.all():
+            weighted_sum = self.lat_weights @ data @ self.lon_weights.T
+            total_weights = self.cell_weights
+        else:
+            weighted_sum = (
+                self.lat_weights @ np.where(valid, data, 0.0) @ self.lon_weights.T
+            )
+            total_weights = self.lat_weights @ valid @ self.lon_weights.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # destination cells without valid source cells are set to nan
+            return np.where(total_weights > 0, weighted_sum / total_weights, np.nan)
+
+
+class XESMFRegridder(_CachedRegridder):
+    """Regridder holding the sparse weight matrix of an ``xesmf.Regridder``."""
+
+    def __init__(
+        self, ds: xr.Dataset, target_grid: xr.Dataset, method: str = "bilinear"
+    ):
+        import xesmf as xe
+
+        super().__init__(ds, target_grid)
+        # same options as the xesmf regridder of xcdat
+        self.regridder = xe.Regridder(
+            get_grid(ds),
+            self.target_grid,
+            method,
+            periodic=False,
+            ignore_degenerate=True,
+            unmapped_to_nan=True,
+        )
+
+    def _apply(self, data: np.ndarray) -> np.ndarray:
+        return self.regridder.regrid_numpy(data)
+
+
+def _weight_matrix(mapping: list, weights: list, n_src: int) -> np.ndarray:
+    """Dense (destination, source) matrix of the per-cell mapping and weights of xcdat."""
+    matrix = np.zeros((len(mapping), n_src))
+    for i, (index, weight) in enumerate(zip(mapping, weights)):
+        # longitude indices wrap around, as np.take(..., mode="wrap") in xcdat
+        np.add.at(matrix[i], np.mod(index, n_src), np.ravel(weight))
+    return matrix
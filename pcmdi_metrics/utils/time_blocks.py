@@ -0,0 +1,216 @@
+import numpy as np
+import xarray as xr
+
+SEASON_MONTHS = {
+    "DJF": [12, 1, 2],
+    "MAM": [3, 4, 5],
+    "JJA": [6, 7, 8],
+    "SON": [9, 10, 11],
+}
+
+
+def get_block_labels(
+    time: xr.DataArray,
+    block: str,
+    dec_mode: str = "DJF",
+    drop_incomplete_djf: bool = True,
+    annual_strict: bool = True,
+    pentad: bool = False,
+):
+    """
+    Map each time step of a daily time series to the year block it belongs to.
+
+    The blocks are those of the block statistics of the extremes and DRCDM metrics:
+    calendar years ("ANN") or seasons of each year. The labels are computed once from the
+    year, month and day of the time steps, so that block statistics can be reduced by
+    label (see :func:`reduce_blocks`) instead of selecting dates.
+
+    Parameters
+    ----------
+    time : xr.DataArray
+        Time coordinate of the data, in increasing order.
+    block : str
+        "ANN", "DJF", "MAM", "JJA" or "SON".
+    dec_mode : str, optional
+        "DJF" to count December in the DJF season of the following year, or "JFD" to
+        use January, February and December of the same year. Default is "DJF".
+    drop_incomplete_djf : bool, optional
+        With dec_mode "DJF", drop the DJF season of the first year, which has no
+        December. Default is True.
+    annual_strict : bool, optional
+        For 5-day means, start the blocks that begin in January on January 5, so that
+        no data of the prior year are used. Default is True.
+    pentad : bool, optional
+        True if the data are 5-day means. Default is False.
+
+    Returns
+    -------
+    labels : np.ndarray
+        Index in `years` of the block of each time step, or -1 if the time step is in
+        none of the blocks.
+    years : np.ndarray
+        Year of each block.
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.utils import get_block_labels, reduce_blocks
+    >>> labels, years = get_block_labels(ds.time, "JJA")
+    >>> jja_max = reduce_blocks(ds["tasmax"].values, labels, len(years), "max")
+    """
+    year = time.dt.year.values
+    month = time.dt.month.values
+    day = time.dt.day.values
+
+    # Only use data from that year - start on Jan 5 avg
+    before_jan5 = (annual_strict and pentad) & (month == 1) & (day < 5)
+
+    if block == "ANN":
+        use = ~before_jan5
+        block_year = year
+    elif block == "DJF" and dec_mode == "DJF":
+        # December counts in the DJF of the next year
+        use = np.isin(month, SEASON_MONTHS[block])
+        block_year = year + (month == 12)
+    elif block == "DJF" and dec_mode == "JFD":
+        use = np.isin(month, SEASON_MONTHS[block]) & ~before_jan5
+        block_year = year
+    elif block in SEASON_MONTHS:
+        use = np.isin(month, SEASON_MONTHS[block])
+        block_year = year
+    else:
+        raise ValueError(
+            f"Unsupported block {block} with dec_mode {dec_mode}. "
+            "Block must be ANN, DJF, MAM, JJA or SON, and dec_mode DJF or JFD."
+        )
+
+    if block == "DJF" and dec_mode == "DJF":
+        if drop_incomplete_djf:
+            years = np.arange(year[0] + 1, year[-1] + 1)
+        else:
+            years = np.arange(year[0], year[-1] + 1)
+    else:
+        years = np.unique(block_year[use])
+
+    labels = np.searchsorted(years, block_year)
+    labels[~use | ~np.isin(block_year, years)] = -1
+    return labels, years
+
+
+def reduce_blocks(
+    data: np.ndarray, labels: np.ndarray, nblocks: int, stat: str, out=None
+) -> np.ndarray:
+    """
+    Reduce data over the first axis by block label, skipping missing values.
+
+    Consecutive time steps with the same label are reduced together, so the cost is a
+    single pass over the data.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        Data with time as the first axis.
+    labels : np.ndarray
+        Block index of each time step, -1 for time steps in no block
+        (see :func:`get_block_labels`).
+    nblocks : int
+        Number of blocks.
+    stat : str
+        "max", "min", "mean" or "median".
+    out : np.ndarray, optional
+        For "max" and "min", running result of shape (nblocks, ...) that is updated in
+        place. This allows reducing a long time series chunk by chunk.
+
+    Returns
+    -------
+    np.ndarray
+        Statistic of each block, of shape (nblocks, ...). Blocks without valid data are
+        NaN.
+    """
+    data = np.asarray(data)
+    shape = (nblocks,) + data.shape[1:]
+    dtype = np.result_type(data.dtype, np.float32)
+
+    if stat in ["max", "min"]:
+        reducer = np.fmax if stat == "max" else np.fmin
+        if out is None:
+            out = np.full(shape, np.nan, dtype=dtype)
+        for label, start, end in _label_runs(labels):
+            reducer(out[label], reducer.reduce(data[start:end], axis=0), out=out[label])
+        return out
+
+    if out is not None:
+        raise ValueError("out is only supported for max and min")
+
+    if stat == "mean":
+        total = np.zeros(shape, dtype=dtype)
+        count = np.zeros(shape, dtype=np.int64)
+        for label, start, end in _label_runs(labels):
+            valid = ~np.isnan(data[start:end])
+            total[label] += np.where(valid, data[start:end], 0).sum(axis=0)
+            count[label] += valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (total / count).astype(dtype)
+
+    if stat == "median":
+        out = np.full(shape, np.nan, dtype=dtype)
+        for label in np.unique(labels[labels >= 0]):
+            out[label] = np.nanmedian(data[labels == label], axis=0)
+        return out
+
+    raise ValueError(f"Unsupported stat {stat}. Stat must be max, min, mean or median.")
+
+
+def block_statistic(
+    da: xr.DataArray, labels: np.ndarray, years: np.ndarray, stat: str
+) -> xr.DataArray:
+    """
+    Statistic of each year block of a DataArray, with :func:`reduce_blocks`.
+
+    Dask arrays are reduced lazily, one spatial chunk at a time.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        Data with a "time" dimension.
+    labels : np.ndarray
+        Block index of each time step (see :func:`get_block_labels`).
+    years : np.ndarray
+        Year of each block.
+    stat : str
+        "max", "min", "mean" or "median".
+
+    Returns
+    -------
+    xr.DataArray
+        Statistic with a "year" dimension in place of "time", like
+        ``da.groupby("time.year")`` reductions.
+    """
+    result = xr.apply_ufunc(
+        _reduce_blocks_last_axis,
+        da,
+        input_core_dims=[["time"]],
+        output_core_dims=[["year"]],
+        kwargs={"labels": labels, "nblocks": len(years), "stat": stat},
+        dask="parallelized",
+        output_dtypes=[np.result_type(da.dtype, np.float32)],
+        dask_gufunc_kwargs={
+            "output_sizes": {"year": len(years)},
+            "allow_rechunk": True,
+        },
+        keep_attrs=True,
+    )
+    return result.transpose("year", ...).assign_coords(year=years)
+
+
+def _reduce_blocks_last_axis(data, labels, nblocks, stat):
+    result = reduce_blocks(np.moveaxis(data, -1, 0), labels, nblocks, stat)
+    return np.moveaxis(result, 0, -1)
+
+
+def _label_runs(labels):
+    """Label, start and end of each run of time steps in a block."""
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1])
+    ends = np.append(starts[1:], len(labels))
+    for start, end in zip(starts, ends):
+        if labels[start] >= 0:
+            yield labels[start], start, end
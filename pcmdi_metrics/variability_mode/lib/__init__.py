@@ -18,8 +18,18 @@ from .eof_analysis import (  # noqa
     eof_analysis_get_variance_mode,
     gain_pcs_fraction,
     gain_pseudo_pcs,
+    gain_pseudo_pcs_batch,
+    get_cbf_projector,
     linear_regression,
+    linear_regression_batch,
     linear_regression_on_globe_for_teleconnection,
+    linear_regression_on_globe_for_teleconnection_batch,
+)
+from .eof_solver import (  # noqa
+    EOF_BACKENDS,
+    TruncatedEof,
+    benchmark_eof_backends,
+    get_eof_solver,
 )
 from .lib_variability_mode import (  # noqa
     adjust_units,
@@ -27,6 +37,8 @@ from .lib_variability_mode import (  # noqa
     debug_print,
     get_domain_range,
     get_eof_numbers,
+    get_mode_settings,
+    get_peak_memory,
     read_data_in,
     sea_ice_adjust,
     search_paths,
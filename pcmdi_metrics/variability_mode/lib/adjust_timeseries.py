@@ -21,12 +21,15 @@ def adjust_timeseries(
     season: str,
     regions_specs: dict = None,
     RmDomainMean: bool = True,
+    ds_anomaly: xr.Dataset = None,
 ) -> xr.Dataset:
     """
     Remove annual cycle (for all modes) and get its seasonal mean time series if
     needed. Then calculate residual by subtraction domain (or global) average.
     Input
     - ds: array (t, y, x)
+    - ds_anomaly: anomaly time series of ds for the season from get_anomaly_timeseries,
+          if already computed (e.g., shared by several modes). It is not modified.
     Output
     - timeseries_season: array (t, y, x)
     """
@@ -35,7 +38,8 @@ def adjust_timeseries(
             "The first parameter of adjust_timeseries must be an xarray Dataset"
         )
     # Reomove annual cycle (for all modes) and get its seasonal mean time series if needed
-    ds_anomaly = get_anomaly_timeseries(ds, data_var, season)
+    if ds_anomaly is None:
+        ds_anomaly = get_anomaly_timeseries(ds, data_var, season)
     # Calculate residual by subtracting domain (or global) average
     ds_residual = get_residual_timeseries(
         ds_anomaly, data_var, mode, regions_specs, RmDomainMean=RmDomainMean
@@ -1,5 +1,7 @@
 import datetime
 
+from pcmdi_metrics.variability_mode.lib.eof_solver import EOF_BACKENDS
+
 
 def AddParserArgument(P):
     # Load pre-defined parsers
@@ -44,6 +46,15 @@ def AddParserArgument(P):
         "- AMO: Atlantic Multidecadal Oscillation\n"
         "(Note: Case insensitive)",
     )
+    P.add_argument(
+        "--variability_modes",
+        type=str,
+        nargs="+",
+        default=None,
+        help="List of modes of variability to analyze in one run (e.g., NAM NAO PNA NPO SAM PSA1 PSA2).\n"
+        "Each data set is read and its annual cycle removed once for all modes.\n"
+        "The modes must be of the same variable. Overrides --variability_mode",
+    )
     P.add_argument(
         "--seasons", type=str, nargs="+", default=None, help="List of seasons"
     )
@@ -159,6 +170,34 @@ def AddParserArgument(P):
         default=True,
         help="Option for Calculate Common Basis Function (CBF) for model: True (default) / False",
     )
+    P.add_argument(
+        "--cbf_batch_size",
+        type=int,
+        dest="cbf_batch_size",
+        default=1,
+        help="Number of realizations of a model whose CBF projections and teleconnection\n"
+        "regressions are computed together (default 1). Larger batches are faster\n"
+        "for large ensembles but keep the data of the whole batch in memory",
+    )
+    P.add_argument(
+        "--time_chunk_size",
+        type=int,
+        dest="time_chunk_size",
+        default=None,
+        help="Number of time steps per dask chunk to read the data (default None: read\n"
+        "without chunks). With chunks, only the selected years are loaded, and the\n"
+        "unit conversion and masking are done chunk by chunk to lower the peak memory",
+    )
+    P.add_argument(
+        "--eof_backend",
+        type=str,
+        dest="eof_backend",
+        default="eofs",
+        choices=EOF_BACKENDS,
+        help="EOF solver (default eofs): eofs for the full SVD of the eofs package,\n"
+        "randomized for a randomized truncated SVD of the leading EOFs, or covariance\n"
+        "for the eigen-decomposition of the time-time covariance matrix",
+    )
     P.add_argument(
         "--nc_out",
         type=bool,
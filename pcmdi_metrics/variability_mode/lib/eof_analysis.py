@@ -2,7 +2,6 @@ from time import gmtime, strftime
 
 import numpy as np
 import xarray as xr
-from eofs.xarray import Eof
 
 from pcmdi_metrics.io import (
     get_latitude,
@@ -12,6 +11,7 @@ from pcmdi_metrics.io import (
     get_time_key,
 )
 from pcmdi_metrics.utils import calculate_area_weights, calculate_grid_area
+from pcmdi_metrics.variability_mode.lib.eof_solver import get_eof_solver
 
 
 def eof_analysis_get_variance_mode(
@@ -23,6 +23,7 @@ def eof_analysis_get_variance_mode(
     debug: bool = False,
     EofScaling: bool = False,
     save_multiple_eofs: bool = False,
+    eof_backend: str = "eofs",
 ) -> tuple:
     """
     Perform Empirical Orthogonal Function (EOF) analysis.
@@ -45,6 +46,10 @@ def eof_analysis_get_variance_mode(
         If True, applies scaling to the EOFs. Default is False.
     save_multiple_eofs : bool, optional
         If True, saves multiple EOFs. Default is False.
+    eof_backend : str, optional
+        The EOF solver: "eofs" (default) for the full SVD of `eofs`, or "randomized"
+        or "covariance" to compute only the leading EOFs (see
+        :func:`pcmdi_metrics.variability_mode.lib.eof_solver.get_eof_solver`).
 
     Returns
     -------
@@ -78,7 +83,10 @@ def eof_analysis_get_variance_mode(
     grid_area = calculate_grid_area(ds)
     area_weights = calculate_area_weights(grid_area)
     da = ds[data_var]
-    solver = Eof(da, weights=area_weights)
+    # Truncated backends also keep the 10 EOFs of the North test
+    solver = get_eof_solver(
+        da, weights=area_weights, backend=eof_backend, neofs=max(eofn_max, 10)
+    )
     debug_print("Lib-EOF: eof", debug)
 
     # pcscaling=1 by default, return normalized EOFs
@@ -272,27 +280,73 @@ def linear_regression_on_globe_for_teleconnection(
         print("type(pc), type(ds):", type(pc), type(ds))
         print("pc.shape, timeseries.shape:", pc.shape, ds[data_var].shape)
 
-    # Linear regression to have extended global map; teleconnection purpose
-    slope, intercept = linear_regression(pc, ds[data_var], debug=debug)
+    return linear_regression_on_globe_for_teleconnection_batch(
+        [pc], [ds], data_var, [stdv_pc], RmDomainMean, EofScaling, debug=debug
+    )[0]
 
-    if not RmDomainMean and EofScaling:
-        factor = 1
-    else:
-        factor = stdv_pc
 
-    eof_lr = (slope * factor) + intercept
+def linear_regression_on_globe_for_teleconnection_batch(
+    pcs, ds_list, data_var, stdv_pcs, RmDomainMean=True, EofScaling=False, debug=False
+) -> list:
+    """
+    Reconstruct EOF patterns of several principal components with a focus on teleconnection.
+
+    Batched version of :func:`linear_regression_on_globe_for_teleconnection`, e.g., for
+    the CBF PCs of all realizations of a model. Regressions on fields of the same grid
+    and length are computed together (see :func:`linear_regression_batch`).
 
-    eof_lr.attrs["variable"] = data_var
-    eof_lr.attrs["description"] = "linear regression on global field for teleconnection"
-    eof_lr.attrs["comment"] = (
-        "Reconstructed EOF pattern with teleconnection considerations"
+    Parameters
+    ----------
+    pcs : list of xr.DataArray
+        The principal component time series used for reconstruction.
+    ds_list : list of xr.Dataset
+        xarray Datasets containing the data for regression, one for each PC.
+    data_var : str
+        The name of the data variable in the datasets.
+    stdv_pcs : list of float
+        The standard deviation of each principal component.
+    RmDomainMean : bool, optional
+        If True, removes the domain mean from the data. Default is True.
+    EofScaling : bool, optional
+        If True, applies scaling to the EOFs. Default is False.
+    debug : bool, optional
+        If True, enables debugging output. Default is False.
+
+    Returns
+    -------
+    list of tuple
+        (eof_lr, slope, intercept) for each PC, as returned by
+        :func:`linear_regression_on_globe_for_teleconnection`.
+    """
+    # Linear regression to have extended global map; teleconnection purpose
+    regressions = linear_regression_batch(
+        pcs, [ds[data_var] for ds in ds_list], debug=debug
     )
-    if "eof_mode" in pc.attrs:
-        eof_lr.attrs["eof_mode"] = pc.attrs["eof_mode"]
+
+    results = []
+    for pc, stdv_pc, (slope, intercept) in zip(pcs, stdv_pcs, regressions):
+        if not RmDomainMean and EofScaling:
+            factor = 1
+        else:
+            factor = stdv_pc
+
+        eof_lr = (slope * factor) + intercept
+
+        eof_lr.attrs["variable"] = data_var
+        eof_lr.attrs["description"] = (
+            "linear regression on global field for teleconnection"
+        )
+        eof_lr.attrs["comment"] = (
+            "Reconstructed EOF pattern with teleconnection considerations"
+        )
+        if "eof_mode" in pc.attrs:
+            eof_lr.attrs["eof_mode"] = pc.attrs["eof_mode"]
+
+        results.append((eof_lr, slope, intercept))
 
     debug_print("linear regression done", debug)
 
-    return eof_lr, slope, intercept
+    return results
 
 
 def linear_regression(x: xr.DataArray, y: xr.DataArray, debug: bool = False) -> tuple:
@@ -319,49 +373,105 @@ def linear_regression(x: xr.DataArray, y: xr.DataArray, debug: bool = False) ->
     intercept : xr.DataArray
         A 2D array representing the spatial map of linear regression intercepts for each grid point.
     """
-    # get original global dimension
-    lat = get_latitude(y)
-    lon = get_longitude(y)
-
-    # get dimension names
-    lat_key = get_latitude_key(y)
-    lon_key = get_longitude_key(y)
-
-    # Ensure (time, lat, lon) order before indexing by position
-    time_key = get_time_key(y)
-    y = y.transpose(time_key, lat_key, lon_key)
-
-    # Convert 3d (time, lat, lon) to 2d (time, lat*lon) for polyfit applying
-    im = y.shape[2]
-    jm = y.shape[1]
-    # Use np.asarray to handle both numpy and Dask-backed arrays
-    y_2d = np.asarray(y).reshape(y.shape[0], jm * im)
-    x_np = np.asarray(x)
-    if debug:
-        print("x.shape:", x.shape)
-        print("y_2d.shape:", y_2d.shape)
-    # Linear regression
-    # np.polyfit (via lstsq) fails with LinAlgError on NaN columns in newer numpy.
-    # Identify columns that are fully finite and only regress those.
-    valid_cols = np.all(np.isfinite(y_2d), axis=0)
-    slope_1d = np.full(jm * im, np.nan)
-    intercept_1d = np.full(jm * im, np.nan)
-    if valid_cols.any():
-        coeffs = np.polyfit(x_np, y_2d[:, valid_cols], 1)
-        slope_1d[valid_cols] = coeffs[0]
-        intercept_1d[valid_cols] = coeffs[1]
-    # Retreive to variabile from numpy array
-    slope = slope_1d.reshape(jm, im)
-    intercept = intercept_1d.reshape(jm, im)
-    # Set lat/lon coordinates
-    slope = xr.DataArray(
-        slope, coords={lat_key: lat, lon_key: lon}, dims=[lat_key, lon_key]
-    )
-    intercept = xr.DataArray(
-        intercept, coords={lat_key: lat, lon_key: lon}, dims=[lat_key, lon_key]
-    )
+    return linear_regression_batch([x], [y], debug=debug)[0]
+
+
+def linear_regression_batch(xs: list, ys: list, debug: bool = False) -> list:
+    """
+    Perform linear regressions of time series against time-varying 2D fields.
+
+    Each time series in `xs` is regressed on the field of the same index in `ys`, as in
+    :func:`linear_regression`. Fields of the same grid and length (e.g., the
+    realizations of a model) are stacked, and their regressions are computed in one
+    vectorized least-squares solve.
+
+    Parameters
+    ----------
+    xs : list of xr.DataArray
+        1D time series (time) used as the independent variables.
+    ys : list of xr.DataArray
+        Time-varying 2D fields (time, lat, lon) used as the dependent variables.
+    debug : bool, optional
+        If True, enables debugging output to display shapes of input arrays.
+        Default is False.
+
+    Returns
+    -------
+    list of tuple
+        (slope, intercept) spatial maps for each pair. Grid points with missing values
+        are NaN.
+    """
+    # Group the fields by grid to stack them
+    groups = {}
+    for i, y in enumerate(ys):
+        lat_key = get_latitude_key(y)
+        lon_key = get_longitude_key(y)
+        time_key = get_time_key(y)
+        # Ensure (time, lat, lon) order before indexing by position
+        y = y.transpose(time_key, lat_key, lon_key)
+        grid = (
+            y.shape,
+            lat_key,
+            lon_key,
+            np.asarray(get_latitude(y)).tobytes(),
+            np.asarray(get_longitude(y)).tobytes(),
+        )
+        groups.setdefault(grid, []).append((i, y))
+
+    results = [None] * len(ys)
+    for members in groups.values():
+        y = members[0][1]
+        lat = get_latitude(y)
+        lon = get_longitude(y)
+        lat_key = get_latitude_key(y)
+        lon_key = get_longitude_key(y)
+        jm = y.shape[1]
+        im = y.shape[2]
+
+        # Convert 3d (time, lat, lon) to 2d (time, lat*lon) and stack
+        # Use np.asarray to handle both numpy and Dask-backed arrays
+        y_3d = np.stack(
+            [np.asarray(y_i).reshape(y.shape[0], jm * im) for _, y_i in members]
+        ).astype(np.float64, copy=False)
+        x_2d = np.stack([np.asarray(xs[i]) for i, _ in members]).astype(np.float64)
+        if debug:
+            print("x_2d.shape:", x_2d.shape)
+            print("y_3d.shape:", y_3d.shape)
+
+        slope_2d, intercept_2d = _least_squares_fit(x_2d, y_3d)
+
+        for (i, _), slope_1d, intercept_1d in zip(members, slope_2d, intercept_2d):
+            # Retreive to variabile from numpy array and set lat/lon coordinates
+            slope = xr.DataArray(
+                slope_1d.reshape(jm, im),
+                coords={lat_key: lat, lon_key: lon},
+                dims=[lat_key, lon_key],
+            )
+            intercept = xr.DataArray(
+                intercept_1d.reshape(jm, im),
+                coords={lat_key: lat, lon_key: lon},
+                dims=[lat_key, lon_key],
+            )
+            results[i] = (slope, intercept)
+
     # return result
-    return slope, intercept
+    return results
+
+
+def _least_squares_fit(x: np.ndarray, y: np.ndarray) -> tuple:
+    # Least-squares fit of y = slope * x + intercept along time for each
+    # regression (first axis) and grid point (last axis):
+    #     x: (regression, time), y: (regression, time, grid point)
+    # Grid points with missing values are NaN (np.polyfit fails on them)
+    x_mean = x.mean(axis=1, keepdims=True)
+    x_anom = x - x_mean
+    y_mean = y.mean(axis=1)
+    with np.errstate(invalid="ignore"):
+        slope = np.einsum("rt,rts->rs", x_anom, y - y_mean[:, np.newaxis])
+        slope /= np.sum(x_anom**2, axis=1, keepdims=True)
+        intercept = y_mean - slope * x_mean
+    valid = np.all(np.isfinite(y), axis=1)
+    return np.where(valid, slope, np.nan), np.where(valid, intercept, np.nan)
 
 
 def gain_pseudo_pcs(
@@ -414,6 +524,108 @@ def gain_pseudo_pcs(
     return pseudo_pcs
 
 
+def get_cbf_projector(
+    solver, eofn: int, reverse_sign: bool = False, EofScaling: bool = False
+) -> xr.DataArray:
+    """
+    Get the pattern that projects fields onto the n-th EOF of an EOF solver.
+
+    The pseudo-PCs of :func:`gain_pseudo_pcs` are the sums over the grid of the field
+    times this pattern: the analysis weights times the n-th EOF. Getting it once from
+    the observation EOF analysis allows projecting the fields of many model
+    realizations with one matrix multiplication (see :func:`gain_pseudo_pcs_batch`).
+
+    Parameters
+    ----------
+    solver : object
+        The solver used for the EOF analysis.
+    eofn : int
+        The index of the EOF to project onto (1-based index).
+    reverse_sign : bool, optional
+        If True, reverses the sign of the pattern. Default is False.
+    EofScaling : bool, optional
+        If True, applies scaling to the EOFs during projection. Default is False.
+
+    Returns
+    -------
+    projector : xr.DataArray
+        The projection pattern (y, x), with NaN where the EOF is missing.
+    """
+    eof = solver.eofs(neofs=eofn, eofscaling=int(EofScaling))[eofn - 1]
+    weights = solver.getWeights()
+    projector = eof if weights is None else eof * weights
+    # Arbitrary sign control, attempt to make all plots have the same sign
+    if reverse_sign:
+        projector = projector * -1
+    if EofScaling:
+        projector.attrs["comment"] = "Scaled pseudo principal components"
+    else:
+        projector.attrs["comment"] = "Non-scaled pseudo principal components"
+    return projector
+
+
+def gain_pseudo_pcs_batch(projector: xr.DataArray, fields: list) -> list:
+    """
+    Project several datasets onto an EOF to generate their pseudo-principal components (PCs).
+
+    Batched version of :func:`gain_pseudo_pcs`: the fields, e.g., all realizations of
+    a model on the observation grid, are stacked along time and projected with one
+    matrix multiplication.
+
+    Parameters
+    ----------
+    projector : xr.DataArray
+        The projection pattern from :func:`get_cbf_projector`.
+    fields : list of xr.DataArray
+        The data fields (time, y, x) to be projected, on the grid of the EOFs.
+
+    Returns
+    -------
+    list of xr.DataArray
+        The pseudo-principal components of each field.
+    """
+    pattern = np.asarray(projector).ravel()
+    eof_valid = ~np.isnan(pattern)
+
+    fields_flat = []
+    for field in fields:
+        time_key = get_time_key(field)
+        field = field.transpose(time_key, ...)
+        if field.shape[1:] != projector.shape:
+            raise ValueError("field and EOFs have different shapes")
+        field_flat = np.asarray(field).reshape(field.shape[0], -1)
+        missing = np.isnan(field_flat)
+        if (missing.any(axis=0) != missing.all(axis=0)).any():
+            raise ValueError(
+                "missing values detected in different locations at different times"
+            )
+        fields_flat.append(field_flat[:, eof_valid])
+
+    # Project all fields onto the EOF at once
+    projected = np.concatenate(fields_flat).dot(pattern[eof_valid])
+
+    pseudo_pcs_list = []
+    ends = np.cumsum([len(field_flat) for field_flat in fields_flat])
+    for field, values in zip(fields, np.split(projected, ends[:-1])):
+        time_key = get_time_key(field)
+        coords = {time_key: field[time_key]}
+        if "mode" in projector.coords:
+            coords["mode"] = projector["mode"]
+        pseudo_pcs = xr.DataArray(
+            values,
+            coords=coords,
+            dims=[time_key],
+            name="pseudo_pcs",
+            attrs={
+                "long_name": f"{field.name}_pseudo_pcs",
+                "comment": projector.attrs["comment"],
+            },
+        )
+        pseudo_pcs_list.append(pseudo_pcs)
+    # return result
+    return pseudo_pcs_list
+
+
 def gain_pcs_fraction(
     ds_full_field: xr.Dataset,
     varname_full_field: str,
@@ -0,0 +1,293 @@
+from time import perf_counter
+
+import numpy as np
+import xarray as xr
+from eofs import standard
+from eofs.tools.xarray import categorise_ndcoords, find_time_coordinates
+from eofs.xarray import Eof
+
+EOF_BACKENDS = ["eofs", "randomized", "covariance"]
+
+
+def get_eof_solver(
+    da: xr.DataArray, weights=None, backend: str = "eofs", neofs: int = 10
+):
+    """
+    Get an EOF solver with the selected backend.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        A time-varying 2D array (time, lat, lon).
+    weights : xr.DataArray or np.ndarray, optional
+        Weights of the analysis (e.g., area weights). Default is None.
+    backend : str, optional
+        "eofs" (default) for the full singular value decomposition (SVD) of
+        `eofs.xarray.Eof`, "randomized" for a randomized truncated SVD, or
+        "covariance" for the eigen-decomposition of the time-time covariance matrix,
+        which is efficient when there are much fewer time steps than grid points.
+    neofs : int, optional
+        The number of leading EOFs computed by the truncated backends. Default is 10.
+
+    Returns
+    -------
+    solver : eofs.xarray.Eof
+        The EOF solver. The solvers of the truncated backends have the same
+        methods, but only for their leading `neofs` EOFs.
+    """
+    if backend == "eofs":
+        return Eof(da, weights=weights)
+    elif backend in ["randomized", "covariance"]:
+        return TruncatedEof(da, weights=weights, neofs=neofs, method=backend)
+    else:
+        raise ValueError(
+            f"Unsupported EOF backend {backend}. Backend must be one of {EOF_BACKENDS}"
+        )
+
+
+class TruncatedEof(Eof):
+    """
+    EOF solver that computes only the leading EOFs.
+
+    Subclass of `eofs.xarray.Eof` with the same methods and outputs for the leading
+    `neofs` EOFs. The variance fractions and North test errors are relative to the
+    total variance of the data, as for the full solver.
+
+    Parameters
+    ----------
+    array : xr.DataArray
+        A time-varying array with time as the first dimension.
+    weights : xr.DataArray or np.ndarray, optional
+        Weights of the analysis. Default is None.
+    neofs : int, optional
+        The number of leading EOFs to compute. Default is 10.
+    method : str, optional
+        "randomized" (default) or "covariance" (see :func:`get_eof_solver`).
+    center : bool, optional
+        If True, removes the time mean. Default is True.
+    ddof : int, optional
+        Delta degrees of freedom of the covariance. Default is 1.
+    n_iter : int, optional
+        Number of power iterations of the randomized SVD. Default is 7.
+    n_oversamples : int, optional
+        Number of additional random vectors of the randomized SVD. Default is 10.
+    seed : int, optional
+        Seed of the random vectors of the randomized SVD. Default is 0.
+    """
+
+    def __init__(
+        self,
+        array: xr.DataArray,
+        weights=None,
+        neofs: int = 10,
+        method: str = "randomized",
+        center: bool = True,
+        ddof: int = 1,
+        n_iter: int = 7,
+        n_oversamples: int = 10,
+        seed: int = 0,
+    ):
+        if not isinstance(array, xr.DataArray):
+            raise TypeError("the input must be an xarray DataArray")
+        time_coords = find_time_coordinates(array)
+        if len(time_coords) != 1:
+            raise ValueError("cannot find a unique time coordinate")
+        if array.dims[0] != time_coords[0].name:
+            raise ValueError(
+                "time must be the first dimension, consider using the transpose() method"
+            )
+        self._time = time_coords[0]
+        self._coords = [array.coords[dim] for dim in array.dims[1:]]
+        (
+            self._time_ndcoords,
+            self._space_ndcoords,
+            self._time_space_ndcoords,
+        ) = categorise_ndcoords(array, self._time.name)
+        if weights is not None:
+            weights = np.asarray(weights).astype(array.dtype)
+        self._solver = _TruncatedStandardEof(
+            np.asarray(array),
+            weights=weights,
+            neofs=neofs,
+            method=method,
+            center=center,
+            ddof=ddof,
+            n_iter=n_iter,
+            n_oversamples=n_oversamples,
+            seed=seed,
+        )
+        self._name = array.name
+        self.neofs = self._solver.neofs
+
+
+class _TruncatedStandardEof(standard.Eof):
+    # eofs.standard.Eof with a truncated decomposition of the data matrix
+
+    def __init__(
+        self,
+        dataset,
+        weights=None,
+        neofs=10,
+        method="randomized",
+        center=True,
+        ddof=1,
+        n_iter=7,
+        n_oversamples=10,
+        seed=0,
+    ):
+        # Same preparation of the (time, space) data matrix as eofs.standard.Eof
+        if dataset.ndim < 2:
+            raise ValueError("the input data set must be at least two dimensional")
+        self._data = dataset.copy()
+        self._filled = False
+        self._records = self._data.shape[0]
+        self._originalshape = self._data.shape[1:]
+        channels = int(np.prod(self._originalshape))
+        if weights is not None:
+            self._weights = np.broadcast_arrays(self._data[0:1], weights)[1][0]
+            self._data = self._data * self._weights
+        else:
+            self._weights = None
+        self._centered = center
+        if center:
+            self._data = self._center(self._data)
+        self._data = self._data.reshape([self._records, channels])
+        if not self._valid_nan(self._data):
+            raise ValueError(
+                "missing values detected in different locations at different times"
+            )
+        nonMissingIndex = np.where(np.logical_not(np.isnan(self._data[0])))[0]
+        dataNoMissing = self._data[:, nonMissingIndex]
+        if dataNoMissing.size == 0:
+            raise ValueError("all input data is missing")
+
+        neofs = min(neofs, *dataNoMissing.shape)
+        if method == "randomized":
+            A, Lh, E = _randomized_svd(
+                dataNoMissing, neofs, n_iter, n_oversamples, seed
+            )
+        elif method == "covariance":
+            A, Lh, E = _covariance_svd(dataNoMissing, neofs)
+        else:
+            raise ValueError(f"Unsupported method {method}")
+
+        self._ddof = ddof
+        normfactor = float(self._records - self._ddof)
+        self._L = Lh * Lh / normfactor
+        # Total variance of all EOFs, for the variance fractions
+        self._total_variance = float(np.sum(dataNoMissing**2)) / normfactor
+        self.neofs = len(self._L)
+        self._flatE = np.full([self.neofs, channels], np.nan, dtype=self._data.dtype)
+        self._flatE[:, nonMissingIndex] = E
+        self._P = A * Lh
+
+    def varianceFraction(self, neigs=None):
+        return self._L[slice(0, neigs)] / self._total_variance
+
+    def totalAnomalyVariance(self):
+        return self._total_variance
+
+    def northTest(self, neigs=None, vfscaled=False):
+        factor = np.sqrt(2.0 / self._records)
+        if vfscaled:
+            factor /= self._total_variance
+        return self._L[slice(0, neigs)] * factor
+
+
+def _randomized_svd(data, k, n_iter, n_oversamples, seed):
+    # Randomized truncated SVD (Halko et al., 2011, doi:10.1137/090771806)
+    # with power iterations for the leading k singular vectors
+    data = data.astype(np.float64, copy=False)
+    rng = np.random.default_rng(seed)
+    nvec = min(k + n_oversamples, *data.shape)
+    Q = data @ rng.standard_normal((data.shape[1], nvec))
+    Q = np.linalg.qr(Q)[0]
+    for _ in range(n_iter):
+        Q = np.linalg.qr(data.T @ Q)[0]
+        Q = np.linalg.qr(data @ Q)[0]
+    U, s, Vt = np.linalg.svd(Q.T @ data, full_matrices=False)
+    return (Q @ U)[:, :k], s[:k], Vt[:k]
+
+
+def _covariance_svd(data, k):
+    # Leading k singular vectors from the eigen-decomposition of the
+    # time-time matrix data @ data.T (cheap when time << space)
+    data = data.astype(np.float64, copy=False)
+    eigenvalues, U = np.linalg.eigh(data @ data.T)
+    order = np.argsort(eigenvalues)[::-1][:k]
+    s = np.sqrt(np.clip(eigenvalues[order], 0, None))
+    U = U[:, order]
+    # Zero singular values (e.g., the mode removed by centering) get zero EOFs
+    Vt = (U.T @ data) / np.where(s > 0, s, np.inf)[:, np.newaxis]
+    return U, s, Vt
+
+
+def benchmark_eof_backends(
+    da: xr.DataArray,
+    weights=None,
+    neofs: int = 3,
+    backends: list = None,
+    repeat: int = 1,
+) -> dict:
+    """
+    Compare the run time and results of the EOF backends with the full `eofs` solver.
+
+    Parameters
+    ----------
+    da : xr.DataArray
+        A time-varying 2D array (time, lat, lon).
+    weights : xr.DataArray or np.ndarray, optional
+        Weights of the analysis (e.g., area weights). Default is None.
+    neofs : int, optional
+        The number of leading EOFs to compare. Default is 3.
+    backends : list of str, optional
+        The backends to benchmark. Default is all of :data:`EOF_BACKENDS`.
+    repeat : int, optional
+        The number of runs of each backend; the fastest is reported. Default is 1.
+
+    Returns
+    -------
+    dict
+        For each backend, the run time in seconds of the solver and of getting its
+        EOFs, PCs and variance fractions ("time"), the largest absolute difference of
+        its variance fractions with those of the `eofs` backend
+        ("max_variance_fraction_diff"), and the smallest absolute pattern correlation
+        of its EOFs with those of the `eofs` backend ("min_eof_pattern_cor").
+
+    Examples
+    --------
+    >>> from pcmdi_metrics.variability_mode.lib import benchmark_eof_backends
+    >>> benchmark_eof_backends(ds["psl"], weights=area_weights)
+    """
+    if backends is None:
+        backends = EOF_BACKENDS
+
+    results = {}
+    outputs = {}
+    for backend in ["eofs"] + [b for b in backends if b != "eofs"]:
+        times = []
+        for _ in range(repeat):
+            start = perf_counter()
+            solver = get_eof_solver(da, weights=weights, backend=backend, neofs=neofs)
+            eof = solver.eofsAsCovariance(neofs=neofs, pcscaling=1)
+            solver.pcs(npcs=neofs)
+            frac = solver.varianceFraction(neigs=neofs)
+            times.append(perf_counter() - start)
+        outputs[backend] = (eof.values.reshape(neofs, -1), frac.values)
+        results[backend] = {"time": min(times)}
+
+    eof_ref, frac_ref = outputs["eofs"]
+    valid = np.all(np.isfinite(eof_ref), axis=0)
+    for backend in results:
+        eof, frac = outputs[backend]
+        # EOF signs are arbitrary
+        cor = [
+            abs(np.corrcoef(eof[n, valid], eof_ref[n, valid])[0, 1])
+            for n in range(neofs)
+        ]
+        results[backend]["max_variance_fraction_diff"] = float(
+            np.max(np.abs(frac - frac_ref))
+        )
+        results[backend]["min_eof_pattern_cor"] = float(np.min(cor))
+
+    return {backend: results[backend] for backend in backends}
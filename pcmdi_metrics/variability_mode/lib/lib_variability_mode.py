@@ -1,6 +1,8 @@
 import copy
 import os
 import re
+import resource
+import sys
 import warnings
 from collections import defaultdict
 from datetime import datetime
@@ -13,6 +15,7 @@ import xcdat as xc
 
 import pcmdi_metrics
 from pcmdi_metrics.io import (
+    get_latitude,
     get_latitude_bounds_key,
     get_latitude_key,
     get_longitude,
@@ -129,6 +132,39 @@ def get_eof_numbers(mode: str, param) -> tuple:
     return eofn_obs, eofn_mod, eofn_mod_max, eofn_expected
 
 
+def get_mode_settings(mode: str) -> dict:
+    """
+    Get the data settings conventionally used to analyze a variability mode.
+
+    Parameters
+    ----------
+    mode : str
+        The climate variability mode. "PDO", "NPGO" and "AMO" are SST based modes
+        analyzed over the ocean from monthly anomalies; the other modes are based
+        on sea level pressure and analyzed for the four seasons.
+
+    Returns
+    -------
+    dict
+        Dictionary with the variable ("varModel"), seasons ("seasons"), land
+        masking ("LandMask") and domain mean removal ("RmDomainMean") of the mode.
+        Modes can be analyzed in one run only if their settings are the same.
+    """
+    if mode in ["PDO", "NPGO", "AMO"]:
+        return {
+            "varModel": "ts",
+            "seasons": ["monthly"],
+            "LandMask": True,
+            "RmDomainMean": True,
+        }
+    return {
+        "varModel": "psl",
+        "seasons": ["DJF", "MAM", "JJA", "SON"],
+        "LandMask": False,
+        "RmDomainMean": True,
+    }
+
+
 def write_nc_output(
     output_file_name, eofMap, pc, frac, slopeMap, interceptMap, identifier=None
 ):
@@ -188,9 +224,57 @@ def read_data_in(
     var_lf: str = "sftlf",
     LandMask: bool = False,
     debug: bool = False,
+    chunks: Union[int, str, dict] = None,
+    lat_range: tuple = None,
+    lon_range: tuple = None,
 ) -> xr.Dataset:
+    """
+    Read the time series of a variable for the variability mode analysis.
+
+    The time range (and the optional latitude and longitude ranges) are selected
+    before any data are read. With `chunks`, the data are read as dask arrays, so that
+    the unit conversion, sea ice adjustment and land masking are done chunk by chunk,
+    and only the selected data are loaded into memory at the end.
+
+    Parameters
+    ----------
+    path : str or list
+        Path(s) of the data file(s).
+    var_in_data : str
+        Name of the variable in the data.
+    var_to_consider : str
+        Name of the variable of the analysis.
+    syear : str, int or float
+        Start year.
+    eyear : str, int or float
+        End year.
+    UnitsAdjust : tuple, optional
+        Unit conversion (see :func:`adjust_units`). Default is None.
+    lf_path : str, optional
+        Path of the land fraction file. Default is None.
+    var_lf : str, optional
+        Name of the land fraction variable. Default is "sftlf".
+    LandMask : bool, optional
+        If True, masks out the land. Default is False.
+    debug : bool, optional
+        If True, prints debug information. Default is False.
+    chunks : int, str or dict, optional
+        Dask chunk sizes to read the data, e.g., {"time": 120}. Default is None, which
+        reads the data as before without dask chunks (one chunk per file for
+        multiple files).
+    lat_range : tuple, optional
+        Latitude range (min, max) to read. Default is None for all latitudes.
+    lon_range : tuple, optional
+        Longitude range (min, max) to read, in 0-360. Default is None for all
+        longitudes.
+
+    Returns
+    -------
+    xr.Dataset
+        The time series, with "lat" and "lon" coordinates and longitudes in 0-360.
+    """
     # Open data file
-    ds = xcdat_open(path, chunks=None)
+    ds = xcdat_open(path, chunks=chunks)
 
     # Standardize coordinate names
     lat_key = get_latitude_key(ds)
@@ -212,15 +296,25 @@ def read_data_in(
         ds = ds.rename(name_dict={lon_bnds_key: "lon_bnds"})
         ds["lon"].attrs["bounds"] = "lon_bnds"
 
+    # Data QC check -- time axis check
+    check_monthly_time_axis(ds)
+
+    # Time subset, before anything else so that the other years are never read
+    ds = subset_time(ds, syear, eyear, debug=debug)
+
     # Adjust lon axis -- make sure they are 0-360 to begin with
     if get_longitude(ds).values.min() < 0:
         ds = xc.swap_lon_axis(ds, (0, 360))
 
-    # Data QC check -- time axis check
-    check_monthly_time_axis(ds)
+    # Spatial subset
+    if lat_range is not None:
+        lat = get_latitude(ds)
+        if lat.values[0] > lat.values[-1]:
+            lat_range = lat_range[::-1]
+    if lat_range is not None or lon_range is not None:
+        ds = select_subset(ds, lat=lat_range, lon=lon_range)
 
-    # Time subset
-    ds_time_subsetted = subset_time(ds, syear, eyear, debug=debug)
+    ds_time_subsetted = ds
     data_timeseries = ds_time_subsetted[var_in_data]
 
     # Sanity checks
@@ -267,9 +361,29 @@ def read_data_in(
     ds_time_subsetted[var_in_data] = data_timeseries
     # ds_time_subsetted = ds_time_subsetted.merge(data_timeseries.rename(var_in_data))  #, compat='override')
 
+    if chunks is not None:
+        # Load the selected data once, computed chunk by chunk
+        ds_time_subsetted = ds_time_subsetted.load()
+
     return ds_time_subsetted
 
 
+def get_peak_memory() -> float:
+    """
+    Get the peak memory usage (maximum resident set size) of the current process.
+
+    Returns
+    -------
+    float
+        Peak memory usage in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
 def check_start_end_year(ds: Union[xr.Dataset, xr.DataArray]):
     time_coord = get_time(ds)
     time_coord = get_time(ds)
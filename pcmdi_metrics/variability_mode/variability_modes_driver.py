@@ -35,6 +35,7 @@ import re
 import sys
 from argparse import RawTextHelpFormatter
 from shutil import copyfile
+from types import SimpleNamespace
 
 from pcmdi_metrics.io import fill_template, get_grid, load_regions_specs, region_subset
 from pcmdi_metrics.stats import calculate_temporal_correlation as calcTCOR
@@ -51,9 +52,14 @@ from pcmdi_metrics.variability_mode.lib import (
     debug_print,
     eof_analysis_get_variance_mode,
     gain_pcs_fraction,
-    gain_pseudo_pcs,
+    gain_pseudo_pcs_batch,
+    get_anomaly_timeseries,
+    get_cbf_projector,
     get_eof_numbers,
+    get_mode_settings,
+    get_peak_memory,
     linear_regression_on_globe_for_teleconnection,
+    linear_regression_on_globe_for_teleconnection_batch,
     north_test,
     plot_map,
     plot_map_multi_panel,
@@ -86,16 +92,23 @@ print("realm:", realm)
 # On/off switches
 obs_compare = True  # Statistics against observation
 CBF = param.CBF  # Conduct CBF analysis
+cbf_batch_size = max(param.cbf_batch_size, 1)  # Realizations per batched CBF
+# Dask chunks to read the data, None to read without chunks
+read_chunks = None if param.time_chunk_size is None else {"time": param.time_chunk_size}
 ConvEOF = param.ConvEOF  # Conduct conventional EOF analysis
 
 EofScaling = param.EofScaling  # If True, consider EOF with unit variance
+eof_backend = param.eof_backend  # EOF solver, see get_eof_solver
 RmDomainMean = param.RemoveDomainMean  # If True, remove Domain Mean of each time step
 LandMask = param.landmask  # If True, maskout land region thus consider only over ocean
 provenance = param.provenance
 
 print("EofScaling:", EofScaling)
+print("eof_backend:", eof_backend)
 print("RmDomainMean:", RmDomainMean)
 print("LandMask:", LandMask)
+print("cbf_batch_size:", cbf_batch_size)
+print("read_chunks:", read_chunks)
 print("provenance:", provenance)
 
 nc_out_obs = param.nc_out_obs  # Record NetCDF output
@@ -112,9 +125,33 @@ if hasattr(param, "cmec"):
     cmec = param.cmec  # Generate CMEC compliant json
 print("CMEC:" + str(cmec))
 
-# Check given mode of variability
-mode = VariabilityModeCheck(param.variability_mode, P)
-print("mode:", mode)
+# Check given modes of variability: a list of modes (analyzed from one read of
+# each data set) takes precedence over the single mode
+if param.variability_modes:
+    if isinstance(param.variability_modes, str):
+        param.variability_modes = [param.variability_modes]
+    modes = [VariabilityModeCheck(m, P) for m in param.variability_modes]
+    modes = list(dict.fromkeys(modes))  # remove duplicates
+else:
+    modes = [VariabilityModeCheck(param.variability_mode, P)]
+print("modes:", modes)
+
+# Modes analyzed in one run share the data and its processing, so their
+# variable, seasons, land masking and domain mean removal must be the same
+if len(modes) > 1:
+    mode_settings = {mode: get_mode_settings(mode) for mode in modes}
+    for key in ["varModel", "seasons", "LandMask", "RmDomainMean"]:
+        values = {mode: settings[key] for mode, settings in mode_settings.items()}
+        if any(value != values[modes[0]] for value in values.values()):
+            P.error(
+                f"Given modes do not share the same {key} ({values}). "
+                "Please analyze them in separate runs."
+            )
+    if param.eofn_obs is not None or param.eofn_mod is not None:
+        print(
+            "Warning: eofn_obs and eofn_mod are not used when several modes are "
+            "analyzed; each mode uses its expected EOF number"
+        )
 
 # Variables
 var = param.varModel
@@ -165,14 +202,6 @@ print("number of models:", len(models))
 realization = param.realization
 print("realization: ", realization)
 
-# EOF ordinal number
-eofn_obs, eofn_mod, eofn_mod_max, eofn_expected = get_eof_numbers(mode, param)
-
-print("eofn_obs:", eofn_obs)
-print("eofn_mod:", eofn_mod)
-print("eofn_mod_max:", eofn_mod_max)
-print("eofn_expected:", eofn_expected)
-
 # case id
 case_id = param.case_id
 
@@ -210,281 +239,856 @@ if oeyear is None:
 # -------------------------------------------------
 regions_specs = load_regions_specs()
 
-# =================================================
-# Create output directories
-# -------------------------------------------------
-outdir_template = param.results_dir
-
-output_types = ["graphics", "diagnostic_results", "metrics_results"]
-dir_paths = {}
-
-print("output directories:")
-
-for output_type in output_types:
-    dir_path = fill_template(
-        outdir_template,
-        output_type=output_type,
-        mip=mip,
-        exp=exp,
-        variability_mode=mode,
-        reference_data_name=obs_name,
-        case_id=case_id,
-    )
-    os.makedirs(dir_path, exist_ok=True)
-    print(output_type, ":", dir_path)
-    dir_paths[output_type] = dir_path
 
 # =================================================
-# Set dictionary for .json record
+# Mode setup: EOF numbers, output directories, and dictionary for .json record
 # -------------------------------------------------
-result_dict = tree()
+def setup_mode(mode):
+    print("mode:", mode)
 
-# Set metrics output JSON file
-json_filename = "_".join(
-    [
-        "var",
-        "mode",
-        mode,
-        "EOF" + str(eofn_mod),
-        "stat",
-        mip,
-        exp,
-        fq,
-        realm,
-        str(msyear) + "-" + str(meyear),
-    ]
-)
-json_file = os.path.join(dir_paths["metrics_results"], json_filename + ".json")
+    # EOF ordinal number: the expected one of each mode when several modes are analyzed
+    if len(modes) > 1:
+        eofn_obs, eofn_mod, eofn_mod_max, eofn_expected = get_eof_numbers(
+            mode, SimpleNamespace(eofn_obs=None, eofn_mod=None, eofn_mod_max=None)
+        )
+        if param.eofn_mod_max is not None:
+            eofn_mod_max = max(int(param.eofn_mod_max), eofn_mod)
+    else:
+        eofn_obs, eofn_mod, eofn_mod_max, eofn_expected = get_eof_numbers(mode, param)
 
-json_file_org = os.path.join(
-    dir_paths["metrics_results"],
-    "_".join([json_filename, "org", str(os.getpid())]) + ".json",
-)
+    print("eofn_obs:", eofn_obs)
+    print("eofn_mod:", eofn_mod)
+    print("eofn_mod_max:", eofn_mod_max)
+    print("eofn_expected:", eofn_expected)
+
+    # Create output directories
+    outdir_template = param.results_dir
+
+    output_types = ["graphics", "diagnostic_results", "metrics_results"]
+    dir_paths = {}
+
+    print("output directories:")
+
+    for output_type in output_types:
+        dir_path = fill_template(
+            outdir_template,
+            output_type=output_type,
+            mip=mip,
+            exp=exp,
+            variability_mode=mode,
+            reference_data_name=obs_name,
+            case_id=case_id,
+        )
+        os.makedirs(dir_path, exist_ok=True)
+        print(output_type, ":", dir_path)
+        dir_paths[output_type] = dir_path
+
+    # Set dictionary for .json record
+    result_dict = tree()
+
+    # Set metrics output JSON file
+    json_filename = "_".join(
+        [
+            "var",
+            "mode",
+            mode,
+            "EOF" + str(eofn_mod),
+            "stat",
+            mip,
+            exp,
+            fq,
+            realm,
+            str(msyear) + "-" + str(meyear),
+        ]
+    )
+    json_file = os.path.join(dir_paths["metrics_results"], json_filename + ".json")
+
+    json_file_org = os.path.join(
+        dir_paths["metrics_results"],
+        "_".join([json_filename, "org", str(os.getpid())]) + ".json",
+    )
+
+    # Archive if there is pre-existing JSON: preventing overwriting
+    if os.path.isfile(json_file) and os.stat(json_file).st_size > 0:
+        copyfile(json_file, json_file_org)
+        if update_json:
+            with open(json_file) as fj:
+                result_dict = json.load(fj)
+
+    if "REF" not in result_dict:
+        result_dict["REF"] = {}
+    if "RESULTS" not in result_dict:
+        result_dict["RESULTS"] = {}
+
+    if obs_compare:
+        # Set dictonary for json archive
+        if "obs" not in result_dict["REF"]:
+            result_dict["REF"]["obs"] = {}
+        if "defaultReference" not in result_dict["REF"]["obs"]:
+            result_dict["REF"]["obs"]["defaultReference"] = {}
+        if "source" not in result_dict["REF"]["obs"]["defaultReference"]:
+            result_dict["REF"]["obs"]["defaultReference"]["source"] = {}
+        if mode not in result_dict["REF"]["obs"]["defaultReference"]:
+            result_dict["REF"]["obs"]["defaultReference"][mode] = {}
+
+        result_dict["REF"]["obs"]["defaultReference"]["source"] = obs_path
+        result_dict["REF"]["obs"]["defaultReference"]["reference_eofs"] = eofn_obs
+        result_dict["REF"]["obs"]["defaultReference"]["period"] = (
+            str(osyear) + "-" + str(oeyear)
+        )
 
-# Archive if there is pre-existing JSON: preventing overwriting
-if os.path.isfile(json_file) and os.stat(json_file).st_size > 0:
-    copyfile(json_file, json_file_org)
-    if update_json:
-        with open(json_file) as fj:
-            result_dict = json.load(fj)
+    return {
+        "eofn_obs": eofn_obs,
+        "eofn_mod": eofn_mod,
+        "eofn_mod_max": eofn_mod_max,
+        "eofn_expected": eofn_expected,
+        "dir_paths": dir_paths,
+        "result_dict": result_dict,
+        # Keep information from observation in the memory during the season and model loop
+        "eof_obs": {},
+        "pc_obs": {},
+        "frac_obs": {},
+        "solver_obs": {},
+        "cbf_projector_obs": {},
+        "reverse_sign_obs": {},
+        "eof_lr_obs": {},
+        "eof_lr_obs_domain": {},
+        "stdv_pc_obs": {},
+        "obs_timeseries_season_dict": {},
+    }
+
+
+modes_info = {mode: setup_mode(mode) for mode in modes}
 
-if "REF" not in result_dict:
-    result_dict["REF"] = {}
-if "RESULTS" not in result_dict:
-    result_dict["RESULTS"] = {}
 
 # =================================================
-# Observation
+# Observation: analysis of one mode and season
 # -------------------------------------------------
-if obs_compare:
-    obs_lf_path = None
+def obs_season_analysis(mode, season, obs_timeseries_anomaly):
+    info = modes_info[mode]
+    eofn_obs = info["eofn_obs"]
+    dir_paths = info["dir_paths"]
+    result_dict = info["result_dict"]
+    eof_obs = info["eof_obs"]
+    pc_obs = info["pc_obs"]
+    frac_obs = info["frac_obs"]
+    solver_obs = info["solver_obs"]
+    cbf_projector_obs = info["cbf_projector_obs"]
+    reverse_sign_obs = info["reverse_sign_obs"]
+    eof_lr_obs = info["eof_lr_obs"]
+    eof_lr_obs_domain = info["eof_lr_obs_domain"]
+    stdv_pc_obs = info["stdv_pc_obs"]
+    obs_timeseries_season_dict = info["obs_timeseries_season_dict"]
+
+    if season not in result_dict["REF"]["obs"]["defaultReference"][mode]:
+        result_dict["REF"]["obs"]["defaultReference"][mode][season] = {}
+
+    dict_head_obs = result_dict["REF"]["obs"]["defaultReference"][mode][season]
+
+    # Time series adjustment (remove annual cycle, seasonal mean (if needed),
+    # and subtracting domain (or global) mean of each time step)
+    debug_print("time series adjustment", debug)
+    obs_timeseries_season = adjust_timeseries(
+        obs_timeseries,
+        obs_var,
+        mode,
+        season,
+        regions_specs,
+        RmDomainMean,
+        ds_anomaly=obs_timeseries_anomaly,
+    )
 
-    # read data in
-    obs_timeseries = read_data_in(
-        obs_path,
+    if debug:
+        print("obs_timeseries_season", obs_timeseries_season)
+
+    # Extract subdomain
+    obs_timeseries_season_subdomain = region_subset(
+        obs_timeseries_season, mode, regions_specs
+    )
+
+    if debug:
+        print("obs_timeseries_season_subdomain", obs_timeseries_season_subdomain)
+
+    # EOF analysis
+    debug_print("EOF analysis", debug)
+    (
+        eof_obs[season],
+        pc_obs[season],
+        frac_obs[season],
+        reverse_sign_obs[season],
+        solver_obs[season],
+    ) = eof_analysis_get_variance_mode(
+        mode,
+        obs_timeseries_season_subdomain,
         obs_var,
-        var,
-        osyear,
-        oeyear,
-        UnitsAdjust=ObsUnitsAdjust,
-        lf_path=obs_lf_path,
-        LandMask=LandMask,
+        eofn=eofn_obs,
         debug=debug,
+        EofScaling=EofScaling,
+        eof_backend=eof_backend,
     )
 
-    # Get global grid information for later use: regrid
-    if ref_grid_global is None:
-        ref_grid_global = get_grid(obs_timeseries)
-
-    # Set dictionary variables to keep information from observation in the memory during the season and model loop
-    eof_obs = {}
-    pc_obs = {}
-    frac_obs = {}
-    solver_obs = {}
-    reverse_sign_obs = {}
-    eof_lr_obs = {}
-    eof_lr_obs_domain = {}
-    stdv_pc_obs = {}
-    obs_timeseries_season_dict = {}
-
-    # Set dictonary for json archive
-    if "obs" not in result_dict["REF"]:
-        result_dict["REF"]["obs"] = {}
-    if "defaultReference" not in result_dict["REF"]["obs"]:
-        result_dict["REF"]["obs"]["defaultReference"] = {}
-    if "source" not in result_dict["REF"]["obs"]["defaultReference"]:
-        result_dict["REF"]["obs"]["defaultReference"]["source"] = {}
-    if mode not in result_dict["REF"]["obs"]["defaultReference"]:
-        result_dict["REF"]["obs"]["defaultReference"][mode] = {}
-
-    result_dict["REF"]["obs"]["defaultReference"]["source"] = obs_path
-    result_dict["REF"]["obs"]["defaultReference"]["reference_eofs"] = eofn_obs
-    result_dict["REF"]["obs"]["defaultReference"]["period"] = (
-        str(osyear) + "-" + str(oeyear)
+    # Keep the projection onto the obs EOF for the CBF of all model realizations
+    cbf_projector_obs[season] = get_cbf_projector(
+        solver_obs[season],
+        eofn_obs,
+        reverse_sign_obs[season],
+        EofScaling=EofScaling,
     )
 
-    # -------------------------------------------------
-    # Season loop
-    # - - - - - - - - - - - - - - - - - - - - - - - - -
-    debug_print("obs season loop starts", debug)
+    # Calculate stdv of pc time series
+    debug_print("calculate stdv of pc time series", debug)
+    stdv_pc_obs[season] = calcSTD(pc_obs[season])
+
+    # Linear regression to have extended global map; teleconnection purpose
+    (
+        eof_lr_obs_season,
+        slope_obs,
+        intercept_obs,
+    ) = linear_regression_on_globe_for_teleconnection(
+        pc_obs[season],
+        obs_timeseries_season,
+        obs_var,
+        stdv_pc_obs[season],
+        RmDomainMean,
+        EofScaling,
+        debug=debug,
+    )
 
-    for season in seasons:
-        debug_print("season: " + season, debug)
+    obs_timeseries_season["eof_lr"] = eof_lr_obs_season
+    obs_timeseries_season["slope"] = slope_obs
+    obs_timeseries_season["intercept"] = intercept_obs
 
-        if season not in result_dict["REF"]["obs"]["defaultReference"][mode]:
-            result_dict["REF"]["obs"]["defaultReference"][mode][season] = {}
+    obs_timeseries_season_dict[season] = obs_timeseries_season
 
-        dict_head_obs = result_dict["REF"]["obs"]["defaultReference"][mode][season]
+    # Extract subdomain for plot
+    obs_timeseries_season_region = region_subset(
+        obs_timeseries_season, mode, regions_specs=regions_specs
+    )
 
-        # Time series adjustment (remove annual cycle, seasonal mean (if needed),
-        # and subtracting domain (or global) mean of each time step)
-        debug_print("time series adjustment", debug)
-        obs_timeseries_season = adjust_timeseries(
-            obs_timeseries, obs_var, mode, season, regions_specs, RmDomainMean
-        )
+    eof_lr_obs_domain[season] = obs_timeseries_season_region["eof_lr"]
+    eof_lr_obs[season] = eof_lr_obs_season
+    # - - - - - - - - - - - - - - - - - - - - - - - - -
+    # Record results
+    # . . . . . . . . . . . . . . . . . . . . . . . . .
+    debug_print("record results", debug)
 
-        if debug:
-            print("obs_timeseries_season", obs_timeseries_season)
+    # Set output file name for NetCDF and plot
+    output_filename_obs = (
+        f"{mode}_{obs_var}_EOF{eofn_obs}_{season}_obs_{osyear}-{oeyear}"
+    )
 
-        # Extract subdomain
-        obs_timeseries_season_subdomain = region_subset(
-            obs_timeseries_season, mode, regions_specs
-        )
+    if EofScaling:
+        output_filename_obs += "_EOFscaled"
 
-        if debug:
-            print("obs_timeseries_season_subdomain", obs_timeseries_season_subdomain)
+    # Plot
+    if plot_obs:
+        debug_print("plot obs", debug)
+        output_img_file_obs = os.path.join(dir_paths["graphics"], output_filename_obs)
 
-        # EOF analysis
-        debug_print("EOF analysis", debug)
-        (
-            eof_obs[season],
-            pc_obs[season],
-            frac_obs[season],
-            reverse_sign_obs[season],
-            solver_obs[season],
-        ) = eof_analysis_get_variance_mode(
+        plot_map(
             mode,
-            obs_timeseries_season_subdomain,
-            obs_var,
-            eofn=eofn_obs,
+            "[REF] " + obs_name,
+            osyear,
+            oeyear,
+            season,
+            eof_lr_obs_domain[season],
+            frac_obs[season],
+            output_img_file_obs,
             debug=debug,
-            EofScaling=EofScaling,
         )
+        plot_map(
+            mode + "_teleconnection",
+            "[REF] " + obs_name,
+            osyear,
+            oeyear,
+            season,
+            eof_lr_obs[season],
+            frac_obs[season],
+            output_img_file_obs + "_teleconnection",
+            debug=debug,
+        )
+        debug_print("obs plotting end", debug)
 
-        # Calculate stdv of pc time series
-        debug_print("calculate stdv of pc time series", debug)
-        stdv_pc_obs[season] = calcSTD(pc_obs[season])
-
-        # Linear regression to have extended global map; teleconnection purpose
-        (
+    # NetCDF: Save global map, pc timeseries, and fraction in NetCDF output
+    if nc_out_obs:
+        debug_print("write obs nc", debug)
+        output_nc_file_obs = os.path.join(
+            dir_paths["diagnostic_results"], output_filename_obs
+        )
+        write_nc_output(
+            output_nc_file_obs,
             eof_lr_obs_season,
+            pc_obs[season],
+            frac_obs[season],
             slope_obs,
             intercept_obs,
-        ) = linear_regression_on_globe_for_teleconnection(
-            pc_obs[season],
-            obs_timeseries_season,
-            obs_var,
-            stdv_pc_obs[season],
-            RmDomainMean,
-            EofScaling,
-            debug=debug,
+            identifier=obs_name,
         )
 
-        obs_timeseries_season["eof_lr"] = eof_lr_obs_season
-        obs_timeseries_season["slope"] = slope_obs
-        obs_timeseries_season["intercept"] = intercept_obs
+    # Save stdv of PC time series in dictionary
+    dict_head_obs["stdv_pc"] = stdv_pc_obs[season]
+    dict_head_obs["frac"] = float(frac_obs[season])
+
+    # Mean
+    mean_obs = mean_xy(eof_obs[season])
+    mean_glo_obs = mean_xy(eof_lr_obs[season])
+    dict_head_obs["mean"] = float(mean_obs)
+    dict_head_obs["mean_glo"] = float(mean_glo_obs)
+    debug_print("obs mean end", debug)
+
+    # North test
+    north_test_plot_title = f"{mode}, {season}, {obs_name} {osyear}-{oeyear}"
+    north_test_output_filename = (
+        f"EG_Spec_North_test_{mode}_{season}_{obs_name}_{osyear}-{oeyear}"
+    )
+    north_test(
+        solver_obs[season],
+        outdir=dir_paths["diagnostic_results"],
+        output_filename=north_test_output_filename,
+        plot_title=north_test_plot_title,
+    )
+
+
+# =================================================
+# Model: preparation of one mode and season
+# -------------------------------------------------
+def model_season_prepare(mode, season, model_timeseries, model_timeseries_anomaly):
+    # Time series adjustment (remove annual cycle, seasonal mean (if needed),
+    # and subtracting domain (or global) mean of each time step)
+    debug_print("time series adjustment", debug)
+    model_timeseries_season = adjust_timeseries(
+        model_timeseries,
+        var,
+        mode,
+        season,
+        regions_specs,
+        RmDomainMean,
+        ds_anomaly=model_timeseries_anomaly,
+    )
 
-        obs_timeseries_season_dict[season] = obs_timeseries_season
+    # Extract subdomain
+    debug_print("extract subdomain", debug)
+    model_timeseries_season_subdomain = region_subset(
+        model_timeseries_season, mode, regions_specs
+    )
 
-        # Extract subdomain for plot
-        obs_timeseries_season_region = region_subset(
-            obs_timeseries_season, mode, regions_specs=regions_specs
+    prepared = {
+        "model_timeseries_season": model_timeseries_season,
+        "model_timeseries_season_subdomain": model_timeseries_season_subdomain,
+    }
+
+    if CBF and obs_compare:
+        # Regrid (interpolation, model grid to ref grid)
+        model_timeseries_season_regrid = regrid(
+            model_timeseries_season,
+            var,
+            ref_grid_global,
+            regrid_tool="regrid2",
+            fill_zero=True,
+            reuse_weights=True,
         )
 
-        eof_lr_obs_domain[season] = obs_timeseries_season_region["eof_lr"]
-        eof_lr_obs[season] = eof_lr_obs_season
-        # - - - - - - - - - - - - - - - - - - - - - - - - -
-        # Record results
-        # . . . . . . . . . . . . . . . . . . . . . . . . .
-        debug_print("record results", debug)
+        # QC
+        if var == "ts":
+            model_timeseries_season_regrid[var] = model_timeseries_season_regrid[
+                var
+            ].where(model_timeseries_season_regrid[var] < 1e10)
 
-        # Set output file name for NetCDF and plot
-        output_filename_obs = (
-            f"{mode}_{obs_var}_EOF{eofn_obs}_{season}_obs_{osyear}-{oeyear}"
+        # crop to subdomain
+        prepared["model_timeseries_season_regrid_subdomain"] = region_subset(
+            model_timeseries_season_regrid, mode, regions_specs, debug=debug
         )
 
+    return prepared
+
+
+# =================================================
+# Model: CBF of several realizations for one mode and season
+# -------------------------------------------------
+def model_cbf_batch(mode, season, prepared_runs):
+    # Project the realizations onto the obs EOF with one matrix multiplication
+    # and compute their teleconnection regressions together
+    info = modes_info[mode]
+    runs_batch = list(prepared_runs)
+    debug_print(f"CBF batch for {runs_batch}", debug)
+
+    # CBF PC time series
+    cbf_pcs = gain_pseudo_pcs_batch(
+        info["cbf_projector_obs"][season],
+        [
+            prepared_runs[run]["model_timeseries_season_regrid_subdomain"][var]
+            for run in runs_batch
+        ],
+    )
+
+    # Calculate stdv of cbf pc time series
+    stdv_cbf_pcs = [calcSTD(cbf_pc) for cbf_pc in cbf_pcs]
+
+    # Linear regression to have extended global map; teleconnection purpose
+    regressions = linear_regression_on_globe_for_teleconnection_batch(
+        cbf_pcs,
+        [prepared_runs[run]["model_timeseries_season"] for run in runs_batch],
+        var,
+        stdv_cbf_pcs,
+        RmDomainMean,
+        EofScaling,
+        debug=debug,
+    )
+
+    for run, cbf_pc, stdv_cbf_pc, (eof_lr_cbf, slope_cbf, intercept_cbf) in zip(
+        runs_batch, cbf_pcs, stdv_cbf_pcs, regressions
+    ):
+        prepared_runs[run]["cbf"] = {
+            "cbf_pc": cbf_pc,
+            "stdv_cbf_pc": stdv_cbf_pc,
+            "eof_lr_cbf": eof_lr_cbf,
+            "slope_cbf": slope_cbf,
+            "intercept_cbf": intercept_cbf,
+        }
+
+
+# =================================================
+# Model: analysis of one mode and season
+# -------------------------------------------------
+def model_season_analysis(mode, model, run, season, prepared):
+    info = modes_info[mode]
+    eofn_mod = info["eofn_mod"]
+    eofn_mod_max = info["eofn_mod_max"]
+    eofn_expected = info["eofn_expected"]
+    dir_paths = info["dir_paths"]
+    result_dict = info["result_dict"]
+    eof_obs = info["eof_obs"]
+    pc_obs = info["pc_obs"]
+    eof_lr_obs = info["eof_lr_obs"]
+    eof_lr_obs_domain = info["eof_lr_obs_domain"]
+    stdv_pc_obs = info["stdv_pc_obs"]
+    obs_timeseries_season_dict = info["obs_timeseries_season_dict"]
+
+    debug_print("season: " + season, debug)
+
+    if season not in result_dict["RESULTS"][model][run]["defaultReference"][mode]:
+        result_dict["RESULTS"][model][run]["defaultReference"][mode][season] = {}
+    result_dict["RESULTS"][model][run]["defaultReference"][mode][season]["period"] = (
+        str(msyear) + "-" + str(meyear)
+    )
+
+    model_timeseries_season = prepared["model_timeseries_season"]
+    model_timeseries_season_subdomain = prepared["model_timeseries_season_subdomain"]
+
+    # -------------------------------------------------
+    # Common Basis Function Approach
+    # - - - - - - - - - - - - - - - - - - - - - - - - -
+    if CBF and obs_compare:
+        if (
+            "cbf"
+            not in result_dict["RESULTS"][model][run]["defaultReference"][mode][season]
+        ):
+            result_dict["RESULTS"][model][run]["defaultReference"][mode][season][
+                "cbf"
+            ] = {}
+        dict_head = result_dict["RESULTS"][model][run]["defaultReference"][mode][
+            season
+        ]["cbf"]
+        debug_print("CBF approach start", debug)
+
+        model_timeseries_season_regrid_subdomain = prepared[
+            "model_timeseries_season_regrid_subdomain"
+        ]
+
+        # CBF PC time series and teleconnection from model_cbf_batch
+        cbf_pc = prepared["cbf"]["cbf_pc"]
+        stdv_cbf_pc = prepared["cbf"]["stdv_cbf_pc"]
+        eof_lr_cbf = prepared["cbf"]["eof_lr_cbf"]
+        slope_cbf = prepared["cbf"]["slope_cbf"]
+        intercept_cbf = prepared["cbf"]["intercept_cbf"]
+
+        model_timeseries_season["eof_lr_cbf"] = eof_lr_cbf
+        model_timeseries_season["slope_cbf"] = slope_cbf
+        model_timeseries_season["intercept_cbf"] = intercept_cbf
+
+        # Extract subdomain for statistics
+        model_timeseries_season_subdomain = region_subset(
+            model_timeseries_season,
+            mode,
+            regions_specs=regions_specs,
+        )
+
+        # Calculate fraction of variance explained by cbf pc
+        # (native grid)
+        frac_cbf = gain_pcs_fraction(
+            model_timeseries_season_subdomain,
+            var,
+            model_timeseries_season_subdomain,
+            "eof_lr_cbf",
+            cbf_pc / stdv_cbf_pc,
+            debug=debug,
+        )
+
+        # (regrid domain): sensitivity test purpose
+        frac_cbf_regrid = gain_pcs_fraction(
+            model_timeseries_season_regrid_subdomain,
+            var,
+            model_timeseries_season_subdomain,
+            "eof_lr_cbf",
+            cbf_pc / stdv_cbf_pc,
+            debug=debug,
+        )
+        dict_head["frac_cbf_regrid"] = float(frac_cbf_regrid)
+
+        # - - - - - - - - - - - - - - - - - - - - - - - - -
+        # Record results
+        # - - - - - - - - - - - - - - - - - - - - - - - - -
+        # Metrics results -- statistics to JSON
+        common_args_cbf = {
+            "mode": mode,
+            "dict_head": dict_head,
+            "model_ds": model_timeseries_season,
+            "model_data_var": "eof_lr_cbf",
+            "eof": model_timeseries_season_subdomain["eof_lr_cbf"],
+            "eof_lr": eof_lr_cbf,
+            "pc": cbf_pc,
+            "stdv_pc": stdv_cbf_pc,
+            "frac": frac_cbf,
+            "regions_specs": regions_specs,
+            "obs_ds": obs_timeseries_season_dict[season],
+            "eof_obs": eof_obs[season],
+            "eof_lr_obs": eof_lr_obs[season],
+            "stdv_pc_obs": stdv_pc_obs[season],
+            "obs_compare": obs_compare,
+            "method": "cbf",
+            "debug": debug,
+        }
+
+        dict_head, eof_lr_cbf = calc_stats_save_dict(**common_args_cbf)
+
+        # Set output file name for NetCDF and plot images
+        output_filename = f"{mode}_{var}_EOF{eofn_mod}_{season}_{mip}_{model}_{exp}_{run}_{fq}_{realm}_{msyear}-{meyear}"
         if EofScaling:
-            output_filename_obs += "_EOFscaled"
+            output_filename += "_EOFscaled"
 
-        # Plot
-        if plot_obs:
-            debug_print("plot obs", debug)
-            output_img_file_obs = os.path.join(
-                dir_paths["graphics"], output_filename_obs
+        # Diagnostics results -- data to NetCDF
+        # Save global map, pc timeseries, and fraction in NetCDF output
+        output_nc_file = os.path.join(dir_paths["diagnostic_results"], output_filename)
+        if nc_out_model:
+            write_nc_output(
+                output_nc_file + "_cbf",
+                eof_lr_cbf,
+                cbf_pc,
+                frac_cbf,
+                slope_cbf,
+                intercept_cbf,
+                identifier=f"{mip.upper()} {model} ({run}), CBF",
             )
 
+        # Graphics -- plot map image to PNG
+        output_img_file = os.path.join(dir_paths["graphics"], output_filename)
+        if plot_model:
+            # Regional map
             plot_map(
                 mode,
-                "[REF] " + obs_name,
-                osyear,
-                oeyear,
+                f"{mip.upper()} {model} ({run}) - CBF",
+                msyear,
+                meyear,
                 season,
-                eof_lr_obs_domain[season],
-                frac_obs[season],
-                output_img_file_obs,
+                model_timeseries_season_subdomain["eof_lr_cbf"],
+                frac_cbf,
+                output_file_name=f"{output_img_file}_cbf",
                 debug=debug,
             )
+            debug_print(f"plot CBF mode domain for {model} {run} completed", debug)
+
+            # Global map
             plot_map(
                 mode + "_teleconnection",
-                "[REF] " + obs_name,
-                osyear,
-                oeyear,
+                f"{mip.upper()} {model} ({run}) - CBF",
+                msyear,
+                meyear,
                 season,
-                eof_lr_obs[season],
-                frac_obs[season],
-                output_img_file_obs + "_teleconnection",
+                eof_lr_cbf,
+                frac_cbf,
+                output_file_name=f"{output_img_file}_cbf_teleconnection",
                 debug=debug,
             )
-            debug_print("obs plotting end", debug)
-
-        # NetCDF: Save global map, pc timeseries, and fraction in NetCDF output
-        if nc_out_obs:
-            debug_print("write obs nc", debug)
-            output_nc_file_obs = os.path.join(
-                dir_paths["diagnostic_results"], output_filename_obs
+            debug_print(
+                f"plot CBF teleconnection for {model} {run} completed",
+                debug,
             )
-            write_nc_output(
-                output_nc_file_obs,
-                eof_lr_obs_season,
-                pc_obs[season],
-                frac_obs[season],
-                slope_obs,
-                intercept_obs,
-                identifier=obs_name,
+
+            # Compare with observation
+            plot_map_multi_panel(
+                mode,
+                f"{mip.upper()} {model} ({run}) - CBF",
+                msyear,
+                meyear,
+                season,
+                eof_lr_obs_domain[season],  #  obs mode domain
+                eof_lr_obs[season],  # obs global
+                pc_obs[season],  # obs pc
+                model_timeseries_season_subdomain["eof_lr_cbf"],  # model mode domain
+                eof_lr_cbf,  # model global
+                cbf_pc,  # model pc
+                frac_cbf,
+                ref_name=obs_name,
+                output_file_name=f"{output_img_file}_cbf_compare_obs",
+                debug=debug,
             )
+            debug_print(f"plot CBF multiplot for {model} {run} completed", debug)
+        debug_print("cbf pcs end", debug)
 
-        # Save stdv of PC time series in dictionary
-        dict_head_obs["stdv_pc"] = stdv_pc_obs[season]
-        dict_head_obs["frac"] = float(frac_obs[season])
-
-        # Mean
-        mean_obs = mean_xy(eof_obs[season])
-        mean_glo_obs = mean_xy(eof_lr_obs[season])
-        dict_head_obs["mean"] = float(mean_obs)
-        dict_head_obs["mean_glo"] = float(mean_glo_obs)
-        debug_print("obs mean end", debug)
-
-        # North test
-        north_test_plot_title = f"{mode}, {season}, {obs_name} {osyear}-{oeyear}"
-        north_test_output_filename = (
-            f"EG_Spec_North_test_{mode}_{season}_{obs_name}_{osyear}-{oeyear}"
-        )
-        north_test(
-            solver_obs[season],
-            outdir=dir_paths["diagnostic_results"],
-            output_filename=north_test_output_filename,
-            plot_title=north_test_plot_title,
+    # -------------------------------------------------
+    # Conventional EOF approach as supplementary
+    # - - - - - - - - - - - - - - - - - - - - - - - - -
+    if ConvEOF:
+        # EOF analysis
+        debug_print("conventional EOF analysis start", debug)
+        (
+            eof_list,
+            pc_list,
+            frac_list,
+            reverse_sign_list,
+            solver,
+        ) = eof_analysis_get_variance_mode(
+            mode,
+            model_timeseries_season_subdomain,
+            var,
+            eofn=eofn_mod,
+            eofn_max=eofn_mod_max,
+            debug=debug,
+            EofScaling=EofScaling,
+            eof_backend=eof_backend,
+            save_multiple_eofs=True,
         )
+        debug_print("conventional EOF analysis done", debug)
+
+        # -------------------------------------------------
+        # For multiple EOFs (e.g., EOF1, EOF2, EOF3, ...)
+        # - - - - - - - - - - - - - - - - - - - - - - - - -
+        rms_list = []
+        cor_list = []
+        tcor_list = []
+
+        for n in range(0, eofn_mod_max):
+            eofs = f"eof{str(n + 1)}"
+            if (
+                eofs
+                not in result_dict["RESULTS"][model][run]["defaultReference"][mode][
+                    season
+                ]
+            ):
+                result_dict["RESULTS"][model][run]["defaultReference"][mode][season][
+                    eofs
+                ] = {}
+                dict_head = result_dict["RESULTS"][model][run]["defaultReference"][
+                    mode
+                ][season][eofs]
+
+            # Component for each EOFs
+            eof = eof_list[n]
+            pc = pc_list[n]
+            frac = frac_list[n]
+
+            # Calculate stdv of pc time series
+            stdv_pc = calcSTD(pc)
+
+            # Linear regression to have extended global map:
+            (
+                eof_lr,
+                slope,
+                intercept,
+            ) = linear_regression_on_globe_for_teleconnection(
+                pc,
+                model_timeseries_season,
+                var,
+                stdv_pc,
+                RmDomainMean,
+                EofScaling,
+                debug=debug,
+            )
+
+            model_timeseries_season["eof_lr"] = eof_lr
+            model_timeseries_season["slope"] = slope
+            model_timeseries_season["intercept"] = intercept
+
+            # - - - - - - - - - - - - - - - - - - - - - - - - -
+            # Record results
+            # - - - - - - - - - - - - - - - - - - - - - - - - -
+            # Metrics results -- statistics to JSON
+            common_args = {
+                "mode": mode,
+                "dict_head": dict_head,
+                "model_ds": model_timeseries_season,
+                "model_data_var": "eof_lr",
+                "eof": eof,
+                "eof_lr": eof_lr,
+                "pc": pc,
+                "stdv_pc": stdv_pc,
+                "frac": frac,
+                "regions_specs": regions_specs,
+                "obs_compare": obs_compare,
+                "method": "eof",
+                "debug": debug,
+            }
+
+            if obs_compare:
+                common_args.update(
+                    {
+                        "obs_ds": obs_timeseries_season_dict[season],
+                        "eof_obs": eof_obs[season],
+                        "eof_lr_obs": eof_lr_obs[season],
+                        "stdv_pc_obs": stdv_pc_obs[season],
+                    }
+                )
+
+            dict_head, eof_lr = calc_stats_save_dict(**common_args)
+
+            # Temporal correlation between CBF PC timeseries and usual model PC timeseries
+            if CBF:
+                tc = calcTCOR(cbf_pc, pc)
+                debug_print("cbf tc end", debug)
+                dict_head["tcor_cbf_vs_eof_pc"] = tc
+
+            # Set output file name for NetCDF and plot images
+            output_filename = f"{mode}_{var}_EOF{n + 1}_{season}_{mip}_{model}_{exp}_{run}_{fq}_{realm}_{msyear}-{meyear}"
+            if EofScaling:
+                output_filename += "_EOFscaled"
+
+            # Diagnostics results -- data to NetCDF
+            # Save global map, pc timeseries, and fraction in NetCDF output
+            output_nc_file = os.path.join(
+                dir_paths["diagnostic_results"], output_filename
+            )
+            if nc_out_model:
+                write_nc_output(
+                    output_nc_file,
+                    eof_lr,
+                    pc,
+                    frac,
+                    slope,
+                    intercept,
+                    identifier=f"{mip.upper()} {model} ({run}), {eofs.upper()}",
+                )
+
+            # Graphics -- plot map image to PNG
+            output_img_file = os.path.join(dir_paths["graphics"], output_filename)
+
+            eof_lr_domain = region_subset(
+                model_timeseries_season,
+                mode,
+                data_var="eof_lr",
+                regions_specs=regions_specs,
+            )["eof_lr"]
+
+            if plot_model:
+                # Regional map
+                plot_map(
+                    mode,
+                    f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
+                    msyear,
+                    meyear,
+                    season,
+                    eof_lr_domain,
+                    frac,
+                    output_img_file,
+                    debug=debug,
+                )
+                # Global map
+                plot_map(
+                    f"{mode}_teleconnection",
+                    f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
+                    msyear,
+                    meyear,
+                    season,
+                    eof_lr,
+                    frac,
+                    f"{output_img_file}_teleconnection",
+                    debug=debug,
+                )
+
+                if n + 1 == eofn_expected:
+                    # Compare with observation
+                    plot_map_multi_panel(
+                        mode,
+                        f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
+                        msyear,
+                        meyear,
+                        season,
+                        eof_lr_obs_domain[season],  #  obs mode domain
+                        eof_lr_obs[season],  # obs global
+                        pc_obs[season],  # obs pc
+                        eof_lr_domain,  # model mode domain
+                        eof_lr,  # model global
+                        pc,  # model pc
+                        frac,
+                        ref_name=obs_name,
+                        output_file_name=f"{output_img_file}_eof{n + 1}_compare_obs",
+                        debug=debug,
+                    )
+
+            # - - - - - - - - - - - - - - - - - - - - - - - - -
+            # EOF swap diagnosis
+            # - - - - - - - - - - - - - - - - - - - - - - - - -
+            rms_list.append(dict_head["rms"])
+            cor_list.append(dict_head["cor"])
+            if CBF:
+                tcor_list.append(dict_head["tcor_cbf_vs_eof_pc"])
+
+        # Find best matching eofs with different criteria
+        best_matching_eofs_rms = rms_list.index(min(rms_list)) + 1
+        best_matching_eofs_cor = cor_list.index(max(cor_list)) + 1
+        if CBF:
+            best_matching_eofs_tcor = tcor_list.index(max(tcor_list)) + 1
+
+        # Save the best matching information to JSON
+        dict_head = result_dict["RESULTS"][model][run]["defaultReference"][mode][season]
+        dict_head["best_matching_model_eofs__rms"] = best_matching_eofs_rms
+        dict_head["best_matching_model_eofs__cor"] = best_matching_eofs_cor
+        if CBF:
+            dict_head["best_matching_model_eofs__tcor_cbf_vs_eof_pc"] = (
+                best_matching_eofs_tcor
+            )
+
+        debug_print("conventional eof end", debug)
+
+
+# =================================================
+# Observation
+# -------------------------------------------------
+if obs_compare:
+    obs_lf_path = None
+
+    # read data in
+    obs_timeseries = read_data_in(
+        obs_path,
+        obs_var,
+        var,
+        osyear,
+        oeyear,
+        UnitsAdjust=ObsUnitsAdjust,
+        lf_path=obs_lf_path,
+        LandMask=LandMask,
+        debug=debug,
+        chunks=read_chunks,
+    )
+    print(f"Peak memory usage after reading obs: {get_peak_memory():.1f} MB")
+
+    # Get global grid information for later use: regrid
+    if ref_grid_global is None:
+        ref_grid_global = get_grid(obs_timeseries)
+
+    # -------------------------------------------------
+    # Season loop
+    # - - - - - - - - - - - - - - - - - - - - - - - - -
+    debug_print("obs season loop starts", debug)
+
+    for season in seasons:
+        debug_print("season: " + season, debug)
+
+        # Remove annual cycle (and get seasonal mean if needed) once for all modes
+        obs_timeseries_anomaly = get_anomaly_timeseries(obs_timeseries, obs_var, season)
+
+        for mode in modes:
+            debug_print("mode: " + mode, debug)
+            obs_season_analysis(mode, season, obs_timeseries_anomaly)
 
     debug_print("obs end", debug)
 
@@ -494,8 +1098,9 @@ if obs_compare:
 for model in models:
     print(" ----- ", model, " ---------------------")
 
-    if model not in result_dict["RESULTS"]:
-        result_dict["RESULTS"][model] = {}
+    for mode in modes:
+        if model not in modes_info[mode]["result_dict"]["RESULTS"]:
+            modes_info[mode]["result_dict"]["RESULTS"][model] = {}
 
     print("modpath:", modpath)
 
@@ -544,542 +1149,215 @@ for model in models:
     print("runs:", runs)
 
     # -------------------------------------------------
-    # Run
+    # Run: realizations are processed in batches of cbf_batch_size, so that
+    # their CBF projections and regressions are computed together
     # -------------------------------------------------
-    for run in runs:
-        print("run:", runs)
-        try:
-            print(" --- ", run, " ---")
+    for batch_start in range(0, len(runs), cbf_batch_size):
+        batch_runs = runs[batch_start : batch_start + cbf_batch_size]
 
-            model_run_path = search_paths(model_path_list, model, run)
-            print("model_run_path:", model_run_path)
+        model_timeseries_runs = {}
+        run_years = {}
+        for run in batch_runs:
+            print("run:", runs)
+            try:
+                print(" --- ", run, " ---")
 
-            if run not in result_dict["RESULTS"][model]:
-                result_dict["RESULTS"][model][run] = {}
+                model_run_path = search_paths(model_path_list, model, run)
+                print("model_run_path:", model_run_path)
 
-            if "defaultReference" not in result_dict["RESULTS"][model][run]:
-                result_dict["RESULTS"][model][run]["defaultReference"] = {}
-
-            if mode not in result_dict["RESULTS"][model][run]["defaultReference"]:
-                result_dict["RESULTS"][model][run]["defaultReference"][mode] = {}
-
-            result_dict["RESULTS"][model][run]["defaultReference"][mode][
-                "target_model_eofs"
-            ] = eofn_mod
-
-            if LandMask and modpath_lf is not None:
-                model_lf_path = fill_template(modpath_lf, mip=mip, exp=exp, model=model)
-            else:
-                model_lf_path = None
-            print("model_lf_path:", model_lf_path)
-
-            # read data in
-            model_timeseries = read_data_in(
-                model_run_path,
-                var,
-                var,
-                msyear,
-                meyear,
-                UnitsAdjust=ModUnitsAdjust,
-                lf_path=model_lf_path,
-                LandMask=LandMask,
-                debug=debug,
-            )
-
-            msyear, meyear = check_start_end_year(model_timeseries)
-
-            debug_print("msyear: " + str(msyear) + " meyear: " + str(meyear), debug)
-
-            # -------------------------------------------------
-            # Season loop
-            # - - - - - - - - - - - - - - - - - - - - - - - - -
-            for season in seasons:
-                debug_print("season: " + season, debug)
+                for mode in modes:
+                    result_dict = modes_info[mode]["result_dict"]
+                    eofn_mod = modes_info[mode]["eofn_mod"]
 
-                if (
-                    season
-                    not in result_dict["RESULTS"][model][run]["defaultReference"][mode]
-                ):
-                    result_dict["RESULTS"][model][run]["defaultReference"][mode][
-                        season
-                    ] = {}
-                result_dict["RESULTS"][model][run]["defaultReference"][mode][season][
-                    "period"
-                ] = (str(msyear) + "-" + str(meyear))
-
-                # Time series adjustment (remove annual cycle, seasonal mean (if needed),
-                # and subtracting domain (or global) mean of each time step)
-                debug_print("time series adjustment", debug)
-                model_timeseries_season = adjust_timeseries(
-                    model_timeseries, var, mode, season, regions_specs, RmDomainMean
-                )
+                    if run not in result_dict["RESULTS"][model]:
+                        result_dict["RESULTS"][model][run] = {}
 
-                # Extract subdomain
-                debug_print("extract subdomain", debug)
-                model_timeseries_season_subdomain = region_subset(
-                    model_timeseries_season, mode, regions_specs
-                )
+                    if "defaultReference" not in result_dict["RESULTS"][model][run]:
+                        result_dict["RESULTS"][model][run]["defaultReference"] = {}
 
-                # -------------------------------------------------
-                # Common Basis Function Approach
-                # - - - - - - - - - - - - - - - - - - - - - - - - -
-                if CBF and obs_compare:
                     if (
-                        "cbf"
-                        not in result_dict["RESULTS"][model][run]["defaultReference"][
-                            mode
-                        ][season]
-                    ):
-                        result_dict["RESULTS"][model][run]["defaultReference"][mode][
-                            season
-                        ]["cbf"] = {}
-                    dict_head = result_dict["RESULTS"][model][run]["defaultReference"][
                         mode
-                    ][season]["cbf"]
-                    debug_print("CBF approach start", debug)
-
-                    # Regrid (interpolation, model grid to ref grid)
-                    model_timeseries_season_regrid = regrid(
-                        model_timeseries_season,
-                        var,
-                        ref_grid_global,
-                        regrid_tool="regrid2",
-                        fill_zero=True,
-                    )
-
-                    # QC
-                    if var == "ts":
-                        model_timeseries_season_regrid[var] = (
-                            model_timeseries_season_regrid[var].where(
-                                model_timeseries_season_regrid[var] < 1e10
-                            )
-                        )
-
-                    # crop to subdomain
-                    model_timeseries_season_regrid_subdomain = region_subset(
-                        model_timeseries_season_regrid, mode, regions_specs, debug=debug
-                    )
-
-                    # CBF PC time series
-                    cbf_pc = gain_pseudo_pcs(
-                        solver_obs[season],
-                        model_timeseries_season_regrid_subdomain[var],
-                        eofn_obs,
-                        reverse_sign_obs[season],
-                        EofScaling=EofScaling,
-                    )
-
-                    # Calculate stdv of cbf pc time series
-                    stdv_cbf_pc = calcSTD(cbf_pc)
-
-                    # Linear regression to have extended global map; teleconnection purpose
-                    (
-                        eof_lr_cbf,
-                        slope_cbf,
-                        intercept_cbf,
-                    ) = linear_regression_on_globe_for_teleconnection(
-                        cbf_pc,
-                        model_timeseries_season,
-                        var,
-                        stdv_cbf_pc,
-                        RmDomainMean,
-                        EofScaling,
-                        debug=debug,
-                    )
+                        not in result_dict["RESULTS"][model][run]["defaultReference"]
+                    ):
+                        result_dict["RESULTS"][model][run]["defaultReference"][
+                            mode
+                        ] = {}
 
-                    model_timeseries_season["eof_lr_cbf"] = eof_lr_cbf
-                    model_timeseries_season["slope_cbf"] = slope_cbf
-                    model_timeseries_season["intercept_cbf"] = intercept_cbf
+                    result_dict["RESULTS"][model][run]["defaultReference"][mode][
+                        "target_model_eofs"
+                    ] = eofn_mod
 
-                    # Extract subdomain for statistics
-                    model_timeseries_season_subdomain = region_subset(
-                        model_timeseries_season,
-                        mode,
-                        regions_specs=regions_specs,
+                if LandMask and modpath_lf is not None:
+                    model_lf_path = fill_template(
+                        modpath_lf, mip=mip, exp=exp, model=model
                     )
+                else:
+                    model_lf_path = None
+                print("model_lf_path:", model_lf_path)
+
+                # read data in
+                model_timeseries = read_data_in(
+                    model_run_path,
+                    var,
+                    var,
+                    msyear,
+                    meyear,
+                    UnitsAdjust=ModUnitsAdjust,
+                    lf_path=model_lf_path,
+                    LandMask=LandMask,
+                    debug=debug,
+                    chunks=read_chunks,
+                )
+                print(
+                    f"Peak memory usage after reading {model} {run}: "
+                    f"{get_peak_memory():.1f} MB"
+                )
 
-                    # Calculate fraction of variance explained by cbf pc
-                    # (native grid)
-                    frac_cbf = gain_pcs_fraction(
-                        model_timeseries_season_subdomain,
-                        var,
-                        model_timeseries_season_subdomain,
-                        "eof_lr_cbf",
-                        cbf_pc / stdv_cbf_pc,
-                        debug=debug,
-                    )
+                msyear, meyear = check_start_end_year(model_timeseries)
 
-                    # (regrid domain): sensitivity test purpose
-                    frac_cbf_regrid = gain_pcs_fraction(
-                        model_timeseries_season_regrid_subdomain,
-                        var,
-                        model_timeseries_season_subdomain,
-                        "eof_lr_cbf",
-                        cbf_pc / stdv_cbf_pc,
-                        debug=debug,
-                    )
-                    dict_head["frac_cbf_regrid"] = float(frac_cbf_regrid)
-
-                    # - - - - - - - - - - - - - - - - - - - - - - - - -
-                    # Record results
-                    # - - - - - - - - - - - - - - - - - - - - - - - - -
-                    # Metrics results -- statistics to JSON
-                    common_args_cbf = {
-                        "mode": mode,
-                        "dict_head": dict_head,
-                        "model_ds": model_timeseries_season,
-                        "model_data_var": "eof_lr_cbf",
-                        "eof": model_timeseries_season_subdomain["eof_lr_cbf"],
-                        "eof_lr": eof_lr_cbf,
-                        "pc": cbf_pc,
-                        "stdv_pc": stdv_cbf_pc,
-                        "frac": frac_cbf,
-                        "regions_specs": regions_specs,
-                        "obs_ds": obs_timeseries_season_dict[season],
-                        "eof_obs": eof_obs[season],
-                        "eof_lr_obs": eof_lr_obs[season],
-                        "stdv_pc_obs": stdv_pc_obs[season],
-                        "obs_compare": obs_compare,
-                        "method": "cbf",
-                        "debug": debug,
-                    }
+                debug_print("msyear: " + str(msyear) + " meyear: " + str(meyear), debug)
 
-                    dict_head, eof_lr_cbf = calc_stats_save_dict(**common_args_cbf)
+                model_timeseries_runs[run] = model_timeseries
+                run_years[run] = (msyear, meyear)
 
-                    # Set output file name for NetCDF and plot images
-                    output_filename = f"{mode}_{var}_EOF{eofn_mod}_{season}_{mip}_{model}_{exp}_{run}_{fq}_{realm}_{msyear}-{meyear}"
-                    if EofScaling:
-                        output_filename += "_EOFscaled"
+            except Exception as err:
+                if debug:
+                    raise
+                else:
+                    print("warning: metrics calculation failed for ", model, run, err)
 
-                    # Diagnostics results -- data to NetCDF
-                    # Save global map, pc timeseries, and fraction in NetCDF output
-                    output_nc_file = os.path.join(
-                        dir_paths["diagnostic_results"], output_filename
+        # -------------------------------------------------
+        # Season loop
+        # - - - - - - - - - - - - - - - - - - - - - - - - -
+        failed_modes = {run: [] for run in model_timeseries_runs}
+        for season in seasons:
+            debug_print("season: " + season, debug)
+
+            # Remove annual cycle (and get seasonal mean if needed) once for all modes
+            model_timeseries_anomaly_runs = {}
+            for run, model_timeseries in model_timeseries_runs.items():
+                try:
+                    model_timeseries_anomaly_runs[run] = get_anomaly_timeseries(
+                        model_timeseries, var, season
                     )
-                    if nc_out_model:
-                        write_nc_output(
-                            output_nc_file + "_cbf",
-                            eof_lr_cbf,
-                            cbf_pc,
-                            frac_cbf,
-                            slope_cbf,
-                            intercept_cbf,
-                            identifier=f"{mip.upper()} {model} ({run}), CBF",
+                except Exception as err:
+                    if debug:
+                        raise
+                    else:
+                        print(
+                            "warning: metrics calculation failed for ", model, run, err
                         )
-
-                    # Graphics -- plot map image to PNG
-                    output_img_file = os.path.join(
-                        dir_paths["graphics"], output_filename
-                    )
-                    if plot_model:
-                        # Regional map
-                        plot_map(
+                        failed_modes[run] = list(modes)
+
+            for mode in modes:
+                debug_print("mode: " + mode, debug)
+
+                # Adjust time series, and regrid for CBF
+                prepared_runs = {}
+                for run in model_timeseries_anomaly_runs:
+                    if mode in failed_modes[run]:
+                        continue
+                    try:
+                        prepared_runs[run] = model_season_prepare(
                             mode,
-                            f"{mip.upper()} {model} ({run}) - CBF",
-                            msyear,
-                            meyear,
-                            season,
-                            model_timeseries_season_subdomain["eof_lr_cbf"],
-                            frac_cbf,
-                            output_file_name=f"{output_img_file}_cbf",
-                            debug=debug,
-                        )
-                        debug_print(
-                            f"plot CBF mode domain for {model} {run} completed", debug
-                        )
-
-                        # Global map
-                        plot_map(
-                            mode + "_teleconnection",
-                            f"{mip.upper()} {model} ({run}) - CBF",
-                            msyear,
-                            meyear,
                             season,
-                            eof_lr_cbf,
-                            frac_cbf,
-                            output_file_name=f"{output_img_file}_cbf_teleconnection",
-                            debug=debug,
+                            model_timeseries_runs[run],
+                            model_timeseries_anomaly_runs[run],
                         )
-                        debug_print(
-                            f"plot CBF teleconnection for {model} {run} completed",
-                            debug,
-                        )
-
-                        # Compare with observation
-                        plot_map_multi_panel(
-                            mode,
-                            f"{mip.upper()} {model} ({run}) - CBF",
-                            msyear,
-                            meyear,
-                            season,
-                            eof_lr_obs_domain[season],  #  obs mode domain
-                            eof_lr_obs[season],  # obs global
-                            pc_obs[season],  # obs pc
-                            model_timeseries_season_subdomain[
-                                "eof_lr_cbf"
-                            ],  # model mode domain
-                            eof_lr_cbf,  # model global
-                            cbf_pc,  # model pc
-                            frac_cbf,
-                            ref_name=obs_name,
-                            output_file_name=f"{output_img_file}_cbf_compare_obs",
-                            debug=debug,
-                        )
-                        debug_print(
-                            f"plot CBF multiplot for {model} {run} completed", debug
-                        )
-                    debug_print("cbf pcs end", debug)
-
-                # -------------------------------------------------
-                # Conventional EOF approach as supplementary
-                # - - - - - - - - - - - - - - - - - - - - - - - - -
-                if ConvEOF:
-                    # EOF analysis
-                    debug_print("conventional EOF analysis start", debug)
-                    (
-                        eof_list,
-                        pc_list,
-                        frac_list,
-                        reverse_sign_list,
-                        solver,
-                    ) = eof_analysis_get_variance_mode(
-                        mode,
-                        model_timeseries_season_subdomain,
-                        var,
-                        eofn=eofn_mod,
-                        eofn_max=eofn_mod_max,
-                        debug=debug,
-                        EofScaling=EofScaling,
-                        save_multiple_eofs=True,
-                    )
-                    debug_print("conventional EOF analysis done", debug)
-
-                    # -------------------------------------------------
-                    # For multiple EOFs (e.g., EOF1, EOF2, EOF3, ...)
-                    # - - - - - - - - - - - - - - - - - - - - - - - - -
-                    rms_list = []
-                    cor_list = []
-                    tcor_list = []
-
-                    for n in range(0, eofn_mod_max):
-                        eofs = f"eof{str(n + 1)}"
-                        if (
-                            eofs
-                            not in result_dict["RESULTS"][model][run][
-                                "defaultReference"
-                            ][mode][season]
-                        ):
-                            result_dict["RESULTS"][model][run]["defaultReference"][
-                                mode
-                            ][season][eofs] = {}
-                            dict_head = result_dict["RESULTS"][model][run][
-                                "defaultReference"
-                            ][mode][season][eofs]
-
-                        # Component for each EOFs
-                        eof = eof_list[n]
-                        pc = pc_list[n]
-                        frac = frac_list[n]
-
-                        # Calculate stdv of pc time series
-                        stdv_pc = calcSTD(pc)
-
-                        # Linear regression to have extended global map:
-                        (
-                            eof_lr,
-                            slope,
-                            intercept,
-                        ) = linear_regression_on_globe_for_teleconnection(
-                            pc,
-                            model_timeseries_season,
-                            var,
-                            stdv_pc,
-                            RmDomainMean,
-                            EofScaling,
-                            debug=debug,
-                        )
-
-                        model_timeseries_season["eof_lr"] = eof_lr
-                        model_timeseries_season["slope"] = slope
-                        model_timeseries_season["intercept"] = intercept
-
-                        # - - - - - - - - - - - - - - - - - - - - - - - - -
-                        # Record results
-                        # - - - - - - - - - - - - - - - - - - - - - - - - -
-                        # Metrics results -- statistics to JSON
-                        common_args = {
-                            "mode": mode,
-                            "dict_head": dict_head,
-                            "model_ds": model_timeseries_season,
-                            "model_data_var": "eof_lr",
-                            "eof": eof,
-                            "eof_lr": eof_lr,
-                            "pc": pc,
-                            "stdv_pc": stdv_pc,
-                            "frac": frac,
-                            "regions_specs": regions_specs,
-                            "obs_compare": obs_compare,
-                            "method": "eof",
-                            "debug": debug,
-                        }
-
-                        if obs_compare:
-                            common_args.update(
-                                {
-                                    "obs_ds": obs_timeseries_season_dict[season],
-                                    "eof_obs": eof_obs[season],
-                                    "eof_lr_obs": eof_lr_obs[season],
-                                    "stdv_pc_obs": stdv_pc_obs[season],
-                                }
-                            )
-
-                        dict_head, eof_lr = calc_stats_save_dict(**common_args)
-
-                        # Temporal correlation between CBF PC timeseries and usual model PC timeseries
-                        if CBF:
-                            tc = calcTCOR(cbf_pc, pc)
-                            debug_print("cbf tc end", debug)
-                            dict_head["tcor_cbf_vs_eof_pc"] = tc
-
-                        # Set output file name for NetCDF and plot images
-                        output_filename = f"{mode}_{var}_EOF{n + 1}_{season}_{mip}_{model}_{exp}_{run}_{fq}_{realm}_{msyear}-{meyear}"
-                        if EofScaling:
-                            output_filename += "_EOFscaled"
-
-                        # Diagnostics results -- data to NetCDF
-                        # Save global map, pc timeseries, and fraction in NetCDF output
-                        output_nc_file = os.path.join(
-                            dir_paths["diagnostic_results"], output_filename
-                        )
-                        if nc_out_model:
-                            write_nc_output(
-                                output_nc_file,
-                                eof_lr,
-                                pc,
-                                frac,
-                                slope,
-                                intercept,
-                                identifier=f"{mip.upper()} {model} ({run}), {eofs.upper()}",
-                            )
-
-                        # Graphics -- plot map image to PNG
-                        output_img_file = os.path.join(
-                            dir_paths["graphics"], output_filename
-                        )
-
-                        eof_lr_domain = region_subset(
-                            model_timeseries_season,
-                            mode,
-                            data_var="eof_lr",
-                            regions_specs=regions_specs,
-                        )["eof_lr"]
-
-                        if plot_model:
-                            # Regional map
-                            plot_map(
+                    except Exception as err:
+                        if debug:
+                            raise
+                        else:
+                            print(
+                                "warning: metrics calculation failed for ",
                                 mode,
-                                f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
-                                msyear,
-                                meyear,
-                                season,
-                                eof_lr_domain,
-                                frac,
-                                output_img_file,
-                                debug=debug,
+                                model,
+                                run,
+                                err,
                             )
-                            # Global map
-                            plot_map(
-                                f"{mode}_teleconnection",
-                                f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
-                                msyear,
-                                meyear,
-                                season,
-                                eof_lr,
-                                frac,
-                                f"{output_img_file}_teleconnection",
-                                debug=debug,
-                            )
-
-                            if n + 1 == eofn_expected:
-                                # Compare with observation
-                                plot_map_multi_panel(
+                            failed_modes[run].append(mode)
+
+                # CBF of all realizations of the batch at once, and one by one
+                # if that fails to find the failing realizations
+                if CBF and obs_compare and prepared_runs:
+                    try:
+                        model_cbf_batch(mode, season, prepared_runs)
+                    except Exception:
+                        if debug:
+                            raise
+                        for run in list(prepared_runs):
+                            try:
+                                model_cbf_batch(mode, season, {run: prepared_runs[run]})
+                            except Exception as err:
+                                print(
+                                    "warning: metrics calculation failed for ",
                                     mode,
-                                    f"{mip.upper()} {model} ({run}) - EOF{n + 1}",
-                                    msyear,
-                                    meyear,
-                                    season,
-                                    eof_lr_obs_domain[season],  #  obs mode domain
-                                    eof_lr_obs[season],  # obs global
-                                    pc_obs[season],  # obs pc
-                                    eof_lr_domain,  # model mode domain
-                                    eof_lr,  # model global
-                                    pc,  # model pc
-                                    frac,
-                                    ref_name=obs_name,
-                                    output_file_name=f"{output_img_file}_eof{n + 1}_compare_obs",
-                                    debug=debug,
+                                    model,
+                                    run,
+                                    err,
                                 )
+                                failed_modes[run].append(mode)
+                                del prepared_runs[run]
+
+                for run, prepared in prepared_runs.items():
+                    msyear, meyear = run_years[run]
+                    try:
+                        model_season_analysis(mode, model, run, season, prepared)
+                    except Exception as err:
+                        if debug:
+                            raise
+                        else:
+                            print(
+                                "warning: metrics calculation failed for ",
+                                mode,
+                                model,
+                                run,
+                                err,
+                            )
+                            failed_modes[run].append(mode)
+
+        # =================================================================
+        # Dictionary to JSON: individual JSON during model_realization loop
+        # -----------------------------------------------------------------
+        for run in model_timeseries_runs:
+            msyear, meyear = run_years[run]
+            for mode in modes:
+                if mode in failed_modes[run]:
+                    continue
+                result_dict = modes_info[mode]["result_dict"]
+                eofn_mod = modes_info[mode]["eofn_mod"]
+                dir_paths = modes_info[mode]["dir_paths"]
+                debug_print("json (individual) writing start", debug)
+                json_filename_tmp = f"var_mode_{mode}_EOF{eofn_mod}_stat_{mip}_{exp}_{fq}_{realm}_{model}_{run}_{msyear}-{meyear}"
+
+                variability_metrics_to_json(
+                    dir_paths["metrics_results"],
+                    json_filename_tmp,
+                    result_dict,
+                    model=model,
+                    run=run,
+                    cmec_flag=cmec,
+                    include_provenance=provenance,
+                )
+                debug_print("json (individual) writing done", debug)
 
-                        # - - - - - - - - - - - - - - - - - - - - - - - - -
-                        # EOF swap diagnosis
-                        # - - - - - - - - - - - - - - - - - - - - - - - - -
-                        rms_list.append(dict_head["rms"])
-                        cor_list.append(dict_head["cor"])
-                        if CBF:
-                            tcor_list.append(dict_head["tcor_cbf_vs_eof_pc"])
-
-                    # Find best matching eofs with different criteria
-                    best_matching_eofs_rms = rms_list.index(min(rms_list)) + 1
-                    best_matching_eofs_cor = cor_list.index(max(cor_list)) + 1
-                    if CBF:
-                        best_matching_eofs_tcor = tcor_list.index(max(tcor_list)) + 1
-
-                    # Save the best matching information to JSON
-                    dict_head = result_dict["RESULTS"][model][run]["defaultReference"][
-                        mode
-                    ][season]
-                    dict_head["best_matching_model_eofs__rms"] = best_matching_eofs_rms
-                    dict_head["best_matching_model_eofs__cor"] = best_matching_eofs_cor
-                    if CBF:
-                        dict_head["best_matching_model_eofs__tcor_cbf_vs_eof_pc"] = (
-                            best_matching_eofs_tcor
-                        )
-
-                    debug_print("conventional eof end", debug)
-
-            # =================================================================
-            # Dictionary to JSON: individual JSON during model_realization loop
-            # -----------------------------------------------------------------
-            debug_print("json (individual) writing start", debug)
-            json_filename_tmp = f"var_mode_{mode}_EOF{eofn_mod}_stat_{mip}_{exp}_{fq}_{realm}_{model}_{run}_{msyear}-{meyear}"
-
-            variability_metrics_to_json(
-                dir_paths["metrics_results"],
-                json_filename_tmp,
-                result_dict,
-                model=model,
-                run=run,
-                cmec_flag=cmec,
-                include_provenance=provenance,
-            )
-            debug_print("json (individual) writing done", debug)
-
-        except Exception as err:
-            if debug:
-                raise
-            else:
-                print("warning: metrics calculation failed for ", model, run, err)
 
 # ========================================================================
 # Dictionary to JSON: collective JSON at the end of model_realization loop
 # ------------------------------------------------------------------------
 if not parallel and (len(models) > 1):
-    debug_print("json (collective) writing start", debug)
-    json_filename_all = f"var_mode_{mode}_EOF{eofn_mod}_stat_{mip}_{exp}_{fq}_{realm}_allModels_allRuns_{msyear}-{meyear}"
-    variability_metrics_to_json(
-        dir_paths["metrics_results"], json_filename_all, result_dict, cmec_flag=cmec
-    )
-    debug_print("json (collective) writing done", debug)
+    for mode in modes:
+        result_dict = modes_info[mode]["result_dict"]
+        eofn_mod = modes_info[mode]["eofn_mod"]
+        dir_paths = modes_info[mode]["dir_paths"]
+        debug_print("json (collective) writing start", debug)
+        json_filename_all = f"var_mode_{mode}_EOF{eofn_mod}_stat_{mip}_{exp}_{fq}_{realm}_allModels_allRuns_{msyear}-{meyear}"
+        variability_metrics_to_json(
+            dir_paths["metrics_results"], json_filename_all, result_dict, cmec_flag=cmec
+        )
+        debug_print("json (collective) writing done", debug)
+
+print(f"Peak memory usage: {get_peak_memory():.1f} MB")
 
 if not debug:
     sys.exit(0)
@@ -1,8 +1,8 @@
 import numpy as np
 import xarray as xr
-import xcdat  # noqa: F401
+import xcdat
 
-from pcmdi_metrics.drcdm.lib import compute_metrics
+from pcmdi_metrics.drcdm.lib import compute_metrics, region_utilities, utilities
 
 
 def create_random_precip(years, max_val=None, min_val=None):
@@ -190,6 +190,78 @@ def test_seasonal_averager_ann_mean():
     assert np.mean(ann_max) == np.mean(ds.temporal.group_average("pr", "year"))
 
 
+def test_seasonal_averager_block_labels():
+    ds, sftlf = create_random_precip([1980, 1982])
+    PR = compute_metrics.TimeSeriesData(ds, "pr")
+    S = compute_metrics.SeasonalAverager(PR, sftlf, dec_mode="JFD")
+    S.calc_5day_mean()
+
+    # Strict annual blocks of the 5-day mean start on Jan 5
+    pentad = S.pentad.where(S.pentad.time.dt.dayofyear >= 5)
+    for stat in ["max", "median", "le0"]:
+        ann = S.annual_stats(stat, pentad=True)
+        if stat == "le0":
+            expected = (pentad <= 0).groupby("time.year").sum() / 361 * 100
+        else:
+            expected = getattr(pentad.groupby("time.year"), stat)(dim="time")
+        np.testing.assert_allclose(ann.values, S.masked_ds(expected).values)
+
+    djf = S.seasonal_stats("DJF", "mean", pentad=False)
+    expected = ds.pr.where(ds.time.dt.month.isin([1, 2, 12])).groupby("time.year")
+    expected = S.masked_ds(expected.mean(dim="time"))
+    np.testing.assert_allclose(djf.values, expected.values)
+    assert list(djf.time.dt.year.values) == [1980, 1981, 1982]
+
+
+def test_load_dataset_years_and_region_bounds(tmp_path):
+    ds, _ = create_random_precip([1980, 1983])
+    ds = ds.assign_coords(lat=[30.0, 40.0], lon=[250.0, 300.0])
+    path = str(tmp_path / "pr.nc")
+    ds.to_netcdf(path)
+
+    # CONUS-like box in -180-180 longitudes
+    coords = [[-125, 25], [-66, 25], [-66, 35], [-125, 35]]
+    bounds = region_utilities.get_region_bounds("CONUS", coords=coords)
+    assert bounds == (25.0, 35.0, -125.0, -66.0)
+
+    result = utilities.load_dataset([path], 1981, 1982, bounds=bounds)
+    expected = utilities.slice_dataset(xcdat.open_dataset(path), 1981, 1982)
+    expected = expected.isel(lat=[0], lon=[0])
+    xr.testing.assert_equal(result.pr, expected.pr)
+    assert list(np.unique(result.time.dt.year)) == [1981, 1982]
+
+
+def test_select_region_bounds_coordinate_names_and_curvilinear_grid():
+    ds, _ = create_random_precip([1980, 1981])
+    bounds = (25.0, 35.0, -125.0, -66.0)
+
+    # 1-D coordinates named latitude/longitude are cropped
+    ds_1d = ds.assign_coords(lat=[30.0, 40.0], lon=[250.0, 300.0])
+    ds_1d = ds_1d.rename(lat="latitude", lon="longitude")
+    result = region_utilities.select_region_bounds(ds_1d, bounds)
+    xr.testing.assert_equal(result, ds_1d.isel(latitude=[0], longitude=[0]))
+
+    # 2-D coordinates are not cropped
+    ds_2d = xr.Dataset(
+        {"pr": (("time", "y", "x"), ds.pr.values)},
+        coords={
+            "time": ds.time,
+            "lat": (
+                ("y", "x"),
+                [[30.0, 30.0], [40.0, 40.0]],
+                {"units": "degrees_north"},
+            ),
+            "lon": (
+                ("y", "x"),
+                [[250.0, 300.0], [250.0, 300.0]],
+                {"units": "degrees_east"},
+            ),
+        },
+    )
+    result = region_utilities.select_region_bounds(ds_2d, bounds)
+    xr.testing.assert_identical(result, ds_2d)
+
+
 # Test that drop_incomplete_djf puts nans in correct places
 # Test that rolling averages for say a month is matching manual version
 
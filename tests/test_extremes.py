@@ -1,7 +1,8 @@
 import numpy as np
 import xarray as xr
+from scipy.stats import genextreme
 
-from pcmdi_metrics.extremes.lib import compute_metrics
+from pcmdi_metrics.extremes.lib import compute_metrics, return_value
 
 
 def create_random_precip(years, max_val=None, min_val=None):
@@ -280,6 +281,80 @@ def test_seasonal_averager_rolling_djf():
     assert rolling_mean == true_mean
 
 
+def test_seasonal_averager_block_extremes():
+    ds, _, sftlf = create_random_precip([1980, 1983])
+    PR = compute_metrics.TimeSeriesData(ds, "pr")
+    stats = [("max", False), ("min", False), ("max", True)]
+
+    for dec_mode in ["DJF", "JFD"]:
+        S = compute_metrics.SeasonalAverager(PR, sftlf, dec_mode=dec_mode)
+        block_stats = S.block_extremes(stats, chunk_size=100)
+
+        for stat, pentad in stats:
+            xr.testing.assert_identical(
+                block_stats[stat, pentad]["ANN"], S.annual_stats(stat, pentad)
+            )
+            for season in ["DJF", "MAM", "JJA", "SON"]:
+                expected = S.seasonal_stats(season, stat, pentad)
+                result = block_stats[stat, pentad][season]
+                np.testing.assert_array_equal(result.time, expected.time)
+                np.testing.assert_allclose(result, expected)
+
+
+def test_fit_rv_cells_matches_calc_rv_py():
+    rng = np.random.default_rng(0)
+    arr = 1 + 0.2 * rng.gumbel(size=(40, 6))
+    arr[:, 1] = 0  # skipped cells
+    arr[3, 2] = np.nan
+    covariate = np.linspace(0, 1, 40)
+
+    for cov in [None, covariate]:
+        data = arr if cov is None else arr + 0.3 * cov[:, None]
+        rv_array, se_array = return_value.fit_rv_cells(
+            data, cov, 20, num_workers=2, block_size=2
+        )
+        assert np.isnan(rv_array[..., 1:3]).all()
+        for j in [0, 3, 4, 5]:
+            rv, se = return_value.calc_rv_py(data[:, j], cov, 20)
+            np.testing.assert_allclose(rv_array[..., j], rv, rtol=1e-8)
+            np.testing.assert_allclose(se_array[..., j], se, rtol=1e-2)
+
+
+def test_gev_fit_batch_matches_scipy_fit():
+    # _gev_fit_batch follows the first guess, penalty and optimizer of
+    # genextreme.fit, which may change with scipy versions
+    rng = np.random.default_rng(1)
+    samples = [
+        1 + 0.2 * rng.gumbel(size=40),
+        genextreme.rvs(0.3, loc=5, scale=2, size=40, random_state=2),
+        genextreme.rvs(-0.3, loc=-1, scale=0.5, size=40, random_state=3),
+        rng.normal(size=40),
+    ]
+
+    theta = return_value._gev_fit_batch(np.stack(samples))
+
+    for sample, params in zip(samples, theta):
+        np.testing.assert_allclose(params, genextreme.fit(sample), rtol=1e-6)
+
+
+def test_inverse_hessian_batch_retries_with_complex_step():
+    rng = np.random.default_rng(0)
+    x = np.stack([1 + 0.2 * rng.gumbel(size=40), 2 + 0.5 * rng.gumbel(size=40)])
+    params = return_value._gev_fit_batch(x)[:, [1, 2, 0]]
+
+    def ll(p, rows):
+        return return_value._gev_nll_batch(p, x[rows])
+
+    def ll_flipped(p, rows):
+        # negative variances by central differences, not by complex step
+        return ll(p, rows) if np.iscomplexobj(p) else -ll(p, rows)
+
+    expected = return_value._inverse_hessian_batch(ll, params)
+    assert np.isfinite(expected).all()
+    vcov = return_value._inverse_hessian_batch(ll_flipped, params)
+    np.testing.assert_allclose(vcov, expected, rtol=1e-3)
+
+
 """def test_seasonal_averager_drop_djf():
     drop_incomplete_djf = True
     dec_mode = "DJF"
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+
+from pcmdi_metrics.misc.scripts import JobScheduler
+
+
+def _write_cmd(path, text):
+    return [sys.executable, "-c", f"open({path!r}, 'a').write({text!r})"]
+
+
+def test_job_scheduler_runs_dependencies_in_order(tmp_path):
+    out = str(tmp_path / "out.txt")
+    scheduler = JobScheduler(num_workers=2, log_dir=str(tmp_path / "logs"))
+    scheduler.add_task("merge", _write_cmd(out, "c"), depends_on=["clim", "metrics"])
+    scheduler.add_task("metrics", _write_cmd(out, "b"), depends_on=["clim"])
+    scheduler.add_task("clim", _write_cmd(out, "a"))
+
+    status = scheduler.run()
+
+    assert status == {"merge": "done", "metrics": "done", "clim": "done"}
+    with open(out) as f:
+        assert f.read() == "abc"
+
+
+def test_job_scheduler_retries_skips_and_resumes(tmp_path):
+    flag = str(tmp_path / "flag")
+    state_file = str(tmp_path / "state.json")
+    # fails on the first attempt only
+    flaky = [
+        sys.executable,
+        "-c",
+        f"import os, sys; e = os.path.exists({flag!r}); open({flag!r}, 'w'); sys.exit(0 if e else 1)",
+    ]
+
+    scheduler = JobScheduler(
+        num_workers=2,
+        log_dir=str(tmp_path / "logs"),
+        state_file=state_file,
+        max_retries=1,
+    )
+    scheduler.add_task("flaky", flaky)
+    scheduler.add_task("broken", [sys.executable, "-c", "raise SystemExit(1)"])
+    scheduler.add_task("after_broken", ["true"], depends_on=["broken"])
+
+    status = scheduler.run()
+
+    assert status == {"flaky": "done", "broken": "failed", "after_broken": "skipped"}
+    with open(state_file) as f:
+        state = json.load(f)
+    assert state["flaky"] == {"status": "done", "attempts": 2}
+
+    # completed tasks are not run again
+    os.remove(flag)
+    status = scheduler.run()
+    assert status["flaky"] == "done"
+    assert not os.path.exists(flag)
+
+
+def test_job_scheduler_leaves_other_child_processes(tmp_path):
+    other = subprocess.Popen([sys.executable, "-c", "raise SystemExit(3)"])
+    scheduler = JobScheduler(num_workers=1, log_dir=str(tmp_path / "logs"))
+    scheduler.add_task("slow", [sys.executable, "-c", "import time; time.sleep(1)"])
+
+    assert scheduler.run() == {"slow": "done"}
+    assert other.wait() == 3
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+import pcmdi_metrics.utils.land_sea_mask as land_sea_mask
+from pcmdi_metrics.utils import (
+    clear_regridder_cache,
+    create_land_sea_mask,
+    create_target_grid,
+)
+
+
+def create_fake_sftlf(shift=0.0):
+    lat = np.arange(-89.0, 90.0, 2.0)
+    lon = np.arange(1.0, 360.0, 2.0)
+    lat2d, lon2d = np.meshgrid(lat, lon, indexing="ij")
+    # two continents with smooth coasts and a few islands
+    sftlf = np.clip((40 - np.hypot(lat2d - 20, lon2d - 90 - shift)) / 10, 0, 1)
+    sftlf += np.clip((25 - np.hypot(lat2d + 30, lon2d - 250)) / 8, 0, 1)
+    sftlf[::7, ::9] = 0.6
+    ds = xr.Dataset(
+        {"sftlf": (("lat", "lon"), np.clip(sftlf, 0, 1))},
+        coords={"lat": lat, "lon": lon},
+    )
+    ds["lat"].attrs.update({"axis": "Y", "units": "degrees_north"})
+    ds["lon"].attrs.update({"axis": "X", "units": "degrees_east"})
+    return ds.bounds.add_missing_bounds(["X", "Y"])
+
+
+class _XcdatRegridder:
+    """Regrid with xcdat every time, as before regridders were cached."""
+
+    def __init__(self, ds, target_grid, regrid_tool="regrid2", regrid_method=None):
+        self.target_grid = target_grid
+        self.regrid_tool = regrid_tool
+
+    def regrid(self, ds, data_var):
+        return ds.regridder.horizontal(
+            data_var, self.target_grid, tool=self.regrid_tool
+        )
+
+
+def test_land_sea_mask_cache_matches_generated_mask(tmp_path, monkeypatch):
+    clear_regridder_cache()
+    t_grid = create_target_grid(target_grid_resolution="10x10")
+    cache_dir = str(tmp_path / "land_sea_mask")
+
+    for shift in [0.0, 20.0]:
+        source = create_fake_sftlf(shift)
+        with monkeypatch.context() as m:
+            m.setattr(land_sea_mask, "get_regridder", _XcdatRegridder)
+            expected = create_land_sea_mask(t_grid, method="pcmdi", source=source)
+
+        mask = create_land_sea_mask(t_grid, method="pcmdi", source=source)
+        xr.testing.assert_equal(mask, expected)
+
+        # generated and written, then read from the cache
+        for _ in range(2):
+            mask = create_land_sea_mask(
+                t_grid, method="pcmdi", source=source, cache_dir=cache_dir
+            )
+            np.testing.assert_array_equal(mask.values, expected.values)
+
+    # one cached mask per source land fraction
+    assert len(os.listdir(cache_dir)) == 2
+
+    # the regrid tool is part of the key as well
+    paths = [
+        land_sea_mask._land_sea_mask_cache_file(
+            cache_dir, t_grid, "lon", "lat", "pcmdi", source, regrid_tool
+        )
+        for regrid_tool in ["regrid2", "xesmf"]
+    ]
+    assert paths[0] != paths[1]
@@ -0,0 +1,324 @@
+import pickle
+
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.io import create_region_masks, region_subset
+from pcmdi_metrics.mean_climate.lib import (
+    compute_metrics,
+    compute_metrics_regions,
+    create_reference_regions,
+    model_result_dict,
+)
+from pcmdi_metrics.mean_climate.lib.calculate_climatology import streamed_climatology
+from pcmdi_metrics.stats import (
+    cor_xy,
+    cor_xy_array,
+    rms_xy,
+    rms_xy_array,
+    rmsc_xy,
+    std_xyt,
+)
+from pcmdi_metrics.utils import (
+    apply_landmask,
+    calculate_grid_area,
+    clear_grid_cache,
+    clear_regridder_cache,
+    create_target_grid,
+    get_regridder,
+    get_spatial_weights,
+    regrid,
+    tree,
+)
+from pcmdi_metrics.utils.grid import _grid_hash
+
+
+def create_fake_ac_ds(offset=0.0, seed=0):
+    times = xr.date_range(
+        start="2000-01-01",
+        periods=12,
+        freq="MS",
+        calendar="noleap",
+        use_cftime=True,
+        name="time",
+    )
+    lat = np.arange(-87.5, 90, 5.0)
+    lon = np.arange(2.5, 360, 5.0)
+
+    rng = np.random.default_rng(seed)
+    values = 280.0 + offset + 10 * rng.standard_normal((len(times), len(lat), len(lon)))
+    values[:, 0:2, 0:4] = np.nan  # missing values
+
+    fake_ds = xr.Dataset(
+        {
+            "ts": xr.DataArray(
+                data=values,
+                dims=["time", "lat", "lon"],
+                coords={"time": times, "lat": lat, "lon": lon},
+                attrs={"units": "K"},
+            )
+        }
+    )
+    fake_ds["lat"].attrs.update({"axis": "Y", "units": "degrees_north"})
+    fake_ds["lon"].attrs.update({"axis": "X", "units": "degrees_east"})
+    fake_ds = fake_ds.bounds.add_missing_bounds()
+
+    return fake_ds
+
+
+def _assert_metrics_close(result, expected):
+    assert list(result.keys()) == list(expected.keys())
+    for stat in expected:
+        assert list(result[stat].keys()) == list(expected[stat].keys())
+        for key in expected[stat]:
+            np.testing.assert_allclose(
+                np.array(result[stat][key], dtype=float),
+                np.array(expected[stat][key], dtype=float),
+                rtol=1e-5,
+            )
+
+
+def test_compute_metrics_fused_matches_individual_stats():
+    dm = create_fake_ac_ds(offset=1.0, seed=0)
+    do = create_fake_ac_ds(seed=1)
+
+    result = compute_metrics("ts", dm, do, fused=True)
+    expected = compute_metrics("ts", dm, do, fused=False)
+
+    _assert_metrics_close(result, expected)
+    # the fused engine is the default
+    assert compute_metrics("ts", dm, do) == result
+
+
+def test_compute_metrics_fused_does_not_modify_input():
+    dm = create_fake_ac_ds(offset=1.0, seed=0)
+    do = create_fake_ac_ds(seed=1)
+    dm_copy = dm.copy(deep=True)
+
+    compute_metrics("ts", dm, do, fused=True)
+
+    xr.testing.assert_identical(dm, dm_copy)
+
+
+def test_compute_metrics_regions_matches_region_subset():
+    dm = create_fake_ac_ds(offset=1.0, seed=0)
+    do = create_fake_ac_ds(seed=1)
+    regions = ["global", "NHEX", "TROPICS", "CONUS"]
+
+    region_masks = create_region_masks(dm, regions)
+    result = compute_metrics_regions("ts", dm, do, region_masks)
+
+    assert list(result.keys()) == regions
+    for region in regions:
+        if region == "global":
+            dm_region, do_region = dm, do
+        else:
+            dm_region = region_subset(dm, region)
+            do_region = region_subset(do, region)
+        expected = compute_metrics("ts", dm_region, do_region, fused=False)
+        _assert_metrics_close(result[region], expected)
+
+
+def test_compute_metrics_regions_matches_land_ocean_masking():
+    dm = create_fake_ac_ds(offset=1.0, seed=0)
+    do = create_fake_ac_ds(seed=1)
+    rng = np.random.default_rng(2)
+    landfrac = xr.DataArray(
+        rng.choice([0.0, 0.1, 0.5, 0.9, 1.0], size=(dm.sizes["lat"], dm.sizes["lon"])),
+        dims=["lat", "lon"],
+        coords={"lat": dm.lat, "lon": dm.lon},
+    )
+    regions = ["land", "ocean", "land_NHEX", "ocean_TROPICS"]
+
+    region_masks = create_region_masks(dm, regions, landfrac=landfrac)
+    result = compute_metrics_regions("ts", dm, do, region_masks)
+
+    for region in regions:
+        keep_over = "land" if "land" in region.split("_") else "ocean"
+        dm_region = dm.copy()
+        do_region = do.copy()
+        dm_region["ts"] = apply_landmask(
+            dm["ts"], landfrac=landfrac, keep_over=keep_over
+        )
+        do_region["ts"] = apply_landmask(
+            do["ts"], landfrac=landfrac, keep_over=keep_over
+        )
+        if region not in ["land", "ocean"]:
+            dm_region = region_subset(dm_region, region)
+            do_region = region_subset(do_region, region)
+        expected = compute_metrics("ts", dm_region, do_region, fused=False)
+        _assert_metrics_close(result[region], expected)
+
+    # landfrac in percent selects the same cells
+    masks_percent = create_region_masks(dm, regions, landfrac=landfrac * 100)
+    xr.testing.assert_identical(masks_percent, region_masks)
+
+
+def test_create_reference_regions_matches_masking_and_subset():
+    do = create_fake_ac_ds(seed=1)
+    landfrac = xr.DataArray(
+        np.random.default_rng(2).choice([0.0, 0.5, 1.0], size=(36, 72)),
+        dims=["lat", "lon"],
+        coords={"lat": do.lat, "lon": do.lon},
+    )
+    regions = ["global", "NHEX", "land", "ocean_TROPICS"]
+
+    ds_ref_dict = create_reference_regions(do, "ts", regions, None, landfrac)
+
+    assert list(ds_ref_dict) == regions
+    assert ds_ref_dict["global"] is do
+    xr.testing.assert_identical(ds_ref_dict["NHEX"], region_subset(do, "NHEX"))
+    for region, keep_over in [("land", "land"), ("ocean_TROPICS", "ocean")]:
+        expected = do.copy()
+        expected["ts"] = apply_landmask(
+            do["ts"], landfrac=landfrac, keep_over=keep_over
+        )
+        if region != "land":
+            expected = region_subset(expected, "TROPICS")
+        xr.testing.assert_identical(ds_ref_dict[region], expected)
+
+
+def test_model_result_dict_keeps_one_model():
+    result_dict = tree()
+    result_dict["Variable"] = {"id": "ts"}
+    result_dict["RESULTS"]["model1"]["default"]["r1"]["global"] = {"rms": 1.0}
+    result_dict["RESULTS"]["model2"]["default"]["r1"]["global"] = {"rms": 2.0}
+
+    model_dict = model_result_dict(result_dict, "model1")
+    model_dict["RESULTS"]["model1"]["default"]["r2"]["global"] = {"rms": 3.0}
+
+    assert list(model_dict["RESULTS"]) == ["model1"]
+    assert model_dict["Variable"] == {"id": "ts"}
+    assert pickle.loads(pickle.dumps(model_dict)) == model_dict
+
+
+def test_get_regridder_reuses_weights():
+    clear_regridder_cache()
+    ds = create_fake_ac_ds()
+    t_grid = create_target_grid(target_grid_resolution="10x10")
+
+    regridder = get_regridder(ds, t_grid, regrid_tool="regrid2")
+
+    assert get_regridder(ds.copy(), t_grid, regrid_tool="regrid2") is regridder
+    clear_regridder_cache()
+    assert get_regridder(ds, t_grid, regrid_tool="regrid2") is not regridder
+
+
+def test_regrid_reuse_weights_matches_regrid2():
+    clear_regridder_cache()
+    t_grid = create_target_grid(target_grid_resolution="10x10")
+    ds = create_fake_ac_ds()
+    # some cells of a destination cell are missing
+    ds["ts"][:, 2, 5] = np.nan
+    valid = ds["ts"].notnull()
+
+    result = regrid(ds, "ts", t_grid, reuse_weights=True)
+    assert "time_bnds" in result
+
+    # complete fields match regrid2
+    ds_complete = ds.copy()
+    ds_complete["ts"] = ds["ts"].fillna(280.0)
+    np.testing.assert_allclose(
+        regrid(ds_complete, "ts", t_grid, reuse_weights=True)["ts"].values,
+        regrid(ds_complete, "ts", t_grid)["ts"].values,
+        rtol=1e-6,
+    )
+
+    # missing values are excluded: regrid2 of the masked data over regrid2 of the
+    # mask, nan where a destination cell has no valid source cell
+    ds_masked = ds.copy()
+    ds_masked["ts"] = ds["ts"].fillna(0.0)
+    ds_valid = ds.copy()
+    ds_valid["ts"] = valid.astype(np.float64)
+    weighted_sum = regrid(ds_masked, "ts", t_grid)["ts"].values
+    total_weights = regrid(ds_valid, "ts", t_grid)["ts"].values
+    expected = np.where(total_weights > 0, weighted_sum / total_weights, np.nan)
+    np.testing.assert_allclose(result["ts"].values, expected, rtol=1e-6)
+    np.testing.assert_array_equal(np.isnan(result["ts"].values), np.isnan(expected))
+    assert np.isnan(expected).any()
+
+
+def test_streamed_climatology_matches_temporal_climatology():
+    ds = create_fake_ac_ds()
+    ds = xr.concat(
+        [
+            ds.assign_coords(time=ds.time.to_index().shift(12 * i, "MS"))
+            for i in range(3)
+        ],
+        dim="time",
+        data_vars="minimal",
+    )
+    ds = ds.drop_vars("time_bnds").bounds.add_missing_bounds(["T"])
+
+    result = streamed_climatology(ds, "ts", chunk_size=5)
+
+    expected_ac = ds.temporal.climatology("ts", freq="month", weighted=True)
+    expected_seasons = ds.temporal.climatology(
+        "ts",
+        freq="season",
+        weighted=True,
+        season_config={"dec_mode": "DJF", "drop_incomplete_djf": True},
+    )
+    np.testing.assert_allclose(result["AC"]["ts"].values, expected_ac["ts"].values)
+    for i, season in enumerate(["DJF", "MAM", "JJA", "SON"]):
+        np.testing.assert_allclose(
+            result[season]["ts"].values, expected_seasons["ts"].isel(time=i).values
+        )
+
+
+def test_get_spatial_weights_is_cached_and_read_only():
+    clear_grid_cache()
+    ds = create_fake_ac_ds()
+
+    weights = get_spatial_weights(ds)
+
+    xr.testing.assert_identical(weights, ds.spatial.get_weights(axis=["X", "Y"]))
+    assert get_spatial_weights(ds.copy(deep=True)) is weights
+    assert get_spatial_weights(ds.isel(lat=slice(0, 10))) is not weights
+    assert not weights.values.flags.writeable
+    assert calculate_grid_area(ds) is calculate_grid_area(ds)
+
+    # grids whose coordinates have no "bounds" attribute are hashed as well
+    ds_no_attr = ds.copy()
+    for key in ["lat", "lon"]:
+        ds_no_attr[key] = ds[key].copy()
+        ds_no_attr[key].attrs.pop("bounds")
+    assert _grid_hash(ds_no_attr, ["X", "Y"])
+    ds_no_bounds = ds_no_attr.drop_vars(["lat_bnds", "lon_bnds"])
+    assert _grid_hash(ds_no_bounds, ["X", "Y"]) != _grid_hash(ds, ["X", "Y"])
+
+
+def test_stats_array_mode_matches_dataset_api():
+    dm = create_fake_ac_ds(offset=1.0, seed=0)
+    do = create_fake_ac_ds(seed=1)
+    dm_copy = dm.copy(deep=True)
+    dm0 = dm.isel(time=0)
+    do0 = do.isel(time=0)
+    # weights with dimensions in another order than the data
+    weights = get_spatial_weights(dm).transpose("lon", "lat")
+    w = weights.transpose("lat", "lon").values
+
+    expected = np.sqrt(((dm0.ts - do0.ts) ** 2).weighted(weights).mean(("lat", "lon")))
+    np.testing.assert_allclose(rms_xy_array(dm0.ts.values, do0.ts.values, w), expected)
+    assert rms_xy(dm0, do0, var="ts", weights=weights) == rms_xy_array(
+        dm0.ts.values, do0.ts.values, w
+    )
+    assert cor_xy(dm0.ts, do0.ts, var="ts", weights=weights) == cor_xy_array(
+        dm0.ts.values, do0.ts.values, w
+    )
+    assert rmsc_xy(dm0, do0, var="ts") == rmsc_xy(dm0.ts, do0.ts, var="ts")
+
+    # integer inputs are promoted to float for the centered difference
+    dm_int = np.arange(w.size).reshape(w.shape)
+    do_int = dm_int[::-1] * 2
+    np.testing.assert_allclose(
+        rms_xy_array(dm_int, do_int, w, centered=True),
+        rms_xy_array(dm_int.astype(float), do_int.astype(float), w, centered=True),
+    )
+
+    average = dm.spatial.average("ts").temporal.average("ts")["ts"]
+    anomaly = dm.assign(ts=(dm.ts - average) ** 2)
+    expected = np.sqrt(anomaly.spatial.average("ts").temporal.average("ts")["ts"])
+    np.testing.assert_allclose(std_xyt(dm, var="ts"), expected)
+
+    xr.testing.assert_identical(dm, dm_copy)
@@ -0,0 +1,155 @@
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.precip_distribution.lib import (
+    CalcBinStructure,
+    CalcRainMetrics,
+    CalcRainMetricsMap,
+    MakeDists,
+    Regrid_xr,
+    oneyear,
+    regrid_by_year,
+)
+
+
+def create_fake_precip(ntime=365, nlat=6, nlon=8, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(0.5, 6, (ntime, nlat, nlon))
+    values[rng.random(values.shape) < 0.4] = 0
+    values[:, 0, 0] = np.nan  # missing grid
+    values[:100, 1, 1] = np.nan  # more than 30% missing
+    values[:10, 2, 2] = np.nan  # less than 30% missing
+    return xr.DataArray(
+        values,
+        dims=("time", "lat", "lon"),
+        coords={"lat": np.linspace(-50, 50, nlat), "lon": np.arange(nlon) * 45.0},
+    )
+
+
+def test_make_dists_matches_histogram():
+    pdata = create_fake_precip()
+    binl, _, _ = CalcBinStructure(pdata)
+    bins = np.append(0, binl)
+    pdata[0, 3, 3] = bins[-1]  # right edge of the last bin
+    pdata[1, 3, 3] = bins[5]
+
+    ppdf, pamt, binbound, ppdf_tn = MakeDists(pdata, binl)
+    ppdf_parallel = MakeDists(pdata, binl, num_workers=2, block_size=10)[0]
+    xr.testing.assert_identical(ppdf, ppdf_parallel)
+    np.testing.assert_array_equal(binbound, bins)
+
+    for ilat in range(pdata.shape[1]):
+        for ilon in range(pdata.shape[2]):
+            cell = pdata.values[:, ilat, ilon]
+            n = np.histogram(cell, bins)[0]
+            binno = np.digitize(cell, bins)
+            amt = [np.nansum(cell[binno == ibin]) for ibin in range(len(binl))]
+            if n.sum() < len(cell) * 0.7:
+                assert np.isnan(ppdf[:, ilat, ilon]).all()
+                continue
+            np.testing.assert_allclose(ppdf[:, ilat, ilon], n / n.sum())
+            np.testing.assert_allclose(ppdf_tn[:, ilat, ilon], n)
+            np.testing.assert_allclose(pamt[:, ilat, ilon], np.array(amt) / n.sum())
+
+
+def test_rain_metrics_map_matches_grid_point_loop():
+    pdata = create_fake_precip()
+    binl, _, bincrates = CalcBinStructure(pdata)
+    ppdf, pamt, _, _ = MakeDists(pdata, binl)
+
+    for pdist in [ppdf, pamt]:
+        rainpeak, rainwidth = CalcRainMetricsMap(pdist, bincrates)
+        for ilat in range(pdata.shape[1]):
+            for ilon in range(pdata.shape[2]):
+                expected = CalcRainMetrics(pdist[:, ilat, ilon], bincrates)[:2]
+                np.testing.assert_array_equal(
+                    [rainpeak[ilat, ilon], rainwidth[ilat, ilon]], expected
+                )
+    assert np.isnan(rainpeak[0, 0]) and np.isfinite(rainpeak[2, 2])
+
+
+def test_oneyear_half_precip_days():
+    thisyear = create_fake_precip(ntime=90)
+    thisyear[:, 4, 4] = 0  # no precipitation
+    thisyear[3, 5, 5] = -1  # negative precipitation
+    pfrac, ndhy, prdyfrac, sdii = oneyear(thisyear, 0.3)
+
+    x = np.arange(91.0)
+    for ilat in range(thisyear.shape[1]):
+        for ilon in range(thisyear.shape[2]):
+            cell = thisyear.values[:, ilat, ilon]
+            if np.isnan(cell).mean() > 0.3 or np.nansum(cell) == 0:
+                assert np.isnan(ndhy[ilat, ilon])
+                continue
+            cum_sum = np.nancumsum(-np.sort(-cell))
+            y = np.concatenate([[0], pfrac[:, ilat, ilon]])
+            assert ndhy[ilat, ilon] == np.interp(0.5, y, x)
+            wet = np.concatenate([[0], cum_sum])
+            ndays = (
+                np.argmax(np.diff(wet) < 1) if np.diff(wet)[-1] < 1 else np.argmax(y)
+            )
+            np.testing.assert_allclose(sdii[ilat, ilon], np.nansum(cell) / ndays)
+
+
+def test_regrid_by_year_matches_concat(tmp_path):
+    times = xr.date_range(
+        "1999-01-01", "2002-12-31", freq="D", calendar="noleap", use_cftime=True
+    )
+    values = create_fake_precip(ntime=len(times), nlat=18, nlon=36).values / 86400
+    values[values > 0.2 / 86400] -= 0.5 / 86400  # small negative values
+    ds = xr.Dataset(
+        {"pr": (("time", "lat", "lon"), values)},
+        coords={
+            "time": times,
+            "lat": np.linspace(-85, 85, 18),
+            "lon": np.arange(36) * 10.0,
+        },
+    )
+    ds.lat.attrs = {"units": "degrees_north", "axis": "Y"}
+    ds.lon.attrs = {"units": "degrees_east", "axis": "X"}
+    ds_raw = ds.copy(deep=True)
+
+    def regrid_years(ds):
+        expected = []
+        for year in range(2000, 2002):
+            do = ds["pr"].sel(time=str(year))
+            do = xr.where((do < 0) & (do > -1), 0, do) * 86400.0
+            expected.append(Regrid_xr(do.to_dataset(), "pr", [20, 20])["pr"])
+        return xr.concat(expected, dim="time")
+
+    expected = regrid_years(ds)
+
+    result = regrid_by_year(
+        ds, "pr", 2000, 2001, 31, 86400, [20, 20], reuse_weights=False
+    )
+    xr.testing.assert_identical(ds, ds_raw)
+    np.testing.assert_array_equal(result["pr"].values, expected.values)
+    np.testing.assert_array_equal(result["time"].values, expected["time"].values)
+
+    # the regridding weights are reused by default
+    def reuse_regrid(data):
+        return regrid_by_year(
+            data,
+            "pr",
+            2000,
+            2001,
+            31,
+            86400,
+            [20, 20],
+            scratch_file=str(tmp_path / "pr.npy"),
+        )["pr"].values
+
+    ds_complete = ds.fillna(0)
+    np.testing.assert_allclose(
+        reuse_regrid(ds_complete), regrid_years(ds_complete).values, rtol=1e-6
+    )
+
+    # missing values are excluded from the weighted average
+    ds_valid = ds.copy()
+    ds_valid["pr"] = ds["pr"].notnull() / 86400.0
+    weighted_sum = regrid_years(ds_complete).values
+    total_weights = regrid_years(ds_valid).values
+    expected = np.where(total_weights > 0, weighted_sum / total_weights, np.nan)
+    result = reuse_regrid(ds)
+    np.testing.assert_allclose(result, expected, rtol=1e-6)
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from pcmdi_metrics.precip_variability.lib import (
+    ClimAnom,
+    Powerspectrum,
+    RedNoiseSignificanceLevel,
+    interpolate_missing,
+    lag1_autocorrelation,
+    rednoise,
+)
+
+
+def create_fake_precip(ntime=1460, nlat=4, nlon=6, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(0.5, 6, (ntime, nlat, nlon))
+    values[rng.random(values.shape) < 0.05] = np.nan  # gaps
+    values[:30, 0, 0] = np.nan  # missing at the start
+    values[-40:, 0, 1] = np.nan  # missing at the end
+    return xr.DataArray(
+        values,
+        dims=("time", "lat", "lon"),
+        coords={"lat": np.linspace(-30, 30, nlat), "lon": np.arange(nlon) * 60.0},
+    )
+
+
+def test_interpolate_missing_matches_pandas():
+    d = create_fake_precip()
+    for dtype in [np.float64, np.float32]:
+        values = d.values.astype(dtype)
+        result = interpolate_missing(values)
+        for ilat in range(d.shape[1]):
+            for ilon in range(d.shape[2]):
+                expected = pd.Series(values[:, ilat, ilon]).interpolate(method="linear")
+                np.testing.assert_array_equal(result[:, ilat, ilon], expected)
+
+
+def test_powerspectrum_matches_grid_point_loop():
+    d = create_fake_precip()
+    freqs, psd, rn, sig95 = Powerspectrum(d, 365, 182)
+    chunked = Powerspectrum(d, 365, 182, chunk_size=5)
+    for result, expected in zip(chunked, (freqs, psd, rn, sig95)):
+        xr.testing.assert_allclose(result, expected)
+
+    nps = np.floor((d.shape[0] - 365) / (365 - 182) + 1)
+    dfm = interpolate_missing(d.values)
+    for ilat in range(d.shape[1]):
+        for ilon in range(d.shape[2]):
+            r1 = lag1_autocorrelation(dfm[:, ilat, ilon])
+            expected = rednoise(psd.values[:, ilat, ilon], len(freqs), r1)
+            np.testing.assert_allclose(rn[:, ilat, ilon], expected)
+            np.testing.assert_allclose(
+                sig95[:, ilat, ilon], RedNoiseSignificanceLevel(2 * nps, expected)
+            )
+    # missing values at the start are not interpolated
+    assert np.isnan(rn[:, 0, 0]).all()
+
+
+def test_clim_anom_leap_days():
+    times = xr.date_range(
+        "2001-01-01",
+        "2004-12-31 18:00",
+        freq="6h",
+        calendar="standard",
+        use_cftime=True,
+    )
+    d = create_fake_precip(ntime=len(times)).assign_coords(time=times)
+    clim, anom = ClimAnom(d, 4, 2001, 2004, "standard")
+    assert clim.shape == (366 * 4,) + d.shape[1:]
+
+    # Years with 365 days skip Feb 29 (day index 59) of the climatology
+    dseg = np.full((4, 366 * 4) + d.shape[1:], np.nan)
+    filled = np.ones((4, 366 * 4), dtype=bool)
+    for iyr, year in enumerate(range(2001, 2005)):
+        yr = d.sel(time=str(year)).values
+        if year == 2004:
+            dseg[iyr] = yr
+        else:
+            dseg[iyr, : 59 * 4] = yr[: 59 * 4]
+            dseg[iyr, 60 * 4 :] = yr[59 * 4 :]
+            filled[iyr, 59 * 4 : 60 * 4] = False
+    expected = np.nanmean(dseg, axis=0)
+    np.testing.assert_array_equal(clim.values, expected)
+    np.testing.assert_array_equal(
+        anom.values, (dseg - expected)[filled].reshape(d.shape)
+    )
+    np.testing.assert_array_equal(
+        clim.values[59 * 4 : 60 * 4], d.sel(time="2004-02-29").values
+    )
+
+    times = xr.date_range(
+        "2001-01-01", "2002-12-30", freq="D", calendar="360_day", use_cftime=True
+    )
+    d = create_fake_precip(ntime=len(times)).assign_coords(time=times)
+    clim, anom = ClimAnom(d, 1, 2001, 2002, "360_day")
+    dseg = d.values.reshape((2, 360) + d.shape[1:])
+    np.testing.assert_array_equal(clim.values, np.nanmean(dseg, axis=0))
+    np.testing.assert_array_equal(
+        anom.values, (dseg - np.nanmean(dseg, axis=0)).reshape(d.shape)
+    )
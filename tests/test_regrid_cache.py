@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import xarray as xr
+
+from pcmdi_metrics.io import RegridCache
+
+
+def create_fake_ds(seed=0):
+    rng = np.random.default_rng(seed)
+    lat = np.arange(-85.0, 90.0, 10.0)
+    lon = np.arange(5.0, 360.0, 10.0)
+    ds = xr.Dataset(
+        {"ts": (("time", "lat", "lon"), rng.random((3, len(lat), len(lon))))},
+        coords={
+            "time": ("time", [15.5, 45.0, 74.5], {"units": "days since 2000-01-01"}),
+            "lat": ("lat", lat, {"axis": "Y", "bounds": "lat_bnds"}),
+            "lon": ("lon", lon, {"axis": "X", "bounds": "lon_bnds"}),
+        },
+    )
+    ds["time"].attrs["axis"] = "T"
+    ds["lat_bnds"] = (("lat", "bnds"), np.stack([lat - 5, lat + 5], axis=1))
+    ds["lon_bnds"] = (("lon", "bnds"), np.stack([lon - 5, lon + 5], axis=1))
+    return ds
+
+
+def test_regrid_cache_hit_and_miss(tmp_path):
+    cache = RegridCache(str(tmp_path / "cache"))
+    ds = create_fake_ds()
+    assert cache.get("missing") is None
+
+    # entries are opened again with the options they were stored with
+    cache.put("raw_times", ds, open_kwargs={"decode_times": False})
+    cached = cache.get("raw_times")
+    np.testing.assert_array_equal(cached.ts, ds.ts)
+    np.testing.assert_array_equal(cached.time, ds.time)
+
+    cache.put("decoded_times", ds, open_kwargs={"decode_times": True})
+    cached = cache.get("decoded_times")
+    np.testing.assert_array_equal(cached.ts, ds.ts)
+    assert not np.issubdtype(cached.time.dtype, np.floating)
+
+    cache.clear()
+    assert cache.get("raw_times") is None
+    assert os.listdir(cache.cache_dir) == []
+
+
+def test_regrid_cache_key_changes_with_input_mtime(tmp_path):
+    cache = RegridCache(str(tmp_path / "cache"))
+    ds = create_fake_ds()
+    data_path = str(tmp_path / "ts.nc")
+    ds.to_netcdf(data_path)
+
+    key = cache.make_key(data_path, ds, varname="ts", decode_times=True)
+    assert key == cache.make_key(data_path, ds, varname="ts", decode_times=True)
+    assert key != cache.make_key(data_path, ds, varname="ts", decode_times=False)
+
+    st = os.stat(data_path)
+    os.utime(data_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert key != cache.make_key(data_path, ds, varname="ts", decode_times=True)
+
+
+def test_regrid_cache_evicts_least_recently_used(tmp_path):
+    cache = RegridCache(str(tmp_path / "cache"))
+    ds = create_fake_ds()
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, ds, open_kwargs={"decode_times": False})
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+
+    # reading "a" makes "b" the least recently used entry
+    assert cache.get("a") is not None
+    size = os.path.getsize(cache._path("a"))
+    cache.max_size_gb = 2.5 * size / 1024**3
+    cache.evict()
+
+    assert cache.get("b") is None
+    assert not os.path.exists(cache._open_kwargs_path("b"))
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
@@ -1,6 +1,10 @@
+import os
+
 import numpy as np
 import xarray as xr
+from scipy.interpolate import griddata
 
+from pcmdi_metrics.sea_ice.lib import sea_ice_iiee_metrics as iiee
 from pcmdi_metrics.sea_ice.lib import sea_ice_lib as lib
 
 
@@ -57,6 +61,30 @@ def test_get_total_extent():
     assert te_mean == total_ext_true
 
 
+def test_get_region_extents_matches_choose_region():
+    rng = np.random.default_rng(0)
+    lat = np.arange(-88.0, 90, 4.0)
+    lon = np.arange(-178.0, 180, 4.0)
+    ds = xr.Dataset(
+        {
+            "siconc": (
+                ("time", "lat", "lon"),
+                rng.uniform(0, 1, (3, len(lat), len(lon))),
+            )
+        },
+        coords={"time": np.arange(3), "lat": lat, "lon": lon},
+    )
+    area = rng.uniform(1, 2, (len(lat), len(lon)))
+    regions = ["arctic", "antarctic", "ca", "na", "np", "sa", "sp", "io"]
+
+    extents = lib.get_region_extents(ds, "siconc", area, 90, regions)
+
+    for region in regions:
+        data = lib.choose_region(region, ds, "siconc", "lon", "lat", 90)
+        total_extent, te_mean = lib.get_total_extent(data, area)
+        np.testing.assert_allclose(extents.sel(region=region), total_extent)
+
+
 def test_mse_t_identical():
     siconc, area = create_fake_sea_ice_ds()
     ts = (siconc.siconc / 100 * area.areacello).sum(("lat", "lon"))
@@ -116,3 +144,50 @@ def get_clim_time_bounds():
     ts2 = ts2.rename("time_bnds", "time_bounds")
     clim2 = lib.get_clim(ts2, siconc, "siconc")
     assert clim1.equals(clim2)
+
+
+def test_interpolate_model_to_obs_grid_matches_griddata(tmp_path):
+    rng = np.random.default_rng(0)
+    obs_x, obs_y = np.meshgrid(np.linspace(-2e6, 2e6, 30), np.linspace(-2e6, 2e6, 30))
+    model_x, model_y = np.meshgrid(
+        np.linspace(-3e6, 3e6, 20), np.linspace(-3e6, 3e6, 25)
+    )
+    obs_status_flag = xr.DataArray((rng.random(obs_x.shape) < 0.1).astype(int))
+    sic = rng.uniform(0, 100, (3,) + model_x.shape)
+    sic[:, :, :5] = np.nan  # land
+    sic[1, 0, 10] = np.nan  # different mask in one month
+
+    iiee.clear_nearest_index_cache()
+    result = iiee.interpolate_model_to_obs_grid(
+        xr.DataArray(sic),
+        model_x,
+        model_y,
+        obs_x,
+        obs_y,
+        obs_status_flag,
+        cache_dir=str(tmp_path),
+    )
+
+    model_points_xy = np.column_stack((model_x.ravel(), model_y.ravel()))
+    obs_points_xy = np.column_stack((obs_x.ravel(), obs_y.ravel()))
+    for month in range(3):
+        sic_1d = sic[month].ravel()
+        ocean = ~np.isnan(sic_1d)
+        expected = griddata(
+            model_points_xy[ocean], sic_1d[ocean], obs_points_xy, method="nearest"
+        )
+        expected[obs_status_flag.values.ravel() == 1] = np.nan
+        np.testing.assert_array_equal(result[month], expected.reshape(obs_x.shape))
+
+    assert len(os.listdir(tmp_path)) == 2
+    iiee.clear_nearest_index_cache()
+    result_from_disk = iiee.interpolate_model_to_obs_grid(
+        xr.DataArray(sic),
+        model_x,
+        model_y,
+        obs_x,
+        obs_y,
+        obs_status_flag,
+        cache_dir=str(tmp_path),
+    )
+    np.testing.assert_array_equal(result, result_from_disk)
@@ -0,0 +1,272 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import xarray as xr
+from eofs.xarray import Eof
+
+import pcmdi_metrics.variability_mode
+from pcmdi_metrics.variability_mode.lib import (
+    arbitrary_checking,
+    gain_pseudo_pcs,
+    gain_pseudo_pcs_batch,
+    get_cbf_projector,
+    get_eof_solver,
+    linear_regression,
+    linear_regression_on_globe_for_teleconnection,
+    linear_regression_on_globe_for_teleconnection_batch,
+    read_data_in,
+)
+
+
+def create_fake_field(seed, ntime=60):
+    times = xr.date_range(
+        start="2000-01-01",
+        periods=ntime,
+        freq="MS",
+        calendar="noleap",
+        use_cftime=True,
+        name="time",
+    )
+    lat = np.arange(20.0, 80.0, 5.0)
+    lon = np.arange(0.0, 120.0, 5.0)
+
+    rng = np.random.default_rng(seed)
+    values = rng.standard_normal((len(times), len(lat), len(lon)))
+    values += (
+        np.sin(np.arange(len(times)))[:, None, None]
+        * np.cos(np.deg2rad(lat))[None, :, None]
+    )
+    values[:, 2:4, 5:7] = np.nan  # missing values
+
+    return xr.DataArray(
+        data=values,
+        dims=["time", "lat", "lon"],
+        coords={"time": times, "lat": lat, "lon": lon},
+        name="psl",
+    )
+
+
+def test_gain_pseudo_pcs_batch_matches_gain_pseudo_pcs():
+    weights = np.sqrt(np.cos(np.deg2rad(create_fake_field(0).lat.values)))
+    weights = weights[:, None] * np.ones(24)
+    solver = Eof(create_fake_field(0), weights=weights)
+    fields = [create_fake_field(seed) for seed in range(1, 4)]
+
+    for EofScaling in [False, True]:
+        projector = get_cbf_projector(
+            solver, 2, reverse_sign=True, EofScaling=EofScaling
+        )
+        pseudo_pcs = gain_pseudo_pcs_batch(projector, fields)
+
+        for field, pcs in zip(fields, pseudo_pcs):
+            expected = gain_pseudo_pcs(
+                solver, field, 2, reverse_sign=True, EofScaling=EofScaling
+            )
+            np.testing.assert_allclose(pcs.values, expected.values)
+            assert pcs.attrs == expected.attrs
+
+
+def test_linear_regression_batch_matches_polyfit():
+    fields = [create_fake_field(seed) for seed in range(3)]
+    fields.append(create_fake_field(3, ntime=48))
+    pcs = [field.isel(lat=5, lon=2) for field in fields]
+
+    results = linear_regression_on_globe_for_teleconnection_batch(
+        pcs, [field.to_dataset() for field in fields], "psl", [2.0] * 4
+    )
+
+    for pc, field, (eof_lr, slope, intercept) in zip(pcs, fields, results):
+        expected = np.polyfit(pc.values, field.values.reshape(len(pc), -1), 1)
+        valid = np.isfinite(field.values[0]).ravel()
+        np.testing.assert_allclose(slope.values.ravel()[valid], expected[0][valid])
+        np.testing.assert_allclose(
+            intercept.values.ravel()[valid], expected[1][valid], atol=1e-12
+        )
+        assert np.isnan(slope.values.ravel()[~valid]).all()
+
+        single = linear_regression_on_globe_for_teleconnection(
+            pc, field.to_dataset(), "psl", 2.0
+        )
+        xr.testing.assert_allclose(eof_lr, single[0])
+        xr.testing.assert_allclose(slope, linear_regression(pc, field)[0])
+
+
+def test_truncated_eof_backends_match_eofs():
+    field = create_fake_field(0)
+    # Second mode, well separated from the noise
+    field += (
+        2
+        * np.cos(np.arange(60))[:, None, None]
+        * np.sin(np.deg2rad(3 * field.lon.values))[None, None, :]
+    )
+    weights = np.sqrt(np.cos(np.deg2rad(field.lat.values)))[:, None] * np.ones(24)
+    # eofsAsCovariance alters the data of the solver, so use one solver per output
+    expected_eofs = Eof(field, weights=weights).eofsAsCovariance(neofs=2, pcscaling=1)
+    expected = Eof(field, weights=weights)
+
+    for backend in ["randomized", "covariance"]:
+        solver = get_eof_solver(field, weights=weights, backend=backend, neofs=10)
+        assert len(solver.varianceFraction()) == 10
+        np.testing.assert_allclose(
+            solver.varianceFraction(neigs=2).values,
+            expected.varianceFraction(neigs=2).values,
+        )
+        np.testing.assert_allclose(
+            solver.northTest(neigs=2, vfscaled=True).values,
+            expected.northTest(neigs=2, vfscaled=True).values,
+        )
+
+        eofs = solver.eofsAsCovariance(neofs=2, pcscaling=1)
+        pcs = solver.pcs(npcs=2, pcscaling=1)
+        for n in range(2):
+            # Same sign after the sign convention of the variability modes
+            sign = -1 if arbitrary_checking("NAM", eofs[n]) else 1
+            sign_expected = -1 if arbitrary_checking("NAM", expected_eofs[n]) else 1
+            np.testing.assert_allclose(
+                eofs[n].values * sign,
+                expected_eofs[n].values * sign_expected,
+                atol=1e-6,
+            )
+            np.testing.assert_allclose(
+                pcs[:, n].values * sign,
+                expected.pcs(npcs=2, pcscaling=1)[:, n].values * sign_expected,
+                atol=1e-6,
+            )
+
+
+def test_read_data_in_chunks_and_domain(tmp_path):
+    times = xr.date_range(
+        start="1900-01-01",
+        periods=120,
+        freq="MS",
+        calendar="noleap",
+        use_cftime=True,
+        name="time",
+    )
+    lat = np.arange(87.5, -90.0, -5.0)
+    lon = np.arange(-177.5, 180.0, 5.0)
+    values = np.random.default_rng(0).normal(280, 5, (len(times), len(lat), len(lon)))
+    ds = xr.Dataset(
+        {"ts": (("time", "lat", "lon"), values)},
+        coords={"time": times, "lat": lat, "lon": lon},
+    )
+    ds.lat.attrs = {"units": "degrees_north", "axis": "Y"}
+    ds.lon.attrs = {"units": "degrees_east", "axis": "X"}
+    path = str(tmp_path / "ts.nc")
+    ds.to_netcdf(path)
+
+    kwargs = dict(UnitsAdjust=(True, "subtract", 273.15))
+    expected = read_data_in(path, "ts", "ts", 1902, 1906, **kwargs)
+    result = read_data_in(path, "ts", "ts", 1902, 1906, chunks={"time": 12}, **kwargs)
+    xr.testing.assert_identical(result, expected)
+    assert expected.time.dt.year.values[[0, -1]].tolist() == [1902, 1906]
+
+    result = read_data_in(
+        path,
+        "ts",
+        "ts",
+        1902,
+        1906,
+        chunks={"time": 12},
+        lat_range=(20, 80),
+        lon_range=(100, 250),
+        **kwargs,
+    )
+    xr.testing.assert_identical(
+        result["ts"], expected["ts"].sel(lat=slice(80, 20), lon=slice(100, 250))
+    )
+
+
+def _assert_results_close(result, expected):
+    if isinstance(expected, dict):
+        assert sorted(result) == sorted(expected)
+        for key in expected:
+            _assert_results_close(result[key], expected[key])
+    elif isinstance(expected, float):
+        np.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-12)
+    else:
+        assert result == expected
+
+
+def test_driver_several_modes_match_single_mode_runs(tmp_path):
+    times = xr.date_range(
+        start="1900-01-01",
+        periods=96,
+        freq="MS",
+        calendar="noleap",
+        use_cftime=True,
+        name="time",
+    )
+    lat = np.arange(-87.5, 90.0, 5.0)
+    lon = np.arange(2.5, 360.0, 5.0)
+    for name, seed in [("psl_obs.nc", 0), ("psl_FAKE-MODEL_r1i1p1f1.nc", 1)]:
+        values = np.random.default_rng(seed).normal(
+            101300, 500, (len(times), len(lat), len(lon))
+        )
+        ds = xr.Dataset(
+            {"psl": (("time", "lat", "lon"), values)},
+            coords={"time": times, "lat": lat, "lon": lon},
+        )
+        ds.lat.attrs = {"units": "degrees_north", "axis": "Y"}
+        ds.lon.attrs = {"units": "degrees_east", "axis": "X"}
+        ds.to_netcdf(str(tmp_path / name))
+
+    param_file = tmp_path / "param.py"
+    param_file.write_text(
+        "\n".join(
+            [
+                'mip = "cmip6"',
+                'exp = "historical"',
+                'variability_mode = "NAM"',
+                'seasons = ["DJF"]',
+                'reference_data_name = "obs"',
+                f"reference_data_path = {str(tmp_path / 'psl_obs.nc')!r}",
+                'varOBS = "psl"',
+                f"modpath = {str(tmp_path / 'psl_%(model)_%(realization).nc')!r}",
+                'modnames = ["FAKE-MODEL"]',
+                'realization = "r1i1p1f1"',
+                'varModel = "psl"',
+                "osyear = msyear = 1900",
+                "oeyear = meyear = 1907",
+                "provenance = False",
+                "plot_obs = plot = nc_out_obs = nc_out = False",
+                f"results_dir = {str(tmp_path / '%(case_id)/%(output_type)/%(variability_mode)')!r}",
+            ]
+        )
+    )
+
+    driver = os.path.join(
+        os.path.dirname(pcmdi_metrics.variability_mode.__file__),
+        "variability_modes_driver.py",
+    )
+
+    def run_driver(case_id, modes):
+        subprocess.run(
+            [sys.executable, driver, "-p", str(param_file), "--case_id", case_id]
+            + ["--variability_modes"]
+            + modes,
+            cwd=str(tmp_path),
+            check=True,
+        )
+
+    def read_results(case_id, mode, eofn):
+        path = tmp_path.joinpath(
+            case_id,
+            "metrics_results",
+            mode,
+            f"var_mode_{mode}_EOF{eofn}_stat_cmip6_historical_mo_atm_"
+            "FAKE-MODEL_r1i1p1f1_1900-1907.json",
+        )
+        with open(path) as f:
+            results = json.load(f)
+        return results["REF"], results["RESULTS"]
+
+    run_driver("multi", ["NAM", "NPO", "PSA2"])
+    for mode, eofn in [("NAM", 1), ("NPO", 2), ("PSA2", 3)]:
+        run_driver(mode, [mode])
+        _assert_results_close(
+            read_results("multi", mode, eofn), read_results(mode, mode, eofn)
+        )
@@ -0,0 +1,26 @@
+import os
+
+from pcmdi_metrics.io.write_atomic import write_atomic
+
+
+def test_write_atomic_replaces_file_or_leaves_no_trace(tmp_path):
+    path = str(tmp_path / "cache" / "entry.txt")
+
+    def write(tmp):
+        with open(tmp, "w") as f:
+            f.write("complete")
+
+    assert write_atomic(path, write, "test entry")
+    with open(path) as f:
+        assert f.read() == "complete"
+
+    def fail(tmp):
+        with open(tmp, "w") as f:
+            f.write("partial")
+        raise OSError("disk full")
+
+    # a failed write keeps the previous file and removes the temporary one
+    assert not write_atomic(path, fail, "test entry")
+    with open(path) as f:
+        assert f.read() == "complete"
+    assert os.listdir(os.path.dirname(path)) == ["entry.txt"]